@@ -0,0 +1,139 @@
+import sys
+import os
+import time
+
+# --- CẤU HÌNH ĐƯỜNG DẪN IMPORT ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.dirname(current_dir))
+
+try:
+    from be.db_connection import get_db_connection, close_db_connection
+except ImportError as e:
+    print(f"❌ LỖI IMPORT: {e}")
+    exit()
+
+# Benchmark: thời gian thêm một dòng bán (trigger FIFO) theo số lượng lô nhập trong lịch sử.
+# Toàn bộ dữ liệu được tạo trong MỘT giao dịch và ROLLBACK ở cuối -> không để lại rác trong DB.
+# Chạy: python be/bench_fifo_lo_nhap.py [số_lô_lịch_sử ...]
+
+SO_LO_CON_HANG = 20          # Số lô còn hàng (open lots) giữ cố định
+SO_LAN_DO = 200              # Số dòng bán được đo cho mỗi kích thước lịch sử
+KICH_THUOC_MAC_DINH = [1000, 10000, 100000]
+
+# Truy vấn tra cứu lô kiểu cũ (JOIN DonHangNhap + sắp xếp) và kiểu mới (index lô mở), để so sánh
+SQL_LO_KIEU_CU = """
+    SELECT ctdhn.id, ctdhn.gia_nhap_don_vi, ctdhn.so_luong_con_lai
+    FROM ChiTietDonHangNhap ctdhn
+    JOIN DonHangNhap dhn ON ctdhn.id_don_hang_nhap = dhn.id
+    WHERE ctdhn.id_san_pham = %s AND ctdhn.so_luong_con_lai > 0 AND dhn.trang_thai = 'Hoàn tất'
+    ORDER BY dhn.ngay_nhan_hang_thuc_te ASC, ctdhn.id ASC;
+"""
+SQL_LO_KIEU_MOI = """
+    SELECT ctdhn.id, ctdhn.gia_nhap_don_vi, ctdhn.so_luong_con_lai
+    FROM ChiTietDonHangNhap ctdhn
+    WHERE ctdhn.id_san_pham = %s AND ctdhn.so_luong_con_lai > 0 AND ctdhn.ngay_nhap_kho IS NOT NULL
+    ORDER BY ctdhn.ngay_nhap_kho ASC, ctdhn.id ASC;
+"""
+
+
+def tao_du_lieu_nen(cur):
+    """Tạo danh mục, sản phẩm, NCC, nhân viên, khách hàng dùng cho benchmark."""
+    cur.execute("INSERT INTO DanhMuc (ma_danh_muc, ten_danh_muc) VALUES ('BENCH', 'Bench FIFO') RETURNING id;")
+    dm_id = cur.fetchone()[0]
+    cur.execute("""INSERT INTO SanPham (ma_san_pham, ten_san_pham, id_danh_muc, so_luong_ton_kho, don_vi_tinh)
+                   VALUES ('BENCH_FIFO', 'Sản phẩm Bench FIFO', %s, 0, 'Cái') RETURNING id;""", (dm_id,))
+    sp_id = cur.fetchone()[0]
+    cur.execute("""INSERT INTO NhaCungCap (ten_nha_cung_cap, email, dia_chi)
+                   VALUES ('NCC Bench FIFO', 'bench.fifo@ncc.test', 'Bench') RETURNING id;""")
+    ncc_id = cur.fetchone()[0]
+    cur.execute("""INSERT INTO NhanVien (ten_nhan_vien, ten_dang_nhap, mat_khau, email, so_dien_thoai)
+                   VALUES ('NV Bench', 'bench_fifo', 'x', 'bench.fifo@nv.test', '0999000111') RETURNING id;""")
+    nv_id = cur.fetchone()[0]
+    cur.execute("""INSERT INTO KhachHang (ten_khach_hang, so_dien_thoai, email)
+                   VALUES ('KH Bench', '0999000222', 'bench.fifo@kh.test') RETURNING id;""")
+    kh_id = cur.fetchone()[0]
+    return sp_id, ncc_id, nv_id, kh_id
+
+
+def tao_lich_su_nhap(cur, sp_id, ncc_id, nv_id, so_lo_lich_su):
+    """Tạo `so_lo_lich_su` lô đã bán hết + SO_LO_CON_HANG lô còn hàng cho sản phẩm."""
+    tong_so_lo = so_lo_lich_su + SO_LO_CON_HANG
+    cur.execute("""
+        INSERT INTO DonHangNhap (id_nha_cung_cap, id_nhan_vien, trang_thai, ngay_nhan_hang_thuc_te, ghi_chu)
+        SELECT %s, %s, 'Hoàn tất', DATE '2000-01-01' + (g / 50), 'BENCH_FIFO'
+        FROM generate_series(1, %s) AS g;
+    """, (ncc_id, nv_id, tong_so_lo))
+    cur.execute("""
+        INSERT INTO ChiTietDonHangNhap (id_don_hang_nhap, id_san_pham, so_luong, so_luong_con_lai, gia_nhap_don_vi, tong_gia_nhap)
+        SELECT id, %s, 1000, 0, 1000, 0 FROM DonHangNhap WHERE ghi_chu = 'BENCH_FIFO';
+    """, (sp_id,))
+    # Các lô cũ coi như đã bán hết, chỉ giữ SO_LO_CON_HANG lô mới nhất còn hàng
+    cur.execute("""
+        UPDATE ChiTietDonHangNhap SET so_luong_con_lai = 0
+        WHERE id_san_pham = %s
+          AND id NOT IN (SELECT id FROM ChiTietDonHangNhap WHERE id_san_pham = %s ORDER BY id DESC LIMIT %s);
+    """, (sp_id, sp_id, SO_LO_CON_HANG))
+    cur.execute("ANALYZE ChiTietDonHangNhap;")
+    cur.execute("ANALYZE DonHangNhap;")
+
+
+def do_thoi_gian_truy_van(cur, sql, sp_id, so_lan=50):
+    bat_dau = time.perf_counter()
+    for _ in range(so_lan):
+        cur.execute(sql, (sp_id,))
+        cur.fetchall()
+    return (time.perf_counter() - bat_dau) / so_lan * 1000
+
+
+def do_thoi_gian_ban_hang(cur, sp_id, nv_id, kh_id):
+    """Đo thời gian trung bình (ms) của một lần INSERT dòng bán (bao gồm trigger FIFO)."""
+    tong = 0.0
+    for _ in range(SO_LAN_DO):
+        cur.execute("""INSERT INTO DonHangBan (id_nhan_vien, id_khach_hang, dia_chi_giao_hang, phuong_thuc_thanh_toan)
+                       VALUES (%s, %s, 'Bench', 'Tiền mặt') RETURNING id;""", (nv_id, kh_id))
+        dhb_id = cur.fetchone()[0]
+        bat_dau = time.perf_counter()
+        cur.execute("""INSERT INTO ChiTietDonHangBan (id_don_hang_ban, id_san_pham, so_luong, gia_ban_niem_yet_don_vi, giam_gia)
+                       VALUES (%s, %s, 3, 2000, 0);""", (dhb_id, sp_id))
+        tong += time.perf_counter() - bat_dau
+    return tong / SO_LAN_DO * 1000
+
+
+def main(kich_thuoc_list):
+    conn = get_db_connection()
+    if not conn:
+        print("❌ KẾT NỐI THẤT BẠI.")
+        return
+
+    try:
+        with conn.cursor() as cur:
+            sp_id, ncc_id, nv_id, kh_id = tao_du_lieu_nen(cur)
+
+            print(f"\n{'Số lô lịch sử':>14} | {'Tra lô cũ (ms)':>14} | {'Tra lô mới (ms)':>15} | {'INSERT dòng bán (ms)':>20}")
+            print("-" * 74)
+            for so_lo in kich_thuoc_list:
+                cur.execute("SAVEPOINT bench;")
+                tao_lich_su_nhap(cur, sp_id, ncc_id, nv_id, so_lo)
+
+                ms_cu = do_thoi_gian_truy_van(cur, SQL_LO_KIEU_CU, sp_id)
+                ms_moi = do_thoi_gian_truy_van(cur, SQL_LO_KIEU_MOI, sp_id)
+                ms_ban = do_thoi_gian_ban_hang(cur, sp_id, nv_id, kh_id)
+                print(f"{so_lo:>14} | {ms_cu:>14.3f} | {ms_moi:>15.3f} | {ms_ban:>20.3f}")
+
+                if so_lo == kich_thuoc_list[-1]:
+                    cur.execute("EXPLAIN " + SQL_LO_KIEU_MOI, (sp_id,))
+                    print("\nKế hoạch truy vấn tra lô mới:")
+                    for row in cur.fetchall():
+                        print("   " + row[0])
+                cur.execute("ROLLBACK TO SAVEPOINT bench;")
+    finally:
+        # Không giữ lại bất kỳ dữ liệu benchmark nào
+        conn.rollback()
+        close_db_connection(conn)
+        print("\n✅ Đã rollback toàn bộ dữ liệu benchmark.")
+
+
+if __name__ == "__main__":
+    sizes = [int(x) for x in sys.argv[1:]] or KICH_THUOC_MAC_DINH
+    main(sizes)
@@ -0,0 +1,101 @@
+import sys
+import os
+import time
+
+# --- CẤU HÌNH ĐƯỜNG DẪN IMPORT ---
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+sys.path.append(os.path.dirname(current_dir))
+
+try:
+    from be.db_connection import get_db_connection, close_db_connection
+    from be import text_search
+except ImportError as e:
+    print(f"❌ LỖI IMPORT: {e}")
+    exit()
+
+# Benchmark: tìm kiếm sản phẩm ở POS với danh mục lớn (mặc định 100.000 SKU).
+# So sánh ILIKE '%...%' kiểu cũ (quét toàn bảng) với tìm kiếm có index (trigram trên ten_tim_kiem + prefix mã).
+# Toàn bộ dữ liệu được tạo trong MỘT giao dịch và ROLLBACK ở cuối -> không để lại rác trong DB.
+# Chạy: python be/bench_tim_kiem_san_pham.py [số_sku]
+
+SO_SKU_MAC_DINH = 100000
+SO_LAN_DO = 50
+TU_KHOA = ["sữa", "sua tuoi", "BENCH0099", "keo dua", "xyz khong co"]
+
+SQL_KIEU_CU = """
+    SELECT id, ma_san_pham, ten_san_pham FROM SanPham
+    WHERE ten_san_pham ILIKE %s OR ma_san_pham ILIKE %s
+    ORDER BY id DESC;
+"""
+
+# Tên mẫu có dấu để sinh tên sản phẩm đa dạng
+TEN_MAU = ["Sữa tươi", "Bánh quy", "Kẹo dừa", "Trà xanh", "Cà phê", "Nước mắm", "Mì gói", "Dầu ăn",
+           "Nước ngọt", "Bột giặt", "Dầu gội", "Sữa chua", "Bánh mì", "Gạo thơm", "Đường kính"]
+
+
+def tao_du_lieu(cur, so_sku):
+    cur.execute("INSERT INTO DanhMuc (ma_danh_muc, ten_danh_muc) VALUES ('BENCHTK', 'Bench tìm kiếm') RETURNING id;")
+    dm_id = cur.fetchone()[0]
+    cur.execute("""
+        INSERT INTO SanPham (ma_san_pham, ten_san_pham, id_danh_muc, so_luong_ton_kho, don_vi_tinh)
+        SELECT 'BENCH' || lpad(g::TEXT, 6, '0'),
+               (%s::TEXT[])[1 + g %% %s] || ' loại ' || g,
+               %s, 10, 'Cái'
+        FROM generate_series(1, %s) AS g;
+    """, (TEN_MAU, len(TEN_MAU), dm_id, so_sku))
+    cur.execute("ANALYZE SanPham;")
+
+
+def sql_kieu_moi(tu_khoa):
+    dieu_kien, dieu_kien_params, hang, hang_params = text_search.build_ranked_search(
+        "ten_tim_kiem", "lower(ma_san_pham)", tu_khoa)
+    sql = f"""
+        SELECT id, ma_san_pham, ten_san_pham FROM SanPham
+        WHERE {dieu_kien}
+        ORDER BY {hang}, length(ten_san_pham), id DESC
+        LIMIT %s;
+    """
+    return sql, tuple(dieu_kien_params + hang_params + [text_search.DEFAULT_SEARCH_LIMIT])
+
+
+def do_thoi_gian(cur, sql, params):
+    bat_dau = time.perf_counter()
+    for _ in range(SO_LAN_DO):
+        cur.execute(sql, params)
+        so_dong = len(cur.fetchall())
+    return (time.perf_counter() - bat_dau) / SO_LAN_DO * 1000, so_dong
+
+
+def main(so_sku):
+    conn = get_db_connection()
+    if not conn:
+        print("❌ KẾT NỐI THẤT BẠI.")
+        return
+
+    try:
+        with conn.cursor() as cur:
+            print(f"Đang tạo {so_sku} sản phẩm...")
+            tao_du_lieu(cur, so_sku)
+
+            print(f"\n{'Từ khóa':>14} | {'ILIKE cũ (ms)':>14} | {'Số dòng':>8} | {'Có index (ms)':>14} | {'Số dòng':>8}")
+            print("-" * 70)
+            for tu_khoa in TU_KHOA:
+                mau = f"%{tu_khoa}%"
+                ms_cu, dong_cu = do_thoi_gian(cur, SQL_KIEU_CU, (mau, mau))
+                ms_moi, dong_moi = do_thoi_gian(cur, *sql_kieu_moi(tu_khoa))
+                print(f"{tu_khoa:>14} | {ms_cu:>14.3f} | {dong_cu:>8} | {ms_moi:>14.3f} | {dong_moi:>8}")
+
+            cur.execute("EXPLAIN " + sql_kieu_moi("sua tuoi")[0], sql_kieu_moi("sua tuoi")[1])
+            print("\nKế hoạch truy vấn tìm kiếm mới ('sua tuoi'):")
+            for row in cur.fetchall():
+                print("   " + row[0])
+    finally:
+        # Không giữ lại bất kỳ dữ liệu benchmark nào
+        conn.rollback()
+        close_db_connection(conn)
+        print("\n✅ Đã rollback toàn bộ dữ liệu benchmark.")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else SO_SKU_MAC_DINH)
@@ -0,0 +1,174 @@
+# be/catalog_cache.py
+
+import json
+import time
+
+from psycopg.rows import dict_row
+
+from be import db_notify, text_search
+from be.db_connection_async import execute_query, get_async_connection
+
+# --- Bộ nhớ đệm danh mục POS ---
+# Mỗi worker giữ toàn bộ sản phẩm đang kinh doanh (id, mã, tên, đơn vị, tồn kho, giá hiện tại) trong RAM.
+# Tìm kiếm ở màn hình POS được phục vụ từ bộ nhớ; trigger trên SanPham / LichSuGiaNiemYet gửi NOTIFY
+# 'catalog_changed' (012_create_triggers.sql, section 5) để chỉ nạp lại đúng sản phẩm bị đổi.
+# Khi bộ đệm chưa sẵn sàng (đang khởi động, mất kết nối LISTEN, nạp lỗi và đang chờ nạp lại) router đọc
+# thẳng từ DB. Phần LISTEN / gộp thông báo / nạp lại khi lỗi dùng chung db_notify.NotifyMirror.
+# Giá đến hạn lúc nửa đêm được hàm func_ap_dung_gia_den_han ghi vào SanPham -> cũng đến đây qua NOTIFY.
+
+KENH_THONG_BAO = "catalog_changed"
+NGUONG_CANH_BAO = 5  # Tồn kho <= ngưỡng này thì gắn cờ 'Sắp hết hàng'
+
+SQL_DANH_SACH_POS = """
+    SELECT
+        sp.id,
+        sp.ma_san_pham,
+        sp.ten_san_pham,
+        sp.don_vi_tinh,
+        sp.so_luong_ton_kho,
+        sp.duong_dan_hinh_anh_chinh,
+        sp.gia_ban_hien_tai -- Giá đang hiệu lực, do trigger duy trì (012, section 4)
+    FROM SanPham sp
+    WHERE sp.trang_thai IN ('Đang kinh doanh - Còn hàng', 'Đang kinh doanh - Hết hàng')
+"""
+
+_items = {}  # id sản phẩm -> (mã chuẩn hóa, tên chuẩn hóa, dict sản phẩm đã gắn cờ tồn kho, giá dạng float)
+_sorted_items = []  # Các phần tử của _items theo id giảm dần (thứ tự trả về cho POS)
+
+_stats = {"so_lan_nap_toan_bo": 0, "so_lan_nap_mot_phan": 0, "lan_nap_cuoi": None}
+
+
+def build_item(row):
+    """Chuẩn hóa một dòng sản phẩm cho POS: gắn cờ cảnh báo tồn kho, ép giá về float."""
+    ton_kho = row.get('so_luong_ton_kho') or 0
+    item = dict(row)
+    if ton_kho <= NGUONG_CANH_BAO:
+        item['canh_bao'] = True
+        item['trang_thai_kho'] = 'Sắp hết hàng'
+    else:
+        item['canh_bao'] = False
+        item['trang_thai_kho'] = 'Còn hàng'
+    item['gia_ban_hien_tai'] = float(row.get('gia_ban_hien_tai') or 0)
+    return item
+
+
+def _tao_phan_tu(row):
+    item = build_item(row)
+    return text_search.chuan_hoa(item['ma_san_pham']), text_search.chuan_hoa(item['ten_san_pham']), item
+
+
+def _sap_xep_lai():
+    global _sorted_items
+    _sorted_items = [_items[k] for k in sorted(_items, reverse=True)]
+
+
+async def query_catalog_from_db(tu_khoa=None, limit=None):
+    """
+    Đọc danh mục POS trực tiếp từ DB (dùng khi bộ đệm chưa sẵn sàng).
+    Cùng thứ tự với search_catalog: có từ khóa thì theo hạng khớp, không thì id giảm dần.
+    """
+    tim_kiem = text_search.build_ranked_search("sp.ten_tim_kiem", "lower(sp.ma_san_pham)", tu_khoa) if tu_khoa else None
+    if tim_kiem:
+        # Tên chứa từ khóa (không dấu, index trigram) hoặc mã bắt đầu bằng từ khóa (index prefix)
+        dieu_kien, dieu_kien_params, hang, hang_params = tim_kiem
+        sql = (f"{SQL_DANH_SACH_POS} AND {dieu_kien} "
+               f"ORDER BY {hang}, length(sp.ten_san_pham), sp.id DESC LIMIT %s")
+        params = dieu_kien_params + hang_params + [text_search.clamp_search_limit(limit)]
+    else:
+        sql = SQL_DANH_SACH_POS + " ORDER BY sp.id DESC"
+        params = []
+        if limit:
+            sql += " LIMIT %s"
+            params.append(limit)
+    rows = await execute_query(sql, tuple(params) if params else None)
+    return [build_item(r) for r in rows]
+
+
+async def _doc_danh_muc(sql, params=None):
+    # Không dùng execute_query: lỗi phải được ném ra, nếu không bộ đệm sẽ bị nạp thành rỗng
+    async with get_async_connection() as conn:
+        async with conn.cursor(row_factory=dict_row) as cur:
+            await cur.execute(sql, params)
+            return await cur.fetchall()
+
+
+async def reload_all():
+    """Nạp lại toàn bộ danh mục từ DB."""
+    global _items
+    rows = await _doc_danh_muc(SQL_DANH_SACH_POS)
+    _items = {row['id']: _tao_phan_tu(row) for row in rows}
+    _sap_xep_lai()
+    _stats["so_lan_nap_toan_bo"] += 1
+    _stats["lan_nap_cuoi"] = time.time()
+
+
+async def refresh_products(ids):
+    """Nạp lại một số sản phẩm; sản phẩm không còn kinh doanh (hoặc đã xóa) bị bỏ khỏi bộ đệm."""
+    ids = list(ids)
+    if not ids:
+        return
+    rows = await _doc_danh_muc(SQL_DANH_SACH_POS + " AND sp.id = ANY(%s)", (ids,))
+    found = {row['id']: _tao_phan_tu(row) for row in rows}
+
+    thay_doi_thu_tu = False
+    for sp_id in ids:
+        if sp_id in found:
+            thay_doi_thu_tu = thay_doi_thu_tu or sp_id not in _items
+            _items[sp_id] = found[sp_id]
+        elif _items.pop(sp_id, None) is not None:
+            thay_doi_thu_tu = True
+    if thay_doi_thu_tu:
+        _sap_xep_lai()
+    else:
+        # Chỉ thay nội dung: cập nhật tại chỗ trong danh sách đã sắp xếp
+        _sorted_items[:] = [_items[phan_tu[2]['id']] for phan_tu in _sorted_items]
+    _stats["so_lan_nap_mot_phan"] += 1
+
+
+def _doc_id_san_pham(payload):
+    return json.loads(payload).get("id_san_pham")
+
+
+# Thông báo có id_san_pham -> chỉ nạp lại sản phẩm đó (gộp các thông báo dồn dập); không có -> nạp toàn bộ
+_dong_bo = db_notify.NotifyMirror("bộ đệm danh mục", KENH_THONG_BAO, reload_all, refresh_products,
+                                  _doc_id_san_pham)
+
+
+def is_ready():
+    """Bộ đệm có thể dùng để trả lời hay không."""
+    return _dong_bo.is_ready()
+
+
+def search_catalog(tu_khoa=None, limit=None):
+    """
+    Tìm sản phẩm theo tên (chứa, không dấu) hoặc mã (bắt đầu bằng) trong bộ nhớ.
+    Có từ khóa: xếp theo hạng khớp (text_search.xep_hang), tên ngắn hơn trước, tối đa `limit` dòng.
+    Không có từ khóa: toàn bộ danh mục theo id giảm dần.
+    Các dict trả về dùng chung với bộ đệm: chỉ đọc, không sửa.
+    """
+    khoa = text_search.chuan_hoa(tu_khoa)
+    if not khoa:
+        items = [item for _, _, item in _sorted_items]
+        return items[:limit] if limit else items
+
+    ket_qua = []
+    for ma, ten, item in _sorted_items:
+        hang = text_search.xep_hang(khoa, ma, ten)
+        if hang is not None:
+            ket_qua.append((hang, len(item['ten_san_pham']), -item['id'], item))
+    ket_qua.sort(key=lambda x: x[:3])
+    return [x[3] for x in ket_qua[:text_search.clamp_search_limit(limit)]]
+
+
+async def start_catalog_cache():
+    """Bắt đầu LISTEN; mỗi lần kết nối (lại) thành công sẽ nạp lại toàn bộ danh mục."""
+    _dong_bo.start()
+
+
+async def stop_catalog_cache():
+    await _dong_bo.stop()
+
+
+def get_catalog_stats():
+    """Thống kê bộ đệm danh mục (số sản phẩm, số lần nạp, số thông báo đã nhận, số lần lỗi)."""
+    return {"so_san_pham": len(_items), **_stats, **_dong_bo.get_stats()}
@@ -1,8 +1,18 @@
 import psycopg2
 import psycopg2.extras  # Import extras để dùng RealDictCursor
+import psycopg2.extensions
+import psycopg2.pool
 import os
+import sys
+import time
+import atexit
+import threading
+from datetime import datetime, time as dt_time, timedelta
+from zoneinfo import ZoneInfo
 from dotenv import load_dotenv
 
+from be import pagination
+
 # Load environment variables
 load_dotenv()
 
@@ -12,32 +22,314 @@ DB_NAME = os.getenv("DB_NAME")
 DB_USER = os.getenv("DB_USER")
 DB_PASS = os.getenv("DB_PASS")
 
+# --- Múi giờ cửa hàng ---
+# Mọi kết nối đặt TimeZone của phiên bằng SHOP_TIMEZONE, để "ngày" trong SQL (ngay_dat_hang::date ở
+# trigger bảng tổng hợp, CURRENT_DATE, so sánh timestamptz với DATE) là ngày theo giờ cửa hàng,
+# không phụ thuộc cấu hình máy chủ PostgreSQL.
+SHOP_TIMEZONE = os.getenv("SHOP_TIMEZONE", "Asia/Ho_Chi_Minh")
+DB_SESSION_OPTIONS = f"-c TimeZone={SHOP_TIMEZONE}"
+
+# --- Connection Pool Configuration ---
+# DB_POOL_MIN / DB_POOL_MAX: số kết nối tối thiểu giữ sẵn / tối đa được mở cùng lúc.
+# DB_POOL_MAX_LIFETIME: số giây tối đa một kết nối được tái sử dụng trước khi đóng và mở lại.
+# DB_POOL_TIMEOUT: số giây tối đa chờ lấy kết nối khi pool đã dùng hết.
+# DB_POOL_CHECK_IDLE: kết nối nằm chờ lâu hơn số giây này sẽ được 'SELECT 1' kiểm tra trước khi giao.
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_CHECK_IDLE = float(os.getenv("DB_POOL_CHECK_IDLE", "30"))
+
+
+class ConnectionPool:
+    """
+    Pool kết nối PostgreSQL dùng chung cho toàn tiến trình (thread-safe).
+
+    - Giữ tối thiểu `minconn` kết nối, mở thêm khi cần cho tới `maxconn`.
+    - Khi pool đầy, luồng gọi sẽ chờ tối đa `timeout` giây.
+    - Kiểm tra sức khỏe kết nối khi lấy ra (kết nối hỏng/quá tuổi sẽ bị thay mới).
+    - Ghi nhận thống kê (đang dùng, rảnh, thời gian chờ) để tinh chỉnh kích thước pool.
+    """
+
+    def __init__(self, minconn, maxconn, max_lifetime, timeout, check_idle, **connect_kwargs):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_lifetime = max_lifetime
+        self.timeout = timeout
+        self.check_idle = check_idle
+        self._connect_kwargs = connect_kwargs
+
+        self._cond = threading.Condition()
+        self._idle = []  # Danh sách (conn, thời điểm tạo, thời điểm trả về pool)
+        self._created_at = {}  # id(conn) -> thời điểm tạo, cho cả kết nối đang dùng
+        self._checked_out = set()  # id(conn) của các kết nối đang được cho mượn
+        self._in_use = 0
+        self._closed = False
+
+        # Thống kê
+        self._so_lan_lay = 0
+        self._so_lan_cho = 0
+        self._tong_thoi_gian_cho = 0.0
+        self._thoi_gian_cho_lon_nhat = 0.0
+        self._so_lan_het_thoi_gian = 0
+        self._so_ket_noi_da_tao = 0
+        self._so_ket_noi_da_dong = 0
+
+        for _ in range(minconn):
+            conn = psycopg2.connect(**self._connect_kwargs)
+            self._register(conn)
+            self._idle.append((conn, self._created_at[id(conn)], time.monotonic()))
+
+    # --- Hàm nội bộ (các hàm ghi trạng thái phải được gọi khi đang giữ self._cond) ---
+
+    def _register(self, conn):
+        self._created_at[id(conn)] = time.monotonic()
+        self._so_ket_noi_da_tao += 1
+
+    def _discard(self, conn):
+        """Đóng hẳn một kết nối (không trả lại pool)."""
+        self._created_at.pop(id(conn), None)
+        self._so_ket_noi_da_dong += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, created_at):
+        return self.max_lifetime > 0 and time.monotonic() - created_at > self.max_lifetime
+
+    def _is_healthy(self, conn, idle_since):
+        if conn.closed:
+            return False
+        if time.monotonic() - idle_since < self.check_idle:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    # --- API ---
+
+    def getconn(self):
+        """Lấy một kết nối từ pool. Ném psycopg2.pool.PoolError nếu chờ quá `timeout`."""
+        bat_dau = time.monotonic()
+        da_phai_cho = False
+
+        while True:
+            candidate = None
+            need_new = False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise psycopg2.pool.PoolError("Connection pool đã bị đóng.")
+                    if self._idle:
+                        candidate = self._idle.pop()
+                        self._in_use += 1
+                        break
+                    if self._in_use + len(self._idle) < self.maxconn:
+                        # Giữ chỗ trước, mở kết nối bên ngoài lock
+                        self._in_use += 1
+                        need_new = True
+                        break
+                    con_lai = self.timeout - (time.monotonic() - bat_dau)
+                    if con_lai <= 0:
+                        self._so_lan_het_thoi_gian += 1
+                        raise psycopg2.pool.PoolError(
+                            f"Hết thời gian chờ kết nối ({self.timeout}s), pool đang dùng {self._in_use}/{self.maxconn}."
+                        )
+                    da_phai_cho = True
+                    self._cond.wait(con_lai)
+
+            if need_new:
+                try:
+                    conn = psycopg2.connect(**self._connect_kwargs)
+                except Exception:
+                    with self._cond:
+                        self._in_use -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._register(conn)
+                break
+
+            conn, created_at, idle_since = candidate
+            if not self._is_expired(created_at) and self._is_healthy(conn, idle_since):
+                break
+
+            # Kết nối hỏng hoặc quá tuổi: bỏ đi và thử lại (vị trí vừa giải phóng sẽ được dùng để mở mới)
+            with self._cond:
+                self._in_use -= 1
+                self._discard(conn)
+                self._cond.notify()
+
+        thoi_gian_cho = time.monotonic() - bat_dau
+        with self._cond:
+            self._checked_out.add(id(conn))
+            self._so_lan_lay += 1
+            if da_phai_cho:
+                self._so_lan_cho += 1
+            self._tong_thoi_gian_cho += thoi_gian_cho
+            self._thoi_gian_cho_lon_nhat = max(self._thoi_gian_cho_lon_nhat, thoi_gian_cho)
+        return conn
+
+    def putconn(self, conn):
+        """
+        Trả kết nối về pool. Giao dịch đang dở sẽ được rollback.
+        Ném psycopg2.pool.PoolError nếu kết nối không do pool này cấp hoặc đã được trả rồi
+        (giống psycopg2.pool), thay vì âm thầm làm lệch bộ đếm kết nối đang dùng.
+        """
+        with self._cond:
+            if id(conn) not in self._checked_out:
+                raise psycopg2.pool.PoolError("Trả về một kết nối không do pool này cấp (hoặc đã trả rồi).")
+
+        reusable = not conn.closed and not self._closed
+        if reusable:
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                reusable = False
+
+        with self._cond:
+            if id(conn) not in self._checked_out:
+                # Một luồng khác vừa trả cùng kết nối này
+                raise psycopg2.pool.PoolError("Kết nối đã được trả về pool.")
+            self._checked_out.discard(id(conn))
+            self._in_use -= 1
+            created_at = self._created_at[id(conn)]
+            if reusable and not self._is_expired(created_at):
+                self._idle.append((conn, created_at, time.monotonic()))
+            else:
+                self._discard(conn)
+            self._cond.notify()
+
+    def closeall(self):
+        """Đóng toàn bộ kết nối đang rảnh và ngừng cấp kết nối mới."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Thống kê tình trạng pool."""
+        with self._cond:
+            return {
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "total_checkouts": self._so_lan_lay,
+                "checkouts_waited": self._so_lan_cho,
+                "timeouts": self._so_lan_het_thoi_gian,
+                "avg_wait_ms": round(self._tong_thoi_gian_cho / self._so_lan_lay * 1000, 3) if self._so_lan_lay else 0.0,
+                "max_wait_ms": round(self._thoi_gian_cho_lon_nhat * 1000, 3),
+                "connections_created": self._so_ket_noi_da_tao,
+                "connections_closed": self._so_ket_noi_da_dong,
+            }
+
+
+# Pool dùng chung cho toàn tiến trình, được khởi tạo ở lần gọi đầu tiên.
+# Lưu kèm PID để tiến trình con (fork, ví dụ uvicorn --workers) tự tạo pool riêng.
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Trả về pool kết nối của tiến trình hiện tại (tạo mới nếu chưa có)."""
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid == os.getpid():
+        return _pool
+
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ConnectionPool(
+                minconn=DB_POOL_MIN,
+                maxconn=DB_POOL_MAX,
+                max_lifetime=DB_POOL_MAX_LIFETIME,
+                timeout=DB_POOL_TIMEOUT,
+                check_idle=DB_POOL_CHECK_IDLE,
+                host=DB_HOST,
+                database=DB_NAME,
+                user=DB_USER,
+                password=DB_PASS,
+                options=DB_SESSION_OPTIONS
+            )
+            _pool_pid = os.getpid()
+    return _pool
+
+
+def shop_now():
+    """Thời điểm hiện tại theo giờ cửa hàng (SHOP_TIMEZONE), cùng múi giờ với phiên SQL."""
+    return datetime.now(ZoneInfo(SHOP_TIMEZONE))
+
+
+def shop_today():
+    """
+    Ngày hôm nay theo giờ cửa hàng. Dùng thay date.today() ở mọi chỗ so với "ngày" của SQL
+    (quy đổi kỳ báo cáo, kỳ đã đóng, lịch chạy hằng ngày): máy chủ chạy UTC lệch ngày vài giờ mỗi ngày.
+    """
+    return shop_now().date()
+
+
+def shop_day_range(start_date, end_date):
+    """
+    Khoảng thời gian nửa mở [00:00 ngày start_date, 00:00 ngày sau end_date) theo giờ cửa hàng.
+    Dùng để lọc cột timestamptz (VD: dhb.ngay_dat_hang >= %s AND dhb.ngay_dat_hang < %s) thay vì
+    ép kiểu cột::date, để PostgreSQL dùng được index trên cột. Tham số None thì trả về None tương ứng.
+    """
+    tz = ZoneInfo(SHOP_TIMEZONE)
+    bat_dau = datetime.combine(start_date, dt_time.min, tzinfo=tz) if start_date else None
+    ket_thuc = datetime.combine(end_date + timedelta(days=1), dt_time.min, tzinfo=tz) if end_date else None
+    return bat_dau, ket_thuc
+
+
+def get_pool_stats():
+    """Thống kê pool kết nối (dùng để theo dõi và chọn DB_POOL_MAX phù hợp khi tải cao)."""
+    if _pool is None or _pool_pid != os.getpid():
+        return None
+    return _pool.stats()
+
+
+def close_pool():
+    """Đóng pool kết nối của tiến trình (gọi khi tắt ứng dụng)."""
+    global _pool
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.closeall()
+        _pool = None
+
+
+atexit.register(close_pool)
+
+
 def get_db_connection():
-    """Tạo kết nối đến PostgreSQL."""
+    """Lấy một kết nối đến PostgreSQL từ pool."""
     if not all([DB_NAME, DB_USER, DB_PASS]):
         print("Error: Thiếu thông tin DB trong file .env")
         return None
 
     try:
-        conn = psycopg2.connect(
-            host=DB_HOST,
-            database=DB_NAME,
-            user=DB_USER,
-            password=DB_PASS
-        )
-        return conn
+        return get_pool().getconn()
     except psycopg2.OperationalError as e:
         print(f"Error connecting to database: {e}")
         return None
+    except psycopg2.pool.PoolError as e:
+        print(f"Error getting connection from pool: {e}", file=sys.stderr)
+        return None
 
 def close_db_connection(conn):
     """
-    Đóng kết nối database.
-    (Giữ lại hàm này để tương thích với các module cũ)
+    Trả kết nối về pool.
+    (Giữ tên hàm cũ để tương thích với các module hiện có)
     """
     if conn:
         try:
-            conn.close()
+            get_pool().putconn(conn)
         except Exception:
             pass
 
@@ -49,7 +341,7 @@ def execute_query(sql, params=None):
     conn = get_db_connection()
     if conn is None:
         return []
-    
+
     try:
         # Sử dụng RealDictCursor để kết quả trả về là Dictionary {cot: gia_tri}
         with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
@@ -70,17 +362,17 @@ def execute_non_query(sql, params=None, return_id=False):
     conn = get_db_connection()
     if conn is None:
         return None
-    
+
     try:
         with conn.cursor() as cur:
             cur.execute(sql, params)
-            
+
             # Nếu yêu cầu trả về ID (dành cho Insert lấy ID ngay lập tức)
             if return_id:
                 new_id = cur.fetchone()[0]
                 conn.commit()
                 return new_id
-            
+
             conn.commit()
             return True
     except Exception as e:
@@ -88,4 +380,35 @@ def execute_non_query(sql, params=None, return_id=False):
         conn.rollback()
         return None
     finally:
-        close_db_connection(conn)
\ No newline at end of file
+        close_db_connection(conn)
+
+def execute_page_query(select_sql, conditions, params, sort_columns, limit=None, cursor=None,
+                       include_total=False, descending=False):
+    """
+    Dùng cho các danh sách phân trang theo cursor (xem be/pagination.py).
+    Trả về {"data": [...], "next_cursor": ..., "total": ... (chỉ khi include_total=True)},
+    hoặc None nếu lỗi CSDL. Ném ValueError nếu cursor không hợp lệ.
+    """
+    sql, page_params, count_sql, count_params, limit = pagination.build_page_sql(
+        select_sql, conditions, params, sort_columns, limit, cursor, descending
+    )
+    conn = get_db_connection()
+    if conn is None:
+        return None
+
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(sql, page_params)
+            rows, next_cursor = pagination.build_page([dict(r) for r in cur.fetchall()], limit,
+                                                      [key for _, key in sort_columns])
+            page = {"data": rows, "next_cursor": next_cursor}
+            if include_total:
+                # Chỉ đếm khi client yêu cầu (COUNT(*) phải quét toàn bộ kết quả lọc)
+                cur.execute(count_sql, count_params)
+                page["total"] = cur.fetchone()["total"]
+            return page
+    except Exception as e:
+        print(f"Error executing page query: {e}")
+        return None
+    finally:
+        close_db_connection(conn)
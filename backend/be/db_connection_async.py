@@ -0,0 +1,104 @@
+# be/db_connection_async.py
+
+import asyncio
+import sys
+from contextlib import asynccontextmanager
+
+import psycopg
+from psycopg.conninfo import make_conninfo
+from psycopg.rows import dict_row
+from psycopg_pool import AsyncConnectionPool
+
+# Dùng chung cấu hình (.env) với pool đồng bộ trong be/db_connection.py
+from be.db_connection import (
+    DB_HOST, DB_NAME, DB_USER, DB_PASS, DB_SESSION_OPTIONS,
+    DB_POOL_MIN, DB_POOL_MAX, DB_POOL_MAX_LIFETIME, DB_POOL_TIMEOUT
+)
+
+# Pool bất đồng bộ của tiến trình, mở ở startup (main.py) hoặc ở lần dùng đầu tiên.
+_pool = None
+_pool_lock = None
+
+
+async def open_async_pool():
+    """Mở pool kết nối bất đồng bộ (gọi một lần khi ứng dụng khởi động)."""
+    global _pool, _pool_lock
+    if _pool is not None:
+        return _pool
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+
+    async with _pool_lock:
+        if _pool is None:
+            pool = AsyncConnectionPool(
+                conninfo=make_conninfo(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASS,
+                                      options=DB_SESSION_OPTIONS),
+                min_size=DB_POOL_MIN,
+                max_size=DB_POOL_MAX,
+                max_lifetime=DB_POOL_MAX_LIFETIME,
+                timeout=DB_POOL_TIMEOUT,
+                check=AsyncConnectionPool.check_connection,
+                open=False
+            )
+            await pool.open()
+            _pool = pool
+    return _pool
+
+
+async def close_async_pool():
+    """Đóng pool bất đồng bộ (gọi khi ứng dụng tắt)."""
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def get_async_pool_stats():
+    """Thống kê pool bất đồng bộ (số kết nối, số yêu cầu đang chờ, thời gian chờ...)."""
+    if _pool is None:
+        return None
+    return _pool.get_stats()
+
+
+@asynccontextmanager
+async def get_async_connection():
+    """
+    Mượn một kết nối từ pool bất đồng bộ.
+    Cuối khối 'async with', giao dịch được commit (hoặc rollback nếu có exception)
+    và kết nối được trả về pool.
+    """
+    pool = await open_async_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+
+async def execute_query(sql, params=None):
+    """
+    Phiên bản async của db_connection.execute_query (lệnh SELECT).
+    Trả về danh sách dictionary (JSON-ready).
+    """
+    try:
+        async with get_async_connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(sql, params)
+                return await cur.fetchall()
+    except Exception as e:
+        print(f"Error executing async query: {e}", file=sys.stderr)
+        return []
+
+
+async def execute_non_query(sql, params=None, return_id=False):
+    """
+    Phiên bản async của db_connection.execute_non_query (INSERT, UPDATE, DELETE).
+    - return_id=True: Trả về ID của dòng vừa Insert (Yêu cầu SQL phải có 'RETURNING id')
+    """
+    try:
+        async with get_async_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                if return_id:
+                    return (await cur.fetchone())[0]
+                return True
+    except psycopg.Error as e:
+        print(f"Error executing async non-query: {e}", file=sys.stderr)
+        return None
@@ -0,0 +1,216 @@
+# be/db_notify.py
+
+import asyncio
+import os
+import sys
+
+import psycopg
+from psycopg import sql
+from psycopg.conninfo import make_conninfo
+
+# Dùng chung cấu hình (.env) với be/db_connection.py
+from be.db_connection import DB_HOST, DB_NAME, DB_USER, DB_PASS, DB_SESSION_OPTIONS
+from be.scheduler import stop_job
+
+# Số giây chờ trước khi kết nối lại khi kết nối LISTEN bị mất
+DB_NOTIFY_RECONNECT_DELAY = float(os.getenv("DB_NOTIFY_RECONNECT_DELAY", "5"))
+
+
+async def listen(channels, on_notify, on_connect=None, on_disconnect=None):
+    """
+    Vòng lặp LISTEN các kênh NOTIFY của PostgreSQL, chạy cho tới khi task bị hủy.
+
+    - Dùng một kết nối riêng (autocommit), KHÔNG mượn từ pool vì kết nối này bị giữ suốt đời ứng dụng.
+    - on_notify(channel, payload): coroutine được gọi cho từng thông báo.
+    - on_connect(): coroutine được gọi sau mỗi lần (kết nối lại) LISTEN thành công. Các thông báo gửi
+      trong lúc mất kết nối đã bị lỡ, nên bên nghe thường nạp lại toàn bộ dữ liệu ở đây.
+    - on_disconnect(): hàm thường, được gọi khi mất kết nối (đánh dấu dữ liệu đệm không còn tin cậy).
+    """
+    conninfo = make_conninfo(host=DB_HOST, dbname=DB_NAME, user=DB_USER, password=DB_PASS,
+                             options=DB_SESSION_OPTIONS)
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(conninfo, autocommit=True) as conn:
+                for channel in channels:
+                    await conn.execute(sql.SQL("LISTEN {}").format(sql.Identifier(channel)))
+                if on_connect is not None:
+                    await on_connect()
+                async for notify in conn.notifies():
+                    await on_notify(notify.channel, notify.payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Lỗi kết nối LISTEN {', '.join(channels)}: {e}", file=sys.stderr)
+
+        if on_disconnect is not None:
+            on_disconnect()
+        await asyncio.sleep(DB_NOTIFY_RECONNECT_DELAY)
+
+
+def start_listener(channels, on_notify, on_connect=None, on_disconnect=None):
+    """Chạy listen(...) thành một task nền; trả về task để hủy khi ứng dụng tắt."""
+    return asyncio.create_task(listen(channels, on_notify, on_connect, on_disconnect))
+
+
+async def stop_listener(task):
+    """Hủy task LISTEN và chờ nó kết thúc."""
+    await stop_job(task)
+
+
+# --- Dữ liệu đệm giữ đúng bằng LISTEN/NOTIFY ---
+# Nạp lỗi: thử nạp lại toàn bộ sau DB_NOTIFY_RELOAD_DELAY giây, gấp đôi sau mỗi lần lỗi
+# nhưng không quá DB_NOTIFY_RELOAD_MAX_DELAY giây.
+DB_NOTIFY_RELOAD_DELAY = float(os.getenv("DB_NOTIFY_RELOAD_DELAY", "1"))
+DB_NOTIFY_RELOAD_MAX_DELAY = float(os.getenv("DB_NOTIFY_RELOAD_MAX_DELAY", "60"))
+
+
+class NotifyMirror:
+    """
+    Bản sao dữ liệu trong bộ nhớ được làm mới qua một kênh NOTIFY.
+
+    - reload_all(): coroutine nạp lại toàn bộ; chạy sau mỗi lần kết nối (lại) LISTEN thành công,
+      vì các thông báo gửi trong lúc mất kết nối đã bị lỡ.
+    - parse_key(payload): khóa bị đổi (id sản phẩm, ngày, ...), hoặc None nếu không rõ -> nạp lại toàn bộ.
+    - refresh(keys): coroutine chỉ nạp lại các khóa; thông báo đến dồn dập được gộp thành một lần gọi
+      (gop=False: gọi ngay cho từng thông báo, dùng khi refresh không đọc DB).
+    - on_stale(): hàm thường, được gọi khi dữ liệu đệm không còn tin cậy.
+    Nạp lỗi (toàn bộ hoặc một phần) -> chưa sẵn sàng, rồi tự nạp lại toàn bộ với thời gian chờ tăng dần
+    cho tới khi thành công (hoặc mất kết nối LISTEN: lần kết nối lại sẽ nạp lại).
+    """
+
+    def __init__(self, ten, channel, reload_all, refresh, parse_key, on_stale=None, gop=True):
+        self.ten = ten
+        self.channel = channel
+        self._reload_all = reload_all
+        self._refresh = refresh
+        self._parse_key = parse_key
+        self._on_stale = on_stale
+        self._gop = gop
+
+        self._ready = False
+        self._connected = False
+        self._pending = set()
+        self._listener_task = None
+        self._refresh_task = None
+        self._reload_task = None
+        self._stats = {"so_thong_bao": 0, "so_lan_loi": 0}
+
+    # --- Hàm nội bộ ---
+
+    async def _nap_toan_bo(self):
+        # Khóa đến trước lúc đọc đã nằm trong lần nạp này; khóa đến trong lúc đọc được làm mới sau đó
+        self._pending.clear()
+        await self._reload_all()
+        self._ready = self._connected
+        self._hen_lam_moi()
+
+    def _hen_lam_moi(self):
+        if self._pending and self._ready and self._refresh_task is None:
+            self._refresh_task = asyncio.create_task(self._xu_ly_cac_khoa_cho())
+
+    async def _xu_ly_cac_khoa_cho(self):
+        """Gộp các thông báo đến dồn dập (VD: một đơn nhiều dòng) thành một lần refresh."""
+        try:
+            while self._pending and self._ready:
+                keys = set(self._pending)
+                self._pending.clear()
+                await self._refresh(keys)
+        except Exception as e:
+            self._bao_loi(e)
+        finally:
+            self._refresh_task = None
+
+    def _bao_loi(self, e):
+        # Không chắc dữ liệu đệm còn đúng -> không dùng cho tới khi nạp lại toàn bộ thành công
+        print(f"Lỗi cập nhật {self.ten}: {e}", file=sys.stderr)
+        self._stats["so_lan_loi"] += 1
+        self.mark_stale()
+        if self._connected and self._reload_task is None:
+            self._reload_task = asyncio.create_task(self._nap_lai_sau_loi())
+
+    async def _nap_lai_sau_loi(self):
+        cho = DB_NOTIFY_RELOAD_DELAY
+        try:
+            while True:
+                await asyncio.sleep(cho)
+                try:
+                    await self._nap_toan_bo()
+                    return
+                except Exception as e:
+                    cho = min(cho * 2, DB_NOTIFY_RELOAD_MAX_DELAY)
+                    self._stats["so_lan_loi"] += 1
+                    print(f"Lỗi nạp lại {self.ten}, thử lại sau {cho:g} giây: {e}", file=sys.stderr)
+        finally:
+            if self._reload_task is asyncio.current_task():
+                self._reload_task = None
+
+    def _huy_nap_lai(self):
+        if self._reload_task is not None:
+            self._reload_task.cancel()
+            self._reload_task = None
+
+    # --- Callback của listen(...) ---
+
+    async def on_connect(self):
+        self._connected = True
+        self._huy_nap_lai()
+        try:
+            await self._nap_toan_bo()
+        except Exception as e:
+            self._bao_loi(e)
+
+    async def on_notify(self, channel, payload):
+        self._stats["so_thong_bao"] += 1
+        try:
+            key = self._parse_key(payload)
+        except (ValueError, AttributeError, TypeError):
+            key = None
+
+        if key is None:
+            try:
+                await self._nap_toan_bo()
+            except Exception as e:
+                self._bao_loi(e)
+            return
+        if not self._gop:
+            try:
+                await self._refresh({key})
+            except Exception as e:
+                self._bao_loi(e)
+            return
+        self._pending.add(key)
+        self._hen_lam_moi()
+
+    def on_disconnect(self):
+        self._connected = False
+        self._huy_nap_lai()
+        self.mark_stale()
+
+    # --- API ---
+
+    def mark_stale(self):
+        """Đánh dấu dữ liệu đệm không còn tin cậy."""
+        self._ready = False
+        if self._on_stale is not None:
+            self._on_stale()
+
+    def is_ready(self):
+        """Dữ liệu đệm có thể dùng để trả lời hay không."""
+        return self._ready
+
+    def start(self):
+        """Bắt đầu LISTEN (chạy nền); mỗi lần kết nối (lại) thành công sẽ nạp lại toàn bộ."""
+        if self._listener_task is None:
+            self._listener_task = start_listener([self.channel], self.on_notify,
+                                                 on_connect=self.on_connect, on_disconnect=self.on_disconnect)
+
+    async def stop(self):
+        """Dừng LISTEN và các lần nạp đang chờ."""
+        await stop_listener(self._listener_task)
+        self._listener_task = None
+        await stop_job(self._refresh_task)
+        await stop_job(self._reload_task)
+        self.on_disconnect()
+
+    def get_stats(self):
+        return {"san_sang": self._ready, **self._stats}
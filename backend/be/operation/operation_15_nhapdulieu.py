@@ -0,0 +1,502 @@
+# be/operation/operation_15_nhapdulieu.py
+
+import csv
+import io
+import os
+import re
+import sys
+from datetime import date, datetime
+import psycopg2
+import psycopg2.extras
+from be.db_connection import get_db_connection, close_db_connection
+
+try:
+    import openpyxl  # Chỉ cần khi nhập tệp .xlsx
+except ImportError:
+    openpyxl = None
+
+
+# --- Nhập dữ liệu hàng loạt (CSV / XLSX) ---
+# Một lần nhập = một dòng LoNhapDuLieu (database/018_create_table_lo_nhap_du_lieu.sql), chạy nền.
+# Tệp được đọc tuần tự (không nạp cả tệp vào bộ nhớ) theo từng khối KICH_THUOC_KHOI dòng; mỗi khối:
+#   1. kiểm tra từng dòng bằng Python (thiếu cột bắt buộc, sai kiểu, trùng khóa với dòng trước trong tệp),
+#   2. COPY các dòng hợp lệ vào bảng tạm nhap_tam,
+#   3. loại các dòng vi phạm ràng buộc với dữ liệu đã có (mỗi kiểm tra là một câu DELETE ... RETURNING),
+#   4. thêm mới / cập nhật bảng đích bằng MỘT câu INSERT ... ON CONFLICT,
+#   5. ghi lỗi từng dòng + tiến độ vào CSDL và COMMIT.
+# Cột của tệp trùng tên cột trong bảng (sản phẩm dùng ma_danh_muc thay cho id_danh_muc).
+# Khi cập nhật bản ghi đã có, chỉ các cột có trong tệp được ghi đè; ô trống = NULL / giá trị mặc định.
+
+KICH_THUOC_KHOI = 5000
+DINH_DANG_HO_TRO = (".csv", ".xlsx")
+
+# Giống ràng buộc CHECK email của các bảng
+EMAIL_REGEX = re.compile(r'^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$')
+
+
+def _van_ban(do_dai=None):
+    def chuyen(gia_tri):
+        if do_dai and len(gia_tri) > do_dai:
+            raise ValueError(f"dài quá {do_dai} ký tự")
+        return gia_tri
+    return chuyen
+
+
+def _so_nguyen_khong_am(gia_tri):
+    try:
+        so = int(gia_tri)
+    except ValueError:
+        raise ValueError(f"'{gia_tri}' không phải số nguyên")
+    if so < 0:
+        raise ValueError("không được âm")
+    return so
+
+
+def _ngay(gia_tri):
+    try:
+        return date.fromisoformat(gia_tri)
+    except ValueError:
+        raise ValueError(f"'{gia_tri}' không đúng định dạng YYYY-MM-DD")
+
+
+def _email(gia_tri):
+    if len(gia_tri) > 255 or not EMAIL_REGEX.match(gia_tri):
+        raise ValueError(f"'{gia_tri}' không phải email hợp lệ")
+    return gia_tri
+
+
+def _mot_trong(*cac_gia_tri):
+    def chuyen(gia_tri):
+        if gia_tri not in cac_gia_tri:
+            raise ValueError(f"'{gia_tri}' không thuộc {', '.join(cac_gia_tri)}")
+        return gia_tri
+    return chuyen
+
+
+# Cấu hình từng loại dữ liệu:
+# - cot: (tên cột trong tệp, kiểu cột ở bảng tạm, hàm kiểm tra, bắt buộc)
+# - ghi: (cột bảng đích, biểu thức lấy từ bảng tạm, cột tệp quyết định có ghi đè khi cập nhật;
+#         None = chỉ ghi khi thêm mới)
+# - khoa: cột UNIQUE dùng để nhận ra bản ghi đã có; duy_nhat: các cột UNIQUE khác
+# - kiem_tra: (câu DELETE ... RETURNING so_dong, giá trị, thông báo lỗi) chạy trên bảng tạm
+CAU_HINH_NHAP = {
+    "san_pham": {
+        "bang": "SanPham",
+        "khoa": "ma_san_pham",
+        "duy_nhat": ["ten_san_pham"],
+        "cot": [
+            ("ma_san_pham", "TEXT", _van_ban(20), True),
+            ("ten_san_pham", "TEXT", _van_ban(255), True),
+            ("ma_danh_muc", "TEXT", _van_ban(10), True),
+            ("don_vi_tinh", "TEXT", _van_ban(50), True),
+            ("so_luong_ton_kho", "INTEGER", _so_nguyen_khong_am, False),
+            ("mo_ta_chi_tiet", "TEXT", _van_ban(), False),
+            ("duong_dan_hinh_anh_chinh", "TEXT", _van_ban(255), False),
+            ("trang_thai", "TEXT", _mot_trong('Đang kinh doanh - Còn hàng', 'Đang kinh doanh - Hết hàng',
+                                              'Ngừng kinh doanh'), False),
+        ],
+        "ghi": [
+            ("ma_san_pham", "s.ma_san_pham", "ma_san_pham"),
+            ("ten_san_pham", "s.ten_san_pham", "ten_san_pham"),
+            ("id_danh_muc", "dm.id", "ma_danh_muc"),
+            ("don_vi_tinh", "s.don_vi_tinh", "don_vi_tinh"),
+            # Tồn kho của sản phẩm đã có do đơn nhập / bán quản lý, tệp chỉ khai báo tồn đầu kỳ
+            ("so_luong_ton_kho", "COALESCE(s.so_luong_ton_kho, 0)", None),
+            ("mo_ta_chi_tiet", "s.mo_ta_chi_tiet", "mo_ta_chi_tiet"),
+            ("duong_dan_hinh_anh_chinh", "s.duong_dan_hinh_anh_chinh", "duong_dan_hinh_anh_chinh"),
+            ("trang_thai", "COALESCE(s.trang_thai, 'Đang kinh doanh - Còn hàng')", "trang_thai"),
+        ],
+        "tu": "nhap_tam s JOIN DanhMuc dm ON dm.ma_danh_muc = s.ma_danh_muc",
+        "kiem_tra": [
+            ("""
+                DELETE FROM nhap_tam s
+                WHERE NOT EXISTS (SELECT 1 FROM DanhMuc dm WHERE dm.ma_danh_muc = s.ma_danh_muc)
+                RETURNING s.so_dong, s.ma_danh_muc;
+            """, "Danh mục '{}' không tồn tại."),
+        ],
+    },
+    "khach_hang": {
+        "bang": "KhachHang",
+        "khoa": "so_dien_thoai",
+        "duy_nhat": ["email"],
+        "cot": [
+            ("ten_khach_hang", "TEXT", _van_ban(255), True),
+            ("so_dien_thoai", "TEXT", _van_ban(20), True),
+            ("email", "TEXT", _email, True),
+            ("dia_chi", "TEXT", _van_ban(), False),
+            ("ngay_sinh", "DATE", _ngay, False),
+            ("gioi_tinh", "TEXT", _mot_trong('Nam', 'Nữ', 'Khác'), False),
+        ],
+        "ghi": [
+            ("ten_khach_hang", "s.ten_khach_hang", "ten_khach_hang"),
+            ("so_dien_thoai", "s.so_dien_thoai", "so_dien_thoai"),
+            ("email", "s.email", "email"),
+            ("dia_chi", "s.dia_chi", "dia_chi"),
+            ("ngay_sinh", "s.ngay_sinh", "ngay_sinh"),
+            ("gioi_tinh", "s.gioi_tinh::enum_gioi_tinh", "gioi_tinh"),
+        ],
+        "tu": "nhap_tam s",
+        "kiem_tra": [],
+    },
+    "nha_cung_cap": {
+        "bang": "NhaCungCap",
+        "khoa": "ten_nha_cung_cap",
+        "duy_nhat": ["email", "ma_so_thue"],
+        "cot": [
+            ("ten_nha_cung_cap", "TEXT", _van_ban(255), True),
+            ("email", "TEXT", _email, True),
+            ("dia_chi", "TEXT", _van_ban(), True),
+            ("ma_so_thue", "TEXT", _van_ban(20), False),
+            ("so_dien_thoai", "TEXT", _van_ban(20), False),
+            ("nguoi_lien_he_chinh", "TEXT", _van_ban(100), False),
+        ],
+        "ghi": [
+            ("ten_nha_cung_cap", "s.ten_nha_cung_cap", "ten_nha_cung_cap"),
+            ("email", "s.email", "email"),
+            ("dia_chi", "s.dia_chi", "dia_chi"),
+            ("ma_so_thue", "s.ma_so_thue", "ma_so_thue"),
+            ("so_dien_thoai", "s.so_dien_thoai", "so_dien_thoai"),
+            ("nguoi_lien_he_chinh", "s.nguoi_lien_he_chinh", "nguoi_lien_he_chinh"),
+        ],
+        "tu": "nhap_tam s",
+        "kiem_tra": [],
+    },
+}
+LOAI_DU_LIEU = list(CAU_HINH_NHAP)
+
+SQL_CAP_NHAT_TIEN_DO = """
+    UPDATE LoNhapDuLieu
+    SET so_dong_da_doc = so_dong_da_doc + %s,
+        so_dong_them_moi = so_dong_them_moi + %s,
+        so_dong_cap_nhat = so_dong_cap_nhat + %s,
+        so_dong_loi = so_dong_loi + %s
+    WHERE id = %s;
+"""
+
+SQL_KET_THUC_LO_NHAP = """
+    UPDATE LoNhapDuLieu SET trang_thai = %s, thong_bao_loi = %s, ngay_hoan_tat = CURRENT_TIMESTAMP
+    WHERE id = %s;
+"""
+
+
+def _dinh_dang_tep(ten_tep):
+    """Trả về phần mở rộng (.csv / .xlsx) của tệp. Ném ValueError nếu không hỗ trợ."""
+    dinh_dang = os.path.splitext(ten_tep or "")[1].lower()
+    if dinh_dang not in DINH_DANG_HO_TRO:
+        raise ValueError(f"Chỉ hỗ trợ tệp {', '.join(DINH_DANG_HO_TRO)}.")
+    if dinh_dang == ".xlsx" and openpyxl is None:
+        raise ValueError("Máy chủ chưa cài openpyxl nên chưa nhập được tệp .xlsx, hãy dùng tệp .csv.")
+    return dinh_dang
+
+
+def _gia_tri_o_excel(gia_tri):
+    """Chuyển giá trị ô Excel về chuỗi giống khi xuất ra CSV."""
+    if gia_tri is None:
+        return ""
+    if isinstance(gia_tri, datetime):
+        return gia_tri.date().isoformat()
+    if isinstance(gia_tri, date):
+        return gia_tri.isoformat()
+    if isinstance(gia_tri, float) and gia_tri.is_integer():
+        return str(int(gia_tri))
+    return str(gia_tri)
+
+
+def _doc_cac_dong(duong_dan_tep, dinh_dang):
+    """Đọc tuần tự các dòng của tệp (dòng đầu là tiêu đề), mỗi dòng là một list chuỗi."""
+    if dinh_dang == ".xlsx":
+        wb = openpyxl.load_workbook(duong_dan_tep, read_only=True, data_only=True)
+        try:
+            for dong in wb.worksheets[0].iter_rows(values_only=True):
+                yield [_gia_tri_o_excel(o) for o in dong]
+        finally:
+            wb.close()
+        return
+
+    # utf-8-sig: bỏ BOM của tệp CSV lưu từ Excel; dấu phân cách ',' hoặc ';' được tự nhận
+    with open(duong_dan_tep, newline="", encoding="utf-8-sig") as f:
+        mau = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(mau, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(f, dialect)
+
+
+def _chi_so_cot(cau_hinh, tieu_de):
+    """Vị trí các cột đã biết trong dòng tiêu đề. Ném ValueError nếu thiếu cột bắt buộc / cột bị lặp."""
+    tieu_de = [(ten or "").strip().lower() for ten in tieu_de]
+    lap = {ten for ten in tieu_de if ten and tieu_de.count(ten) > 1}
+    if lap:
+        raise ValueError(f"Cột bị lặp trong dòng tiêu đề: {', '.join(sorted(lap))}.")
+
+    chi_so = {ten: vi_tri for vi_tri, ten in enumerate(tieu_de) if ten}
+    thieu = [ten for ten, _, _, bat_buoc in cau_hinh["cot"] if bat_buoc and ten not in chi_so]
+    if thieu:
+        raise ValueError(f"Tệp thiếu cột bắt buộc: {', '.join(thieu)}.")
+    return {ten: chi_so[ten] for ten, _, _, _ in cau_hinh["cot"] if ten in chi_so}
+
+
+def _kiem_tra_dong(cau_hinh, chi_so, dong):
+    """Chuyển một dòng của tệp thành dict giá trị đã kiểm tra. Ném ValueError (gộp mọi lỗi của dòng)."""
+    gia_tri = {}
+    loi = []
+    for ten, _, chuyen, bat_buoc in cau_hinh["cot"]:
+        vi_tri = chi_so.get(ten)
+        o = (dong[vi_tri] if vi_tri is not None and vi_tri < len(dong) else "").strip()
+        if not o:
+            if bat_buoc:
+                loi.append(f"thiếu {ten}")
+            gia_tri[ten] = None
+            continue
+        try:
+            gia_tri[ten] = chuyen(o)
+        except ValueError as e:
+            loi.append(f"{ten}: {e}")
+    if loi:
+        raise ValueError("; ".join(loi) + ".")
+    return gia_tri
+
+
+def _build_staging_sql(cau_hinh):
+    cot = ", ".join(f"{ten} {kieu}" for ten, kieu, _, _ in cau_hinh["cot"])
+    # Rỗng sau mỗi COMMIT (mỗi khối); bị xóa khi kết thúc lần nhập vì kết nối được trả lại pool
+    return f"CREATE TEMP TABLE nhap_tam (so_dong INTEGER NOT NULL, {cot}) ON COMMIT DELETE ROWS;"
+
+
+def _build_unique_check_sqls(cau_hinh):
+    """Câu kiểm tra: giá trị UNIQUE (ngoài khóa) đã thuộc về một bản ghi khác trong bảng đích."""
+    bang, khoa = cau_hinh["bang"], cau_hinh["khoa"]
+    return [(f"""
+                DELETE FROM nhap_tam s USING {bang} t
+                WHERE t.{cot} = s.{cot} AND t.{khoa} <> s.{khoa}
+                RETURNING s.so_dong, s.{cot};
+            """, f"{cot} '{{}}' đã thuộc về một bản ghi khác.") for cot in cau_hinh["duy_nhat"]]
+
+
+def _build_upsert_sql(cau_hinh, cot_trong_tep):
+    """
+    Thêm mới / cập nhật bảng đích từ bảng tạm trong một câu lệnh.
+    Chỉ ghi đè các cột có trong tệp và chỉ khi giá trị thay đổi; RETURNING xmax = 0 nghĩa là dòng được thêm mới.
+    """
+    bang, khoa = cau_hinh["bang"], cau_hinh["khoa"]
+    cot_dich = [cot for cot, _, _ in cau_hinh["ghi"]]
+    bieu_thuc = [bt for _, bt, _ in cau_hinh["ghi"]]
+    cap_nhat = [cot for cot, _, nguon in cau_hinh["ghi"] if nguon in cot_trong_tep and cot != khoa]
+    return f"""
+        INSERT INTO {bang} ({', '.join(cot_dich)})
+        SELECT {', '.join(bieu_thuc)}
+        FROM {cau_hinh['tu']}
+        ON CONFLICT ({khoa}) DO UPDATE SET
+            {', '.join(f'{cot} = EXCLUDED.{cot}' for cot in cap_nhat)}
+        WHERE ({', '.join(f'{bang}.{cot}' for cot in cap_nhat)})
+              IS DISTINCT FROM
+              ({', '.join(f'EXCLUDED.{cot}' for cot in cap_nhat)})
+        RETURNING (xmax = 0) AS la_them_moi;
+    """
+
+
+def _ghi_ket_qua_khoi(cur, id_lo_nhap, so_dong_doc, so_them_moi, so_cap_nhat, loi):
+    if loi:
+        psycopg2.extras.execute_values(
+            cur, "INSERT INTO LoiNhapDuLieu (id_lo_nhap, so_dong, noi_dung_loi) VALUES %s;",
+            [(id_lo_nhap, so_dong, noi_dung) for so_dong, noi_dung in sorted(loi.items())],
+            page_size=KICH_THUOC_KHOI)
+    cur.execute(SQL_CAP_NHAT_TIEN_DO, (so_dong_doc, so_them_moi, so_cap_nhat, len(loi), id_lo_nhap))
+
+
+def _xu_ly_khoi(conn, cur, id_lo_nhap, cau_hinh, chi_so, cac_cau_kiem_tra, upsert_sql, khoi, da_gap):
+    """Kiểm tra, COPY và ghi một khối dòng rồi COMMIT. Lỗi CSDL của khối được ghi cho mọi dòng trong khối."""
+    loi = {}
+    hop_le = []
+    for so_dong, dong in khoi:
+        try:
+            gia_tri = _kiem_tra_dong(cau_hinh, chi_so, dong)
+        except ValueError as e:
+            loi[so_dong] = str(e)
+            continue
+
+        # Trùng khóa / cột UNIQUE với một dòng trước đó trong tệp
+        trung = next((cot for cot in da_gap if gia_tri[cot] is not None and gia_tri[cot] in da_gap[cot]), None)
+        if trung:
+            loi[so_dong] = f"{trung} '{gia_tri[trung]}' trùng với một dòng trước trong tệp."
+            continue
+        for cot in da_gap:
+            if gia_tri[cot] is not None:
+                da_gap[cot].add(gia_tri[cot])
+        hop_le.append([so_dong] + [gia_tri[ten] for ten, _, _, _ in cau_hinh["cot"]])
+
+    so_them_moi = so_cap_nhat = 0
+    try:
+        if hop_le:
+            buf = io.StringIO()
+            csv.writer(buf).writerows(hop_le)
+            buf.seek(0)
+            cur.copy_expert("COPY nhap_tam FROM STDIN WITH (FORMAT csv);", buf)
+
+            for sql, thong_bao in cac_cau_kiem_tra:
+                cur.execute(sql)
+                for so_dong, gia_tri in cur.fetchall():
+                    loi[so_dong] = thong_bao.format(gia_tri)
+
+            cur.execute(upsert_sql)
+            ket_qua = cur.fetchall()
+            so_them_moi = sum(1 for (la_them_moi,) in ket_qua if la_them_moi)
+            so_cap_nhat = len(ket_qua) - so_them_moi
+
+        _ghi_ket_qua_khoi(cur, id_lo_nhap, len(khoi), so_them_moi, so_cap_nhat, loi)
+        conn.commit()
+    except psycopg2.Error as e:
+        # VD: bản ghi trùng được thêm đồng thời bởi người dùng khác -> bỏ cả khối, báo lỗi cho từng dòng
+        conn.rollback()
+        thong_bao = f"Lỗi CSDL khi ghi khối dòng: {str(e).strip()}"
+        for dong in hop_le:
+            loi.setdefault(dong[0], thong_bao)
+        _ghi_ket_qua_khoi(cur, id_lo_nhap, len(khoi), 0, 0, loi)
+        conn.commit()
+
+
+def _xoa_tep_tam(duong_dan_tep):
+    try:
+        os.remove(duong_dan_tep)
+    except OSError as e:
+        print(f"Không xóa được tệp tạm {duong_dan_tep}: {e}", file=sys.stderr)
+
+
+def create_import_job(loai_du_lieu, ten_tep):
+    """
+    Tạo một lần nhập dữ liệu ở trạng thái 'Đang chờ' (chưa đọc tệp).
+
+    Returns:
+        int or None: ID lần nhập, hoặc None nếu có lỗi CSDL.
+    Raises:
+        ValueError: loại dữ liệu hoặc định dạng tệp không được hỗ trợ.
+    """
+    if loai_du_lieu not in CAU_HINH_NHAP:
+        raise ValueError(f"Loại dữ liệu phải là một trong: {', '.join(LOAI_DU_LIEU)}.")
+    _dinh_dang_tep(ten_tep)
+
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute("INSERT INTO LoNhapDuLieu (loai_du_lieu, ten_tep) VALUES (%s, %s) RETURNING id;",
+                        (loai_du_lieu, ten_tep[:255]))
+            new_id = cur.fetchone()[0]
+            conn.commit()
+            return new_id
+    except psycopg2.Error as e:
+        print(f"Lỗi CSDL khi tạo lần nhập dữ liệu: {e}", file=sys.stderr)
+        conn.rollback()
+        return None
+    finally:
+        close_db_connection(conn)
+
+
+def run_import_job(id_lo_nhap, duong_dan_tep):
+    """
+    Xử lý một lần nhập dữ liệu (chạy nền). Tệp tạm ở duong_dan_tep luôn bị xóa khi xong.
+
+    Returns:
+        str or None: Trạng thái cuối ('Hoàn tất' / 'Thất bại'), hoặc None nếu không xử lý được lần nhập.
+    """
+    conn = get_db_connection()
+    if not conn:
+        _xoa_tep_tam(duong_dan_tep)
+        return None
+
+    trang_thai, thong_bao_loi = 'Hoàn tất', None
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                UPDATE LoNhapDuLieu SET trang_thai = 'Đang xử lý'
+                WHERE id = %s AND trang_thai = 'Đang chờ'
+                RETURNING loai_du_lieu, ten_tep;
+            """, (id_lo_nhap,))
+            lo_nhap = cur.fetchone()
+            if not lo_nhap:
+                print(f"Lỗi: Lần nhập {id_lo_nhap} không tồn tại hoặc đã được xử lý.", file=sys.stderr)
+                conn.rollback()
+                return None
+            cau_hinh = CAU_HINH_NHAP[lo_nhap[0]]
+            cur.execute("DROP TABLE IF EXISTS pg_temp.nhap_tam;")
+            cur.execute(_build_staging_sql(cau_hinh))
+            conn.commit()
+
+            try:
+                cac_dong = _doc_cac_dong(duong_dan_tep, _dinh_dang_tep(lo_nhap[1]))
+                chi_so = _chi_so_cot(cau_hinh, next(cac_dong, []))
+                cac_cau_kiem_tra = cau_hinh["kiem_tra"] + _build_unique_check_sqls(cau_hinh)
+                upsert_sql = _build_upsert_sql(cau_hinh, chi_so)
+                da_gap = {cot: set() for cot in [cau_hinh["khoa"]] + cau_hinh["duy_nhat"]}
+
+                khoi = []
+                for so_dong, dong in enumerate(cac_dong, start=2):
+                    if not any((o or "").strip() for o in dong):
+                        continue
+                    khoi.append((so_dong, dong))
+                    if len(khoi) >= KICH_THUOC_KHOI:
+                        _xu_ly_khoi(conn, cur, id_lo_nhap, cau_hinh, chi_so, cac_cau_kiem_tra, upsert_sql, khoi, da_gap)
+                        khoi = []
+                if khoi:
+                    _xu_ly_khoi(conn, cur, id_lo_nhap, cau_hinh, chi_so, cac_cau_kiem_tra, upsert_sql, khoi, da_gap)
+            except psycopg2.Error:
+                raise
+            except Exception as e:
+                # Lỗi của cả tệp: thiếu cột bắt buộc, sai mã hóa, tệp hỏng (csv / openpyxl ném nhiều loại lỗi)...
+                # Các khối đã COMMIT trước đó vẫn được giữ
+                trang_thai, thong_bao_loi = 'Thất bại', f"Không đọc được tệp: {e}"
+
+            cur.execute(SQL_KET_THUC_LO_NHAP, (trang_thai, thong_bao_loi, id_lo_nhap))
+            cur.execute("DROP TABLE IF EXISTS pg_temp.nhap_tam;")
+            conn.commit()
+            return trang_thai
+    except psycopg2.Error as e:
+        print(f"Lỗi CSDL khi nhập dữ liệu (lần nhập {id_lo_nhap}): {e}", file=sys.stderr)
+        conn.rollback()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(SQL_KET_THUC_LO_NHAP, ('Thất bại', f"Lỗi CSDL: {str(e).strip()}", id_lo_nhap))
+                cur.execute("DROP TABLE IF EXISTS pg_temp.nhap_tam;")
+                conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+        return 'Thất bại'
+    finally:
+        close_db_connection(conn)
+        _xoa_tep_tam(duong_dan_tep)
+
+
+def get_import_job(id_lo_nhap, error_limit=100):
+    """
+    Lấy tiến độ / kết quả của một lần nhập và tối đa error_limit lỗi dòng đầu tiên (theo số dòng).
+    Trả về None nếu không tìm thấy hoặc có lỗi.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+            cur.execute("""
+                SELECT *, so_dong_da_doc - so_dong_them_moi - so_dong_cap_nhat - so_dong_loi AS so_dong_khong_doi
+                FROM LoNhapDuLieu WHERE id = %s;
+            """, (id_lo_nhap,))
+            lo_nhap = cur.fetchone()
+            if not lo_nhap:
+                return None
+            ket_qua = dict(lo_nhap)
+
+            cur.execute("""
+                SELECT so_dong, noi_dung_loi FROM LoiNhapDuLieu
+                WHERE id_lo_nhap = %s ORDER BY so_dong LIMIT %s;
+            """, (id_lo_nhap, error_limit))
+            ket_qua["loi"] = [dict(row) for row in cur.fetchall()]
+            return ket_qua
+    except psycopg2.Error as e:
+        print(f"Lỗi CSDL khi lấy lần nhập dữ liệu: {e}", file=sys.stderr)
+        return None
+    finally:
+        close_db_connection(conn)
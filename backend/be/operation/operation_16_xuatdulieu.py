@@ -0,0 +1,136 @@
+# be/operation/operation_16_xuatdulieu.py
+
+import csv
+import io
+import json
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+
+import psycopg
+
+from be.db_connection import shop_day_range, shop_today
+from be.db_connection_async import get_async_connection
+from be.reports.operation_10_doanhthuloinhuan import SQL_FINANCIAL_DETAILS
+
+
+# --- Xuất dữ liệu dạng luồng (CSV / NDJSON) ---
+# Dữ liệu được đọc bằng server-side cursor (con trỏ có tên) trên pool bất đồng bộ, mỗi lần KICH_THUOC_LO dòng,
+# và được ghi ngay thành một đoạn của response: bộ nhớ không phụ thuộc độ dài khoảng ngày.
+# Cả lần xuất nằm trong một giao dịch nên các dòng thuộc cùng một snapshot dữ liệu.
+
+KICH_THUOC_LO = 1000
+DINH_DANG_XUAT = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+# Đơn bán: lọc khoảng nửa mở theo giờ cửa hàng, đọc theo index (ngay_dat_hang, id)
+SQL_XUAT_DON_HANG_BAN = """
+    SELECT dhb.id, dhb.ngay_dat_hang, dhb.id_khach_hang, kh.ten_khach_hang, dhb.id_nhan_vien, nv.ten_nhan_vien,
+           dhb.trang_thai_don_hang, dhb.trang_thai_thanh_toan, dhb.phuong_thuc_thanh_toan,
+           dhb.so_dong_hang, dhb.tam_tinh_tien_hang, dhb.tong_gia_von, dhb.thue_vat, dhb.thue_hkd,
+           dhb.tong_thanh_toan_du_kien, dhb.so_tien_da_thanh_toan,
+           dhb.ngay_giao_hang_thuc_te, dhb.dia_chi_giao_hang
+    FROM DonHangBan dhb
+    JOIN KhachHang kh ON kh.id = dhb.id_khach_hang
+    JOIN NhanVien nv ON nv.id = dhb.id_nhan_vien
+    WHERE dhb.ngay_dat_hang >= %s AND dhb.ngay_dat_hang < %s
+    ORDER BY dhb.ngay_dat_hang, dhb.id
+"""
+
+SQL_XUAT_CHI_TIET_DON_HANG_BAN = """
+    SELECT ct.id, ct.id_don_hang_ban, dhb.ngay_dat_hang, dhb.trang_thai_don_hang,
+           ct.id_san_pham, sp.ma_san_pham, sp.ten_san_pham, ct.so_luong,
+           ct.gia_ban_niem_yet_don_vi, ct.giam_gia, ct.gia_ban_cuoi_cung_don_vi, ct.tong_gia_ban, ct.tong_gia_von
+    FROM DonHangBan dhb
+    JOIN ChiTietDonHangBan ct ON ct.id_don_hang_ban = dhb.id
+    JOIN SanPham sp ON sp.id = ct.id_san_pham
+    WHERE dhb.ngay_dat_hang >= %s AND dhb.ngay_dat_hang < %s
+    ORDER BY dhb.ngay_dat_hang, dhb.id, ct.id
+"""
+
+# Đơn nhập: mỗi dòng sản phẩm một dòng (kèm thông tin đơn); đơn chưa có sản phẩm vẫn có một dòng
+SQL_XUAT_DON_HANG_NHAP = """
+    SELECT dhn.id AS id_don_hang_nhap, dhn.ngay_dat_hang, dhn.ngay_nhan_hang_thuc_te, dhn.trang_thai,
+           dhn.id_nha_cung_cap, ncc.ten_nha_cung_cap,
+           ct.id_san_pham, sp.ma_san_pham, sp.ten_san_pham, ct.so_luong, ct.gia_nhap_don_vi, ct.tong_gia_nhap
+    FROM DonHangNhap dhn
+    JOIN NhaCungCap ncc ON ncc.id = dhn.id_nha_cung_cap
+    LEFT JOIN ChiTietDonHangNhap ct ON ct.id_don_hang_nhap = dhn.id
+    LEFT JOIN SanPham sp ON sp.id = ct.id_san_pham
+    WHERE dhn.ngay_dat_hang BETWEEN %s AND %s
+    ORDER BY dhn.ngay_dat_hang, dhn.id, ct.id
+"""
+
+SQL_XUAT_CHI_PHI = """
+    SELECT cp.id, cp.ngay_chi_phi, cp.loai_chi_phi, cp.so_tien, cp.mo_ta, cp.id_nhan_vien, nv.ten_nhan_vien
+    FROM ChiPhi cp
+    LEFT JOIN NhanVien nv ON nv.id = cp.id_nhan_vien
+    WHERE cp.ngay_chi_phi BETWEEN %s AND %s
+    ORDER BY cp.ngay_chi_phi, cp.id
+"""
+
+# Loại dữ liệu -> (câu SQL, hàm tạo tham số từ (tu_ngay, den_ngay))
+XUAT_DU_LIEU = {
+    "don_hang_ban": (SQL_XUAT_DON_HANG_BAN, lambda tu, den: shop_day_range(tu, den)),
+    "chi_tiet_don_hang_ban": (SQL_XUAT_CHI_TIET_DON_HANG_BAN, lambda tu, den: shop_day_range(tu, den)),
+    "don_hang_nhap": (SQL_XUAT_DON_HANG_NHAP, lambda tu, den: (tu, den)),
+    "chi_phi": (SQL_XUAT_CHI_PHI, lambda tu, den: (tu, den)),
+    # Báo cáo tài chính theo ngày (cùng câu SQL với GET /baocao/taichinh); DECLARE CURSOR không nhận dấu ';'
+    "tai_chinh_theo_ngay": (SQL_FINANCIAL_DETAILS.strip().rstrip(";"), lambda tu, den: (tu, den) * 3),
+}
+LOAI_XUAT = list(XUAT_DU_LIEU)
+
+
+def get_export_range(tu_ngay: date = None, den_ngay: date = None):
+    """Khoảng ngày xuất (gồm cả hai đầu). Mặc định: từ đầu tháng này đến hôm nay."""
+    den_ngay = den_ngay or shop_today()
+    tu_ngay = tu_ngay or den_ngay.replace(day=1)
+    if tu_ngay > den_ngay:
+        raise ValueError("Ngày bắt đầu không được lớn hơn ngày kết thúc.")
+    return tu_ngay, den_ngay
+
+
+def _gia_tri_json(gia_tri):
+    # Giống cách FastAPI trả Decimal: số nguyên nếu không có phần lẻ, ngược lại số thực
+    if isinstance(gia_tri, Decimal):
+        return int(gia_tri) if gia_tri.as_tuple().exponent >= 0 else float(gia_tri)
+    if isinstance(gia_tri, (date, datetime)):
+        return gia_tri.isoformat()
+    return str(gia_tri)
+
+
+def _dinh_dang_lo(dinh_dang, cot, cac_dong):
+    """Chuyển một lô dòng thành một đoạn văn bản CSV / NDJSON."""
+    if dinh_dang == "csv":
+        buf = io.StringIO()
+        csv.writer(buf).writerows(cac_dong)
+        return buf.getvalue()
+    return "".join(json.dumps(dict(zip(cot, dong)), ensure_ascii=False, default=_gia_tri_json) + "\n"
+                   for dong in cac_dong)
+
+
+async def stream_export(loai_xuat, dinh_dang, tu_ngay: date, den_ngay: date):
+    """
+    Async generator trả về từng đoạn văn bản của tệp xuất (dùng với StreamingResponse).
+    CSV có dòng tiêu đề và BOM UTF-8 (Excel đọc đúng tiếng Việt); NDJSON là mỗi dòng một object JSON.
+    Lỗi CSDL giữa chừng được ghi log rồi ném lại để ngắt kết nối (client nhận tệp không trọn vẹn thay vì tệp thiếu dòng).
+    """
+    sql, tham_so = XUAT_DU_LIEU[loai_xuat]
+    try:
+        async with get_async_connection() as conn:
+            async with conn.cursor(name=f"xuat_{loai_xuat}") as cur:
+                await cur.execute(sql, tham_so(tu_ngay, den_ngay))
+                cot = [c.name for c in cur.description]
+                if dinh_dang == "csv":
+                    yield "\ufeff" + _dinh_dang_lo(dinh_dang, cot, [cot])
+
+                while True:
+                    cac_dong = await cur.fetchmany(KICH_THUOC_LO)
+                    if not cac_dong:
+                        break
+                    yield _dinh_dang_lo(dinh_dang, cot, cac_dong)
+    except psycopg.Error as e:
+        print(f"Lỗi CSDL khi xuất {loai_xuat}: {e}", file=sys.stderr)
+        raise
@@ -2,7 +2,8 @@
 
 import psycopg2
 import psycopg2.extras
-from be.db_connection import get_db_connection, close_db_connection
+from be.db_connection import get_db_connection, close_db_connection, execute_page_query
+from be import text_search
 
 
 def add_sanpham(ma_san_pham, ten_san_pham, id_danh_muc, so_luong_ton_kho, don_vi_tinh,
@@ -38,19 +39,15 @@ def add_sanpham(ma_san_pham, ten_san_pham, id_danh_muc, so_luong_ton_kho, don_vi
     return new_id
 
 
-def get_sanpham(id_danh_muc_filter=None, ten_san_pham_filter=None, low_stock_threshold=None):
-    """
-    Lấy danh sách sản phẩm, có thể lọc theo danh mục, tên, hoặc tồn kho thấp.
-    """
-    conn = get_db_connection()
-    if not conn:
-        return None
-
-    base_sql = """
+SQL_DANH_SACH_SAN_PHAM = """
         SELECT sp.*, dm.ten_danh_muc 
         FROM SanPham sp
         JOIN DanhMuc dm ON sp.id_danh_muc = dm.id
     """
+
+
+def _build_sanpham_filters(id_danh_muc_filter=None, ten_san_pham_filter=None, low_stock_threshold=None):
+    """Xây dựng điều kiện lọc sản phẩm, trả về (conditions, params)."""
     conditions = []
     params = []
 
@@ -59,13 +56,30 @@ def get_sanpham(id_danh_muc_filter=None, ten_san_pham_filter=None, low_stock_thr
         params.append(id_danh_muc_filter)
 
     if ten_san_pham_filter:
-        conditions.append("sp.ten_san_pham ILIKE %s")
-        params.append(f"%{ten_san_pham_filter}%")
+        # Tên chứa từ khóa, không phân biệt dấu / hoa thường (index trigram trên ten_tim_kiem)
+        dieu_kien, dieu_kien_params = text_search.build_contains_condition("sp.ten_tim_kiem", ten_san_pham_filter)
+        if dieu_kien:
+            conditions.append(dieu_kien)
+            params.extend(dieu_kien_params)
 
     if low_stock_threshold is not None:
         conditions.append("sp.so_luong_ton_kho <= %s")
         params.append(low_stock_threshold)
 
+    return conditions, params
+
+
+def get_sanpham(id_danh_muc_filter=None, ten_san_pham_filter=None, low_stock_threshold=None):
+    """
+    Lấy danh sách sản phẩm, có thể lọc theo danh mục, tên, hoặc tồn kho thấp.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    base_sql = SQL_DANH_SACH_SAN_PHAM
+    conditions, params = _build_sanpham_filters(id_danh_muc_filter, ten_san_pham_filter, low_stock_threshold)
+
     if conditions:
         base_sql += " WHERE " + " AND ".join(conditions)
 
@@ -83,6 +97,18 @@ def get_sanpham(id_danh_muc_filter=None, ten_san_pham_filter=None, low_stock_thr
         close_db_connection(conn)
 
 
+def get_sanpham_page(id_danh_muc_filter=None, ten_san_pham_filter=None, low_stock_threshold=None,
+                     limit=None, cursor=None, include_total=False):
+    """
+    Lấy một trang danh sách sản phẩm (sắp xếp theo tên), dùng cursor của trang trước để lấy trang tiếp.
+    Ném ValueError nếu cursor không hợp lệ.
+    """
+    conditions, params = _build_sanpham_filters(id_danh_muc_filter, ten_san_pham_filter, low_stock_threshold)
+    return execute_page_query(SQL_DANH_SACH_SAN_PHAM, conditions, params,
+                              [("sp.ten_san_pham", "ten_san_pham"), ("sp.id", "id")],
+                              limit, cursor, include_total)
+
+
 def get_sanpham_by_id(sanpham_id):
     """
     Lấy thông tin chi tiết của một sản phẩm theo ID.
@@ -2,7 +2,8 @@
 
 import psycopg2
 import psycopg2.extras
-from be.db_connection import get_db_connection, close_db_connection
+from be.db_connection import get_db_connection, close_db_connection, execute_page_query
+from be import text_search
 
 
 def add_nhacungcap(ten_nha_cung_cap, email, dia_chi, ma_so_thue=None,
@@ -37,6 +38,27 @@ def add_nhacungcap(ten_nha_cung_cap, email, dia_chi, ma_so_thue=None,
     return new_id
 
 
+def _build_nhacungcap_filters(name_filter=None, phone_filter=None, email_filter=None):
+    """Xây dựng điều kiện tìm kiếm nhà cung cấp, trả về (conditions, params)."""
+    conditions = []
+    params = []
+
+    # Tất cả đều là "chứa chuỗi nhập", dùng các index trigram (xem file tạo bảng NhaCungCap)
+    tim_kiem = [
+        ("ten_tim_kiem", name_filter, text_search.chuan_hoa),          # Tên không dấu: "nguyen" khớp "Nguyễn"
+        ("so_dien_thoai_so", phone_filter, text_search.chi_lay_so),    # Bỏ khoảng trắng, dấu chấm, gạch nối
+        ("lower(email)", email_filter, text_search.chuan_hoa),
+    ]
+    for cot, tu_khoa, ham_chuan_hoa in tim_kiem:
+        if tu_khoa:
+            dieu_kien, dieu_kien_params = text_search.build_contains_condition(cot, tu_khoa, ham_chuan_hoa)
+            if dieu_kien:
+                conditions.append(dieu_kien)
+                params.extend(dieu_kien_params)
+
+    return conditions, params
+
+
 def get_nhacungcap(name_filter=None, phone_filter=None, email_filter=None):
     """
     Lấy danh sách nhà cung cấp, có thể lọc theo nhiều tiêu chí.
@@ -46,18 +68,7 @@ def get_nhacungcap(name_filter=None, phone_filter=None, email_filter=None):
         return None
 
     base_sql = "SELECT * FROM NhaCungCap"
-    conditions = []
-    params = []
-
-    if name_filter:
-        conditions.append("ten_nha_cung_cap ILIKE %s")
-        params.append(f"%{name_filter}%")
-    if phone_filter:
-        conditions.append("so_dien_thoai LIKE %s")
-        params.append(f"%{phone_filter}%")
-    if email_filter:
-        conditions.append("email ILIKE %s")
-        params.append(f"%{email_filter}%")
+    conditions, params = _build_nhacungcap_filters(name_filter, phone_filter, email_filter)
 
     if conditions:
         base_sql += " WHERE " + " AND ".join(conditions)
@@ -75,6 +86,18 @@ def get_nhacungcap(name_filter=None, phone_filter=None, email_filter=None):
         close_db_connection(conn)
 
 
+def get_nhacungcap_page(name_filter=None, phone_filter=None, email_filter=None,
+                        limit=None, cursor=None, include_total=False):
+    """
+    Lấy một trang danh sách nhà cung cấp (sắp xếp theo tên), dùng cursor của trang trước để lấy trang tiếp.
+    Ném ValueError nếu cursor không hợp lệ.
+    """
+    conditions, params = _build_nhacungcap_filters(name_filter, phone_filter, email_filter)
+    return execute_page_query("SELECT * FROM NhaCungCap", conditions, params,
+                              [("ten_nha_cung_cap", "ten_nha_cung_cap"), ("id", "id")],
+                              limit, cursor, include_total)
+
+
 def get_nhacungcap_by_id(nhacungcap_id: int):
     """
     Lấy thông tin một nhà cung cấp theo ID.
@@ -3,7 +3,8 @@
 import psycopg2
 import psycopg2.extras
 from datetime import date
-from be.db_connection import get_db_connection, close_db_connection
+from be.db_connection import get_db_connection, close_db_connection, execute_page_query
+from be import text_search
 
 
 def add_khachhang(ten_khach_hang, so_dien_thoai, email,
@@ -48,6 +49,27 @@ def add_khachhang(ten_khach_hang, so_dien_thoai, email,
     return new_id
 
 
+def _build_khachhang_filters(name_filter=None, phone_filter=None, email_filter=None):
+    """Xây dựng điều kiện tìm kiếm khách hàng, trả về (conditions, params)."""
+    conditions = []
+    params = []
+
+    # Tất cả đều là "chứa chuỗi nhập", dùng các index trigram (xem file tạo bảng KhachHang)
+    tim_kiem = [
+        ("ten_tim_kiem", name_filter, text_search.chuan_hoa),          # Tên không dấu: "nguyen" khớp "Nguyễn"
+        ("so_dien_thoai_so", phone_filter, text_search.chi_lay_so),    # Bỏ khoảng trắng, dấu chấm, gạch nối
+        ("lower(email)", email_filter, text_search.chuan_hoa),
+    ]
+    for cot, tu_khoa, ham_chuan_hoa in tim_kiem:
+        if tu_khoa:
+            dieu_kien, dieu_kien_params = text_search.build_contains_condition(cot, tu_khoa, ham_chuan_hoa)
+            if dieu_kien:
+                conditions.append(dieu_kien)
+                params.extend(dieu_kien_params)
+
+    return conditions, params
+
+
 def get_khachhang(name_filter=None, phone_filter=None, email_filter=None):
     """
     Lấy danh sách khách hàng, có thể tìm kiếm theo tên, SĐT hoặc email.
@@ -57,18 +79,7 @@ def get_khachhang(name_filter=None, phone_filter=None, email_filter=None):
         return None
 
     base_sql = "SELECT * FROM KhachHang"
-    conditions = []
-    params = []
-
-    if name_filter:
-        conditions.append("ten_khach_hang ILIKE %s")
-        params.append(f"%{name_filter}%")
-    if phone_filter:
-        conditions.append("so_dien_thoai LIKE %s")
-        params.append(f"%{phone_filter}%")
-    if email_filter:
-        conditions.append("email ILIKE %s")
-        params.append(f"%{email_filter}%")
+    conditions, params = _build_khachhang_filters(name_filter, phone_filter, email_filter)
 
     if conditions:
         base_sql += " WHERE " + " AND ".join(conditions)
@@ -86,6 +97,66 @@ def get_khachhang(name_filter=None, phone_filter=None, email_filter=None):
         close_db_connection(conn)
 
 
+def get_khachhang_page(name_filter=None, phone_filter=None, email_filter=None,
+                       limit=None, cursor=None, include_total=False):
+    """
+    Lấy một trang danh sách khách hàng (sắp xếp theo tên), dùng cursor của trang trước để lấy trang tiếp.
+    Ném ValueError nếu cursor không hợp lệ.
+    """
+    conditions, params = _build_khachhang_filters(name_filter, phone_filter, email_filter)
+    return execute_page_query("SELECT * FROM KhachHang", conditions, params,
+                              [("ten_khach_hang", "ten_khach_hang"), ("id", "id")],
+                              limit, cursor, include_total)
+
+
+def search_khachhang(tu_khoa, limit=None):
+    """
+    Tra cứu nhanh khách hàng ở quầy thu ngân, kết quả xếp theo mức độ khớp.
+    - Chỉ gồm chữ số (VD: "5678", "0909 123"): số điện thoại KẾT THÚC bằng các số đã nhập
+      (index trên reverse(so_dien_thoai_so)); trùng cả số đứng đầu, rồi khách mua nhiều trước.
+    - Ngược lại: tên chứa từ khóa (không dấu) hoặc email bắt đầu bằng từ khóa (text_search.build_ranked_search).
+    Trả về danh sách khách hàng hoặc None nếu lỗi.
+    """
+    limit = text_search.clamp_search_limit(limit)
+    chuoi = (tu_khoa or "").strip()
+    la_so_dien_thoai = bool(text_search.chi_lay_so(chuoi)) and all(c.isdigit() or c in " +.-" for c in chuoi)
+
+    if la_so_dien_thoai:
+        dieu_kien, params = text_search.build_suffix_condition("reverse(so_dien_thoai_so)", chuoi)
+        sql = f"""
+            SELECT * FROM KhachHang
+            WHERE {dieu_kien}
+            ORDER BY (so_dien_thoai_so = %s) DESC, so_lan_mua_hang DESC, id
+            LIMIT %s;
+        """
+        params = params + [text_search.chi_lay_so(chuoi), limit]
+    else:
+        tim_kiem = text_search.build_ranked_search("ten_tim_kiem", "lower(email)", chuoi)
+        if not tim_kiem:
+            return []
+        dieu_kien, dieu_kien_params, hang, hang_params = tim_kiem
+        sql = f"""
+            SELECT * FROM KhachHang
+            WHERE {dieu_kien}
+            ORDER BY {hang}, length(ten_khach_hang), id
+            LIMIT %s;
+        """
+        params = dieu_kien_params + hang_params + [limit]
+
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(sql, tuple(params))
+            return [dict(row) for row in cur.fetchall()]
+    except psycopg2.Error as e:
+        print(f"Lỗi khi tra cứu khách hàng: {e}")
+        return None
+    finally:
+        close_db_connection(conn)
+
+
 def get_khachhang_by_id(khachhang_id: int):
     """
     Lấy thông tin một khách hàng theo ID.
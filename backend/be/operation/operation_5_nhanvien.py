@@ -2,7 +2,7 @@
 
 import psycopg2
 import psycopg2.extras
-from be.db_connection import get_db_connection, close_db_connection
+from be.db_connection import get_db_connection, close_db_connection, execute_page_query
 
 
 def add_nhanvien(ten_nhan_vien, ten_dang_nhap, mat_khau, email, so_dien_thoai,
@@ -59,6 +59,16 @@ def get_all_nhanvien():
         close_db_connection(conn)
 
 
+def get_nhanvien_page(limit=None, cursor=None, include_total=False):
+    """
+    Lấy một trang danh sách nhân viên (sắp xếp theo tên), dùng cursor của trang trước để lấy trang tiếp.
+    Ném ValueError nếu cursor không hợp lệ.
+    """
+    return execute_page_query("SELECT * FROM NhanVien", [], [],
+                              [("ten_nhan_vien", "ten_nhan_vien"), ("id", "id")],
+                              limit, cursor, include_total)
+
+
 def get_nhanvien_by_id(nhanvien_id: int):
     """Lấy thông tin một nhân viên theo ID."""
     conn = get_db_connection()
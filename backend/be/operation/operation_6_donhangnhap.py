@@ -4,7 +4,53 @@ import psycopg2
 import psycopg2.extras
 from datetime import date
 import sys
-from be.db_connection import get_db_connection, close_db_connection
+from be.db_connection import get_db_connection, close_db_connection, execute_page_query
+
+# --- Các câu SQL dùng chung ---
+
+SQL_INSERT_DON_HANG_NHAP = """
+    INSERT INTO DonHangNhap (id_nha_cung_cap, id_nhan_vien, ngay_dat_hang, ngay_du_kien_nhan_hang, trang_thai, ghi_chu)
+    VALUES (%s, %s, COALESCE(%s, CURRENT_DATE), %s, %s, %s) RETURNING id;
+"""
+
+SQL_INSERT_CHI_TIET_NHAP = """
+    INSERT INTO ChiTietDonHangNhap (id_don_hang_nhap, id_san_pham, so_luong, gia_nhap_don_vi, ghi_chu)
+    VALUES (%s, %s, %s, %s, %s) RETURNING id;
+"""
+
+# Dạng cho execute_values: mọi dòng sản phẩm trong một câu INSERT nhiều dòng
+SQL_INSERT_NHIEU_CHI_TIET_NHAP = """
+    INSERT INTO ChiTietDonHangNhap (id_don_hang_nhap, id_san_pham, so_luong, gia_nhap_don_vi, ghi_chu)
+    VALUES %s;
+"""
+
+SQL_THONG_TIN_DON_HANG_NHAP = """
+    SELECT dhn.*, ncc.ten_nha_cung_cap, nv.ten_nhan_vien
+    FROM DonHangNhap dhn
+    LEFT JOIN NhaCungCap ncc ON dhn.id_nha_cung_cap = ncc.id
+    LEFT JOIN NhanVien nv ON dhn.id_nhan_vien = nv.id
+    WHERE dhn.id = %s;
+"""
+
+SQL_CHI_TIET_DON_HANG_NHAP = """
+    SELECT ctdhn.*, sp.ten_san_pham, sp.don_vi_tinh, sp.ma_san_pham
+    FROM ChiTietDonHangNhap ctdhn
+    JOIN SanPham sp ON ctdhn.id_san_pham = sp.id
+    WHERE ctdhn.id_don_hang_nhap = %s ORDER BY sp.ten_san_pham;
+"""
+
+# Số dòng tối đa trong một câu INSERT của execute_values (đơn lớn hơn được chia thành vài câu)
+SO_DONG_MOI_LAN_CHEN = 1000
+
+
+def _parse_ngay(ngay_str, ten_truong):
+    """Chuyển chuỗi 'YYYY-MM-DD' thành date (None nếu bỏ trống). Ném ValueError nếu sai định dạng."""
+    if not ngay_str:
+        return None
+    try:
+        return date.fromisoformat(ngay_str)
+    except (ValueError, TypeError):
+        raise ValueError(f"Định dạng {ten_truong} '{ngay_str}' không hợp lệ (YYYY-MM-DD).")
 
 
 def create_donhangnhap(id_nha_cung_cap, id_nhan_vien,
@@ -13,37 +59,21 @@ def create_donhangnhap(id_nha_cung_cap, id_nhan_vien,
     """
     Tạo một Đơn Hàng Nhập mới trong bảng DonHangNhap.
     """
+    try:
+        processed_ngay_dat_hang = _parse_ngay(ngay_dat_hang_str, "ngày đặt hàng")
+        processed_ngay_du_kien = _parse_ngay(ngay_du_kien_nhan_hang_str, "ngày dự kiến nhận hàng")
+    except ValueError as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return None
+
     conn = get_db_connection()
     if not conn:
         return None
 
-    processed_ngay_dat_hang = None
-    if ngay_dat_hang_str:
-        try:
-            processed_ngay_dat_hang = date.fromisoformat(ngay_dat_hang_str)
-        except (ValueError, TypeError):
-            print(f"Lỗi: Định dạng ngày đặt hàng '{ngay_dat_hang_str}' không hợp lệ (YYYY-MM-DD).", file=sys.stderr)
-            close_db_connection(conn)
-            return None
-
-    processed_ngay_du_kien = None
-    if ngay_du_kien_nhan_hang_str:
-        try:
-            processed_ngay_du_kien = date.fromisoformat(ngay_du_kien_nhan_hang_str)
-        except (ValueError, TypeError):
-            print(f"Lỗi: Định dạng ngày dự kiến nhận hàng '{ngay_du_kien_nhan_hang_str}' không hợp lệ (YYYY-MM-DD).",
-                  file=sys.stderr)
-            close_db_connection(conn)
-            return None
-
     new_order_id = None
-    sql = """
-        INSERT INTO DonHangNhap (id_nha_cung_cap, id_nhan_vien, ngay_dat_hang, ngay_du_kien_nhan_hang, trang_thai, ghi_chu)
-        VALUES (%s, %s, COALESCE(%s, CURRENT_DATE), %s, %s, %s) RETURNING id;
-    """
     try:
         with conn.cursor() as cur:
-            cur.execute(sql, (
+            cur.execute(SQL_INSERT_DON_HANG_NHAP, (
             id_nha_cung_cap, id_nhan_vien, processed_ngay_dat_hang, processed_ngay_du_kien, trang_thai, ghi_chu))
             new_order_id = cur.fetchone()[0]
             conn.commit()
@@ -55,6 +85,58 @@ def create_donhangnhap(id_nha_cung_cap, id_nhan_vien,
     return new_order_id
 
 
+def create_donhangnhap_with_items(id_nha_cung_cap, id_nhan_vien, items,
+                                  ngay_dat_hang_str=None, ngay_du_kien_nhan_hang_str=None,
+                                  trang_thai='Chờ xác nhận', ghi_chu=None):
+    """
+    Tạo Đơn Hàng Nhập kèm toàn bộ sản phẩm trong MỘT giao dịch:
+    đầu đơn + một câu INSERT nhiều dòng (execute_values) cho các sản phẩm, rồi đọc lại đơn trên cùng kết nối.
+    Một dòng lỗi (VD: sản phẩm không tồn tại) thì không tạo gì cả.
+
+    Args:
+        items (list of dict): id_san_pham, so_luong, gia_nhap_don_vi, ghi_chu (tùy chọn). Có thể rỗng.
+
+    Returns:
+        dict or None: Đơn hàng nhập vừa tạo (giống get_chitietdonhangnhap), hoặc None nếu lỗi.
+    """
+    try:
+        processed_ngay_dat_hang = _parse_ngay(ngay_dat_hang_str, "ngày đặt hàng")
+        processed_ngay_du_kien = _parse_ngay(ngay_du_kien_nhan_hang_str, "ngày dự kiến nhận hàng")
+    except ValueError as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return None
+
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+            cur.execute(SQL_INSERT_DON_HANG_NHAP, (id_nha_cung_cap, id_nhan_vien, processed_ngay_dat_hang,
+                                                   processed_ngay_du_kien, trang_thai, ghi_chu))
+            new_order_id = cur.fetchone()[0]
+
+            if items:
+                psycopg2.extras.execute_values(
+                    cur, SQL_INSERT_NHIEU_CHI_TIET_NHAP,
+                    [(new_order_id, item['id_san_pham'], item['so_luong'], item['gia_nhap_don_vi'], item.get('ghi_chu'))
+                     for item in items],
+                    page_size=SO_DONG_MOI_LAN_CHEN)
+
+            cur.execute(SQL_THONG_TIN_DON_HANG_NHAP, (new_order_id,))
+            order_info = dict(cur.fetchone())
+            cur.execute(SQL_CHI_TIET_DON_HANG_NHAP, (new_order_id,))
+            order_info['chi_tiet_san_pham'] = [dict(row) for row in cur.fetchall()]
+            conn.commit()
+            return order_info
+    except psycopg2.Error as e:
+        print(f"Lỗi CSDL khi tạo đơn hàng nhập kèm sản phẩm: {e}", file=sys.stderr)
+        conn.rollback()
+        return None
+    finally:
+        close_db_connection(conn)
+
+
 def add_item_to_donhangnhap(id_don_hang_nhap, id_san_pham, so_luong, gia_nhap_don_vi, ghi_chu_item=None):
     """
     Thêm một sản phẩm vào một Đơn Hàng Nhập.
@@ -64,13 +146,9 @@ def add_item_to_donhangnhap(id_don_hang_nhap, id_san_pham, so_luong, gia_nhap_do
         return None
 
     new_item_id = None
-    sql = """
-        INSERT INTO ChiTietDonHangNhap (id_don_hang_nhap, id_san_pham, so_luong, gia_nhap_don_vi, ghi_chu)
-        VALUES (%s, %s, %s, %s, %s) RETURNING id;
-    """
     try:
         with conn.cursor() as cur:
-            cur.execute(sql, (id_don_hang_nhap, id_san_pham, so_luong, gia_nhap_don_vi, ghi_chu_item))
+            cur.execute(SQL_INSERT_CHI_TIET_NHAP, (id_don_hang_nhap, id_san_pham, so_luong, gia_nhap_don_vi, ghi_chu_item))
             new_item_id = cur.fetchone()[0]
             conn.commit()
     except psycopg2.Error as e:
@@ -81,19 +159,16 @@ def add_item_to_donhangnhap(id_don_hang_nhap, id_san_pham, so_luong, gia_nhap_do
     return new_item_id
 
 
-def get_all_donhangnhap(supplier_id: int = None, status: str = None):
-    """
-    Lấy danh sách Đơn Hàng Nhập, có thể lọc.
-    """
-    conn = get_db_connection()
-    if not conn: return None
-
-    base_sql = """
+SQL_DANH_SACH_DON_HANG_NHAP = """
         SELECT dhn.*, ncc.ten_nha_cung_cap, nv.ten_nhan_vien
         FROM DonHangNhap dhn
         JOIN NhaCungCap ncc ON dhn.id_nha_cung_cap = ncc.id
         JOIN NhanVien nv ON dhn.id_nhan_vien = nv.id
     """
+
+
+def _build_donhangnhap_filters(supplier_id: int = None, status: str = None):
+    """Xây dựng điều kiện lọc đơn hàng nhập, trả về (conditions, params)."""
     conditions = []
     params = []
 
@@ -104,6 +179,19 @@ def get_all_donhangnhap(supplier_id: int = None, status: str = None):
         conditions.append("dhn.trang_thai = %s")
         params.append(status)
 
+    return conditions, params
+
+
+def get_all_donhangnhap(supplier_id: int = None, status: str = None):
+    """
+    Lấy danh sách Đơn Hàng Nhập, có thể lọc.
+    """
+    conn = get_db_connection()
+    if not conn: return None
+
+    base_sql = SQL_DANH_SACH_DON_HANG_NHAP
+    conditions, params = _build_donhangnhap_filters(supplier_id, status)
+
     if conditions:
         base_sql += " WHERE " + " AND ".join(conditions)
 
@@ -120,6 +208,18 @@ def get_all_donhangnhap(supplier_id: int = None, status: str = None):
         close_db_connection(conn)
 
 
+def get_donhangnhap_page(supplier_id: int = None, status: str = None,
+                        limit: int = None, cursor: str = None, include_total: bool = False):
+    """
+    Lấy một trang danh sách Đơn Hàng Nhập (mới nhất trước), dùng cursor của trang trước để lấy trang tiếp.
+    Ném ValueError nếu cursor không hợp lệ.
+    """
+    conditions, params = _build_donhangnhap_filters(supplier_id, status)
+    return execute_page_query(SQL_DANH_SACH_DON_HANG_NHAP, conditions, params,
+                              [("dhn.ngay_dat_hang", "ngay_dat_hang"), ("dhn.id", "id")],
+                              limit, cursor, include_total, descending=True)
+
+
 def get_chitietdonhangnhap(id_don_hang_nhap):
     """
     Lấy thông tin chi tiết của một Đơn Hàng Nhập.
@@ -131,25 +231,12 @@ def get_chitietdonhangnhap(id_don_hang_nhap):
     order_info = None
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-            sql_order = """
-                SELECT dhn.*, ncc.ten_nha_cung_cap, nv.ten_nhan_vien
-                FROM DonHangNhap dhn
-                LEFT JOIN NhaCungCap ncc ON dhn.id_nha_cung_cap = ncc.id
-                LEFT JOIN NhanVien nv ON dhn.id_nhan_vien = nv.id 
-                WHERE dhn.id = %s;
-            """
-            cur.execute(sql_order, (id_don_hang_nhap,))
+            cur.execute(SQL_THONG_TIN_DON_HANG_NHAP, (id_don_hang_nhap,))
             order_data = cur.fetchone()
             if not order_data: return None
             order_info = dict(order_data)
 
-            sql_items = """
-                SELECT ctdhn.*, sp.ten_san_pham, sp.don_vi_tinh, sp.ma_san_pham
-                FROM ChiTietDonHangNhap ctdhn
-                JOIN SanPham sp ON ctdhn.id_san_pham = sp.id
-                WHERE ctdhn.id_don_hang_nhap = %s ORDER BY sp.ten_san_pham;
-            """
-            cur.execute(sql_items, (id_don_hang_nhap,))
+            cur.execute(SQL_CHI_TIET_DON_HANG_NHAP, (id_don_hang_nhap,))
             order_info['chi_tiet_san_pham'] = [dict(row) for row in cur.fetchall()]
     except psycopg2.Error as e:
         print(f"Lỗi CSDL khi lấy chi tiết Đơn Hàng Nhập: {e}", file=sys.stderr)
@@ -2,12 +2,181 @@
 
 import psycopg2
 import psycopg2.extras
+import psycopg
 from datetime import date
+from decimal import Decimal
 import sys
-from be.db_connection import get_db_connection, close_db_connection
+from psycopg.rows import dict_row
+from be.db_connection import get_db_connection, close_db_connection, shop_day_range
+from be.db_connection_async import get_async_connection
+from be import pagination
+
+# --- Các câu SQL dùng chung cho phiên bản đồng bộ (psycopg2) và bất đồng bộ (psycopg 3) ---
+
+SQL_INSERT_DON_HANG = """
+    INSERT INTO DonHangBan (
+        id_nhan_vien, id_khach_hang, dia_chi_giao_hang, ngay_dat_hang,
+        phuong_thuc_thanh_toan, trang_thai_don_hang, trang_thai_thanh_toan,
+        ghi_chu_don_hang
+    ) VALUES (%s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP), %s, %s, %s, %s) RETURNING id;
+"""
+
+SQL_KHOA_SAN_PHAM = "SELECT ten_san_pham, so_luong_ton_kho, gia_ban_hien_tai FROM SanPham WHERE id = %s FOR UPDATE;"
+
+SQL_INSERT_CHI_TIET = """
+    INSERT INTO ChiTietDonHangBan (id_don_hang_ban, id_san_pham, so_luong, gia_ban_niem_yet_don_vi, giam_gia, ghi_chu)
+    VALUES (%s, %s, %s, %s, %s, %s) RETURNING id;
+"""
+
+# Khóa tất cả sản phẩm của giỏ hàng theo thứ tự id tăng dần (tránh deadlock giữa các quầy)
+SQL_KHOA_NHIEU_SAN_PHAM = """
+    SELECT id, ten_san_pham, so_luong_ton_kho, gia_ban_hien_tai FROM SanPham
+    WHERE id = ANY(%s) ORDER BY id FOR UPDATE;
+"""
+
+SQL_THONG_TIN_DON_HANG = """
+    SELECT dhb.*, kh.ten_khach_hang, nv.ten_nhan_vien
+    FROM DonHangBan dhb
+    LEFT JOIN KhachHang kh ON dhb.id_khach_hang = kh.id
+    JOIN NhanVien nv ON dhb.id_nhan_vien = nv.id
+    WHERE dhb.id = %s;
+"""
+
+SQL_CHI_TIET_DON_HANG = """
+    SELECT ctdhb.*, sp.ten_san_pham, sp.ma_san_pham, sp.don_vi_tinh
+    FROM ChiTietDonHangBan ctdhb
+    JOIN SanPham sp ON ctdhb.id_san_pham = sp.id
+    WHERE ctdhb.id_don_hang_ban = %s ORDER BY ctdhb.id;
+"""
+
+SQL_PHAN_BO_LO_NHAP = """
+    SELECT pb.*, ctdhb.id_san_pham, ctdhn.id_don_hang_nhap, ctdhn.ngay_nhap_kho
+    FROM PhanBoLoNhap pb
+    JOIN ChiTietDonHangBan ctdhb ON pb.id_chi_tiet_don_hang_ban = ctdhb.id
+    JOIN ChiTietDonHangNhap ctdhn ON pb.id_chi_tiet_don_hang_nhap = ctdhn.id
+    WHERE ctdhb.id_don_hang_ban = %s
+    ORDER BY pb.id_chi_tiet_don_hang_ban, pb.id;
+"""
+
+# Thanh toán (từng phần): trigger cộng vào DonHangBan.so_tien_da_thanh_toan và kiểm tra không vượt số còn nợ
+# (database/017_create_table_thanh_toan_don_hang_ban.sql). Phương thức mặc định là phương thức của đơn.
+SQL_INSERT_THANH_TOAN = """
+    INSERT INTO ThanhToanDonHangBan (id_don_hang_ban, so_tien, phuong_thuc_thanh_toan, id_nhan_vien, ghi_chu)
+    SELECT id, %s, COALESCE(%s::enum_phuong_thuc_thanh_toan, phuong_thuc_thanh_toan), %s, %s
+    FROM DonHangBan WHERE id = %s
+    RETURNING id;
+"""
+
+SQL_SO_DU_DON_HANG = """
+    SELECT id AS id_don_hang_ban, tam_tinh_tien_hang, so_tien_da_thanh_toan,
+           tam_tinh_tien_hang - so_tien_da_thanh_toan AS so_tien_con_lai, trang_thai_thanh_toan
+    FROM DonHangBan WHERE id = %s;
+"""
+
+SQL_THANH_TOAN_DON_HANG = """
+    SELECT * FROM ThanhToanDonHangBan WHERE id_don_hang_ban = %s ORDER BY ngay_thanh_toan, id;
+"""
+
+
+def _parse_ngay(ngay_str):
+    """Chuyển chuỗi YYYY-MM-DD thành date. Ném ValueError nếu sai định dạng."""
+    return date.fromisoformat(ngay_str) if ngay_str else None
+
+
+def _tinh_financial_calc(items):
+    """
+    TÍNH TOÁN THUẾ & TỔNG TIỀN (Xử lý Python) cho danh sách sản phẩm của một đơn.
+    """
+    # Tổng tiền hàng (đã trừ giảm giá từng món, lấy từ DB tính sẵn - NUMERIC nên là Decimal)
+    tong_tien_hang = sum((Decimal(str(item['tong_gia_ban'])) for item in items), Decimal('0'))
+
+    # Tính thuế theo yêu cầu (VAT 10%, HKD 1.5%)
+    # Giả sử thuế được tính thêm trên tổng tiền hàng (Khách phải trả thêm)
+    # Hệ số dạng Decimal: Decimal * float ném TypeError
+    thue_vat = tong_tien_hang * Decimal('0.10')
+    thue_hkd = tong_tien_hang * Decimal('0.015')
+    tong_thanh_toan = tong_tien_hang + thue_vat + thue_hkd
+
+    return {
+        "tong_tien_hang": float(tong_tien_hang),
+        "thue_vat_10_percent": float(thue_vat),
+        "thue_hkd_1_5_percent": float(thue_hkd),
+        "tong_thanh_toan": float(tong_thanh_toan)
+    }
+
+
+def _chuan_hoa_items(items):
+    """
+    Kiểm tra danh sách sản phẩm của giỏ hàng và sắp xếp theo id_san_pham.
+    Mỗi item là dict: id_san_pham, so_luong, gia_ban_niem_yet_don_vi, giam_gia, ghi_chu_item.
+    Ném ValueError nếu giỏ rỗng hoặc một sản phẩm xuất hiện nhiều lần.
+    """
+    if not items:
+        raise ValueError("Đơn hàng phải có ít nhất một sản phẩm.")
+    sorted_items = sorted(items, key=lambda item: item['id_san_pham'])
+    for truoc, sau in zip(sorted_items, sorted_items[1:]):
+        if truoc['id_san_pham'] == sau['id_san_pham']:
+            raise ValueError(f"Sản phẩm {sau['id_san_pham']} xuất hiện nhiều lần trong đơn hàng.")
+    return sorted_items
+
+
+def _kiem_tra_ton_kho(products, items):
+    """So sánh tồn kho đã khóa với số lượng đặt. Trả về thông báo lỗi hoặc None nếu đủ hàng."""
+    ton_kho = {p['id']: p for p in products}
+    for item in items:
+        product = ton_kho.get(item['id_san_pham'])
+        if not product:
+            return f"Không tìm thấy sản phẩm {item['id_san_pham']}."
+        if product['so_luong_ton_kho'] < item['so_luong']:
+            return (f"Sản phẩm '{product['ten_san_pham']}' không đủ tồn kho "
+                    f"(còn {product['so_luong_ton_kho']}, cần {item['so_luong']}).")
+    return None
+
+
+def _dien_gia_niem_yet(products, items):
+    """Dòng không gửi giá niêm yết thì lấy giá bán hiện tại của sản phẩm (SanPham.gia_ban_hien_tai)."""
+    gia_hien_tai = {p['id']: p['gia_ban_hien_tai'] for p in products}
+    return [item if item.get('gia_ban_niem_yet_don_vi') is not None
+            else dict(item, gia_ban_niem_yet_don_vi=gia_hien_tai[item['id_san_pham']])
+            for item in items]
+
+
+def _build_insert_chi_tiet_nhieu_dong_sql(id_don_hang_ban, items):
+    """Xây dựng một câu INSERT nhiều dòng cho toàn bộ sản phẩm của đơn."""
+    values = []
+    params = []
+    for item in items:
+        values.append("(%s, %s, %s, %s, %s, %s)")
+        params.extend([id_don_hang_ban, item['id_san_pham'], item['so_luong'],
+                       item['gia_ban_niem_yet_don_vi'], item.get('giam_gia', 0), item.get('ghi_chu_item')])
+    sql = f"""
+        INSERT INTO ChiTietDonHangBan (id_don_hang_ban, id_san_pham, so_luong, gia_ban_niem_yet_don_vi, giam_gia, ghi_chu)
+        VALUES {', '.join(values)};
+    """
+    return sql, tuple(params)
+
+
+def _build_update_status_sql(id_don_hang_ban, new_trang_thai_don_hang,
+                             new_trang_thai_thanh_toan=None, ngay_giao_hang_thuc_te_str=None):
+    """Xây dựng câu UPDATE trạng thái đơn hàng và tham số tương ứng."""
+    update_fields = ["trang_thai_don_hang = %s"]
+    params = [new_trang_thai_don_hang]
+
+    if new_trang_thai_thanh_toan:
+        update_fields.append("trang_thai_thanh_toan = %s")
+        params.append(new_trang_thai_thanh_toan)
+
+    if ngay_giao_hang_thuc_te_str:
+        try:
+            ngay_giao_thuc_te = date.fromisoformat(ngay_giao_hang_thuc_te_str)
+            update_fields.append("ngay_giao_hang_thuc_te = %s")
+            params.append(ngay_giao_thuc_te)
+        except ValueError: pass
+
+    params.append(id_don_hang_ban)
+    sql = f"UPDATE DonHangBan SET {', '.join(update_fields)} WHERE id = %s;"
+    return sql, tuple(params)
 
-# --- Giữ nguyên các hàm create_donhangban, add_item_to_donhangban như cũ ---
-# (Phần code tạo đơn và thêm sản phẩm không cần sửa đổi gì vì Trigger DB vẫn hoạt động tốt)
 
 def create_donhangban(id_nhan_vien, id_khach_hang, dia_chi_giao_hang,
                       ngay_dat_hang_str=None,
@@ -18,22 +187,15 @@ def create_donhangban(id_nhan_vien, id_khach_hang, dia_chi_giao_hang,
     """Tạo một Đơn Hàng Bán mới."""
     conn = get_db_connection()
     if not conn: return None
-    ngay_dat_hang = None
-    if ngay_dat_hang_str:
-        try: ngay_dat_hang = date.fromisoformat(ngay_dat_hang_str)
-        except ValueError: return None
+    try: ngay_dat_hang = _parse_ngay(ngay_dat_hang_str)
+    except ValueError:
+        close_db_connection(conn)
+        return None
 
     new_order_id = None
-    sql = """
-        INSERT INTO DonHangBan (
-            id_nhan_vien, id_khach_hang, dia_chi_giao_hang, ngay_dat_hang,
-            phuong_thuc_thanh_toan, trang_thai_don_hang, trang_thai_thanh_toan,
-            ghi_chu_don_hang
-        ) VALUES (%s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP), %s, %s, %s, %s) RETURNING id;
-    """
     try:
         with conn.cursor() as cur:
-            cur.execute(sql, (id_nhan_vien, id_khach_hang, dia_chi_giao_hang, ngay_dat_hang,
+            cur.execute(SQL_INSERT_DON_HANG, (id_nhan_vien, id_khach_hang, dia_chi_giao_hang, ngay_dat_hang,
                               phuong_thuc_thanh_toan, trang_thai_don_hang, trang_thai_thanh_toan, ghi_chu_don_hang))
             new_order_id = cur.fetchone()[0]
             conn.commit()
@@ -51,16 +213,14 @@ def add_item_to_donhangban(id_don_hang_ban, id_san_pham, so_luong, gia_ban_niem_
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
             # Check tồn kho
-            cur.execute("SELECT ten_san_pham, so_luong_ton_kho FROM SanPham WHERE id = %s FOR UPDATE;", (id_san_pham,))
+            cur.execute(SQL_KHOA_SAN_PHAM, (id_san_pham,))
             product = cur.fetchone()
             if not product or product['so_luong_ton_kho'] < so_luong:
                 return None # Xử lý lỗi tồn kho ở đây nếu cần
+            if gia_ban_niem_yet_don_vi is None:
+                gia_ban_niem_yet_don_vi = product['gia_ban_hien_tai']
 
-            sql = """
-                INSERT INTO ChiTietDonHangBan (id_don_hang_ban, id_san_pham, so_luong, gia_ban_niem_yet_don_vi, giam_gia, ghi_chu)
-                VALUES (%s, %s, %s, %s, %s, %s) RETURNING id;
-            """
-            cur.execute(sql, (id_don_hang_ban, id_san_pham, so_luong, gia_ban_niem_yet_don_vi, giam_gia, ghi_chu_item))
+            cur.execute(SQL_INSERT_CHI_TIET, (id_don_hang_ban, id_san_pham, so_luong, gia_ban_niem_yet_don_vi, giam_gia, ghi_chu_item))
             new_item_id = cur.fetchone()[0]
             conn.commit()
     except psycopg2.Error:
@@ -68,6 +228,60 @@ def add_item_to_donhangban(id_don_hang_ban, id_san_pham, so_luong, gia_ban_niem_
     finally: close_db_connection(conn)
     return new_item_id
 
+def create_donhangban_with_items(id_nhan_vien, id_khach_hang, dia_chi_giao_hang, items,
+                                 ngay_dat_hang_str=None,
+                                 phuong_thuc_thanh_toan='Tiền mặt',
+                                 trang_thai_don_hang='Chờ xác nhận',
+                                 trang_thai_thanh_toan='Chưa thanh toán',
+                                 ghi_chu_don_hang=None):
+    """
+    Tạo đơn hàng bán kèm toàn bộ sản phẩm trong MỘT giao dịch.
+    Nếu một sản phẩm không đủ tồn kho thì không tạo gì cả.
+    Trả về hóa đơn đầy đủ (giống get_chitietdonhangban) hoặc None nếu lỗi.
+    """
+    try:
+        ngay_dat_hang = _parse_ngay(ngay_dat_hang_str)
+        items = _chuan_hoa_items(items)
+    except ValueError as e:
+        print(f"Lỗi dữ liệu: {e}", file=sys.stderr)
+        return None
+
+    conn = get_db_connection()
+    if not conn: return None
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            # 1. Khóa & kiểm tra tồn kho cho tất cả sản phẩm bằng một câu lệnh
+            cur.execute(SQL_KHOA_NHIEU_SAN_PHAM, ([item['id_san_pham'] for item in items],))
+            products = cur.fetchall()
+            loi = _kiem_tra_ton_kho(products, items)
+            if loi:
+                print(f"Lỗi tồn kho: {loi}", file=sys.stderr)
+                conn.rollback()
+                return None
+            items = _dien_gia_niem_yet(products, items)
+
+            # 2. Tạo đơn hàng và chèn tất cả sản phẩm (Trigger tự tính giá vốn FIFO)
+            cur.execute(SQL_INSERT_DON_HANG, (id_nhan_vien, id_khach_hang, dia_chi_giao_hang, ngay_dat_hang,
+                                              phuong_thuc_thanh_toan, trang_thai_don_hang, trang_thai_thanh_toan,
+                                              ghi_chu_don_hang))
+            new_order_id = cur.fetchone()['id']
+            cur.execute(*_build_insert_chi_tiet_nhieu_dong_sql(new_order_id, items))
+
+            # 3. Đọc lại hóa đơn trên cùng kết nối
+            cur.execute(SQL_THONG_TIN_DON_HANG, (new_order_id,))
+            order_info = dict(cur.fetchone())
+            cur.execute(SQL_CHI_TIET_DON_HANG, (new_order_id,))
+            order_info['chi_tiet_san_pham'] = [dict(r) for r in cur.fetchall()]
+            order_info['financial_calc'] = _tinh_financial_calc(order_info['chi_tiet_san_pham'])
+            conn.commit()
+            return order_info
+    except psycopg2.Error as e:
+        print(f"Lỗi CSDL: {e}", file=sys.stderr)
+        conn.rollback()
+        return None
+    finally:
+        close_db_connection(conn)
+
 # --- CẬP NHẬT MỚI: Hàm lấy chi tiết đơn hàng CÓ TÍNH THUẾ ---
 
 def get_chitietdonhangban(id_don_hang_ban):
@@ -82,46 +296,18 @@ def get_chitietdonhangban(id_don_hang_ban):
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
             # 1. Lấy thông tin chung đơn hàng
-            sql_order = """
-                SELECT dhb.*, kh.ten_khach_hang, nv.ten_nhan_vien
-                FROM DonHangBan dhb
-                LEFT JOIN KhachHang kh ON dhb.id_khach_hang = kh.id
-                JOIN NhanVien nv ON dhb.id_nhan_vien = nv.id
-                WHERE dhb.id = %s;
-            """
-            cur.execute(sql_order, (id_don_hang_ban,))
+            cur.execute(SQL_THONG_TIN_DON_HANG, (id_don_hang_ban,))
             row = cur.fetchone()
             if not row: return None
             order_info = dict(row)
 
             # 2. Lấy danh sách sản phẩm
-            sql_items = """
-                SELECT ctdhb.*, sp.ten_san_pham, sp.ma_san_pham, sp.don_vi_tinh
-                FROM ChiTietDonHangBan ctdhb
-                JOIN SanPham sp ON ctdhb.id_san_pham = sp.id
-                WHERE ctdhb.id_don_hang_ban = %s ORDER BY ctdhb.id;
-            """
-            cur.execute(sql_items, (id_don_hang_ban,))
+            cur.execute(SQL_CHI_TIET_DON_HANG, (id_don_hang_ban,))
             items = [dict(r) for r in cur.fetchall()]
             order_info['chi_tiet_san_pham'] = items
 
-            # 3. TÍNH TOÁN THUẾ & TỔNG TIỀN (Xử lý Python)
-            # Tổng tiền hàng (đã trừ giảm giá từng món, lấy từ DB tính sẵn)
-            tong_tien_hang = sum(item['tong_gia_ban'] for item in items)
-            
-            # Tính thuế theo yêu cầu (VAT 10%, HKD 1.5%)
-            # Giả sử thuế được tính thêm trên tổng tiền hàng (Khách phải trả thêm)
-            thue_vat = tong_tien_hang * 0.10
-            thue_hkd = tong_tien_hang * 0.015
-            tong_thanh_toan = tong_tien_hang + thue_vat + thue_hkd
-
-            # Gán thêm các trường calculated vào kết quả trả về
-            order_info['financial_calc'] = {
-                "tong_tien_hang": float(tong_tien_hang),
-                "thue_vat_10_percent": float(thue_vat),
-                "thue_hkd_1_5_percent": float(thue_hkd),
-                "tong_thanh_toan": float(tong_thanh_toan)
-            }
+            # 3. Gán thêm các trường calculated (thuế & tổng tiền) vào kết quả trả về
+            order_info['financial_calc'] = _tinh_financial_calc(items)
 
     except psycopg2.Error as e:
         print(f"Lỗi: {e}")
@@ -131,29 +317,85 @@ def get_chitietdonhangban(id_don_hang_ban):
     
     return order_info
 
-# --- CẬP NHẬT MỚI: Hàm lấy danh sách đơn hàng cũng cần hiển thị tổng tiền ---
+def get_phanbolonhap(id_don_hang_ban):
+    """
+    Lấy danh sách lô nhập mà từng dòng của đơn hàng đã xuất (do trigger FIFO ghi lại),
+    dùng để đối chiếu giá vốn. Trả về list hoặc None nếu lỗi.
+    """
+    conn = get_db_connection()
+    if not conn: return None
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(SQL_PHAN_BO_LO_NHAP, (id_don_hang_ban,))
+            return [dict(row) for row in cur.fetchall()]
+    except psycopg2.Error as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return None
+    finally:
+        close_db_connection(conn)
 
-def get_all_donhangban(customer_id=None, staff_id=None, status=None):
+def add_payment_to_donhangban(id_don_hang_ban, so_tien, phuong_thuc_thanh_toan=None, id_nhan_vien=None, ghi_chu=None):
     """
-    Lấy danh sách đơn hàng. 
-    Lưu ý: Vì không lưu tổng tiền trong DB, ta phải JOIN và SUM để lấy tổng giá trị hiển thị.
+    Ghi nhận một lần thanh toán (có thể từng phần) cho đơn hàng.
+    Trả một phần không đổi trang_thai_thanh_toan (vẫn 'Chưa thanh toán'); số đã thu / còn lại
+    lấy từ so_tien_da_thanh_toan / so_tien_con_lai.
+    Trả về số dư của đơn sau khi thanh toán (kèm id_thanh_toan), hoặc None nếu đơn không tồn tại / đã hủy /
+    đã thanh toán / số tiền vượt quá số còn nợ.
     """
     conn = get_db_connection()
     if not conn: return None
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(SQL_INSERT_THANH_TOAN, (so_tien, phuong_thuc_thanh_toan, id_nhan_vien, ghi_chu, id_don_hang_ban))
+            payment = cur.fetchone()
+            if not payment:
+                return None
+            cur.execute(SQL_SO_DU_DON_HANG, (id_don_hang_ban,))
+            result = dict(cur.fetchone())
+            result['id_thanh_toan'] = payment['id']
+            conn.commit()
+            return result
+    except psycopg2.Error as e:
+        print(f"Lỗi khi ghi nhận thanh toán: {e}", file=sys.stderr)
+        conn.rollback()
+        return None
+    finally:
+        close_db_connection(conn)
+
+def get_payments_of_donhangban(id_don_hang_ban):
+    """Số dư và lịch sử thanh toán của đơn hàng. Trả về dict, hoặc None nếu không có đơn / lỗi."""
+    conn = get_db_connection()
+    if not conn: return None
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(SQL_SO_DU_DON_HANG, (id_don_hang_ban,))
+            result = cur.fetchone()
+            if not result: return None
+            result = dict(result)
+            cur.execute(SQL_THANH_TOAN_DON_HANG, (id_don_hang_ban,))
+            result['thanh_toan'] = [dict(row) for row in cur.fetchall()]
+            return result
+    except psycopg2.Error as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return None
+    finally:
+        close_db_connection(conn)
 
-    # Query phức tạp hơn xíu để tính tổng tiền on-the-fly
+# --- CẬP NHẬT MỚI: Hàm lấy danh sách đơn hàng cũng cần hiển thị tổng tiền ---
+
+def _build_get_all_sql(customer_id=None, staff_id=None, status=None):
+    """Xây dựng câu SELECT danh sách đơn hàng (kèm tổng tiền) và tham số lọc."""
+    # Tổng tiền (tam_tinh_tien_hang, tong_thanh_toan_du_kien...) được trigger lưu sẵn trên DonHangBan,
+    # nên chỉ cần đọc một bảng đơn hàng, không JOIN/SUM các dòng chi tiết.
     base_sql = """
         SELECT 
             dhb.*, 
+            dhb.tam_tinh_tien_hang - dhb.so_tien_da_thanh_toan AS so_tien_con_lai,
             kh.ten_khach_hang, 
-            nv.ten_nhan_vien,
-            COALESCE(SUM(ct.tong_gia_ban), 0) as tam_tinh_tien_hang,
-            -- Tính luôn tổng thanh toán dự kiến để hiển thị ra list
-            (COALESCE(SUM(ct.tong_gia_ban), 0) * 1.115) as tong_thanh_toan_du_kien
+            nv.ten_nhan_vien
         FROM DonHangBan dhb
         JOIN KhachHang kh ON dhb.id_khach_hang = kh.id
         JOIN NhanVien nv ON dhb.id_nhan_vien = nv.id
-        LEFT JOIN ChiTietDonHangBan ct ON dhb.id = ct.id_don_hang_ban
     """
     conditions = []
     params = []
@@ -171,15 +413,113 @@ def get_all_donhangban(customer_id=None, staff_id=None, status=None):
     if conditions:
         base_sql += " WHERE " + " AND ".join(conditions)
 
-    # Group by để hàm SUM hoạt động đúng
-    base_sql += """
-        GROUP BY dhb.id, kh.ten_khach_hang, nv.ten_nhan_vien
-        ORDER BY dhb.ngay_dat_hang DESC, dhb.id DESC;
+    base_sql += " ORDER BY dhb.ngay_dat_hang DESC, dhb.id DESC;"
+    return base_sql, tuple(params)
+
+# --- Danh sách đơn hàng phân trang theo cursor (keyset trên ngay_dat_hang, id) ---
+
+# Các trường client được chọn qua tham số 'fields' (tên trường -> biểu thức SQL)
+DONHANGBAN_FIELDS = {
+    "id": "dhb.id",
+    "ngay_dat_hang": "dhb.ngay_dat_hang",
+    "id_khach_hang": "dhb.id_khach_hang",
+    "ten_khach_hang": "kh.ten_khach_hang",
+    "id_nhan_vien": "dhb.id_nhan_vien",
+    "ten_nhan_vien": "nv.ten_nhan_vien",
+    "dia_chi_giao_hang": "dhb.dia_chi_giao_hang",
+    "ngay_giao_hang_du_kien": "dhb.ngay_giao_hang_du_kien",
+    "ngay_giao_hang_thuc_te": "dhb.ngay_giao_hang_thuc_te",
+    "phuong_thuc_thanh_toan": "dhb.phuong_thuc_thanh_toan",
+    "trang_thai_don_hang": "dhb.trang_thai_don_hang",
+    "trang_thai_thanh_toan": "dhb.trang_thai_thanh_toan",
+    "ghi_chu_don_hang": "dhb.ghi_chu_don_hang",
+    "so_dong_hang": "dhb.so_dong_hang",
+    "tam_tinh_tien_hang": "dhb.tam_tinh_tien_hang",
+    "thue_vat": "dhb.thue_vat",
+    "thue_hkd": "dhb.thue_hkd",
+    "tong_thanh_toan_du_kien": "dhb.tong_thanh_toan_du_kien",
+    "so_tien_da_thanh_toan": "dhb.so_tien_da_thanh_toan",
+    "so_tien_con_lai": "dhb.tam_tinh_tien_hang - dhb.so_tien_da_thanh_toan",
+}
+DONHANGBAN_PAGE_KEYS = ("ngay_dat_hang", "id")
+DONHANGBAN_SORT_COLUMNS = [("dhb.ngay_dat_hang", "ngay_dat_hang"), ("dhb.id", "id")]
+
+
+def _build_page_sql(limit=None, cursor=None, fields=None, customer_id=None, staff_id=None, status=None,
+                    date_from_str=None, date_to_str=None):
+    """
+    Xây dựng câu SELECT một trang đơn hàng (mới nhất trước).
+    Ném ValueError nếu cursor, fields hoặc ngày không hợp lệ.
+    Trả về (sql, params, limit).
+    """
+    columns = pagination.parse_fields(fields, DONHANGBAN_FIELDS, DONHANGBAN_PAGE_KEYS)
+    conditions = []
+    params = []
+
+    if customer_id:
+        conditions.append("dhb.id_khach_hang = %s")
+        params.append(customer_id)
+    if staff_id:
+        conditions.append("dhb.id_nhan_vien = %s")
+        params.append(staff_id)
+    if status:
+        conditions.append("dhb.trang_thai_don_hang = %s")
+        params.append(status)
+    # Khoảng nửa mở theo giờ cửa hàng; date_to tính trọn ngày: < 00:00 ngày hôm sau
+    tu_luc, den_truoc = shop_day_range(date.fromisoformat(date_from_str) if date_from_str else None,
+                                       date.fromisoformat(date_to_str) if date_to_str else None)
+    if tu_luc:
+        conditions.append("dhb.ngay_dat_hang >= %s")
+        params.append(tu_luc)
+    if den_truoc:
+        conditions.append("dhb.ngay_dat_hang < %s")
+        params.append(den_truoc)
+
+    select_sql = f"""
+        SELECT {', '.join(columns)}
+        FROM DonHangBan dhb
+        JOIN KhachHang kh ON dhb.id_khach_hang = kh.id
+        JOIN NhanVien nv ON dhb.id_nhan_vien = nv.id
+    """
+    sql, params, _, _, limit = pagination.build_page_sql(select_sql, conditions, params, DONHANGBAN_SORT_COLUMNS,
+                                                         limit, cursor, descending=True)
+    return sql, params, limit
+
+
+def get_donhangban_page(limit=None, cursor=None, fields=None, customer_id=None, staff_id=None, status=None,
+                        date_from_str=None, date_to_str=None):
+    """
+    Lấy một trang danh sách đơn hàng (mới nhất trước).
+    Trả về {"data": [...], "next_cursor": "..." hoặc None}, hoặc None nếu lỗi CSDL.
+    Ném ValueError nếu cursor/fields/ngày không hợp lệ.
     """
+    sql, params, limit = _build_page_sql(limit, cursor, fields, customer_id, staff_id, status,
+                                         date_from_str, date_to_str)
+    conn = get_db_connection()
+    if not conn: return None
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(sql, params)
+            rows, next_cursor = pagination.build_page([dict(r) for r in cur.fetchall()], limit, DONHANGBAN_PAGE_KEYS)
+            return {"data": rows, "next_cursor": next_cursor}
+    except psycopg2.Error as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return None
+    finally:
+        close_db_connection(conn)
+
+def get_all_donhangban(customer_id=None, staff_id=None, status=None):
+    """
+    Lấy danh sách đơn hàng kèm tổng tiền (tam_tinh_tien_hang, tong_thanh_toan_du_kien)
+    đã được trigger lưu sẵn trên DonHangBan.
+    """
+    conn = get_db_connection()
+    if not conn: return None
 
+    sql, params = _build_get_all_sql(customer_id, staff_id, status)
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-            cur.execute(base_sql, tuple(params))
+            cur.execute(sql, params)
             return [dict(row) for row in cur.fetchall()]
     except psycopg2.Error as e:
         print(f"Lỗi: {e}")
@@ -193,32 +533,213 @@ def update_donhangban_status(id_don_hang_ban, new_trang_thai_don_hang,
     """Cập nhật trạng thái (giữ nguyên logic cũ)."""
     conn = get_db_connection()
     if not conn: return False
-    # ... (Giữ nguyên phần update trạng thái như code cũ của bạn)
     # Vì logic trừ kho đã nằm ở Trigger DB nên không cần sửa gì ở đây
-    update_fields = ["trang_thai_don_hang = %s"]
-    params = [new_trang_thai_don_hang]
-
-    if new_trang_thai_thanh_toan:
-        update_fields.append("trang_thai_thanh_toan = %s")
-        params.append(new_trang_thai_thanh_toan)
-
-    if ngay_giao_hang_thuc_te_str:
-        try:
-            ngay_giao_thuc_te = date.fromisoformat(ngay_giao_hang_thuc_te_str)
-            update_fields.append("ngay_giao_hang_thuc_te = %s")
-            params.append(ngay_giao_thuc_te)
-        except ValueError: pass
-
-    params.append(id_don_hang_ban)
-    sql = f"UPDATE DonHangBan SET {', '.join(update_fields)} WHERE id = %s;"
+    sql, params = _build_update_status_sql(id_don_hang_ban, new_trang_thai_don_hang,
+                                           new_trang_thai_thanh_toan, ngay_giao_hang_thuc_te_str)
 
     try:
         with conn.cursor() as cur:
-            cur.execute(sql, tuple(params))
+            cur.execute(sql, params)
             if cur.rowcount == 0: return False
             conn.commit()
             return True
     except psycopg2.Error:
         return False
     finally:
-        close_db_connection(conn)
\ No newline at end of file
+        close_db_connection(conn)
+
+
+# =====================================================================
+# PHIÊN BẢN BẤT ĐỒNG BỘ (ASYNC) CHO CÁC ENDPOINT BÁN HÀNG
+# Dùng pool psycopg 3 trong be/db_connection_async.py để không chặn event loop.
+# Logic và kết quả trả về giống hệt các hàm đồng bộ ở trên.
+# =====================================================================
+
+async def create_donhangban_async(id_nhan_vien, id_khach_hang, dia_chi_giao_hang,
+                                  ngay_dat_hang_str=None,
+                                  phuong_thuc_thanh_toan='Tiền mặt',
+                                  trang_thai_don_hang='Chờ xác nhận',
+                                  trang_thai_thanh_toan='Chưa thanh toán',
+                                  ghi_chu_don_hang=None):
+    """Tạo một Đơn Hàng Bán mới (async)."""
+    try: ngay_dat_hang = _parse_ngay(ngay_dat_hang_str)
+    except ValueError: return None
+
+    try:
+        async with get_async_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(SQL_INSERT_DON_HANG, (id_nhan_vien, id_khach_hang, dia_chi_giao_hang, ngay_dat_hang,
+                                                        phuong_thuc_thanh_toan, trang_thai_don_hang,
+                                                        trang_thai_thanh_toan, ghi_chu_don_hang))
+                return (await cur.fetchone())[0]
+    except psycopg.Error as e:
+        print(f"Lỗi CSDL: {e}", file=sys.stderr)
+        return None
+
+async def add_item_to_donhangban_async(id_don_hang_ban, id_san_pham, so_luong, gia_ban_niem_yet_don_vi, giam_gia,
+                                       ghi_chu_item=None):
+    """Thêm sản phẩm vào đơn hàng (async, Trigger sẽ tự tính giá vốn FIFO)."""
+    try:
+        async with get_async_connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                # Check tồn kho
+                await cur.execute(SQL_KHOA_SAN_PHAM, (id_san_pham,))
+                product = await cur.fetchone()
+                if not product or product['so_luong_ton_kho'] < so_luong:
+                    return None
+                if gia_ban_niem_yet_don_vi is None:
+                    gia_ban_niem_yet_don_vi = product['gia_ban_hien_tai']
+
+                await cur.execute(SQL_INSERT_CHI_TIET, (id_don_hang_ban, id_san_pham, so_luong,
+                                                        gia_ban_niem_yet_don_vi, giam_gia, ghi_chu_item))
+                return (await cur.fetchone())['id']
+    except psycopg.Error as e:
+        print(f"Lỗi CSDL: {e}", file=sys.stderr)
+        return None
+
+async def create_donhangban_with_items_async(id_nhan_vien, id_khach_hang, dia_chi_giao_hang, items,
+                                             ngay_dat_hang_str=None,
+                                             phuong_thuc_thanh_toan='Tiền mặt',
+                                             trang_thai_don_hang='Chờ xác nhận',
+                                             trang_thai_thanh_toan='Chưa thanh toán',
+                                             ghi_chu_don_hang=None):
+    """Tạo đơn hàng kèm toàn bộ sản phẩm trong một giao dịch (async). Trả về hóa đơn hoặc None."""
+    try:
+        ngay_dat_hang = _parse_ngay(ngay_dat_hang_str)
+        items = _chuan_hoa_items(items)
+    except ValueError as e:
+        print(f"Lỗi dữ liệu: {e}", file=sys.stderr)
+        return None
+
+    try:
+        async with get_async_connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(SQL_KHOA_NHIEU_SAN_PHAM, ([item['id_san_pham'] for item in items],))
+                products = await cur.fetchall()
+                loi = _kiem_tra_ton_kho(products, items)
+                if loi:
+                    print(f"Lỗi tồn kho: {loi}", file=sys.stderr)
+                    await conn.rollback()
+                    return None
+                items = _dien_gia_niem_yet(products, items)
+
+                await cur.execute(SQL_INSERT_DON_HANG, (id_nhan_vien, id_khach_hang, dia_chi_giao_hang, ngay_dat_hang,
+                                                        phuong_thuc_thanh_toan, trang_thai_don_hang,
+                                                        trang_thai_thanh_toan, ghi_chu_don_hang))
+                new_order_id = (await cur.fetchone())['id']
+                await cur.execute(*_build_insert_chi_tiet_nhieu_dong_sql(new_order_id, items))
+
+                await cur.execute(SQL_THONG_TIN_DON_HANG, (new_order_id,))
+                order_info = await cur.fetchone()
+                await cur.execute(SQL_CHI_TIET_DON_HANG, (new_order_id,))
+                order_info['chi_tiet_san_pham'] = await cur.fetchall()
+                order_info['financial_calc'] = _tinh_financial_calc(order_info['chi_tiet_san_pham'])
+                return order_info
+    except psycopg.Error as e:
+        print(f"Lỗi CSDL: {e}", file=sys.stderr)
+        return None
+
+async def get_chitietdonhangban_async(id_don_hang_ban):
+    """Lấy chi tiết đơn hàng kèm tính thuế (async)."""
+    try:
+        async with get_async_connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(SQL_THONG_TIN_DON_HANG, (id_don_hang_ban,))
+                order_info = await cur.fetchone()
+                if not order_info: return None
+
+                await cur.execute(SQL_CHI_TIET_DON_HANG, (id_don_hang_ban,))
+                items = await cur.fetchall()
+                order_info['chi_tiet_san_pham'] = items
+                order_info['financial_calc'] = _tinh_financial_calc(items)
+                return order_info
+    except psycopg.Error as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return None
+
+async def get_phanbolonhap_async(id_don_hang_ban):
+    """Lấy phân bổ lô nhập FIFO của đơn hàng (async)."""
+    try:
+        async with get_async_connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(SQL_PHAN_BO_LO_NHAP, (id_don_hang_ban,))
+                return await cur.fetchall()
+    except psycopg.Error as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return None
+
+async def get_all_donhangban_async(customer_id=None, staff_id=None, status=None):
+    """Lấy danh sách đơn hàng kèm tổng tiền (async)."""
+    sql, params = _build_get_all_sql(customer_id, staff_id, status)
+    try:
+        async with get_async_connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(sql, params)
+                return await cur.fetchall()
+    except psycopg.Error as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return None
+
+async def get_donhangban_page_async(limit=None, cursor=None, fields=None, customer_id=None, staff_id=None,
+                                    status=None, date_from_str=None, date_to_str=None):
+    """Lấy một trang danh sách đơn hàng (async). Ném ValueError nếu tham số không hợp lệ."""
+    sql, params, limit = _build_page_sql(limit, cursor, fields, customer_id, staff_id, status,
+                                         date_from_str, date_to_str)
+    try:
+        async with get_async_connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(sql, params)
+                rows, next_cursor = pagination.build_page(await cur.fetchall(), limit, DONHANGBAN_PAGE_KEYS)
+                return {"data": rows, "next_cursor": next_cursor}
+    except psycopg.Error as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return None
+
+async def add_payment_to_donhangban_async(id_don_hang_ban, so_tien, phuong_thuc_thanh_toan=None,
+                                         id_nhan_vien=None, ghi_chu=None):
+    """Ghi nhận một lần thanh toán cho đơn hàng (async)."""
+    try:
+        async with get_async_connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(SQL_INSERT_THANH_TOAN, (so_tien, phuong_thuc_thanh_toan, id_nhan_vien, ghi_chu,
+                                                          id_don_hang_ban))
+                payment = await cur.fetchone()
+                if not payment:
+                    return None
+                await cur.execute(SQL_SO_DU_DON_HANG, (id_don_hang_ban,))
+                result = await cur.fetchone()
+                result['id_thanh_toan'] = payment['id']
+                return result
+    except psycopg.Error as e:
+        print(f"Lỗi khi ghi nhận thanh toán: {e}", file=sys.stderr)
+        return None
+
+async def get_payments_of_donhangban_async(id_don_hang_ban):
+    """Số dư và lịch sử thanh toán của đơn hàng (async)."""
+    try:
+        async with get_async_connection() as conn:
+            async with conn.cursor(row_factory=dict_row) as cur:
+                await cur.execute(SQL_SO_DU_DON_HANG, (id_don_hang_ban,))
+                result = await cur.fetchone()
+                if not result: return None
+                await cur.execute(SQL_THANH_TOAN_DON_HANG, (id_don_hang_ban,))
+                result['thanh_toan'] = await cur.fetchall()
+                return result
+    except psycopg.Error as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return None
+
+async def update_donhangban_status_async(id_don_hang_ban, new_trang_thai_don_hang,
+                                         new_trang_thai_thanh_toan=None,
+                                         ngay_giao_hang_thuc_te_str=None):
+    """Cập nhật trạng thái đơn hàng (async)."""
+    sql, params = _build_update_status_sql(id_don_hang_ban, new_trang_thai_don_hang,
+                                           new_trang_thai_thanh_toan, ngay_giao_hang_thuc_te_str)
+    try:
+        async with get_async_connection() as conn:
+            async with conn.cursor() as cur:
+                await cur.execute(sql, params)
+                return cur.rowcount > 0
+    except psycopg.Error as e:
+        print(f"Lỗi CSDL: {e}", file=sys.stderr)
+        return False
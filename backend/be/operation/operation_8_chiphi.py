@@ -4,7 +4,7 @@ import psycopg2
 import psycopg2.extras
 from datetime import date
 import sys
-from be.db_connection import get_db_connection, close_db_connection
+from be.db_connection import get_db_connection, close_db_connection, execute_page_query
 
 
 def add_chiphi(loai_chi_phi: str, so_tien: int, ngay_chi_phi_str: str = None,
@@ -49,19 +49,15 @@ def add_chiphi(loai_chi_phi: str, so_tien: int, ngay_chi_phi_str: str = None,
     return new_chiphi_id
 
 
-def get_chiphi(loai_filter: str = None, date_from_str: str = None, date_to_str: str = None):
-    """
-    Lấy danh sách các khoản chi phí, có thể lọc.
-    """
-    conn = get_db_connection()
-    if not conn:
-        return None
-
-    base_sql = """
+SQL_DANH_SACH_CHI_PHI = """
         SELECT cp.*, nv.ten_nhan_vien 
         FROM ChiPhi cp
         LEFT JOIN NhanVien nv ON cp.id_nhan_vien = nv.id
     """
+
+
+def _build_chiphi_filters(loai_filter: str = None, date_from_str: str = None, date_to_str: str = None):
+    """Xây dựng điều kiện lọc chi phí (bỏ qua ngày sai định dạng), trả về (conditions, params)."""
     conditions = []
     params = []
 
@@ -70,17 +66,31 @@ def get_chiphi(loai_filter: str = None, date_from_str: str = None, date_to_str:
         params.append(f"%{loai_filter}%")
     if date_from_str:
         try:
-            conditions.append("cp.ngay_chi_phi >= %s")
             params.append(date.fromisoformat(date_from_str))
+            conditions.append("cp.ngay_chi_phi >= %s")
         except (ValueError, TypeError):
             print(f"Cảnh báo: Ngày bắt đầu '{date_from_str}' sai định dạng, bỏ qua.", file=sys.stderr)
     if date_to_str:
         try:
-            conditions.append("cp.ngay_chi_phi <= %s")
             params.append(date.fromisoformat(date_to_str))
+            conditions.append("cp.ngay_chi_phi <= %s")
         except (ValueError, TypeError):
             print(f"Cảnh báo: Ngày kết thúc '{date_to_str}' sai định dạng, bỏ qua.", file=sys.stderr)
 
+    return conditions, params
+
+
+def get_chiphi(loai_filter: str = None, date_from_str: str = None, date_to_str: str = None):
+    """
+    Lấy danh sách các khoản chi phí, có thể lọc.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    base_sql = SQL_DANH_SACH_CHI_PHI
+    conditions, params = _build_chiphi_filters(loai_filter, date_from_str, date_to_str)
+
     if conditions:
         base_sql += " WHERE " + " AND ".join(conditions)
 
@@ -97,6 +107,18 @@ def get_chiphi(loai_filter: str = None, date_from_str: str = None, date_to_str:
         close_db_connection(conn)
 
 
+def get_chiphi_page(loai_filter: str = None, date_from_str: str = None, date_to_str: str = None,
+                    limit: int = None, cursor: str = None, include_total: bool = False):
+    """
+    Lấy một trang danh sách chi phí (mới nhất trước), dùng cursor của trang trước để lấy trang tiếp.
+    Ném ValueError nếu cursor không hợp lệ.
+    """
+    conditions, params = _build_chiphi_filters(loai_filter, date_from_str, date_to_str)
+    return execute_page_query(SQL_DANH_SACH_CHI_PHI, conditions, params,
+                              [("cp.ngay_chi_phi", "ngay_chi_phi"), ("cp.id", "id")],
+                              limit, cursor, include_total, descending=True)
+
+
 def get_chiphi_by_id(chiphi_id: int):
     """
     Lấy thông tin một khoản chi phí theo ID.
@@ -4,7 +4,7 @@ import psycopg2
 import psycopg2.extras
 from datetime import date
 import sys
-from be.db_connection import get_db_connection, close_db_connection
+from be.db_connection import get_db_connection, close_db_connection, shop_today
 
 
 def add_lichsugianiemyet(id_san_pham: int, gia_niem_yet: int, ngay_ap_dung_str: str, ghi_chu: str = None):
@@ -137,3 +137,31 @@ def update_lichsugianiemyet(history_id: int, **kwargs):
         return False
     finally:
         close_db_connection(conn)
+
+def apply_due_prices(ngay_str: str = None):
+    """
+    Áp dụng các mức giá đã tới ngày hiệu lực vào SanPham.gia_ban_hien_tai
+    (gọi hằng ngày sau nửa đêm; gọi lại nhiều lần cũng không sai).
+    Trả về số sản phẩm đã đổi giá hoặc None nếu lỗi.
+    """
+    try:
+        ngay = date.fromisoformat(ngay_str) if ngay_str else shop_today()
+    except ValueError:
+        print(f"Lỗi: Định dạng ngày '{ngay_str}' không hợp lệ. Vui lòng dùng 'YYYY-MM-DD'.", file=sys.stderr)
+        return None
+
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT func_ap_dung_gia_den_han(%s);", (ngay,))
+            so_san_pham = cur.fetchone()[0]
+            conn.commit()
+            return so_san_pham
+    except psycopg2.Error as e:
+        print(f"Lỗi khi áp dụng giá đến hạn: {e}", file=sys.stderr)
+        conn.rollback()
+        return None
+    finally:
+        close_db_connection(conn)
@@ -0,0 +1,135 @@
+# be/pagination.py
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+# --- Phân trang theo khóa (keyset / cursor) ---
+# Trang sau được lấy bằng điều kiện "(cột sắp xếp, id) < giá trị của dòng cuối trang trước"
+# thay vì OFFSET, nên chi phí mỗi trang không phụ thuộc vào độ dài lịch sử.
+# Cursor là chuỗi base64 (đối với client là chuỗi "mờ", chỉ việc gửi lại nguyên vẹn).
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def clamp_limit(limit):
+    """Giới hạn kích thước trang trong khoảng [1, MAX_LIMIT]."""
+    if not limit:
+        return DEFAULT_LIMIT
+    return max(1, min(int(limit), MAX_LIMIT))
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"n": str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        if "n" in value:
+            return Decimal(value["n"])
+        raise ValueError("Cursor không hợp lệ.")
+    return value
+
+
+def encode_cursor(values):
+    """Mã hóa danh sách giá trị khóa sắp xếp của dòng cuối trang thành cursor."""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor, so_gia_tri):
+    """
+    Giải mã cursor thành danh sách giá trị khóa.
+    Ném ValueError nếu cursor sai định dạng hoặc không đủ `so_gia_tri` phần tử.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8"))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError("Cursor không hợp lệ.") from e
+    if not isinstance(values, list) or len(values) != so_gia_tri:
+        raise ValueError("Cursor không hợp lệ.")
+    return [_decode_value(v) for v in values]
+
+
+def build_keyset_condition(columns, values, descending=True):
+    """
+    Điều kiện lấy các dòng nằm SAU cursor theo thứ tự sắp xếp `columns`.
+    Dùng so sánh theo bộ (row comparison) để PostgreSQL quét thẳng trên index tổng hợp.
+    Trả về (sql, params).
+    """
+    toan_tu = "<" if descending else ">"
+    placeholders = ", ".join(["%s"] * len(columns))
+    return f"({', '.join(columns)}) {toan_tu} ({placeholders})", list(values)
+
+
+def parse_fields(fields, allowed_fields, required_fields):
+    """
+    Chọn các cột trả về (projection) từ chuỗi "a,b,c".
+    - allowed_fields: dict {tên trường: biểu thức SQL}
+    - required_fields: các trường luôn được trả về (cần cho cursor)
+    Ném ValueError nếu có trường không được phép. Trả về danh sách biểu thức SQL "expr AS ten".
+    """
+    if not fields:
+        selected = list(allowed_fields)
+    else:
+        selected = [f.strip() for f in fields.split(",") if f.strip()]
+        khong_hop_le = [f for f in selected if f not in allowed_fields]
+        if khong_hop_le:
+            raise ValueError(f"Trường không hợp lệ: {', '.join(khong_hop_le)}")
+        selected = list(required_fields) + [f for f in selected if f not in required_fields]
+    return [f"{allowed_fields[f]} AS {f}" for f in selected]
+
+
+def build_page(rows, limit, key_fields):
+    """
+    Cắt kết quả truy vấn (đã lấy limit + 1 dòng) thành một trang.
+    Trả về (danh sách dòng, next_cursor hoặc None nếu là trang cuối).
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([last[k] for k in key_fields])
+
+
+def build_page_sql(select_sql, conditions, params, sort_columns, limit=None, cursor=None, descending=False):
+    """
+    Ghép câu truy vấn một trang từ câu SELECT gốc (chưa có WHERE/ORDER BY).
+    - conditions / params: các điều kiện lọc và tham số tương ứng
+    - sort_columns: danh sách (biểu thức SQL, tên trường trong kết quả) xác định thứ tự ổn định;
+      phần tử cuối phải là khóa duy nhất (thường là id) để không bỏ sót / lặp dòng giữa các trang.
+    Ném ValueError nếu cursor không hợp lệ.
+    Trả về (sql trang, params trang, sql đếm tổng, params đếm tổng, limit).
+    """
+    limit = clamp_limit(limit)
+    conditions = list(conditions)
+    params = list(params)
+    where_sql = " WHERE " + " AND ".join(conditions) if conditions else ""
+    count_sql = f"SELECT COUNT(*) AS total FROM ({select_sql}{where_sql}) AS t;"
+    count_params = tuple(params)
+
+    if cursor:
+        values = decode_cursor(cursor, len(sort_columns))
+        keyset_sql, keyset_params = build_keyset_condition([c for c, _ in sort_columns], values, descending)
+        conditions.append(keyset_sql)
+        params.extend(keyset_params)
+        where_sql = " WHERE " + " AND ".join(conditions)
+
+    huong = "DESC" if descending else "ASC"
+    order_sql = ", ".join(f"{c} {huong}" for c, _ in sort_columns)
+    # Lấy dư 1 dòng để biết còn trang sau hay không
+    sql = f"{select_sql}{where_sql} ORDER BY {order_sql} LIMIT %s;"
+    params.append(limit + 1)
+    return sql, tuple(params), count_sql, count_params, limit
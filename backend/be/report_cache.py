@@ -0,0 +1,173 @@
+# be/report_cache.py
+
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+from be import db_notify
+from be.db_connection import shop_today
+
+# --- Bộ nhớ đệm kết quả báo cáo ---
+# Khóa: (tên báo cáo, ngày bắt đầu, ngày kết thúc đã quy đổi từ kỳ báo cáo, các tham số khác).
+# - Khoảng ngày đã đóng (kết thúc trước hôm nay): giữ tới khi bị vô hiệu hóa hoặc bị đẩy ra (LRU).
+# - Khoảng ngày chạm tới hôm nay (hoặc tương lai): chỉ giữ REPORT_CACHE_TTL_SECONDS giây.
+# Đơn hàng / chi phí ghi lùi ngày làm đổi số liệu của kỳ đã đóng: trigger trên các bảng tổng hợp
+# và ChiPhi gửi NOTIFY 'report_data_changed' (012_create_triggers.sql, section 7) với ngày bị đổi,
+# các kết quả có khoảng ngày chứa ngày đó bị xóa. Khi không có kết nối LISTEN thì không dùng bộ đệm.
+
+KENH_THONG_BAO = "report_data_changed"
+REPORT_CACHE_TTL_SECONDS = float(os.getenv("REPORT_CACHE_TTL_SECONDS", "60"))
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "256"))
+
+_entries = OrderedDict()  # khóa -> (kết quả, hết hạn lúc (time.monotonic) hoặc None, phụ thuộc từ ngày, đến ngày)
+_lock = threading.Lock()  # Router báo cáo là hàm đồng bộ (chạy trong threadpool), NOTIFY đến từ event loop
+_generation = 0  # Tăng mỗi lần vô hiệu hóa; kết quả tính xong sau một lần vô hiệu hóa thì không được lưu
+
+_stats = {"so_lan_trung": 0, "so_lan_truot": 0, "so_lan_bo_qua": 0, "so_lan_vo_hieu_hoa": 0}
+
+
+def resolve_period(period, start_date_str=None, end_date_str=None):
+    """
+    Quy đổi kỳ báo cáo thành (ngày bắt đầu, ngày kết thúc), cùng quy tắc với _get_date_range
+    trong các module báo cáo. Ném ValueError nếu tham số không hợp lệ.
+    """
+    today = shop_today()
+    if period == 'yesterday':
+        return today - timedelta(days=1), today - timedelta(days=1)
+    if period == 'last_week':
+        end_date = today - timedelta(days=today.weekday() + 1)
+        return end_date - timedelta(days=6), end_date
+    if period == 'last_month':
+        end_date = today.replace(day=1) - timedelta(days=1)
+        return end_date.replace(day=1), end_date
+    if period == 'custom':
+        if not start_date_str or not end_date_str:
+            raise ValueError("Với period='custom', cần cung cấp ngày bắt đầu và kết thúc.")
+        start_date = date.fromisoformat(start_date_str)
+        end_date = date.fromisoformat(end_date_str)
+        if start_date > end_date:
+            raise ValueError("Ngày bắt đầu không được lớn hơn ngày kết thúc.")
+        return start_date, end_date
+    raise ValueError(f"Kỳ báo cáo '{period}' không hợp lệ.")
+
+
+def get_or_compute(ten_bao_cao, start_date, end_date, params, compute, phu_thuoc_tu=None):
+    """
+    Trả về kết quả báo cáo từ bộ đệm, hoặc gọi compute() và lưu lại.
+
+    - params: tuple các tham số khác của báo cáo (phần của khóa).
+    - phu_thuoc_tu: ngày sớm nhất mà dữ liệu của nó ảnh hưởng tới kết quả, nếu sớm hơn start_date
+      (VD: khách hàng mới/quay lại phụ thuộc lần mua đầu tiên trong toàn bộ lịch sử -> date.min).
+    - compute() trả về None (lỗi) thì không lưu.
+    Kết quả trả về dùng chung với bộ đệm: chỉ đọc, không sửa.
+    """
+    if not _dong_bo.is_ready():
+        _stats["so_lan_bo_qua"] += 1
+        return compute()
+
+    khoa = (ten_bao_cao, start_date, end_date, tuple(params))
+    now = time.monotonic()
+    with _lock:
+        entry = _entries.get(khoa)
+        if entry is not None and (entry[1] is None or entry[1] > now):
+            _entries.move_to_end(khoa)
+            _stats["so_lan_trung"] += 1
+            return entry[0]
+        _stats["so_lan_truot"] += 1
+        the_he = _generation
+
+    ket_qua = compute()
+    if ket_qua is None:
+        return None
+
+    # Kỳ đã đóng thì không còn đơn mới nào rơi vào nữa (trừ ghi lùi ngày -> NOTIFY)
+    het_han = None if end_date < shop_today() else time.monotonic() + REPORT_CACHE_TTL_SECONDS
+    with _lock:
+        if _dong_bo.is_ready() and the_he == _generation:
+            _entries[khoa] = (ket_qua, het_han, phu_thuoc_tu or start_date, end_date)
+            _entries.move_to_end(khoa)
+            while len(_entries) > REPORT_CACHE_MAX_ENTRIES:
+                _entries.popitem(last=False)
+    return ket_qua
+
+
+def cached_report(ten_bao_cao, period, start_date_str, end_date_str, params, compute, phu_thuoc_tu=None,
+                  tinh_trong_bo_nho=None):
+    """
+    Quy đổi kỳ báo cáo thành khoảng ngày rồi lấy kết quả qua get_or_compute.
+    compute(tu_ngay, den_ngay) nhận khoảng ngày đã quy đổi (chuỗi YYYY-MM-DD), để báo cáo tính đúng
+    khoảng ngày của khóa. Trả về None nếu kỳ báo cáo không hợp lệ hoặc báo cáo lỗi.
+    tinh_trong_bo_nho(tu_ngay, den_ngay): nhận date, tính từ be/report_engine.py; kết quả khác None
+    luôn mới nên được trả về ngay, không lưu bộ đệm. None (bộ máy chưa sẵn sàng) -> bộ đệm / SQL như cũ.
+    """
+    try:
+        tu_ngay, den_ngay = resolve_period(period, start_date_str, end_date_str)
+    except ValueError as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return None
+    if tinh_trong_bo_nho is not None:
+        ket_qua = tinh_trong_bo_nho(tu_ngay, den_ngay)
+        if ket_qua is not None:
+            return ket_qua
+    return get_or_compute(ten_bao_cao, tu_ngay, den_ngay, params,
+                          lambda: compute(tu_ngay.isoformat(), den_ngay.isoformat()),
+                          phu_thuoc_tu=phu_thuoc_tu)
+
+
+def invalidate(ngay=None):
+    """Xóa các kết quả có khoảng ngày (kể cả phần phụ thuộc) chứa `ngay`; ngay=None thì xóa tất cả."""
+    global _generation
+    with _lock:
+        _generation += 1
+        _stats["so_lan_vo_hieu_hoa"] += 1
+        if ngay is None:
+            _entries.clear()
+            return
+        for khoa in [k for k, e in _entries.items() if e[2] <= ngay <= e[3]]:
+            del _entries[khoa]
+
+
+def _doc_ngay(payload):
+    ngay = json.loads(payload).get("ngay")
+    return date.fromisoformat(ngay) if ngay else None
+
+
+async def _xoa_toan_bo():
+    # Các thông báo trong lúc mất kết nối đã bị lỡ -> bỏ toàn bộ kết quả cũ
+    invalidate()
+
+
+async def _xoa_cac_ngay(cac_ngay):
+    for ngay in cac_ngay:
+        invalidate(ngay)
+
+
+# Vô hiệu hóa không đọc DB nên làm ngay cho từng thông báo (không gộp)
+_dong_bo = db_notify.NotifyMirror("bộ đệm báo cáo", KENH_THONG_BAO, _xoa_toan_bo, _xoa_cac_ngay, _doc_ngay,
+                                  on_stale=invalidate, gop=False)
+
+
+async def start_report_cache():
+    """Bắt đầu LISTEN; bộ đệm chỉ được dùng khi kết nối LISTEN đang hoạt động."""
+    _dong_bo.start()
+
+
+async def stop_report_cache():
+    await _dong_bo.stop()
+
+
+def get_report_cache_stats():
+    """Thống kê bộ đệm báo cáo (số kết quả đang giữ, trúng / trượt / bỏ qua, số lần vô hiệu hóa)."""
+    with _lock:
+        so_ket_qua = len(_entries)
+    tong = _stats["so_lan_trung"] + _stats["so_lan_truot"]
+    return {
+        "so_ket_qua": so_ket_qua,
+        "ti_le_trung": round(_stats["so_lan_trung"] / tong, 4) if tong else None,
+        **_stats,
+        **_dong_bo.get_stats(),
+    }
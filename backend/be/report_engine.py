@@ -0,0 +1,330 @@
+# be/report_engine.py
+
+import json
+import os
+import time
+from datetime import date
+from decimal import Decimal
+
+from be import db_notify
+from be.db_connection_async import get_async_connection
+from be.report_cache import KENH_THONG_BAO
+from be.reports.operation_10_doanhthuloinhuan import TAX_RATE
+
+try:
+    import numpy as np  # Chỉ cần cho bộ máy báo cáo trong bộ nhớ
+except ImportError:
+    np = None
+
+# --- Bộ máy báo cáo trong bộ nhớ (tùy chọn, cần numpy và REPORT_ENGINE_ENABLED=1) ---
+# Mỗi worker giữ bản sao dạng cột (mảng numpy, sắp theo ngày) của hai bảng tổng hợp bán hàng theo ngày
+# (chỉ gồm đơn 'Hoàn tất') và tổng chi phí mỗi ngày. Các báo cáo số đơn, sản phẩm bán chạy, doanh thu /
+# lợi nhuận, khách hàng chi tiêu nhiều được tính bằng cắt khoảng ngày (searchsorted) + gộp nhóm vectơ hóa,
+# không truy vấn PostgreSQL -> dashboard có thể làm mới vài giây một lần.
+# Cùng kênh NOTIFY với be/report_cache.py: mỗi thông báo mang một ngày bị đổi (đơn hoàn tất / hủy, chi phí,
+# ghi lùi ngày) -> chỉ đọc lại các dòng của những ngày đó rồi ghép vào bản sao (ngày mới thì nối vào cuối).
+# Khi chưa sẵn sàng (tắt, chưa cài numpy, đang nạp, mất kết nối LISTEN, nạp lỗi và đang chờ nạp lại) các hàm
+# trả về None và router dùng đường cũ (bộ đệm kết quả + SQL). LISTEN / gộp thông báo / nạp lại khi lỗi
+# dùng chung db_notify.NotifyMirror với be/catalog_cache.py và be/report_cache.py.
+# Ngày lưu dạng số nguyên date.toordinal(); số lượng / tiền (NUMERIC, 3 chữ số lẻ) lưu dạng số nguyên x1000
+# để phép cộng chính xác như SUM của PostgreSQL.
+
+REPORT_ENGINE_ENABLED = os.getenv("REPORT_ENGINE_ENABLED", "0") == "1"
+KICH_THUOC_LO = 10000
+TY_LE = 3  # Số chữ số lẻ của các cột tiền / số lượng đã nhân lên
+
+_NGAY_GOC = "DATE '0001-01-01'"  # ngay - _NGAY_GOC + 1 = date.toordinal()
+
+# Tên bảng -> (câu SQL với {dieu_kien}, cột lọc theo ngày, tên các cột theo thứ tự SELECT)
+BANG_DU_LIEU = {
+    "ban_hang": (f"""
+        SELECT th.ngay - {_NGAY_GOC} + 1 AS ngay, th.id_san_pham,
+               (th.so_luong * 1000)::bigint AS so_luong, (th.doanh_thu * 1000)::bigint AS doanh_thu, th.so_don
+        FROM TongHopBanHangNgay th
+        {{dieu_kien}}
+    """, "th.ngay", ("ngay", "id_san_pham", "so_luong", "doanh_thu", "so_don")),
+    "don_hang": (f"""
+        SELECT th.ngay - {_NGAY_GOC} + 1 AS ngay, th.id_khach_hang, th.so_don,
+               (th.doanh_thu * 1000)::bigint AS doanh_thu, (th.gia_von * 1000)::bigint AS gia_von
+        FROM TongHopDonHangNgay th
+        {{dieu_kien}}
+    """, "th.ngay", ("ngay", "id_khach_hang", "so_don", "doanh_thu", "gia_von")),
+    "chi_phi": (f"""
+        SELECT ngay_chi_phi - {_NGAY_GOC} + 1 AS ngay, (SUM(so_tien) * 1000)::bigint AS so_tien
+        FROM ChiPhi
+        {{dieu_kien}}
+        GROUP BY ngay_chi_phi
+    """, "ngay_chi_phi", ("ngay", "so_tien")),
+}
+
+# Tên hiển thị, chỉ đọc cho các id có trong dữ liệu vừa nạp (đổi tên được cập nhật ở lần nạp ngày kế tiếp)
+SQL_TEN_SAN_PHAM = "SELECT id, ten_san_pham, ma_san_pham FROM SanPham WHERE id = ANY(%s)"
+SQL_TEN_KHACH_HANG = "SELECT id, ten_khach_hang FROM KhachHang WHERE id = ANY(%s)"
+
+_snapshot = None  # {"ban_hang": {cột: mảng}, "don_hang": {...}, "chi_phi": {...}}, thay nguyên khối khi cập nhật
+_san_pham = {}  # id sản phẩm -> (tên, mã)
+_khach_hang = {}  # id khách hàng -> tên
+
+_stats = {"so_lan_nap_toan_bo": 0, "so_lan_nap_theo_ngay": 0, "so_lan_tinh": 0, "lan_nap_cuoi": None}
+
+
+# --- Thao tác trên bảng cột ---
+
+def _thanh_bang(mang, cac_cot):
+    """Mảng 2 chiều (mỗi dòng một bản ghi) -> {tên cột: mảng 1 chiều liên tục}, sắp theo ngày."""
+    bang = {ten: np.ascontiguousarray(mang[:, i]) for i, ten in enumerate(cac_cot)}
+    thu_tu = np.argsort(bang["ngay"], kind="stable")
+    return {ten: cot[thu_tu] for ten, cot in bang.items()}
+
+
+def _thay_ngay(bang, cac_ngay, moi):
+    """Bỏ các dòng thuộc cac_ngay rồi thêm các dòng mới của những ngày đó, giữ thứ tự theo ngày."""
+    giu = ~np.isin(bang["ngay"], cac_ngay)
+    ket_qua = {ten: np.concatenate([cot[giu], moi[ten]]) for ten, cot in bang.items()}
+    so_dong_giu = int(giu.sum())
+    if so_dong_giu and len(moi["ngay"]) and moi["ngay"][0] < ket_qua["ngay"][so_dong_giu - 1]:
+        # Ghi lùi ngày: sắp lại (dữ liệu gần như đã sắp nên sắp ổn định rất nhanh)
+        thu_tu = np.argsort(ket_qua["ngay"], kind="stable")
+        ket_qua = {ten: cot[thu_tu] for ten, cot in ket_qua.items()}
+    return ket_qua
+
+
+def _trong_khoang(bang, tu_ngay, den_ngay):
+    """Các dòng có ngày trong [tu_ngay, den_ngay] (view, không sao chép)."""
+    dau = np.searchsorted(bang["ngay"], tu_ngay.toordinal(), side="left")
+    cuoi = np.searchsorted(bang["ngay"], den_ngay.toordinal(), side="right")
+    return {ten: cot[dau:cuoi] for ten, cot in bang.items()}
+
+
+def _gop_nhom(khoa, cot_tong=(), cot_lon_nhat=()):
+    """GROUP BY khoa: (các khóa, [SUM từng cột], [MAX từng cột]) bằng sắp xếp + reduceat."""
+    if len(khoa) == 0:
+        return khoa, [cot[:0] for cot in cot_tong], [cot[:0] for cot in cot_lon_nhat]
+    thu_tu = np.argsort(khoa, kind="stable")
+    khoa = khoa[thu_tu]
+    dau_nhom = np.flatnonzero(np.concatenate(([True], khoa[1:] != khoa[:-1])))
+    return (khoa[dau_nhom],
+            [np.add.reduceat(cot[thu_tu], dau_nhom) for cot in cot_tong],
+            [np.maximum.reduceat(cot[thu_tu], dau_nhom) for cot in cot_lon_nhat])
+
+
+def _theo_ngay(bang, cot, tu_ngay, den_ngay):
+    """SUM(cot) theo từng ngày của khoảng (ngày không có dòng = 0), như generate_series + LEFT JOIN."""
+    bang = _trong_khoang(bang, tu_ngay, den_ngay)
+    moc = tu_ngay.toordinal()
+    tong = np.zeros(den_ngay.toordinal() - moc + 1, dtype=np.int64)
+    np.add.at(tong, bang["ngay"] - moc, bang[cot])
+    return tong
+
+
+def _so(gia_tri):
+    """Số nguyên đã nhân 10^TY_LE -> Decimal (cùng kiểu với SUM của cột NUMERIC)."""
+    return Decimal(int(gia_tri)).scaleb(-TY_LE)
+
+
+def _lay_snapshot():
+    if not _dong_bo.is_ready():
+        return None
+    _stats["so_lan_tinh"] += 1
+    return _snapshot
+
+
+# --- Nạp dữ liệu ---
+
+async def _doc_mang(conn, sql, params, so_cot):
+    """Đọc kết quả (toàn số nguyên) theo lô bằng con trỏ phía máy chủ, trả về mảng 2 chiều int64."""
+    cac_lo = []
+    async with conn.cursor(name="bao_cao_trong_bo_nho") as cur:
+        await cur.execute(sql, params)
+        while True:
+            rows = await cur.fetchmany(KICH_THUOC_LO)
+            if not rows:
+                break
+            cac_lo.append(np.array(rows, dtype=np.int64))
+    return np.concatenate(cac_lo) if cac_lo else np.empty((0, so_cot), dtype=np.int64)
+
+
+async def _doc_cac_bang(conn, cac_ngay=None):
+    """Đọc cả ba bảng (cac_ngay=None: toàn bộ, ngược lại chỉ các ngày đó) thành bảng cột."""
+    ket_qua = {}
+    for ten, (sql, cot_ngay, cac_cot) in BANG_DU_LIEU.items():
+        if cac_ngay is None:
+            mang = await _doc_mang(conn, sql.format(dieu_kien=""), None, len(cac_cot))
+        else:
+            mang = await _doc_mang(conn, sql.format(dieu_kien=f"WHERE {cot_ngay} = ANY(%s)"),
+                                   (sorted(cac_ngay),), len(cac_cot))
+        ket_qua[ten] = _thanh_bang(mang, cac_cot)
+    return ket_qua
+
+
+async def _doc_ten(conn, bang):
+    """Tên sản phẩm / khách hàng xuất hiện trong các bảng vừa đọc."""
+    san_pham, khach_hang = {}, {}
+    async with conn.cursor() as cur:
+        ids = np.unique(bang["ban_hang"]["id_san_pham"]).tolist()
+        if ids:
+            await cur.execute(SQL_TEN_SAN_PHAM, (ids,))
+            san_pham = {row[0]: (row[1], row[2]) for row in await cur.fetchall()}
+        ids = np.unique(bang["don_hang"]["id_khach_hang"]).tolist()
+        if ids:
+            await cur.execute(SQL_TEN_KHACH_HANG, (ids,))
+            khach_hang = {row[0]: row[1] for row in await cur.fetchall()}
+    return san_pham, khach_hang
+
+
+async def reload_all():
+    """Nạp lại toàn bộ dữ liệu từ DB."""
+    global _snapshot
+    async with get_async_connection() as conn:
+        bang = await _doc_cac_bang(conn)
+        san_pham, khach_hang = await _doc_ten(conn, bang)
+    # Tên được ghi trước bản sao mới: người đọc không gặp id chưa có tên
+    _san_pham.update(san_pham)
+    _khach_hang.update(khach_hang)
+    _snapshot = bang
+    _stats["so_lan_nap_toan_bo"] += 1
+    _stats["lan_nap_cuoi"] = time.time()
+
+
+async def refresh_days(cac_ngay):
+    """Đọc lại dữ liệu của một số ngày và ghép vào bản sao trong bộ nhớ."""
+    global _snapshot
+    cac_ngay = set(cac_ngay)
+    if not cac_ngay or _snapshot is None:
+        return
+    async with get_async_connection() as conn:
+        moi = await _doc_cac_bang(conn, cac_ngay)
+        san_pham, khach_hang = await _doc_ten(conn, moi)
+    _san_pham.update(san_pham)
+    _khach_hang.update(khach_hang)
+    mang_ngay = np.array([ngay.toordinal() for ngay in cac_ngay], dtype=np.int64)
+    _snapshot = {ten: _thay_ngay(_snapshot[ten], mang_ngay, moi[ten]) for ten in _snapshot}
+    _stats["so_lan_nap_theo_ngay"] += 1
+    _stats["lan_nap_cuoi"] = time.time()
+
+
+def _doc_ngay(payload):
+    ngay = json.loads(payload).get("ngay")
+    return date.fromisoformat(ngay) if ngay else None
+
+
+# Thông báo có ngày -> chỉ đọc lại ngày đó (gộp các thông báo dồn dập); không có -> nạp toàn bộ
+_dong_bo = db_notify.NotifyMirror("bộ máy báo cáo trong bộ nhớ", KENH_THONG_BAO, reload_all, refresh_days,
+                                  _doc_ngay)
+
+
+def is_ready():
+    """Bộ máy có thể dùng để trả lời hay không."""
+    return _dong_bo.is_ready()
+
+
+async def start_report_engine():
+    """Bắt đầu LISTEN (nếu được bật và đã cài numpy); mỗi lần kết nối (lại) sẽ nạp lại toàn bộ."""
+    if np is None or not REPORT_ENGINE_ENABLED:
+        return
+    _dong_bo.start()
+
+
+async def stop_report_engine():
+    global _snapshot
+    await _dong_bo.stop()
+    _snapshot = None
+
+
+def get_report_engine_stats():
+    """Thống kê bộ máy báo cáo (số dòng, dung lượng mảng, số lần nạp, số thông báo)."""
+    snapshot = _snapshot or {}
+    return {
+        "bat": REPORT_ENGINE_ENABLED,
+        "co_numpy": np is not None,
+        "so_dong": {ten: len(bang["ngay"]) for ten, bang in snapshot.items()},
+        "so_byte": sum(cot.nbytes for bang in snapshot.values() for cot in bang.values()),
+        **_stats,
+        **_dong_bo.get_stats(),
+    }
+
+
+# --- Báo cáo (cùng kết quả với các hàm SQL ở be/reports; None nếu bộ máy chưa sẵn sàng) ---
+
+def get_order_count_report(tu_ngay: date, den_ngay: date):
+    """Số đơn 'Hoàn tất' theo từng ngày, như operation_11.get_order_count_report."""
+    snapshot = _lay_snapshot()
+    if snapshot is None:
+        return None
+    so_don = _theo_ngay(snapshot["don_hang"], "so_don", tu_ngay, den_ngay)
+    moc = tu_ngay.toordinal()
+    return [{"ky_bao_cao": date.fromordinal(moc + i), "so_luong_don_hang": int(n)} for i, n in enumerate(so_don)]
+
+
+def get_best_selling_products_report(tu_ngay: date, den_ngay: date, sort_by: str, top_n: int):
+    """Sản phẩm bán chạy theo số lượng hoặc doanh thu, như operation_11.get_best_selling_products_report."""
+    if sort_by not in ['quantity', 'revenue'] or top_n not in [3, 5, 10]:
+        return None
+    snapshot = _lay_snapshot()
+    if snapshot is None:
+        return None
+    ban_hang = _trong_khoang(snapshot["ban_hang"], tu_ngay, den_ngay)
+    ids, (so_luong, doanh_thu, so_don), _ = _gop_nhom(
+        ban_hang["id_san_pham"], [ban_hang["so_luong"], ban_hang["doanh_thu"], ban_hang["so_don"]])
+    co_ban = so_don > 0  # Bỏ các sản phẩm chỉ còn 0 sau khi đơn bị hủy
+    ids, so_luong, doanh_thu = ids[co_ban], so_luong[co_ban], doanh_thu[co_ban]
+    top = np.argsort(-(so_luong if sort_by == 'quantity' else doanh_thu), kind="stable")[:top_n]
+    ket_qua = []
+    for i in top:
+        ten_san_pham, ma_san_pham = _san_pham[int(ids[i])]
+        ket_qua.append({"id_san_pham": int(ids[i]), "ten_san_pham": ten_san_pham, "ma_san_pham": ma_san_pham,
+                        "tong_so_luong_ban": _so(so_luong[i]), "tong_doanh_thu": _so(doanh_thu[i])})
+    return ket_qua
+
+
+def get_top_spending_customers_report(tu_ngay: date, den_ngay: date, top_n: int):
+    """Khách hàng chi tiêu nhiều nhất, như operation_12.get_top_spending_customers_report."""
+    if top_n not in [3, 5, 10]:
+        return None
+    snapshot = _lay_snapshot()
+    if snapshot is None:
+        return None
+    don_hang = _trong_khoang(snapshot["don_hang"], tu_ngay, den_ngay)
+    co_don = don_hang["so_don"] > 0
+    ids, (chi_tieu, so_don), (ngay_cuoi,) = _gop_nhom(
+        don_hang["id_khach_hang"][co_don], [don_hang["doanh_thu"][co_don], don_hang["so_don"][co_don]],
+        [don_hang["ngay"][co_don]])
+    top = np.argsort(-chi_tieu, kind="stable")[:top_n]
+    return [{
+        "id_khach_hang": int(ids[i]),
+        "ten_khach_hang": _khach_hang[int(ids[i])],
+        "tong_chi_tieu": _so(chi_tieu[i]),
+        "tong_so_don_hang": int(so_don[i]),
+        "ngay_mua_cuoi_cung": date.fromordinal(int(ngay_cuoi[i])),
+    } for i in top]
+
+
+def get_financial_report(tu_ngay: date, den_ngay: date, ky_bao_cao: str):
+    """Doanh thu / lợi nhuận tổng và theo ngày, như operation_10.get_financial_report."""
+    snapshot = _lay_snapshot()
+    if snapshot is None:
+        return None
+    don_hang = _trong_khoang(snapshot["don_hang"], tu_ngay, den_ngay)
+    doanh_thu = _theo_ngay(don_hang, "doanh_thu", tu_ngay, den_ngay)
+    gia_von = _theo_ngay(don_hang, "gia_von", tu_ngay, den_ngay)
+    chi_phi = _theo_ngay(snapshot["chi_phi"], "so_tien", tu_ngay, den_ngay)
+
+    thue = Decimal(str(TAX_RATE))
+
+    def loi_nhuan(dt, gv, cp):
+        # Lợi nhuận = (Doanh thu - Giá vốn) - (Doanh thu * TAX_RATE) - Chi phí
+        return _so(dt) - _so(gv) - _so(dt) * thue - _so(cp)
+
+    moc = tu_ngay.toordinal()
+    return {
+        "summary": {
+            "tong_doanh_thu": _so(doanh_thu.sum()),
+            "loi_nhuan": loi_nhuan(doanh_thu.sum(), gia_von.sum(), chi_phi.sum()),
+            "ky_bao_cao": ky_bao_cao,
+        },
+        "details": [{
+            "ky_bao_cao": date.fromordinal(moc + i),
+            "tong_doanh_thu": _so(doanh_thu[i]),
+            "loi_nhuan": loi_nhuan(doanh_thu[i], gia_von[i], chi_phi[i]),
+        } for i in range(len(doanh_thu))],
+    }
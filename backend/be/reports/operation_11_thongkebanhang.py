@@ -4,7 +4,53 @@ import psycopg2
 import psycopg2.extras
 from datetime import date, timedelta
 import sys
-from be.db_connection import get_db_connection, close_db_connection
+from be.db_connection import get_db_connection, close_db_connection, shop_today
+
+
+# --- Câu SQL báo cáo ---
+# Đặt ở mức module để test kế hoạch truy vấn (EXPLAIN) dùng lại được. Lọc ngày trên cột ngay (DATE)
+# của bảng tổng hợp, không ép kiểu cột, để dùng được khóa chính (ngay, ...).
+
+# FIX: Đổi bí danh từ "do" thành "d_orders" để tránh xung đột với từ khóa của SQL.
+SQL_ORDER_COUNT = """
+    WITH daily_orders AS (
+        -- Số đơn 'Hoàn tất' mỗi ngày, lấy từ bảng tổng hợp ngày (014_create_table_tong_hop_ban_hang.sql)
+        SELECT
+            ngay AS report_date,
+            SUM(so_don) AS order_count
+        FROM TongHopDonHangNgay
+        WHERE ngay BETWEEN %s AND %s
+        GROUP BY ngay
+    ), all_dates AS (
+        -- Tạo chuỗi ngày đầy đủ để đảm bảo không ngày nào bị thiếu
+        SELECT generate_series(%s::date, %s::date, '1 day'::interval)::date AS report_date
+    )
+    -- Kết hợp để có báo cáo hoàn chỉnh, ngày không có đơn hàng sẽ có giá trị 0
+    SELECT
+        ad.report_date AS ky_bao_cao,
+        COALESCE(d_orders.order_count, 0) AS so_luong_don_hang
+    FROM all_dates ad
+    LEFT JOIN daily_orders d_orders ON ad.report_date = d_orders.report_date
+    ORDER BY ad.report_date ASC;
+"""
+
+# FIX: Đảm bảo tên cột trong ORDER BY khớp với bí danh trong SELECT.
+# {order_clause}: "tong_so_luong_ban DESC" hoặc "tong_doanh_thu DESC"
+SQL_BEST_SELLING = """
+    SELECT 
+        sp.id AS id_san_pham,
+        sp.ten_san_pham,
+        sp.ma_san_pham,
+        SUM(th.so_luong) AS tong_so_luong_ban,
+        SUM(th.doanh_thu) AS tong_doanh_thu
+    FROM TongHopBanHangNgay th
+    JOIN SanPham sp ON th.id_san_pham = sp.id
+    WHERE th.ngay BETWEEN %s AND %s
+    GROUP BY sp.id, sp.ten_san_pham, sp.ma_san_pham
+    HAVING SUM(th.so_don) > 0 -- Bỏ các dòng chỉ còn 0 sau khi đơn bị hủy
+    ORDER BY {order_clause}
+    LIMIT %s;
+"""
 
 
 def _get_date_range(period: str, start_date_str: str = None, end_date_str: str = None):
@@ -16,7 +62,7 @@ def _get_date_range(period: str, start_date_str: str = None, end_date_str: str =
     if period not in allowed_periods:
         raise ValueError(f"Kỳ báo cáo '{period}' không hợp lệ.")
 
-    today = date.today()
+    today = shop_today()
     start_date, end_date = None, None
 
     if period == 'yesterday':
@@ -56,28 +102,6 @@ def get_order_count_report(period: str, start_date_str: str = None, end_date_str
         print(f"Lỗi: {e}", file=sys.stderr)
         return None
 
-    # FIX: Đổi bí danh từ "do" thành "d_orders" để tránh xung đột với từ khóa của SQL.
-    sql = """
-        WITH daily_orders AS (
-            -- Đếm số lượng đơn hàng (phân biệt) đã 'Hoàn tất' mỗi ngày
-            SELECT
-                DATE_TRUNC('day', ngay_dat_hang)::date AS report_date,
-                COUNT(DISTINCT id) AS order_count
-            FROM DonHangBan
-            WHERE trang_thai_don_hang = 'Hoàn tất' AND ngay_dat_hang::date BETWEEN %s AND %s
-            GROUP BY report_date
-        ), all_dates AS (
-            -- Tạo chuỗi ngày đầy đủ để đảm bảo không ngày nào bị thiếu
-            SELECT generate_series(%s::date, %s::date, '1 day'::interval)::date AS report_date
-        )
-        -- Kết hợp để có báo cáo hoàn chỉnh, ngày không có đơn hàng sẽ có giá trị 0
-        SELECT
-            ad.report_date AS ky_bao_cao,
-            COALESCE(d_orders.order_count, 0) AS so_luong_don_hang
-        FROM all_dates ad
-        LEFT JOIN daily_orders d_orders ON ad.report_date = d_orders.report_date
-        ORDER BY ad.report_date ASC;
-    """
 
     conn = get_db_connection()
     if not conn:
@@ -85,7 +109,7 @@ def get_order_count_report(period: str, start_date_str: str = None, end_date_str
 
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-            cur.execute(sql, (start_date, end_date, start_date, end_date))
+            cur.execute(SQL_ORDER_COUNT, (start_date, end_date, start_date, end_date))
             return [dict(row) for row in cur.fetchall()]
     except psycopg2.Error as e:
         print(f"Lỗi CSDL khi tạo báo cáo số lượng đơn hàng: {e}", file=sys.stderr)
@@ -123,26 +147,8 @@ def get_best_selling_products_report(period: str, sort_by: str, top_n: int,
         return None
 
     # --- 2. Xây dựng câu lệnh SQL ---
-    # FIX: Đảm bảo tên cột trong ORDER BY khớp với bí danh trong SELECT.
     order_clause = "tong_so_luong_ban DESC" if sort_by == 'quantity' else "tong_doanh_thu DESC"
 
-    sql = f"""
-        SELECT 
-            sp.id AS id_san_pham,
-            sp.ten_san_pham,
-            sp.ma_san_pham,
-            SUM(ctdhb.so_luong) AS tong_so_luong_ban,
-            SUM(ctdhb.tong_gia_ban) AS tong_doanh_thu
-        FROM ChiTietDonHangBan ctdhb
-        JOIN DonHangBan dhb ON ctdhb.id_don_hang_ban = dhb.id
-        JOIN SanPham sp ON ctdhb.id_san_pham = sp.id
-        WHERE dhb.trang_thai_don_hang = 'Hoàn tất' 
-          AND dhb.ngay_dat_hang::date BETWEEN %s AND %s
-        GROUP BY sp.id, sp.ten_san_pham, sp.ma_san_pham
-        ORDER BY {order_clause}
-        LIMIT %s;
-    """
-
     # --- 3. Thực thi và trả về kết quả ---
     conn = get_db_connection()
     if not conn:
@@ -150,7 +156,7 @@ def get_best_selling_products_report(period: str, sort_by: str, top_n: int,
 
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-            cur.execute(sql, (start_date, end_date, top_n))
+            cur.execute(SQL_BEST_SELLING.format(order_clause=order_clause), (start_date, end_date, top_n))
             return [dict(row) for row in cur.fetchall()]
     except psycopg2.Error as e:
         print(f"Lỗi CSDL khi tạo báo cáo sản phẩm bán chạy: {e}", file=sys.stderr)
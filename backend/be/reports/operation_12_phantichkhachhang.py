@@ -4,7 +4,105 @@ import psycopg2
 import psycopg2.extras
 from datetime import date, timedelta
 import sys
-from be.db_connection import get_db_connection, close_db_connection
+from be.db_connection import get_db_connection, close_db_connection, shop_today
+
+
+# --- Câu SQL báo cáo ---
+# Đặt ở mức module để test kế hoạch truy vấn (EXPLAIN) dùng lại được. Lọc ngày trên cột ngay (DATE)
+# của bảng tổng hợp, không ép kiểu cột, để dùng được index.
+
+# Ngày mua hàng hoàn tất đầu tiên của mỗi khách hàng được trigger lưu sẵn ở KhachHang.ngay_mua_dau_tien
+# (012_create_triggers.sql, 3.2 và 6.2): chỉ cần đọc khách hàng có hoạt động TRONG kỳ, không quét toàn bộ lịch sử.
+
+# --- SQL để lấy MỘT DÒNG tổng hợp ---
+SQL_ACQUISITION_SUMMARY = """
+    WITH customers_in_period AS (
+        -- Lấy danh sách khách hàng có mua hàng trong kỳ báo cáo (bảng tổng hợp ngày, chỉ gồm đơn 'Hoàn tất')
+        SELECT DISTINCT id_khach_hang
+        FROM TongHopDonHangNgay
+        WHERE so_don > 0 AND ngay BETWEEN %s AND %s
+    )
+    -- Đếm số lượng khách hàng mới và quay lại trong kỳ
+    SELECT
+        COUNT(CASE WHEN kh.ngay_mua_dau_tien BETWEEN %s AND %s THEN 1 END) AS so_khach_hang_moi,
+        COUNT(CASE WHEN kh.ngay_mua_dau_tien < %s THEN 1 END) AS so_khach_hang_quay_lai
+    FROM customers_in_period cip
+    JOIN KhachHang kh ON cip.id_khach_hang = kh.id;
+"""
+
+# --- SQL để lấy DANH SÁCH chi tiết theo ngày ---
+SQL_ACQUISITION_DETAILS = """
+    WITH daily_distinct_activity AS (
+        -- Lấy hoạt động (duy nhất) của khách hàng mỗi ngày trong kỳ
+        SELECT DISTINCT ngay AS report_date, id_khach_hang
+        FROM TongHopDonHangNgay
+        WHERE so_don > 0 AND ngay BETWEEN %s AND %s
+    ),
+    daily_counts AS (
+        -- Phân loại và đếm khách hàng mới/quay lại mỗi ngày
+        SELECT
+            dda.report_date,
+            COUNT(DISTINCT CASE WHEN kh.ngay_mua_dau_tien = dda.report_date THEN dda.id_khach_hang END) AS new_customers,
+            COUNT(DISTINCT CASE WHEN kh.ngay_mua_dau_tien < dda.report_date THEN dda.id_khach_hang END) AS returning_customers
+        FROM daily_distinct_activity dda
+        JOIN KhachHang kh ON dda.id_khach_hang = kh.id
+        GROUP BY dda.report_date
+    ),
+    all_dates AS (
+        -- Tạo chuỗi ngày đầy đủ
+        SELECT generate_series(%s::date, %s::date, '1 day'::interval)::date AS report_date
+    )
+    -- Kết hợp để có báo cáo hoàn chỉnh
+    SELECT
+        ad.report_date AS ky_bao_cao,
+        COALESCE(dc.new_customers, 0) AS so_khach_hang_moi,
+        COALESCE(dc.returning_customers, 0) AS so_khach_hang_quay_lai
+    FROM all_dates ad
+    LEFT JOIN daily_counts dc ON ad.report_date = dc.report_date
+    ORDER BY ad.report_date ASC;
+"""
+
+SQL_TOP_SPENDERS = """
+    SELECT
+        kh.id AS id_khach_hang,
+        kh.ten_khach_hang,
+        SUM(th.doanh_thu) AS tong_chi_tieu,
+        SUM(th.so_don) AS tong_so_don_hang,
+        MAX(th.ngay) AS ngay_mua_cuoi_cung
+    FROM KhachHang kh
+    JOIN TongHopDonHangNgay th ON kh.id = th.id_khach_hang
+    WHERE th.so_don > 0
+      AND th.ngay BETWEEN %s AND %s
+    GROUP BY kh.id, kh.ten_khach_hang
+    ORDER BY tong_chi_tieu DESC
+    LIMIT %s;
+"""
+
+# --- SQL cohort: MỘT lần quét cho mọi cohort ---
+# Mỗi khách hàng thuộc cohort là tháng của ngay_mua_dau_tien; hoạt động của khách được gộp về
+# (khách hàng, tháng) từ bảng tổng hợp ngày trong khoảng tháng báo cáo, rồi gộp tiếp theo
+# (tháng cohort, số tháng kể từ lần mua đầu). Không chạy truy vấn riêng cho từng cohort.
+SQL_CUSTOMER_COHORTS = """
+    WITH hoat_dong_thang AS (
+        SELECT th.id_khach_hang,
+               date_trunc('month', th.ngay)::date AS thang,
+               SUM(th.doanh_thu) AS doanh_thu
+        FROM TongHopDonHangNgay th
+        WHERE th.so_don > 0 AND th.ngay BETWEEN %s AND %s
+        GROUP BY th.id_khach_hang, date_trunc('month', th.ngay)
+    )
+    SELECT
+        date_trunc('month', kh.ngay_mua_dau_tien)::date AS thang_cohort,
+        ((EXTRACT(YEAR FROM hd.thang) - EXTRACT(YEAR FROM kh.ngay_mua_dau_tien)) * 12
+          + EXTRACT(MONTH FROM hd.thang) - EXTRACT(MONTH FROM kh.ngay_mua_dau_tien))::int AS so_thang,
+        COUNT(*) AS so_khach_hoat_dong,
+        SUM(hd.doanh_thu) AS doanh_thu
+    FROM hoat_dong_thang hd
+    JOIN KhachHang kh ON kh.id = hd.id_khach_hang
+    WHERE kh.ngay_mua_dau_tien >= %s
+    GROUP BY 1, 2
+    ORDER BY 1, 2;
+"""
 
 
 def _get_date_range(period: str, start_date_str: str = None, end_date_str: str = None):
@@ -15,7 +113,7 @@ def _get_date_range(period: str, start_date_str: str = None, end_date_str: str =
     if period not in allowed_periods:
         raise ValueError(f"Kỳ báo cáo '{period}' không hợp lệ.")
 
-    today = date.today()
+    today = shop_today()
     start_date, end_date = None, None
 
     if period == 'yesterday':
@@ -61,65 +159,6 @@ def get_customer_acquisition_report(period: str, start_date_str: str = None, end
         print(f"Lỗi: {e}", file=sys.stderr)
         return None
 
-    # --- SQL để lấy MỘT DÒNG tổng hợp ---
-    sql_summary = """
-        WITH customer_first_purchase AS (
-            -- Tìm ngày mua hàng hoàn tất đầu tiên của mỗi khách hàng
-            SELECT id_khach_hang, MIN(ngay_dat_hang::date) as first_purchase_date
-            FROM DonHangBan WHERE trang_thai_don_hang = 'Hoàn tất'
-            GROUP BY id_khach_hang
-        ),
-        customers_in_period AS (
-            -- Lấy danh sách khách hàng có mua hàng trong kỳ báo cáo
-            SELECT DISTINCT id_khach_hang
-            FROM DonHangBan
-            WHERE trang_thai_don_hang = 'Hoàn tất' AND ngay_dat_hang::date BETWEEN %s AND %s
-        )
-        -- Đếm số lượng khách hàng mới và quay lại trong kỳ
-        SELECT
-            COUNT(CASE WHEN cfp.first_purchase_date BETWEEN %s AND %s THEN 1 END) AS so_khach_hang_moi,
-            COUNT(CASE WHEN cfp.first_purchase_date < %s THEN 1 END) AS so_khach_hang_quay_lai
-        FROM customers_in_period cip
-        JOIN customer_first_purchase cfp ON cip.id_khach_hang = cfp.id_khach_hang;
-    """
-
-    # --- SQL để lấy DANH SÁCH chi tiết theo ngày ---
-    sql_details = """
-        WITH customer_first_purchase AS (
-            SELECT id_khach_hang, MIN(ngay_dat_hang::date) as first_purchase_date
-            FROM DonHangBan WHERE trang_thai_don_hang = 'Hoàn tất'
-            GROUP BY id_khach_hang
-        ),
-        daily_distinct_activity AS (
-            -- Lấy hoạt động (duy nhất) của khách hàng mỗi ngày trong kỳ
-            SELECT DISTINCT ngay_dat_hang::date AS report_date, id_khach_hang
-            FROM DonHangBan
-            WHERE trang_thai_don_hang = 'Hoàn tất' AND ngay_dat_hang::date BETWEEN %s AND %s
-        ),
-        daily_counts AS (
-            -- Phân loại và đếm khách hàng mới/quay lại mỗi ngày
-            SELECT
-                dda.report_date,
-                COUNT(DISTINCT CASE WHEN cfp.first_purchase_date = dda.report_date THEN dda.id_khach_hang END) AS new_customers,
-                COUNT(DISTINCT CASE WHEN cfp.first_purchase_date < dda.report_date THEN dda.id_khach_hang END) AS returning_customers
-            FROM daily_distinct_activity dda
-            JOIN customer_first_purchase cfp ON dda.id_khach_hang = cfp.id_khach_hang
-            GROUP BY dda.report_date
-        ),
-        all_dates AS (
-            -- Tạo chuỗi ngày đầy đủ
-            SELECT generate_series(%s::date, %s::date, '1 day'::interval)::date AS report_date
-        )
-        -- Kết hợp để có báo cáo hoàn chỉnh
-        SELECT
-            ad.report_date AS ky_bao_cao,
-            COALESCE(dc.new_customers, 0) AS so_khach_hang_moi,
-            COALESCE(dc.returning_customers, 0) AS so_khach_hang_quay_lai
-        FROM all_dates ad
-        LEFT JOIN daily_counts dc ON ad.report_date = dc.report_date
-        ORDER BY ad.report_date ASC;
-    """
-
     conn = get_db_connection()
     if not conn:
         return None
@@ -128,13 +167,13 @@ def get_customer_acquisition_report(period: str, start_date_str: str = None, end
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
             # Chạy truy vấn tổng hợp
-            cur.execute(sql_summary, (start_date, end_date, start_date, end_date, start_date))
+            cur.execute(SQL_ACQUISITION_SUMMARY, (start_date, end_date, start_date, end_date, start_date))
             summary_data = cur.fetchone()
             if summary_data:
                 final_report['summary'] = dict(summary_data)
 
             # Chạy truy vấn chi tiết
-            cur.execute(sql_details, (start_date, end_date, start_date, end_date))
+            cur.execute(SQL_ACQUISITION_DETAILS, (start_date, end_date, start_date, end_date))
             final_report['details'] = [dict(row) for row in cur.fetchall()]
 
     except psycopg2.Error as e:
@@ -169,33 +208,104 @@ def get_top_spending_customers_report(period: str, top_n: int,
         print(f"Lỗi: {e}", file=sys.stderr)
         return None
 
-    sql = """
-        SELECT
-            kh.id AS id_khach_hang,
-            kh.ten_khach_hang,
-            SUM(ctdhb.tong_gia_ban) AS tong_chi_tieu,
-            COUNT(DISTINCT dhb.id) AS tong_so_don_hang,
-            MAX(dhb.ngay_dat_hang::date) AS ngay_mua_cuoi_cung
-        FROM KhachHang kh
-        JOIN DonHangBan dhb ON kh.id = dhb.id_khach_hang
-        JOIN ChiTietDonHangBan ctdhb ON dhb.id = ctdhb.id_don_hang_ban
-        WHERE dhb.trang_thai_don_hang = 'Hoàn tất'
-          AND dhb.ngay_dat_hang::date BETWEEN %s AND %s
-        GROUP BY kh.id, kh.ten_khach_hang
-        ORDER BY tong_chi_tieu DESC
-        LIMIT %s;
-    """
-
     conn = get_db_connection()
     if not conn:
         return None
 
     try:
         with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
-            cur.execute(sql, (start_date, end_date, top_n))
+            cur.execute(SQL_TOP_SPENDERS, (start_date, end_date, top_n))
             return [dict(row) for row in cur.fetchall()]
     except psycopg2.Error as e:
         print(f"Lỗi CSDL khi tạo báo cáo khách hàng chi tiêu nhiều: {e}", file=sys.stderr)
         return None
     finally:
         close_db_connection(conn)
+
+
+def get_month_range(from_month_str: str = None, to_month_str: str = None):
+    """
+    Quy đổi khoảng tháng 'YYYY-MM' thành (ngày đầu tháng đầu, ngày cuối tháng cuối).
+    Mặc định: 12 tháng đã kết thúc gần nhất (tới hết tháng trước).
+    """
+    today = shop_today()
+    if to_month_str:
+        to_month = date.fromisoformat(f"{to_month_str}-01")
+    else:
+        to_month = (today.replace(day=1) - timedelta(days=1)).replace(day=1)
+    if from_month_str:
+        from_month = date.fromisoformat(f"{from_month_str}-01")
+    else:
+        so_thang = to_month.year * 12 + to_month.month - 1 - 11
+        from_month = date(so_thang // 12, so_thang % 12 + 1, 1)
+    if from_month > to_month:
+        raise ValueError("Tháng bắt đầu không được lớn hơn tháng kết thúc.")
+    # Ngày cuối của to_month
+    end_date = (to_month.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return from_month, end_date
+
+
+def get_customer_cohort_report(from_month_str: str = None, to_month_str: str = None):
+    """
+    Tạo báo cáo cohort giữ chân khách hàng theo tháng.
+
+    Mỗi cohort là các khách hàng có đơn 'Hoàn tất' đầu tiên trong một tháng (trong khoảng báo cáo);
+    với mỗi tháng tiếp theo (so_thang = 0, 1, 2, ...) trả về số khách còn mua, tỉ lệ giữ chân và doanh thu.
+
+    Cấu trúc trả về:
+    {
+        "tu_thang": "YYYY-MM", "den_thang": "YYYY-MM",
+        "cohorts": [ { "thang_cohort": "YYYY-MM", "so_khach_hang": N,
+                       "theo_thang": [ { "so_thang": 0, "so_khach_hoat_dong": N, "ti_le_giu_chan": 1.0,
+                                         "doanh_thu": X }, ... ] }, ... ]
+    }
+
+    Args:
+        from_month_str (str, optional): Tháng bắt đầu 'YYYY-MM'.
+        to_month_str (str, optional): Tháng kết thúc 'YYYY-MM'.
+
+    Returns:
+        dict or None: Báo cáo cohort, hoặc None nếu có lỗi.
+    """
+    try:
+        start_date, end_date = get_month_range(from_month_str, to_month_str)
+    except ValueError as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return None
+
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+            cur.execute(SQL_CUSTOMER_COHORTS, (start_date, end_date, start_date))
+            rows = cur.fetchall()
+    except psycopg2.Error as e:
+        print(f"Lỗi CSDL khi tạo báo cáo cohort khách hàng: {e}", file=sys.stderr)
+        return None
+    finally:
+        close_db_connection(conn)
+
+    # Dòng so_thang = 0 của mỗi cohort chính là cỡ cohort (tháng mua đầu tiên luôn có hoạt động)
+    cohorts = {}
+    for row in rows:
+        thang = row['thang_cohort'].strftime('%Y-%m')
+        cohort = cohorts.setdefault(thang, {"thang_cohort": thang, "so_khach_hang": 0, "theo_thang": []})
+        if row['so_thang'] == 0:
+            cohort['so_khach_hang'] = row['so_khach_hoat_dong']
+        cohort['theo_thang'].append({
+            "so_thang": row['so_thang'],
+            "so_khach_hoat_dong": row['so_khach_hoat_dong'],
+            "doanh_thu": row['doanh_thu'],
+        })
+    for cohort in cohorts.values():
+        for o in cohort['theo_thang']:
+            o['ti_le_giu_chan'] = (round(o['so_khach_hoat_dong'] / cohort['so_khach_hang'], 4)
+                                   if cohort['so_khach_hang'] else None)
+
+    return {
+        "tu_thang": start_date.strftime('%Y-%m'),
+        "den_thang": end_date.strftime('%Y-%m'),
+        "cohorts": list(cohorts.values()),
+    }
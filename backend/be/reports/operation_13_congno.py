@@ -3,8 +3,29 @@
 import psycopg2
 import psycopg2.extras
 from datetime import date
+from decimal import Decimal
 import sys
-from be.db_connection import get_db_connection, close_db_connection
+from be.db_connection import get_db_connection, close_db_connection, shop_today
+
+
+# --- Tuổi nợ ---
+# Các mốc (số ngày) chia nhóm tuổi nợ, mặc định 0–30, 31–60, 61–90, trên 90 ngày.
+# Tuổi nợ = ngày tính báo cáo - ngày giao hàng thực tế (chưa có ngày giao thì tính là 0).
+DEFAULT_AGING_BUCKETS = (30, 60, 90)
+
+# width_bucket(tuổi, mảng mốc + 1): 0 cho tuổi <= mốc đầu, i cho mốc thứ i < tuổi <= mốc thứ i+1
+SQL_AGING = """
+    WITH theo_nhom AS (
+        SELECT id_khach_hang,
+               width_bucket(%s::date - COALESCE(ngay_tinh_no, %s::date), %s::int[]) AS nhom,
+               SUM(so_tien_con_no) AS so_tien
+        FROM CongNoPhaiThu
+        GROUP BY 1, 2
+    )
+    SELECT tn.id_khach_hang, kh.ten_khach_hang, tn.nhom, tn.so_tien
+    FROM theo_nhom tn
+    JOIN KhachHang kh ON kh.id = tn.id_khach_hang;
+"""
 
 
 def get_receivables_report(overdue_only: bool = False):
@@ -14,6 +35,7 @@ def get_receivables_report(overdue_only: bool = False):
     Một đơn hàng được tính là công nợ khi:
     - trang_thai_don_hang là 'Đã giao' hoặc 'Hoàn tất'.
     - trang_thai_thanh_toan là 'Chưa thanh toán'.
+    - Số tiền nợ là phần chưa trả: tiền hàng trừ các lần thanh toán từng phần.
     - Một khoản nợ được coi là 'quá hạn' nếu ngày hiện tại > ngày giao hàng thực tế + 30 ngày.
 
     Cấu trúc trả về:
@@ -31,63 +53,39 @@ def get_receivables_report(overdue_only: bool = False):
     """
     # --- 1. Định nghĩa các câu lệnh SQL ---
 
+    # Số dư được trigger duy trì (database/016_create_table_cong_no_phai_thu.sql):
+    # - CongNoKhachHang: tổng còn nợ của từng khách ĐANG nợ -> tổng và danh sách chỉ đọc số khách đang nợ.
+    # - CongNoPhaiThu: còn nợ của từng đơn -> phần quá hạn chỉ đọc các đơn quá hạn (index ngay_tinh_no).
+    # Thanh toán từng phần đã được trừ sẵn (017_create_table_thanh_toan_don_hang_ban.sql).
+
     # SQL để lấy MỘT DÒNG tổng hợp toàn bộ công nợ
     sql_summary = """
-        WITH unpaid_orders_value AS (
-            -- Tính toán giá trị của từng đơn hàng chưa thanh toán
-            SELECT
-                -- Dùng SUM ở đây vì một đơn hàng có thể có nhiều chi tiết
-                SUM(ctdhb.tong_gia_ban) AS order_value,
-                -- Tính giá trị quá hạn, chỉ khi ngày giao hàng thực tế tồn tại
-                CASE
-                    WHEN dhb.ngay_giao_hang_thuc_te IS NOT NULL AND (CURRENT_DATE - dhb.ngay_giao_hang_thuc_te > 30)
-                    THEN SUM(ctdhb.tong_gia_ban)
-                    ELSE 0
-                END AS overdue_value
-            FROM DonHangBan dhb
-            JOIN ChiTietDonHangBan ctdhb ON dhb.id = ctdhb.id_don_hang_ban
-            WHERE
-                dhb.trang_thai_don_hang IN ('Đã giao', 'Hoàn tất')
-                AND dhb.trang_thai_thanh_toan = 'Chưa thanh toán'
-            GROUP BY dhb.id, dhb.ngay_giao_hang_thuc_te
-        )
-        -- Tổng hợp lại tất cả các đơn hàng
         SELECT
-            COALESCE(SUM(order_value), 0) AS tong_cong_no_phai_thu,
-            COALESCE(SUM(overdue_value), 0) AS tong_cong_no_qua_han
-        FROM unpaid_orders_value;
+            (SELECT COALESCE(SUM(tong_cong_no), 0) FROM CongNoKhachHang) AS tong_cong_no_phai_thu,
+            -- Giá trị quá hạn, chỉ khi ngày giao hàng thực tế tồn tại
+            (SELECT COALESCE(SUM(so_tien_con_no), 0) FROM CongNoPhaiThu
+             WHERE ngay_tinh_no < CURRENT_DATE - 30) AS tong_cong_no_qua_han;
     """
 
     # SQL để lấy DANH SÁCH chi tiết công nợ theo từng khách hàng
     # Phần này được xây dựng động để có thể thêm bộ lọc overdue_only
     base_sql_details = """
-        WITH unpaid_orders_value AS (
-            -- Tương tự như trên, tính giá trị từng đơn hàng
-            SELECT
-                dhb.id_khach_hang,
-                SUM(ctdhb.tong_gia_ban) AS order_value,
-                CASE
-                    WHEN dhb.ngay_giao_hang_thuc_te IS NOT NULL AND (CURRENT_DATE - dhb.ngay_giao_hang_thuc_te > 30)
-                    THEN SUM(ctdhb.tong_gia_ban)
-                    ELSE 0
-                END AS overdue_value
-            FROM DonHangBan dhb
-            JOIN ChiTietDonHangBan ctdhb ON dhb.id = ctdhb.id_don_hang_ban
-            WHERE
-                dhb.trang_thai_don_hang IN ('Đã giao', 'Hoàn tất')
-                AND dhb.trang_thai_thanh_toan = 'Chưa thanh toán'
-            GROUP BY dhb.id, dhb.id_khach_hang, dhb.ngay_giao_hang_thuc_te
+        WITH overdue_debt AS (
+            -- Nợ quá hạn của từng khách hàng
+            SELECT id_khach_hang, SUM(so_tien_con_no) AS cong_no_qua_han
+            FROM CongNoPhaiThu
+            WHERE ngay_tinh_no < CURRENT_DATE - 30
+            GROUP BY id_khach_hang
         ),
         customer_debt AS (
-            -- Gom nhóm công nợ theo từng khách hàng
             SELECT
                 kh.id AS id_khach_hang,
                 kh.ten_khach_hang,
-                SUM(uov.order_value) AS tong_cong_no,
-                SUM(uov.overdue_value) AS cong_no_qua_han
-            FROM unpaid_orders_value uov
-            JOIN KhachHang kh ON uov.id_khach_hang = kh.id
-            GROUP BY kh.id, kh.ten_khach_hang
+                kn.tong_cong_no,
+                COALESCE(od.cong_no_qua_han, 0) AS cong_no_qua_han
+            FROM CongNoKhachHang kn
+            JOIN KhachHang kh ON kn.id_khach_hang = kh.id
+            LEFT JOIN overdue_debt od ON od.id_khach_hang = kn.id_khach_hang
         )
         SELECT * FROM customer_debt
     """
@@ -123,3 +121,105 @@ def get_receivables_report(overdue_only: bool = False):
         close_db_connection(conn)
 
     return final_report
+
+
+def _aging_bucket_labels(buckets):
+    """Tên các nhóm tuổi nợ từ các mốc (30, 60, 90) -> ['0-30', '31-60', '61-90', '90+']."""
+    labels = []
+    tu = 0
+    for moc in buckets:
+        labels.append(f"{tu}-{moc}")
+        tu = moc + 1
+    labels.append(f"{buckets[-1]}+")
+    return labels
+
+
+def get_receivables_aging_report(buckets=DEFAULT_AGING_BUCKETS, as_of_str: str = None):
+    """
+    Tạo báo cáo tuổi nợ phải thu theo khách hàng, đọc từ sổ công nợ CongNoPhaiThu.
+
+    Cấu trúc trả về:
+    {
+        "ngay_tinh": date, "nhom_tuoi_no": ["0-30", "31-60", "61-90", "90+"],
+        "summary": { "tong_cong_no": X, "theo_nhom": [X0, X1, X2, X3] },
+        "details": [ { "id_khach_hang": A, "ten_khach_hang": "...", "tong_cong_no": B,
+                       "theo_nhom": [B0, B1, B2, B3] }, ... ]   # Nợ nhiều nhất trước
+    }
+
+    Args:
+        buckets (sequence of int, optional): Các mốc số ngày, tăng dần. Mặc định (30, 60, 90).
+        as_of_str (str, optional): Ngày tính tuổi nợ 'YYYY-MM-DD'. Mặc định là hôm nay.
+
+    Returns:
+        dict or None: Báo cáo, hoặc None nếu tham số không hợp lệ / có lỗi.
+    """
+    buckets = [int(b) for b in buckets] if buckets else []
+    if not buckets or buckets[0] < 1 or any(a >= b for a, b in zip(buckets, buckets[1:])):
+        print("Lỗi: Các mốc tuổi nợ phải là số ngày dương, tăng dần.", file=sys.stderr)
+        return None
+    try:
+        as_of = date.fromisoformat(as_of_str) if as_of_str else shop_today()
+    except ValueError:
+        print(f"Lỗi: Định dạng ngày '{as_of_str}' không hợp lệ. Vui lòng dùng 'YYYY-MM-DD'.", file=sys.stderr)
+        return None
+
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+            cur.execute(SQL_AGING, (as_of, as_of, [b + 1 for b in buckets]))
+            rows = cur.fetchall()
+    except psycopg2.Error as e:
+        print(f"Lỗi CSDL khi tạo báo cáo tuổi nợ: {e}", file=sys.stderr)
+        return None
+    finally:
+        close_db_connection(conn)
+
+    so_nhom = len(buckets) + 1
+    tong_theo_nhom = [Decimal(0)] * so_nhom
+    khach_hang = {}
+    for row in rows:
+        kh = khach_hang.setdefault(row['id_khach_hang'], {
+            "id_khach_hang": row['id_khach_hang'],
+            "ten_khach_hang": row['ten_khach_hang'],
+            "tong_cong_no": Decimal(0),
+            "theo_nhom": [Decimal(0)] * so_nhom,
+        })
+        kh['theo_nhom'][row['nhom']] += row['so_tien']
+        kh['tong_cong_no'] += row['so_tien']
+        tong_theo_nhom[row['nhom']] += row['so_tien']
+
+    return {
+        "ngay_tinh": as_of,
+        "nhom_tuoi_no": _aging_bucket_labels(buckets),
+        "summary": {"tong_cong_no": sum(tong_theo_nhom), "theo_nhom": tong_theo_nhom},
+        "details": sorted(khach_hang.values(), key=lambda kh: (-kh['tong_cong_no'], kh['id_khach_hang'])),
+    }
+
+
+def get_customer_receivable_balance(id_khach_hang: int):
+    """
+    Số dư công nợ hiện tại của một khách hàng (đọc trực tiếp CongNoKhachHang, không gom nhóm các đơn).
+    Trả về {"id_khach_hang", "tong_cong_no", "so_don_no"} (0 nếu không nợ), hoặc None nếu có lỗi.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+            cur.execute("SELECT tong_cong_no, so_don_no FROM CongNoKhachHang WHERE id_khach_hang = %s;",
+                        (id_khach_hang,))
+            row = cur.fetchone()
+    except psycopg2.Error as e:
+        print(f"Lỗi CSDL khi lấy công nợ khách hàng: {e}", file=sys.stderr)
+        return None
+    finally:
+        close_db_connection(conn)
+
+    return {
+        "id_khach_hang": id_khach_hang,
+        "tong_cong_no": row['tong_cong_no'] if row else Decimal(0),
+        "so_don_no": row['so_don_no'] if row else 0,
+    }
@@ -0,0 +1,237 @@
+# be/reports/operation_14_phankhucrfm.py
+
+import psycopg2
+import psycopg2.extras
+import sys
+from be.db_connection import get_db_connection, close_db_connection
+from be import pagination
+
+
+# --- Phân khúc RFM tính sẵn ---
+# Điểm và phân khúc được lưu ở DiemRFMKhachHang (database/015_create_table_diem_rfm_khach_hang.sql):
+# - refresh_rfm_scores(full=True): tính lại chỉ số của mọi khách hàng (chạy hằng đêm).
+# - refresh_rfm_scores(full=False): chỉ tính lại chỉ số của khách hàng trong hàng đợi KhachHangCanTinhRFM
+#   (trigger đánh dấu khi đơn hoàn tất thay đổi), các khách khác giữ chỉ số đã lưu.
+# Cả hai cách đều xếp hạng lại toàn bộ trong MỘT câu lệnh (điểm ngũ phân vị phụ thuộc mọi khách hàng)
+# và chỉ ghi những dòng có điểm / chỉ số thay đổi.
+
+# Quy tắc phân khúc theo thứ tự ưu tiên (quy tắc đầu tiên khớp được chọn)
+QUY_TAC_PHAN_KHUC = [
+    ("Khách hàng VIP", "diem_r >= 4 AND diem_f >= 4 AND diem_m >= 4"),
+    ("Trung thành", "diem_r >= 3 AND diem_f >= 4"),
+    ("Khách hàng mới", "diem_r >= 4 AND diem_f <= 2"),
+    ("Tiềm năng", "diem_r >= 3"),
+    ("Có nguy cơ rời bỏ", "diem_f >= 3 OR diem_m >= 4"),
+    ("Ngủ đông", "TRUE"),
+]
+PHAN_KHUC = [ten for ten, _ in QUY_TAC_PHAN_KHUC]
+
+# Chỉ số mới của toàn bộ khách hàng đã mua hàng: số đơn và chi tiêu gom một lần trên bảng tổng hợp.
+# Số lần mua lấy từ SUM(so_don) (bảng tổng hợp tự trừ khi đơn rời 'Hoàn tất'), không dùng bộ đếm
+# KhachHang.so_lan_mua_hang vì bộ đếm đó không giảm khi đơn bị hủy / trả hàng.
+SQL_CHI_SO_TOAN_BO = """
+    SELECT kh.id AS id_khach_hang, kh.ngay_mua_gan_nhat,
+           COALESCE(ct.so_lan_mua_hang, 0) AS so_lan_mua_hang,
+           COALESCE(ct.tong_chi_tieu, 0) AS tong_chi_tieu
+    FROM KhachHang kh
+    LEFT JOIN (
+        SELECT id_khach_hang, SUM(so_don) AS so_lan_mua_hang, SUM(doanh_thu) AS tong_chi_tieu
+        FROM TongHopDonHangNgay
+        GROUP BY id_khach_hang
+    ) ct ON ct.id_khach_hang = kh.id
+    WHERE kh.ngay_mua_gan_nhat IS NOT NULL
+"""
+
+# Chỉ số đã lưu của khách không đổi + chỉ số mới của khách trong hàng đợi (đọc theo index id_khach_hang)
+SQL_CHI_SO_BO_SUNG = """
+    SELECT d.id_khach_hang, d.ngay_mua_gan_nhat, d.so_lan_mua_hang, d.tong_chi_tieu
+    FROM DiemRFMKhachHang d
+    WHERE d.id_khach_hang <> ALL(%(ids)s)
+    UNION ALL
+    SELECT kh.id, kh.ngay_mua_gan_nhat, COALESCE(ct.so_lan_mua_hang, 0), COALESCE(ct.tong_chi_tieu, 0)
+    FROM KhachHang kh
+    LEFT JOIN LATERAL (
+        SELECT SUM(th.so_don) AS so_lan_mua_hang, SUM(th.doanh_thu) AS tong_chi_tieu
+        FROM TongHopDonHangNgay th
+        WHERE th.id_khach_hang = kh.id
+    ) ct ON TRUE
+    WHERE kh.id = ANY(%(ids)s) AND kh.ngay_mua_gan_nhat IS NOT NULL
+"""
+
+# Điểm = 1 + 5 * (hạng - 1) / tổng số khách: giá trị bằng nhau luôn cùng điểm
+SQL_CAP_NHAT_DIEM = """
+    WITH chi_so AS ({chi_so}),
+    diem AS (
+        SELECT c.*,
+               1 + 5 * (RANK() OVER (ORDER BY c.ngay_mua_gan_nhat) - 1) / COUNT(*) OVER () AS diem_r,
+               1 + 5 * (RANK() OVER (ORDER BY c.so_lan_mua_hang) - 1) / COUNT(*) OVER () AS diem_f,
+               1 + 5 * (RANK() OVER (ORDER BY c.tong_chi_tieu) - 1) / COUNT(*) OVER () AS diem_m
+        FROM chi_so c
+    )
+    INSERT INTO DiemRFMKhachHang (id_khach_hang, ngay_mua_gan_nhat, so_lan_mua_hang, tong_chi_tieu,
+                                  diem_r, diem_f, diem_m, phan_khuc)
+    SELECT id_khach_hang, ngay_mua_gan_nhat, so_lan_mua_hang, tong_chi_tieu, diem_r, diem_f, diem_m,
+           CASE {phan_khuc} END
+    FROM diem
+    ON CONFLICT (id_khach_hang) DO UPDATE SET
+        ngay_mua_gan_nhat = EXCLUDED.ngay_mua_gan_nhat,
+        so_lan_mua_hang = EXCLUDED.so_lan_mua_hang,
+        tong_chi_tieu = EXCLUDED.tong_chi_tieu,
+        diem_r = EXCLUDED.diem_r,
+        diem_f = EXCLUDED.diem_f,
+        diem_m = EXCLUDED.diem_m,
+        phan_khuc = EXCLUDED.phan_khuc,
+        ngay_cap_nhat = CURRENT_TIMESTAMP
+    WHERE (DiemRFMKhachHang.ngay_mua_gan_nhat, DiemRFMKhachHang.so_lan_mua_hang, DiemRFMKhachHang.tong_chi_tieu,
+           DiemRFMKhachHang.diem_r, DiemRFMKhachHang.diem_f, DiemRFMKhachHang.diem_m, DiemRFMKhachHang.phan_khuc)
+          IS DISTINCT FROM
+          (EXCLUDED.ngay_mua_gan_nhat, EXCLUDED.so_lan_mua_hang, EXCLUDED.tong_chi_tieu,
+           EXCLUDED.diem_r, EXCLUDED.diem_f, EXCLUDED.diem_m, EXCLUDED.phan_khuc);
+"""
+
+SQL_PHAN_KHUC_CASE = " ".join(f"WHEN {dieu_kien} THEN '{ten}'" for ten, dieu_kien in QUY_TAC_PHAN_KHUC)
+
+RFM_FIELDS = {
+    "id_khach_hang": "d.id_khach_hang",
+    "ten_khach_hang": "kh.ten_khach_hang",
+    "so_dien_thoai": "kh.so_dien_thoai",
+    "email": "kh.email",
+    "phan_khuc": "d.phan_khuc",
+    "diem_r": "d.diem_r",
+    "diem_f": "d.diem_f",
+    "diem_m": "d.diem_m",
+    "ngay_mua_gan_nhat": "d.ngay_mua_gan_nhat",
+    "so_lan_mua_hang": "d.so_lan_mua_hang",
+    "tong_chi_tieu": "d.tong_chi_tieu",
+}
+RFM_PAGE_KEYS = ("tong_chi_tieu", "id_khach_hang")
+RFM_SORT_COLUMNS = [("d.tong_chi_tieu", "tong_chi_tieu"), ("d.id_khach_hang", "id_khach_hang")]
+
+
+def refresh_rfm_scores(full: bool = True):
+    """
+    Tính lại điểm RFM và phân khúc khách hàng.
+
+    Args:
+        full (bool): True - tính lại chỉ số của mọi khách hàng (công việc hằng đêm);
+                     False - chỉ khách hàng có đơn hoàn tất thay đổi kể từ lần trước.
+
+    Returns:
+        dict or None: {"so_khach_can_tinh": N, "so_dong_xoa": X, "so_dong_cap_nhat": Y}, hoặc None nếu có lỗi.
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    try:
+        with conn.cursor() as cur:
+            # Một lần tính tại một thời điểm; không chặn người đọc
+            cur.execute("LOCK TABLE DiemRFMKhachHang IN SHARE ROW EXCLUSIVE MODE;")
+            cur.execute("DELETE FROM KhachHangCanTinhRFM RETURNING id_khach_hang;")
+            ids = [row[0] for row in cur.fetchall()]
+
+            if full:
+                # Khách không còn đơn hoàn tất nào thì bỏ khỏi bảng điểm
+                cur.execute("""
+                    DELETE FROM DiemRFMKhachHang d USING KhachHang kh
+                    WHERE d.id_khach_hang = kh.id AND kh.ngay_mua_gan_nhat IS NULL;
+                """)
+                so_dong_xoa = cur.rowcount
+                cur.execute(SQL_CAP_NHAT_DIEM.format(chi_so=SQL_CHI_SO_TOAN_BO, phan_khuc=SQL_PHAN_KHUC_CASE))
+                so_dong_cap_nhat = cur.rowcount
+            elif ids:
+                cur.execute("""
+                    DELETE FROM DiemRFMKhachHang d USING KhachHang kh
+                    WHERE d.id_khach_hang = kh.id AND kh.id = ANY(%s) AND kh.ngay_mua_gan_nhat IS NULL;
+                """, (ids,))
+                so_dong_xoa = cur.rowcount
+                cur.execute(SQL_CAP_NHAT_DIEM.format(chi_so=SQL_CHI_SO_BO_SUNG, phan_khuc=SQL_PHAN_KHUC_CASE),
+                            {"ids": ids})
+                so_dong_cap_nhat = cur.rowcount
+            else:
+                so_dong_xoa = so_dong_cap_nhat = 0
+        conn.commit()
+        return {"so_khach_can_tinh": len(ids), "so_dong_xoa": so_dong_xoa, "so_dong_cap_nhat": so_dong_cap_nhat}
+    except psycopg2.Error as e:
+        print(f"Lỗi CSDL khi tính điểm RFM: {e}", file=sys.stderr)
+        conn.rollback()
+        return None
+    finally:
+        close_db_connection(conn)
+
+
+def get_rfm_segment_summary():
+    """
+    Số khách hàng, tổng chi tiêu và điểm trung bình của từng phân khúc (theo thứ tự QUY_TAC_PHAN_KHUC).
+    Trả về list[dict] hoặc None nếu có lỗi.
+    """
+    sql = """
+        SELECT phan_khuc,
+               COUNT(*) AS so_khach_hang,
+               SUM(tong_chi_tieu) AS tong_chi_tieu,
+               ROUND(AVG(diem_r), 2) AS diem_r_trung_binh,
+               ROUND(AVG(diem_f), 2) AS diem_f_trung_binh,
+               ROUND(AVG(diem_m), 2) AS diem_m_trung_binh,
+               MAX(ngay_cap_nhat) AS ngay_cap_nhat
+        FROM DiemRFMKhachHang
+        GROUP BY phan_khuc;
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(sql)
+            rows = {r['phan_khuc']: dict(r) for r in cur.fetchall()}
+        return [rows[ten] for ten in PHAN_KHUC if ten in rows]
+    except psycopg2.Error as e:
+        print(f"Lỗi CSDL khi lấy tổng hợp phân khúc RFM: {e}", file=sys.stderr)
+        return None
+    finally:
+        close_db_connection(conn)
+
+
+def _build_rfm_page_sql(phan_khuc=None, limit=None, cursor=None, fields=None):
+    """
+    Câu SELECT một trang khách hàng của bảng điểm RFM (chi tiêu cao trước).
+    Ném ValueError nếu phân khúc, cursor hoặc fields không hợp lệ. Trả về (sql, params, limit).
+    """
+    columns = pagination.parse_fields(fields, RFM_FIELDS, RFM_PAGE_KEYS)
+    conditions = []
+    params = []
+    if phan_khuc:
+        if phan_khuc not in PHAN_KHUC:
+            raise ValueError(f"Phân khúc '{phan_khuc}' không hợp lệ.")
+        conditions.append("d.phan_khuc = %s")
+        params.append(phan_khuc)
+
+    select_sql = f"""
+        SELECT {', '.join(columns)}
+        FROM DiemRFMKhachHang d
+        JOIN KhachHang kh ON d.id_khach_hang = kh.id
+    """
+    sql, params, _, _, limit = pagination.build_page_sql(select_sql, conditions, params, RFM_SORT_COLUMNS,
+                                                         limit, cursor, descending=True)
+    return sql, params, limit
+
+
+def get_rfm_customers_page(phan_khuc=None, limit=None, cursor=None, fields=None):
+    """
+    Lấy một trang khách hàng theo phân khúc RFM.
+    Trả về {"data": [...], "next_cursor": "..." hoặc None}, hoặc None nếu lỗi CSDL.
+    Ném ValueError nếu phân khúc/cursor/fields không hợp lệ.
+    """
+    sql, params, limit = _build_rfm_page_sql(phan_khuc, limit, cursor, fields)
+    conn = get_db_connection()
+    if not conn:
+        return None
+    try:
+        with conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor) as cur:
+            cur.execute(sql, params)
+            rows, next_cursor = pagination.build_page([dict(r) for r in cur.fetchall()], limit, RFM_PAGE_KEYS)
+            return {"data": rows, "next_cursor": next_cursor}
+    except psycopg2.Error as e:
+        print(f"Lỗi CSDL khi lấy danh sách khách hàng theo phân khúc: {e}", file=sys.stderr)
+        return None
+    finally:
+        close_db_connection(conn)
@@ -0,0 +1,226 @@
+# be/reports/operation_17_xuatphantich.py
+
+import json
+import os
+import shutil
+import sys
+from datetime import date
+import psycopg2
+from be.db_connection import get_db_connection, close_db_connection, shop_day_range, SHOP_TIMEZONE
+
+try:
+    import pyarrow as pa  # Chỉ cần cho xuất dữ liệu phân tích
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+CO_PYARROW = pa is not None
+
+
+# --- Xuất lịch sử bán hàng dạng cột (Parquet / Arrow IPC) cho phân tích ngoại tuyến ---
+# Mỗi ngày đã kết thúc (trước CURRENT_DATE theo giờ cửa hàng) có đơn 'Hoàn tất' là một phân vùng:
+#   {thu_muc}/ngay=YYYY-MM-DD/ban_hang.parquet   (đọc bằng pyarrow.dataset với partitioning="hive")
+# Mỗi dòng là một dòng hàng đã bán kèm khóa sản phẩm / danh mục / khách hàng / nhân viên.
+# Tệp _manifest.json lưu "dấu vân tay" từng ngày lấy từ bảng tổng hợp TongHopBanHangNgay; lần chạy sau
+# chỉ ghi các ngày mới hoặc có dấu vân tay khác (VD: đơn của ngày cũ hoàn tất muộn / bị sửa) và xóa
+# các ngày không còn đơn hoàn tất. Ghi lại một ngày luôn thay cả tệp của ngày đó (chạy lại an toàn).
+
+THU_MUC_XUAT = os.getenv("ANALYTICS_EXPORT_DIR", "analytics_export")
+DINH_DANG_MAC_DINH = os.getenv("ANALYTICS_EXPORT_FORMAT", "parquet")
+DUOI_TEP = {"parquet": ".parquet", "arrow": ".arrow"}
+TEP_MANIFEST = "_manifest.json"
+KICH_THUOC_LO = 2000
+
+# Khóa advisory: mỗi worker uvicorn đều có lịch chạy riêng, chỉ một tiến trình ghi thư mục tại một thời điểm
+KHOA_XUAT = "xuat_lich_su_ban_hang"
+
+# Dấu vân tay của từng ngày đã kết thúc, đọc từ bảng tổng hợp (không quét ChiTietDonHangBan)
+SQL_DAU_VAN_TAY_NGAY = """
+    SELECT ngay,
+           md5(string_agg(concat_ws(':', id_san_pham, id_khach_hang, id_nhan_vien, so_luong, doanh_thu, gia_von, so_don),
+                          ',' ORDER BY id_san_pham, id_khach_hang, id_nhan_vien)) AS dau_van_tay
+    FROM TongHopBanHangNgay
+    WHERE ngay < CURRENT_DATE AND so_don > 0
+    GROUP BY ngay;
+"""
+
+# Dòng hàng của các ngày cần ghi (khoảng nửa mở theo giờ cửa hàng, index (trang_thai, ngay_dat_hang))
+SQL_DONG_HANG_DA_BAN = """
+    SELECT dhb.ngay_dat_hang::date AS ngay, dhb.id AS id_don_hang_ban, ct.id AS id_chi_tiet_don_hang_ban,
+           dhb.ngay_dat_hang, dhb.id_khach_hang, dhb.id_nhan_vien, ct.id_san_pham, sp.id_danh_muc,
+           ct.so_luong, ct.gia_ban_niem_yet_don_vi, ct.giam_gia, ct.gia_ban_cuoi_cung_don_vi,
+           ct.tong_gia_ban, ct.tong_gia_von
+    FROM DonHangBan dhb
+    JOIN ChiTietDonHangBan ct ON ct.id_don_hang_ban = dhb.id
+    JOIN SanPham sp ON sp.id = ct.id_san_pham
+    WHERE dhb.trang_thai_don_hang = 'Hoàn tất'
+      AND dhb.ngay_dat_hang >= %s AND dhb.ngay_dat_hang < %s
+      AND dhb.ngay_dat_hang::date = ANY(%s)
+    ORDER BY dhb.ngay_dat_hang, dhb.id, ct.id
+"""
+
+
+def _arrow_schema():
+    """Lược đồ tệp (cột "ngay" nằm ở tên thư mục phân vùng)."""
+    return pa.schema([
+        ("id_don_hang_ban", pa.int32()),
+        ("id_chi_tiet_don_hang_ban", pa.int32()),
+        ("ngay_dat_hang", pa.timestamp("us", tz=SHOP_TIMEZONE)),
+        ("id_khach_hang", pa.int32()),
+        ("id_nhan_vien", pa.int32()),
+        ("id_san_pham", pa.int32()),
+        ("id_danh_muc", pa.int32()),
+        ("so_luong", pa.int32()),
+        ("gia_ban_niem_yet_don_vi", pa.decimal128(12, 0)),
+        ("giam_gia", pa.decimal128(5, 2)),
+        ("gia_ban_cuoi_cung_don_vi", pa.decimal128(12, 0)),
+        ("tong_gia_ban", pa.decimal128(15, 0)),
+        ("tong_gia_von", pa.decimal128(15, 0)),
+    ])
+
+
+def _thu_muc_ngay(thu_muc, ngay):
+    return os.path.join(thu_muc, f"ngay={ngay}")
+
+
+def _doc_manifest(thu_muc, dinh_dang):
+    """Dấu vân tay các ngày đã xuất ({'YYYY-MM-DD': '...'}); rỗng nếu chưa có hoặc khác định dạng."""
+    try:
+        with open(os.path.join(thu_muc, TEP_MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return manifest.get("ngay", {}) if manifest.get("dinh_dang") == dinh_dang else {}
+
+
+def _ghi_tep_thay_the(duong_dan, ghi):
+    """Ghi vào tệp tạm rồi đổi tên: người đọc không bao giờ thấy tệp ghi dở."""
+    tam = duong_dan + ".tmp"
+    ghi(tam)
+    os.replace(tam, duong_dan)
+
+
+def _ghi_manifest(thu_muc, dinh_dang, dau_van_tay):
+    def ghi(tam):
+        with open(tam, "w", encoding="utf-8") as f:
+            json.dump({"dinh_dang": dinh_dang, "ngay": dau_van_tay}, f, ensure_ascii=False, indent=1, sort_keys=True)
+    _ghi_tep_thay_the(os.path.join(thu_muc, TEP_MANIFEST), ghi)
+
+
+def _ghi_phan_vung(thu_muc, dinh_dang, ngay, cac_dong):
+    """Ghi (thay) tệp của một ngày từ danh sách dòng (bỏ cột ngay đầu tiên)."""
+    schema = _arrow_schema()
+    cac_cot = list(zip(*cac_dong))[1:]
+    table = pa.Table.from_arrays([pa.array(cot, type=truong.type) for cot, truong in zip(cac_cot, schema)],
+                                 schema=schema)
+
+    def ghi(tam):
+        if dinh_dang == "parquet":
+            pq.write_table(table, tam, compression="zstd")
+        else:
+            with pa.OSFile(tam, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+                writer.write_table(table)
+
+    os.makedirs(_thu_muc_ngay(thu_muc, ngay), exist_ok=True)
+    _ghi_tep_thay_the(os.path.join(_thu_muc_ngay(thu_muc, ngay), "ban_hang" + DUOI_TEP[dinh_dang]), ghi)
+
+
+def export_sales_history(thu_muc: str = None, dinh_dang: str = None, full: bool = False):
+    """
+    Xuất (bổ sung) lịch sử dòng hàng đã bán ra các tệp cột theo ngày.
+
+    Args:
+        thu_muc (str): Thư mục đích, mặc định ANALYTICS_EXPORT_DIR.
+        dinh_dang (str): 'parquet' hoặc 'arrow' (Arrow IPC), mặc định ANALYTICS_EXPORT_FORMAT.
+        full (bool): True - ghi lại mọi ngày (bỏ qua manifest).
+
+    Returns:
+        dict or None: {"thu_muc", "dinh_dang", "so_ngay_ghi", "so_ngay_xoa", "so_dong_ghi"}
+                      ({"bo_qua": True} nếu tiến trình khác đang xuất), hoặc None nếu có lỗi.
+    Raises:
+        ValueError: dinh_dang không hợp lệ.
+    """
+    thu_muc = thu_muc or THU_MUC_XUAT
+    dinh_dang = dinh_dang or DINH_DANG_MAC_DINH
+    if dinh_dang not in DUOI_TEP:
+        raise ValueError(f"Định dạng phải là một trong: {', '.join(DUOI_TEP)}.")
+    if not CO_PYARROW:
+        print("Lỗi: Chưa cài pyarrow, không thể xuất dữ liệu phân tích.", file=sys.stderr)
+        return None
+
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_try_advisory_lock(hashtext(%s));", (KHOA_XUAT,))
+            if not cur.fetchone()[0]:
+                return {"bo_qua": True}
+        try:
+            os.makedirs(thu_muc, exist_ok=True)
+            da_xuat = {} if full else _doc_manifest(thu_muc, dinh_dang)
+
+            with conn.cursor() as cur:
+                cur.execute(SQL_DAU_VAN_TAY_NGAY)
+                hien_tai = {str(ngay): dau_van_tay for ngay, dau_van_tay in cur.fetchall()}
+
+            can_ghi = sorted(ngay for ngay, dau_van_tay in hien_tai.items() if da_xuat.get(ngay) != dau_van_tay)
+            da_ghi = set()
+            so_dong_ghi = 0
+            if can_ghi:
+                tu_luc, den_truoc = shop_day_range(date.fromisoformat(can_ghi[0]), date.fromisoformat(can_ghi[-1]))
+                # Con trỏ phía máy chủ: chỉ giữ dòng của một ngày trong bộ nhớ
+                with conn.cursor(name="xuat_lich_su_ban_hang") as cur:
+                    cur.itersize = KICH_THUOC_LO
+                    cur.execute(SQL_DONG_HANG_DA_BAN, (tu_luc, den_truoc, [date.fromisoformat(n) for n in can_ghi]))
+                    ngay_dang_doc, cac_dong = None, []
+                    for dong in cur:
+                        if dong[0] != ngay_dang_doc and cac_dong:
+                            _ghi_phan_vung(thu_muc, dinh_dang, ngay_dang_doc, cac_dong)
+                            da_ghi.add(str(ngay_dang_doc))
+                            so_dong_ghi += len(cac_dong)
+                            cac_dong = []
+                        ngay_dang_doc = dong[0]
+                        cac_dong.append(dong)
+                    if cac_dong:
+                        _ghi_phan_vung(thu_muc, dinh_dang, ngay_dang_doc, cac_dong)
+                        da_ghi.add(str(ngay_dang_doc))
+                        so_dong_ghi += len(cac_dong)
+            conn.commit()
+
+            # Ngày không còn đơn hoàn tất (đã hủy / trả hàng...) -> xóa phân vùng
+            can_xoa = (set(da_xuat) - set(hien_tai)) | (set(can_ghi) - da_ghi)
+            for ngay in can_xoa:
+                shutil.rmtree(_thu_muc_ngay(thu_muc, ngay), ignore_errors=True)
+            if full:
+                for ten in os.listdir(thu_muc):
+                    if ten.startswith("ngay=") and ten[len("ngay="):] not in da_ghi:
+                        shutil.rmtree(os.path.join(thu_muc, ten), ignore_errors=True)
+
+            _ghi_manifest(thu_muc, dinh_dang, {ngay: dau_van_tay for ngay, dau_van_tay in hien_tai.items()
+                                               if ngay in da_ghi or (ngay in da_xuat and ngay not in can_ghi)})
+            return {"thu_muc": os.path.abspath(thu_muc), "dinh_dang": dinh_dang, "so_ngay_ghi": len(da_ghi),
+                    "so_ngay_xoa": len(can_xoa), "so_dong_ghi": so_dong_ghi}
+        finally:
+            conn.rollback()
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_unlock(hashtext(%s));", (KHOA_XUAT,))
+            conn.commit()
+    except (psycopg2.Error, OSError) as e:
+        print(f"Lỗi khi xuất lịch sử bán hàng: {e}", file=sys.stderr)
+        conn.rollback()
+        return None
+    finally:
+        close_db_connection(conn)
+
+
+def get_sales_history_export_status(thu_muc: str = None, dinh_dang: str = None):
+    """Các ngày đã xuất theo manifest: {"thu_muc", "dinh_dang", "so_ngay", "ngay_dau", "ngay_cuoi"}."""
+    thu_muc = thu_muc or THU_MUC_XUAT
+    dinh_dang = dinh_dang or DINH_DANG_MAC_DINH
+    cac_ngay = sorted(_doc_manifest(thu_muc, dinh_dang))
+    return {"thu_muc": os.path.abspath(thu_muc), "dinh_dang": dinh_dang, "co_pyarrow": CO_PYARROW,
+            "so_ngay": len(cac_ngay), "ngay_dau": cac_ngay[0] if cac_ngay else None,
+            "ngay_cuoi": cac_ngay[-1] if cac_ngay else None}
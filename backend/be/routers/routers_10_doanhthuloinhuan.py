@@ -1,8 +1,10 @@
 # backend/be/routers/routers_10_doanhthuloinhuan.py
 
 from fastapi import APIRouter, HTTPException, Query
+from datetime import date
 from typing import Optional, Dict, Any
 import be.reports.operation_10_doanhthuloinhuan as operation_10
+from be import report_cache, report_engine
 
 router = APIRouter(
     prefix="/baocao/taichinh",
@@ -23,8 +25,17 @@ def get_financial_report(
     - Không sử dụng 'response_model' cứng để đảm bảo các trường dữ liệu tính toán động (dynamic) được trả về đầy đủ.
     """
     
-    # Gọi hàm operation để lấy số liệu (đã bao gồm logic trừ thuế 11.5%)
-    report_data = operation_10.get_financial_report(period, start_date, end_date)
+    # Gọi hàm operation để lấy số liệu (đã bao gồm logic trừ thuế 11.5%), qua bộ đệm kết quả (be/report_cache.py).
+    # Báo cáo được tính đúng khoảng ngày tu/den của khóa; period nằm trong khóa vì nhãn kỳ báo cáo
+    # ('Tuần ...', 'Tháng ...') khác nhau. Bộ máy báo cáo trong bộ nhớ (be/report_engine.py) trả lời trước nếu đang bật.
+    report_data = report_cache.cached_report(
+        "taichinh", period, start_date, end_date, (period,),
+        lambda tu, den: operation_10.get_financial_report(
+            'custom', tu, den,
+            ky_bao_cao=operation_10.get_period_label(period, date.fromisoformat(tu), date.fromisoformat(den))),
+        tinh_trong_bo_nho=lambda tu, den: report_engine.get_financial_report(
+            tu, den, operation_10.get_period_label(period, tu, den))
+    )
     
     if report_data is None:
         raise HTTPException(
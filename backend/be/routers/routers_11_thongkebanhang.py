@@ -9,6 +9,7 @@ from enum import Enum
 
 # Import các hàm nghiệp vụ
 from be.reports import operation_11_thongkebanhang as stats_ops
+from be import report_cache, report_engine
 
 # Khởi tạo router mới, gộp chung vào tag "Báo cáo"
 router = APIRouter(
@@ -80,10 +81,12 @@ def get_order_count_report(
     """
     Tạo báo cáo thống kê số lượng đơn hàng đã 'Hoàn tất' theo từng ngày.
     """
-    report = stats_ops.get_order_count_report(
-        period.value,
+    report = report_cache.cached_report(
+        "order-count", period.value,
         start_date.isoformat() if start_date else None,
-        end_date.isoformat() if end_date else None
+        end_date.isoformat() if end_date else None,
+        (), lambda tu, den: stats_ops.get_order_count_report('custom', tu, den),
+        tinh_trong_bo_nho=report_engine.get_order_count_report
     )
     if report is None:
         raise HTTPException(status_code=400, detail="Không thể tạo báo cáo.")
@@ -103,12 +106,14 @@ def get_best_selling_products_report(
     """
     Tạo báo cáo về các sản phẩm bán chạy nhất trong một khoảng thời gian.
     """
-    report = stats_ops.get_best_selling_products_report(
-        period.value,
-        sort_by.value,
-        top_n.value,
+    report = report_cache.cached_report(
+        "best-selling-products", period.value,
         start_date.isoformat() if start_date else None,
-        end_date.isoformat() if end_date else None
+        end_date.isoformat() if end_date else None,
+        (sort_by.value, top_n.value),
+        lambda tu, den: stats_ops.get_best_selling_products_report('custom', sort_by.value, top_n.value, tu, den),
+        tinh_trong_bo_nho=lambda tu, den: report_engine.get_best_selling_products_report(
+            tu, den, sort_by.value, top_n.value)
     )
     if report is None:
         raise HTTPException(status_code=400, detail="Không thể tạo báo cáo.")
@@ -128,3 +133,15 @@ def get_inventory_report(
     if report is None:
         raise HTTPException(status_code=500, detail="Lỗi máy chủ nội bộ khi tạo báo cáo tồn kho.")
     return report
+
+
+@router.get("/cache-stats", summary="Thống kê bộ đệm kết quả báo cáo")
+def get_report_cache_stats():
+    """Số lần trúng / trượt bộ đệm báo cáo, số kết quả đang giữ, số lần bị vô hiệu hóa."""
+    return report_cache.get_report_cache_stats()
+
+
+@router.get("/engine-stats", summary="Thống kê bộ máy báo cáo trong bộ nhớ")
+def get_report_engine_stats():
+    """Bộ máy có bật / sẵn sàng không, số dòng và dung lượng dữ liệu đang giữ, số lần nạp lại."""
+    return report_engine.get_report_engine_stats()
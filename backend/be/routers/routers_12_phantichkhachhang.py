@@ -9,6 +9,7 @@ from enum import Enum
 
 # Import các hàm nghiệp vụ
 from be.reports import operation_12_phantichkhachhang as customer_ops
+from be import report_cache, report_engine
 
 # Khởi tạo router mới, gộp chung vào tag "Báo cáo"
 router = APIRouter(
@@ -59,6 +60,25 @@ class TopSpenderOut(BaseModel):
         from_attributes = True
 
 
+class CohortMonth(BaseModel):
+    so_thang: int = Field(..., description="Số tháng kể từ tháng mua đầu tiên (0 = tháng cohort)")
+    so_khach_hoat_dong: int
+    ti_le_giu_chan: Optional[float] = None
+    doanh_thu: Decimal
+
+
+class CustomerCohort(BaseModel):
+    thang_cohort: str
+    so_khach_hang: int
+    theo_thang: List[CohortMonth]
+
+
+class CustomerCohortReportOut(BaseModel):
+    tu_thang: str
+    den_thang: str
+    cohorts: List[CustomerCohort]
+
+
 # --- API Endpoints ---
 
 @router.get("/customer-acquisition", response_model=CustomerAcquisitionReportOut,
@@ -73,10 +93,13 @@ def get_customer_acquisition_report(
     - **Khách hàng mới**: Là những người có đơn hàng 'Hoàn tất' đầu tiên trong kỳ báo cáo.
     - **Khách hàng quay lại**: Là những người có đơn hàng 'Hoàn tất' trong kỳ nhưng đã có đơn hàng hoàn tất trước đó.
     """
-    report = customer_ops.get_customer_acquisition_report(
-        period.value,
+    # Phân loại mới / quay lại dựa trên lần mua đầu tiên trong toàn bộ lịch sử -> phụ thuộc mọi ngày trước kỳ
+    report = report_cache.cached_report(
+        "customer-acquisition", period.value,
         start_date.isoformat() if start_date else None,
-        end_date.isoformat() if end_date else None
+        end_date.isoformat() if end_date else None,
+        (), lambda tu, den: customer_ops.get_customer_acquisition_report('custom', tu, den),
+        phu_thuoc_tu=date.min
     )
     if report is None:
         raise HTTPException(status_code=400, detail="Không thể tạo báo cáo.")
@@ -99,11 +122,42 @@ def get_top_spending_customers_report(
     """
     Tạo báo cáo về các khách hàng có tổng chi tiêu cao nhất trong một khoảng thời gian.
     """
-    report = customer_ops.get_top_spending_customers_report(
-        period.value,
-        top_n.value,
+    report = report_cache.cached_report(
+        "top-spending-customers", period.value,
         start_date.isoformat() if start_date else None,
-        end_date.isoformat() if end_date else None
+        end_date.isoformat() if end_date else None,
+        (top_n.value,),
+        lambda tu, den: customer_ops.get_top_spending_customers_report('custom', top_n.value, tu, den),
+        tinh_trong_bo_nho=lambda tu, den: report_engine.get_top_spending_customers_report(tu, den, top_n.value)
+    )
+    if report is None:
+        raise HTTPException(status_code=400, detail="Không thể tạo báo cáo.")
+    return report
+
+
+@router.get("/customer-cohorts", response_model=CustomerCohortReportOut,
+            summary="Lấy báo cáo cohort giữ chân khách hàng theo tháng")
+def get_customer_cohort_report(
+        from_month: Optional[str] = Query(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$",
+                                          description="Tháng bắt đầu (YYYY-MM), mặc định 12 tháng đã kết thúc gần nhất"),
+        to_month: Optional[str] = Query(None, pattern=r"^\d{4}-(0[1-9]|1[0-2])$",
+                                        description="Tháng kết thúc (YYYY-MM), mặc định tháng trước")
+):
+    """
+    Ma trận cohort: khách hàng được nhóm theo tháng có đơn 'Hoàn tất' đầu tiên; mỗi cohort có số khách
+    còn mua hàng, tỉ lệ giữ chân và doanh thu theo từng tháng kể từ tháng đầu tiên.
+    """
+    try:
+        tu_ngay, den_ngay = customer_ops.get_month_range(from_month, to_month)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Cohort dựa vào lần mua đầu tiên trong toàn bộ lịch sử -> phụ thuộc mọi ngày trước kỳ.
+    # Các tháng đã kết thúc được giữ trong bộ đệm tới khi có dữ liệu ghi lùi ngày.
+    report = report_cache.get_or_compute(
+        "customer-cohorts", tu_ngay, den_ngay, (),
+        lambda: customer_ops.get_customer_cohort_report(from_month, to_month),
+        phu_thuoc_tu=date.min
     )
     if report is None:
         raise HTTPException(status_code=400, detail="Không thể tạo báo cáo.")
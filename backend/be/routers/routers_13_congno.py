@@ -3,6 +3,7 @@
 from fastapi import APIRouter, HTTPException, status, Query
 from pydantic import BaseModel
 from typing import List, Optional
+from datetime import date
 from decimal import Decimal
 
 # Import các hàm nghiệp vụ
@@ -33,6 +34,31 @@ class ReceivablesReportOut(BaseModel):
     details: List[ReceivablesDetailOut]
 
 
+class AgingDetailOut(BaseModel):
+    id_khach_hang: int
+    ten_khach_hang: str
+    tong_cong_no: Decimal
+    theo_nhom: List[Decimal]
+
+
+class AgingSummaryOut(BaseModel):
+    tong_cong_no: Decimal
+    theo_nhom: List[Decimal]
+
+
+class AgingReportOut(BaseModel):
+    ngay_tinh: date
+    nhom_tuoi_no: List[str]
+    summary: AgingSummaryOut
+    details: List[AgingDetailOut]
+
+
+class CustomerBalanceOut(BaseModel):
+    id_khach_hang: int
+    tong_cong_no: Decimal
+    so_don_no: int
+
+
 # --- API Endpoint ---
 
 @router.get("/receivables", response_model=ReceivablesReportOut, summary="Lấy báo cáo công nợ phải thu")
@@ -57,3 +83,33 @@ def get_receivables_report(
         report["summary"] = {"tong_cong_no_phai_thu": 0, "tong_cong_no_qua_han": 0}
 
     return report
+
+
+@router.get("/receivables-aging", response_model=AgingReportOut, summary="Lấy báo cáo tuổi nợ phải thu")
+def get_receivables_aging_report(
+        buckets: List[int] = Query([30, 60, 90], description="Các mốc số ngày (tăng dần) chia nhóm tuổi nợ"),
+        as_of: Optional[date] = Query(None, description="Ngày tính tuổi nợ, mặc định hôm nay")
+):
+    """
+    Công nợ phải thu của từng khách hàng chia theo nhóm tuổi nợ (mặc định 0-30, 31-60, 61-90, 90+ ngày
+    kể từ ngày giao hàng thực tế). Số liệu đọc từ sổ công nợ do trigger duy trì.
+    """
+    report = receivables_ops.get_receivables_aging_report(buckets, as_of.isoformat() if as_of else None)
+    if report is None:
+        raise HTTPException(status_code=400, detail="Không thể tạo báo cáo tuổi nợ. Kiểm tra các mốc tuổi nợ.")
+    return report
+
+
+@router.get("/receivables/customers/{id_khach_hang}", response_model=CustomerBalanceOut,
+            summary="Lấy số dư công nợ của một khách hàng")
+def get_customer_receivable_balance(id_khach_hang: int):
+    """
+    Tổng số tiền còn nợ và số đơn đang nợ của khách hàng (đã trừ các lần thanh toán từng phần).
+    """
+    balance = receivables_ops.get_customer_receivable_balance(id_khach_hang)
+    if balance is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Không thể lấy công nợ khách hàng."
+        )
+    return balance
@@ -0,0 +1,87 @@
+# be/routers/routers_14_phankhucrfm.py
+
+from fastapi import APIRouter, HTTPException, status, Query
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+from decimal import Decimal
+from enum import Enum
+
+# Import các hàm nghiệp vụ
+from be.reports import operation_14_phankhucrfm as rfm_ops
+
+# Khởi tạo router mới, gộp chung vào tag "Báo cáo"
+router = APIRouter(
+    prefix="/reports",
+    tags=["Báo cáo"],
+)
+
+
+# --- Định nghĩa các giá trị Enum để validation ---
+PhanKhuc = Enum("PhanKhuc", {ten: ten for ten in rfm_ops.PHAN_KHUC}, type=str)
+
+
+# --- Pydantic Models ---
+class RFMSegmentSummaryOut(BaseModel):
+    phan_khuc: str
+    so_khach_hang: int
+    tong_chi_tieu: Decimal
+    diem_r_trung_binh: Decimal
+    diem_f_trung_binh: Decimal
+    diem_m_trung_binh: Decimal
+    ngay_cap_nhat: datetime
+
+
+class RFMRefreshOut(BaseModel):
+    so_khach_can_tinh: int
+    so_dong_xoa: int
+    so_dong_cap_nhat: int
+
+
+# --- API Endpoints ---
+
+@router.get("/rfm-segments", response_model=List[RFMSegmentSummaryOut],
+            summary="Tổng hợp các phân khúc khách hàng RFM")
+def get_rfm_segments():
+    """
+    Số khách hàng, tổng chi tiêu và điểm R/F/M trung bình của từng phân khúc (từ bảng điểm tính sẵn).
+    """
+    report = rfm_ops.get_rfm_segment_summary()
+    if report is None:
+        raise HTTPException(status_code=500, detail="Lỗi Server khi lấy phân khúc khách hàng.")
+    return report
+
+
+@router.get("/rfm-segments/customers", summary="Danh sách khách hàng theo phân khúc RFM (theo trang)")
+def get_rfm_segment_customers(
+        phan_khuc: Optional[PhanKhuc] = Query(None, description="Phân khúc cần xem; bỏ trống để lấy tất cả"),
+        limit: int = Query(50, ge=1, le=200),
+        cursor: Optional[str] = Query(None, description="Giá trị next_cursor của trang trước"),
+        fields: Optional[str] = Query(None, description="Danh sách trường cần lấy, phân cách bởi dấu phẩy")
+):
+    """
+    Duyệt khách hàng của một phân khúc, chi tiêu cao trước, phân trang bằng cursor.
+    """
+    try:
+        page = rfm_ops.get_rfm_customers_page(phan_khuc.value if phan_khuc else None, limit, cursor, fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if page is None:
+        raise HTTPException(status_code=500, detail="Lỗi Server khi lấy danh sách khách hàng.")
+
+    return {"status": "success", "count": len(page["data"]), "next_cursor": page["next_cursor"], "data": page["data"]}
+
+
+@router.post("/rfm-segments/refresh", response_model=RFMRefreshOut, summary="Tính lại điểm RFM")
+def refresh_rfm_segments(
+        full: bool = Query(False, description="True: tính lại toàn bộ; False: chỉ khách hàng có đơn thay đổi")
+):
+    """
+    Tính điểm RFM theo yêu cầu. Mặc định chỉ tính lại chỉ số của khách hàng có đơn hoàn tất thay đổi
+    kể từ lần trước (toàn bộ được tính lại hằng đêm).
+    """
+    result = rfm_ops.refresh_rfm_scores(full=full)
+    if result is None:
+        raise HTTPException(status_code=500, detail="Lỗi Server khi tính điểm RFM.")
+    return result
@@ -0,0 +1,93 @@
+# be/routers/routers_15_nhapdulieu.py
+
+import os
+import shutil
+import tempfile
+from fastapi import APIRouter, HTTPException, status, Query, UploadFile, File, BackgroundTasks
+from pydantic import BaseModel
+from typing import List, Optional
+from datetime import datetime
+from enum import Enum
+
+# Import các hàm nghiệp vụ
+from be.operation import operation_15_nhapdulieu as import_ops
+
+# Khởi tạo router mới
+router = APIRouter(
+    prefix="/imports",
+    tags=["Nhập dữ liệu"],
+)
+
+
+# --- Định nghĩa các giá trị Enum để validation ---
+LoaiDuLieu = Enum("LoaiDuLieu", {ten: ten for ten in import_ops.LOAI_DU_LIEU}, type=str)
+
+
+# --- Pydantic Models ---
+class ImportRowError(BaseModel):
+    so_dong: int
+    noi_dung_loi: str
+
+
+class ImportJobOut(BaseModel):
+    id: int
+    loai_du_lieu: str
+    ten_tep: str
+    trang_thai: str
+    so_dong_da_doc: int
+    so_dong_them_moi: int
+    so_dong_cap_nhat: int
+    so_dong_khong_doi: int
+    so_dong_loi: int
+    thong_bao_loi: Optional[str] = None
+    ngay_tao_ban_ghi: datetime
+    ngay_hoan_tat: Optional[datetime] = None
+    loi: List[ImportRowError] = []
+
+
+# --- API Endpoints ---
+
+@router.post("/{loai_du_lieu}", response_model=ImportJobOut, status_code=status.HTTP_202_ACCEPTED,
+             summary="Nhập hàng loạt sản phẩm / khách hàng / nhà cung cấp từ tệp CSV hoặc XLSX")
+def start_import(loai_du_lieu: LoaiDuLieu, background_tasks: BackgroundTasks,
+                 file: UploadFile = File(..., description="Tệp .csv (UTF-8) hoặc .xlsx, dòng đầu là tên cột")):
+    """
+    Nhận tệp và xử lý nền: dòng hợp lệ được thêm mới hoặc cập nhật theo khóa
+    (ma_san_pham / so_dien_thoai / ten_nha_cung_cap), dòng lỗi được bỏ qua và ghi lại lý do.
+    Theo dõi tiến độ bằng `GET /imports/{id}`.
+    """
+    # Chép tệp tải lên ra đĩa theo từng phần TRƯỚC khi tạo job: chép lỗi giữa chừng thì
+    # không để lại job 'Đang chờ' mãi mãi. Job nền đọc tuần tự rồi xóa tệp.
+    tmp_path = None
+    try:
+        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename or "")[1]) as tmp:
+            tmp_path = tmp.name
+            shutil.copyfileobj(file.file, tmp)
+    except OSError as e:
+        if tmp_path:
+            os.unlink(tmp_path)
+        raise HTTPException(status_code=500, detail=f"Lỗi Server khi lưu tệp tải lên: {e}")
+
+    try:
+        job_id = import_ops.create_import_job(loai_du_lieu.value, file.filename)
+    except ValueError as e:
+        os.unlink(tmp_path)
+        raise HTTPException(status_code=400, detail=str(e))
+    if job_id is None:
+        os.unlink(tmp_path)
+        raise HTTPException(status_code=500, detail="Lỗi Server khi tạo lần nhập dữ liệu.")
+
+    background_tasks.add_task(import_ops.run_import_job, job_id, tmp_path)
+
+    return import_ops.get_import_job(job_id, error_limit=0)
+
+
+@router.get("/{job_id}", response_model=ImportJobOut, summary="Tiến độ và kết quả một lần nhập dữ liệu")
+def get_import(job_id: int, error_limit: int = Query(100, ge=0, le=1000, description="Số lỗi dòng tối đa trả về")):
+    """
+    Số dòng đã đọc / thêm mới / cập nhật / lỗi và danh sách lỗi theo số dòng trong tệp.
+    """
+    job = import_ops.get_import_job(job_id, error_limit=error_limit)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Không tìm thấy lần nhập dữ liệu với ID {job_id}.")
+    return job
@@ -0,0 +1,47 @@
+# be/routers/routers_16_xuatdulieu.py
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
+from datetime import date
+from enum import Enum
+
+# Import các hàm nghiệp vụ
+from be.operation import operation_16_xuatdulieu as export_ops
+
+# Khởi tạo router mới
+router = APIRouter(
+    prefix="/exports",
+    tags=["Xuất dữ liệu"],
+)
+
+
+# --- Định nghĩa các giá trị Enum để validation ---
+LoaiXuat = Enum("LoaiXuat", {ten: ten for ten in export_ops.LOAI_XUAT}, type=str)
+DinhDangXuat = Enum("DinhDangXuat", {ten: ten for ten in export_ops.DINH_DANG_XUAT}, type=str)
+
+
+# --- API Endpoints ---
+
+@router.get("/{loai_xuat}", summary="Xuất đơn hàng / chi tiết đơn / đơn nhập / chi phí ra CSV hoặc NDJSON")
+async def export_data(
+        loai_xuat: LoaiXuat,
+        dinh_dang: DinhDangXuat = Query(DinhDangXuat.csv, description="csv hoặc ndjson (mỗi dòng một object JSON)"),
+        tu_ngay: Optional[date] = Query(None, description="Từ ngày (YYYY-MM-DD), mặc định ngày đầu tháng"),
+        den_ngay: Optional[date] = Query(None, description="Đến ngày (YYYY-MM-DD), mặc định hôm nay")
+):
+    """
+    Tải toàn bộ dữ liệu trong khoảng ngày dưới dạng tệp, được gửi dần theo từng lô dòng
+    (không giới hạn số dòng, không giữ cả kết quả trong bộ nhớ máy chủ).
+    """
+    try:
+        tu_ngay, den_ngay = export_ops.get_export_range(tu_ngay, den_ngay)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    ten_tep = f"{loai_xuat.value}_{tu_ngay}_{den_ngay}.{dinh_dang.value}"
+    return StreamingResponse(
+        export_ops.stream_export(loai_xuat.value, dinh_dang.value, tu_ngay, den_ngay),
+        media_type=export_ops.DINH_DANG_XUAT[dinh_dang.value],
+        headers={"Content-Disposition": f'attachment; filename="{ten_tep}"'}
+    )
@@ -0,0 +1,74 @@
+# be/routers/routers_17_xuatphantich.py
+
+from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel
+from typing import Optional
+from enum import Enum
+
+# Import các hàm nghiệp vụ
+from be.reports import operation_17_xuatphantich as analytics_ops
+
+# Khởi tạo router mới, gộp chung vào tag "Báo cáo"
+router = APIRouter(
+    prefix="/reports",
+    tags=["Báo cáo"],
+)
+
+
+# --- Định nghĩa các giá trị Enum để validation ---
+DinhDangPhanTich = Enum("DinhDangPhanTich", {ten: ten for ten in analytics_ops.DUOI_TEP}, type=str)
+
+
+# --- Pydantic Models ---
+class SalesHistoryExportOut(BaseModel):
+    thu_muc: str
+    dinh_dang: str
+    so_ngay_ghi: int
+    so_ngay_xoa: int
+    so_dong_ghi: int
+
+
+class SalesHistoryExportStatusOut(BaseModel):
+    thu_muc: str
+    dinh_dang: str
+    co_pyarrow: bool
+    so_ngay: int
+    ngay_dau: Optional[str] = None
+    ngay_cuoi: Optional[str] = None
+
+
+# --- API Endpoints ---
+
+@router.get("/sales-history-export", response_model=SalesHistoryExportStatusOut,
+            summary="Trạng thái tệp xuất lịch sử bán hàng (Parquet / Arrow)")
+def get_sales_history_export(
+        dinh_dang: Optional[DinhDangPhanTich] = Query(None, description="parquet hoặc arrow; mặc định theo cấu hình")
+):
+    """
+    Thư mục xuất và khoảng ngày đã có tệp theo manifest.
+    """
+    return analytics_ops.get_sales_history_export_status(dinh_dang=dinh_dang.value if dinh_dang else None)
+
+
+@router.post("/sales-history-export", response_model=SalesHistoryExportOut,
+             summary="Xuất lịch sử bán hàng ra tệp cột cho phân tích ngoại tuyến")
+def run_sales_history_export(
+        full: bool = Query(False, description="True: ghi lại mọi ngày; False: chỉ ngày mới hoặc có thay đổi"),
+        dinh_dang: Optional[DinhDangPhanTich] = Query(None, description="parquet hoặc arrow; mặc định theo cấu hình")
+):
+    """
+    Ghi các dòng hàng đã bán (mỗi ngày một phân vùng ngay=YYYY-MM-DD) vào thư mục ANALYTICS_EXPORT_DIR.
+    Mặc định chỉ ghi bổ sung các ngày thay đổi kể từ lần trước (toàn bộ vẫn được kiểm tra hằng đêm).
+    """
+    if not analytics_ops.CO_PYARROW:
+        raise HTTPException(status_code=503, detail="Máy chủ chưa cài pyarrow, không thể xuất dữ liệu phân tích.")
+    try:
+        result = analytics_ops.export_sales_history(dinh_dang=dinh_dang.value if dinh_dang else None, full=full)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if result is None:
+        raise HTTPException(status_code=500, detail="Lỗi Server khi xuất lịch sử bán hàng.")
+    if result.get("bo_qua"):
+        raise HTTPException(status_code=409, detail="Đang có một lần xuất khác chạy, vui lòng thử lại sau.")
+    return result
@@ -1,70 +1,28 @@
 from fastapi import APIRouter, HTTPException, Query
 from typing import Optional
-from ..db_connection import execute_query
+from .. import catalog_cache
 
 router = APIRouter()
 
 @router.get("/san-pham/danh-sach")
-async def get_danh_sach_san_pham(tu_khoa: Optional[str] = None):
+async def get_danh_sach_san_pham(
+    tu_khoa: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Số kết quả tối đa (mặc định 50 khi có từ khóa)")
+):
     """
     Lấy danh sách sản phẩm cho POS.
-    - JOIN ngầm với bảng LichSuGiaNiemYet để lấy giá bán hiện tại.
-    - Tìm kiếm theo Tên hoặc Mã sản phẩm.
+    - Giá bán hiện tại = giá niêm yết mới nhất có hiệu lực tính đến hôm nay.
+    - Tìm kiếm theo Tên (không dấu: "sua" khớp "Sữa") hoặc đầu Mã sản phẩm, kết quả xếp theo mức độ khớp.
     - Cảnh báo nếu tồn kho <= 5.
+    - Phục vụ từ bộ đệm danh mục trong RAM (be/catalog_cache.py, làm mới qua LISTEN/NOTIFY);
+      đọc thẳng từ DB khi bộ đệm chưa sẵn sàng.
     """
     try:
-        # Câu query thông minh: Lấy thông tin SP + Giá hiệu lực mới nhất
-        sql = """
-            SELECT 
-                sp.id, 
-                sp.ma_san_pham, 
-                sp.ten_san_pham, 
-                sp.don_vi_tinh, 
-                sp.so_luong_ton_kho,
-                sp.duong_dan_hinh_anh_chinh,
-                -- Subquery: Lấy giá niêm yết mới nhất có hiệu lực tính đến hôm nay
-                COALESCE(
-                    (SELECT gia_niem_yet 
-                     FROM LichSuGiaNiemYet ls 
-                     WHERE ls.id_san_pham = sp.id 
-                       AND ls.ngay_ap_dung <= CURRENT_DATE 
-                     ORDER BY ls.ngay_ap_dung DESC 
-                     LIMIT 1), 
-                    0
-                ) as gia_ban_hien_tai
-            FROM SanPham sp
-            WHERE sp.trang_thai IN ('Đang kinh doanh - Còn hàng', 'Đang kinh doanh - Hết hàng')
-        """
-        
-        params = []
-        if tu_khoa:
-            # Tìm kiếm cả Mã SP và Tên SP (ILIKE không phân biệt hoa thường)
-            sql += " AND (sp.ten_san_pham ILIKE %s OR sp.ma_san_pham ILIKE %s)"
-            search_term = f"%{tu_khoa}%"
-            params.extend([search_term, search_term])
-            
-        sql += " ORDER BY sp.id DESC"
-        
-        # Thực thi query
-        products = execute_query(sql, tuple(params) if params else None)
-        
-        # --- LOGIC XỬ LÝ PYTHON (Cảnh báo tồn kho) ---
-        NGUONG_CANH_BAO = 5
-        
-        for p in products:
-            # Xử lý tồn kho
-            ton_kho = p.get('so_luong_ton_kho') or 0
-            
-            # Gắn cờ cảnh báo
-            if ton_kho <= NGUONG_CANH_BAO:
-                p['canh_bao'] = True
-                p['trang_thai_kho'] = 'Sắp hết hàng'
-            else:
-                p['canh_bao'] = False
-                p['trang_thai_kho'] = 'Còn hàng'
-                
-            # Ép kiểu giá về float cho Frontend dễ tính toán
-            p['gia_ban_hien_tai'] = float(p.get('gia_ban_hien_tai') or 0)
+        if catalog_cache.is_ready():
+            products = catalog_cache.search_catalog(tu_khoa, limit)
+        else:
+            # Thực thi query (async, không chặn event loop)
+            products = await catalog_cache.query_catalog_from_db(tu_khoa, limit)
 
         return {
             "status": "success",
@@ -74,4 +32,10 @@ async def get_danh_sach_san_pham(tu_khoa: Optional[str] = None):
 
     except Exception as e:
         print(f"Lỗi lấy danh sách sản phẩm: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/san-pham/danh-sach/cache-stats")
+async def get_catalog_cache_stats():
+    # Thống kê bộ đệm danh mục POS (số sản phẩm, số lần nạp lại, số thông báo NOTIFY đã nhận)
+    return catalog_cache.get_catalog_stats()
@@ -46,6 +46,13 @@ class SupplierOut(SupplierBase):
         from_attributes = True
 
 
+class SupplierPage(BaseModel):
+    count: int
+    next_cursor: Optional[str] = None  # None nếu là trang cuối
+    total: Optional[int] = None  # Chỉ có khi include_total=true
+    data: List[SupplierOut]
+
+
 # --- API Endpoints ---
 
 @router.post("/", response_model=SupplierOut, status_code=status.HTTP_201_CREATED, summary="Tạo nhà cung cấp mới")
@@ -63,19 +70,27 @@ def create_supplier(supplier: SupplierCreate):
     return created_supplier
 
 
-@router.get("/", response_model=List[SupplierOut], summary="Lấy danh sách nhà cung cấp và tìm kiếm")
+@router.get("/", response_model=SupplierPage, summary="Lấy danh sách nhà cung cấp (phân trang) và tìm kiếm")
 def get_suppliers(
         name: Optional[str] = Query(None, description="Tìm theo tên nhà cung cấp"),
         phone: Optional[str] = Query(None, description="Tìm theo số điện thoại"),
-        email: Optional[str] = Query(None, description="Tìm theo email")
+        email: Optional[str] = Query(None, description="Tìm theo email"),
+        limit: int = Query(50, ge=1, le=200, description="Số dòng mỗi trang"),
+        cursor: Optional[str] = Query(None, description="Giá trị next_cursor của trang trước"),
+        include_total: bool = Query(False, description="Trả thêm tổng số dòng (tốn thêm một truy vấn COUNT)")
 ):
     """
-    Lấy danh sách nhà cung cấp. Có thể tìm kiếm theo tên, SĐT, hoặc email.
+    Lấy danh sách nhà cung cấp theo trang (sắp xếp theo tên). Có thể tìm kiếm theo tên, SĐT, hoặc email.
+    Gửi lại `next_cursor` để lấy trang tiếp theo.
     """
-    suppliers = ncc_ops.get_nhacungcap(name_filter=name, phone_filter=phone, email_filter=email)
-    if suppliers is None:
+    try:
+        page = ncc_ops.get_nhacungcap_page(name_filter=name, phone_filter=phone, email_filter=email,
+                                          limit=limit, cursor=cursor, include_total=include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
         raise HTTPException(status_code=500, detail="Lỗi máy chủ nội bộ khi truy vấn nhà cung cấp.")
-    return suppliers
+    return {"count": len(page["data"]), **page}
 
 
 @router.get("/{supplier_id}", response_model=SupplierOut, summary="Lấy thông tin một nhà cung cấp")
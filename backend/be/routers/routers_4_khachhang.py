@@ -44,12 +44,21 @@ class CustomerUpdate(BaseModel):
 class CustomerOut(CustomerBase):
     id: int
     so_lan_mua_hang: int
+    ngay_mua_dau_tien: Optional[date] = None  # Ngày đơn 'Hoàn tất' đầu tiên (do trigger duy trì)
+    ngay_mua_gan_nhat: Optional[date] = None
     ngay_tao_ban_ghi: datetime
 
     class Config:
         from_attributes = True
 
 
+class CustomerPage(BaseModel):
+    count: int
+    next_cursor: Optional[str] = None  # None nếu là trang cuối
+    total: Optional[int] = None  # Chỉ có khi include_total=true
+    data: List[CustomerOut]
+
+
 # --- API Endpoints ---
 
 @router.post("/", response_model=CustomerOut, status_code=status.HTTP_201_CREATED, summary="Tạo khách hàng mới")
@@ -66,18 +75,41 @@ def create_customer(customer: CustomerCreate):
     return created_customer
 
 
-@router.get("/", response_model=List[CustomerOut], summary="Lấy danh sách khách hàng và tìm kiếm")
+@router.get("/", response_model=CustomerPage, summary="Lấy danh sách khách hàng (phân trang) và tìm kiếm")
 def get_customers(
         name: Optional[str] = Query(None, description="Tìm theo tên khách hàng"),
         phone: Optional[str] = Query(None, description="Tìm theo số điện thoại"),
-        email: Optional[str] = Query(None, description="Tìm theo email")
+        email: Optional[str] = Query(None, description="Tìm theo email"),
+        limit: int = Query(50, ge=1, le=200, description="Số dòng mỗi trang"),
+        cursor: Optional[str] = Query(None, description="Giá trị next_cursor của trang trước"),
+        include_total: bool = Query(False, description="Trả thêm tổng số dòng (tốn thêm một truy vấn COUNT)")
 ):
     """
-    Lấy danh sách khách hàng. Có thể tìm kiếm theo tên, SĐT, hoặc email.
+    Lấy danh sách khách hàng theo trang (sắp xếp theo tên). Có thể tìm kiếm theo tên, SĐT, hoặc email.
+    Gửi lại `next_cursor` để lấy trang tiếp theo.
     """
-    customers = kh_ops.get_khachhang(name_filter=name, phone_filter=phone, email_filter=email)
-    if customers is None:
+    try:
+        page = kh_ops.get_khachhang_page(name_filter=name, phone_filter=phone, email_filter=email,
+                                       limit=limit, cursor=cursor, include_total=include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
         raise HTTPException(status_code=500, detail="Lỗi máy chủ nội bộ khi truy vấn khách hàng.")
+    return {"count": len(page["data"]), **page}
+
+
+@router.get("/search", response_model=List[CustomerOut], summary="Tra cứu nhanh khách hàng (thu ngân)")
+def search_customers(
+        q: str = Query(..., min_length=1, description="Vài số cuối điện thoại, hoặc tên / email (không cần dấu)"),
+        limit: int = Query(20, ge=1, le=100, description="Số kết quả tối đa")
+):
+    """
+    Tra cứu khách hàng khi thanh toán: nhập các số cuối điện thoại hoặc một phần tên.
+    Kết quả được xếp theo mức độ khớp.
+    """
+    customers = kh_ops.search_khachhang(q, limit=limit)
+    if customers is None:
+        raise HTTPException(status_code=500, detail="Lỗi máy chủ nội bộ khi tra cứu khách hàng.")
     return customers
 
 
@@ -1,6 +1,6 @@
 # be/routers/routers_5_nhanvien.py
 
-from fastapi import APIRouter, HTTPException, status, Response
+from fastapi import APIRouter, HTTPException, status, Response, Query
 from pydantic import BaseModel, Field, EmailStr
 from typing import List, Optional, Literal
 from datetime import datetime
@@ -50,6 +50,13 @@ class StaffOut(StaffBase):
         from_attributes = True
 
 
+class StaffPage(BaseModel):
+    count: int
+    next_cursor: Optional[str] = None  # None nếu là trang cuối
+    total: Optional[int] = None  # Chỉ có khi include_total=true
+    data: List[StaffOut]
+
+
 # --- API Endpoints ---
 
 @router.post("/", response_model=StaffOut, status_code=status.HTTP_201_CREATED, summary="Tạo nhân viên mới")
@@ -66,15 +73,23 @@ def create_staff(staff: StaffCreate):
     return created_staff
 
 
-@router.get("/", response_model=List[StaffOut], summary="Lấy danh sách nhân viên")
-def get_all_staff():
+@router.get("/", response_model=StaffPage, summary="Lấy danh sách nhân viên (phân trang)")
+def get_all_staff(
+        limit: int = Query(50, ge=1, le=200, description="Số dòng mỗi trang"),
+        cursor: Optional[str] = Query(None, description="Giá trị next_cursor của trang trước"),
+        include_total: bool = Query(False, description="Trả thêm tổng số dòng (tốn thêm một truy vấn COUNT)")
+):
     """
-    Lấy danh sách tất cả nhân viên trong hệ thống.
+    Lấy danh sách nhân viên theo trang (sắp xếp theo tên).
+    Gửi lại `next_cursor` để lấy trang tiếp theo.
     """
-    staff_list = nv_ops.get_all_nhanvien()
-    if staff_list is None:
+    try:
+        page = nv_ops.get_nhanvien_page(limit=limit, cursor=cursor, include_total=include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
         raise HTTPException(status_code=500, detail="Lỗi máy chủ nội bộ khi truy vấn nhân viên.")
-    return staff_list
+    return {"count": len(page["data"]), **page}
 
 
 @router.get("/{staff_id}", response_model=StaffOut, summary="Lấy thông tin một nhân viên")
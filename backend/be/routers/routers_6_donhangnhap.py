@@ -74,6 +74,13 @@ class PurchaseOrderDetailOut(PurchaseOrderOut):
     chi_tiet_san_pham: List[PurchaseOrderItemOut] = []
 
 
+class PurchaseOrderPage(BaseModel):
+    count: int
+    next_cursor: Optional[str] = None  # None nếu là trang cuối
+    total: Optional[int] = None  # Chỉ có khi include_total=true
+    data: List[PurchaseOrderOut]
+
+
 # --- API Endpoints ---
 
 @router.post("/", response_model=PurchaseOrderDetailOut, status_code=status.HTTP_201_CREATED,
@@ -85,34 +92,37 @@ def create_purchase_order(order: PurchaseOrderCreate):
     order_dict = order.model_dump(exclude={"chi_tiet_san_pham"})
     # Chuyển đổi date object thành string để hàm operation xử lý
     for key in ['ngay_dat_hang', 'ngay_du_kien_nhan_hang']:
-        if order_dict[key]:
-            order_dict[f"{key}_str"] = order_dict.pop(key).isoformat()
+        value = order_dict.pop(key)
+        order_dict[f"{key}_str"] = value.isoformat() if value else None
 
-    new_id = dhn_ops.create_donhangnhap(**order_dict)
-    if new_id is None:
+    # Đầu đơn và toàn bộ sản phẩm được ghi trong một giao dịch (một câu INSERT nhiều dòng)
+    items = [item.model_dump() for item in order.chi_tiet_san_pham or []]
+    created_order = dhn_ops.create_donhangnhap_with_items(items=items, **order_dict)
+    if created_order is None:
         raise HTTPException(status_code=400, detail="Không thể tạo đơn hàng nhập.")
-
-    # Thêm các chi tiết sản phẩm nếu có
-    if order.chi_tiet_san_pham:
-        for item in order.chi_tiet_san_pham:
-            dhn_ops.add_item_to_donhangnhap(new_id, **item.model_dump())
-
-    created_order = dhn_ops.get_chitietdonhangnhap(new_id)
     return created_order
 
 
-@router.get("/", response_model=List[PurchaseOrderOut], summary="Lấy danh sách đơn hàng nhập")
+@router.get("/", response_model=PurchaseOrderPage, summary="Lấy danh sách đơn hàng nhập (phân trang)")
 def get_all_purchase_orders(
         supplier_id: Optional[int] = Query(None, description="Lọc theo ID nhà cung cấp"),
-        status: Optional[PurchaseOrderStatus] = Query(None, description="Lọc theo trạng thái đơn hàng")
+        status: Optional[PurchaseOrderStatus] = Query(None, description="Lọc theo trạng thái đơn hàng"),
+        limit: int = Query(50, ge=1, le=200, description="Số dòng mỗi trang"),
+        cursor: Optional[str] = Query(None, description="Giá trị next_cursor của trang trước"),
+        include_total: bool = Query(False, description="Trả thêm tổng số dòng (tốn thêm một truy vấn COUNT)")
 ):
     """
-    Lấy danh sách tất cả các đơn hàng nhập, có thể lọc theo nhà cung cấp hoặc trạng thái.
+    Lấy danh sách đơn hàng nhập theo trang (mới nhất trước), có thể lọc theo nhà cung cấp hoặc trạng thái.
+    Gửi lại `next_cursor` để lấy trang tiếp theo.
     """
-    orders = dhn_ops.get_all_donhangnhap(supplier_id=supplier_id, status=status)
-    if orders is None:
+    try:
+        page = dhn_ops.get_donhangnhap_page(supplier_id=supplier_id, status=status,
+                                           limit=limit, cursor=cursor, include_total=include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
         raise HTTPException(status_code=500, detail="Lỗi máy chủ nội bộ.")
-    return orders
+    return {"count": len(page["data"]), **page}
 
 
 @router.get("/{order_id}", response_model=PurchaseOrderDetailOut, summary="Lấy chi tiết một đơn hàng nhập")
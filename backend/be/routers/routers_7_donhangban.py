@@ -1,7 +1,7 @@
 # backend/be/routers/routers_7_donhangban.py
 
-from fastapi import APIRouter, HTTPException, Body
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Body, Query
+from pydantic import BaseModel, Field
 from typing import Optional, List
 import be.operation.operation_7_donhangban as operation_7
 
@@ -28,22 +28,40 @@ class AddItemDonHangBan(BaseModel):
     id_don_hang_ban: int
     id_san_pham: int
     so_luong: float
-    gia_ban_niem_yet_don_vi: float
+    gia_ban_niem_yet_don_vi: Optional[float] = None  # Bỏ trống: dùng giá bán hiện tại của sản phẩm
     giam_gia: float = 0.0  # Từ 0.0 đến 1.0 (VD: 0.1 là giảm 10%)
     ghi_chu_item: Optional[str] = None
 
+class ItemDonHangBan(BaseModel):
+    id_san_pham: int
+    so_luong: float
+    gia_ban_niem_yet_don_vi: Optional[float] = None  # Bỏ trống: dùng giá bán hiện tại của sản phẩm
+    giam_gia: float = 0.0
+    ghi_chu_item: Optional[str] = None
+
+class CreateDonHangBanWithItems(CreateDonHangBan):
+    items: List[ItemDonHangBan]
+
 class UpdateStatusDonHangBan(BaseModel):
     trang_thai_don_hang: str
     trang_thai_thanh_toan: Optional[str] = None
     ngay_giao_hang_thuc_te_str: Optional[str] = None
 
+class CreateThanhToan(BaseModel):
+    so_tien: float = Field(..., gt=0)
+    phuong_thuc_thanh_toan: Optional[str] = None  # Bỏ trống: dùng phương thức của đơn hàng
+    id_nhan_vien: Optional[int] = None
+    ghi_chu: Optional[str] = None
+
 # ---------------------------------------------------------
 # 2. CÁC API ENDPOINT
+# (async def + hàm *_async của operation: truy vấn qua pool bất đồng bộ,
+#  không chiếm thread-pool của uvicorn khi có nhiều quầy thanh toán cùng lúc)
 # ---------------------------------------------------------
 
 @router.post("/", description="Tạo một đơn hàng bán mới")
-def create_don_hang(order_data: CreateDonHangBan):
-    new_id = operation_7.create_donhangban(
+async def create_don_hang(order_data: CreateDonHangBan):
+    new_id = await operation_7.create_donhangban_async(
         id_nhan_vien=order_data.id_nhan_vien,
         id_khach_hang=order_data.id_khach_hang,
         dia_chi_giao_hang=order_data.dia_chi_giao_hang,
@@ -61,8 +79,8 @@ def create_don_hang(order_data: CreateDonHangBan):
 
 
 @router.post("/add-item", description="Thêm sản phẩm vào đơn hàng (Kiểm tra tồn kho & Tính giá vốn)")
-def add_item_to_order(item_data: AddItemDonHangBan):
-    new_item_id = operation_7.add_item_to_donhangban(
+async def add_item_to_order(item_data: AddItemDonHangBan):
+    new_item_id = await operation_7.add_item_to_donhangban_async(
         id_don_hang_ban=item_data.id_don_hang_ban,
         id_san_pham=item_data.id_san_pham,
         so_luong=item_data.so_luong,
@@ -77,10 +95,30 @@ def add_item_to_order(item_data: AddItemDonHangBan):
     return {"message": "Thêm sản phẩm thành công", "id_chi_tiet": new_item_id}
 
 
+@router.post("/create-with-items", description="Tạo đơn hàng kèm toàn bộ sản phẩm trong một giao dịch, trả về hóa đơn")
+async def create_don_hang_with_items(order_data: CreateDonHangBanWithItems):
+    result = await operation_7.create_donhangban_with_items_async(
+        id_nhan_vien=order_data.id_nhan_vien,
+        id_khach_hang=order_data.id_khach_hang,
+        dia_chi_giao_hang=order_data.dia_chi_giao_hang,
+        items=[item.model_dump() for item in order_data.items],
+        ngay_dat_hang_str=order_data.ngay_dat_hang_str,
+        phuong_thuc_thanh_toan=order_data.phuong_thuc_thanh_toan,
+        trang_thai_don_hang=order_data.trang_thai_don_hang,
+        trang_thai_thanh_toan=order_data.trang_thai_thanh_toan,
+        ghi_chu_don_hang=order_data.ghi_chu_don_hang
+    )
+
+    if not result:
+        raise HTTPException(status_code=400, detail="Không thể tạo đơn hàng (Giỏ hàng rỗng/trùng sản phẩm, hết tồn kho hoặc ID không hợp lệ).")
+
+    return {"message": "Tạo đơn hàng thành công", "id_don_hang": result['id'], "hoa_don": result}
+
+
 @router.get("/chitiet/{id_don_hang}", description="Lấy chi tiết đơn hàng + Tính toán thuế phí (Financial Calc)")
-def get_chitiet_donhang(id_don_hang: int):
+async def get_chitiet_donhang(id_don_hang: int):
     # LƯU Ý: Không sử dụng response_model để trả về đầy đủ dictionary bao gồm cả 'financial_calc'
-    result = operation_7.get_chitietdonhangban(id_don_hang)
+    result = await operation_7.get_chitietdonhangban_async(id_don_hang)
     
     if not result:
         raise HTTPException(status_code=404, detail="Không tìm thấy đơn hàng này.")
@@ -88,24 +126,50 @@ def get_chitiet_donhang(id_don_hang: int):
     return result
 
 
-@router.get("/", description="Lấy danh sách đơn hàng (Có lọc theo khách, nhân viên, trạng thái)")
-def get_all_donhang(
+@router.get("/phan-bo-lo/{id_don_hang}", description="Lấy các lô nhập đã xuất cho từng dòng của đơn (đối chiếu giá vốn FIFO)")
+async def get_phan_bo_lo(id_don_hang: int):
+    results = await operation_7.get_phanbolonhap_async(id_don_hang)
+
+    if results is None:
+        raise HTTPException(status_code=500, detail="Lỗi Server khi lấy phân bổ lô nhập.")
+
+    return results
+
+
+@router.get("/", description="Lấy danh sách đơn hàng. Mặc định trả về danh sách đầy đủ như trước; "
+                             "gửi limit / cursor (hoặc fields, date_from, date_to) để lấy theo trang, mới nhất trước")
+async def get_all_donhang(
     customer_id: Optional[int] = None, 
     staff_id: Optional[int] = None, 
-    status: Optional[str] = None
+    status: Optional[str] = None,
+    date_from: Optional[str] = Query(None, description="YYYY-MM-DD"),
+    date_to: Optional[str] = Query(None, description="YYYY-MM-DD (tính cả ngày này)"),
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Số dòng mỗi trang (mặc định 50 khi phân trang)"),
+    cursor: Optional[str] = Query(None, description="Giá trị next_cursor của trang trước"),
+    fields: Optional[str] = Query(None, description="Danh sách trường cần lấy, phân cách bởi dấu phẩy")
 ):
-    # LƯU Ý: Không sử dụng response_model để trả về được trường 'tong_thanh_toan_du_kien' tính toán từ operation
-    results = operation_7.get_all_donhangban(customer_id, staff_id, status)
+    # Không gửi tham số phân trang nào: giữ nguyên dạng cũ (mảng đơn hàng) cho các client hiện có
+    if limit is None and cursor is None and fields is None and date_from is None and date_to is None:
+        results = await operation_7.get_all_donhangban_async(customer_id, staff_id, status)
+        if results is None:
+            raise HTTPException(status_code=500, detail="Lỗi Server khi lấy danh sách đơn hàng.")
+        return results
+
+    try:
+        page = await operation_7.get_donhangban_page_async(limit, cursor, fields, customer_id, staff_id, status,
+                                                           date_from, date_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    if results is None:
+    if page is None:
         raise HTTPException(status_code=500, detail="Lỗi Server khi lấy danh sách đơn hàng.")
         
-    return results
+    return {"status": "success", "count": len(page["data"]), "next_cursor": page["next_cursor"], "data": page["data"]}
 
 
 @router.put("/update-status/{id_don_hang}", description="Cập nhật trạng thái đơn hàng (Duyệt đơn, Hoàn tất, Hủy...)")
-def update_status(id_don_hang: int, status_data: UpdateStatusDonHangBan):
-    success = operation_7.update_donhangban_status(
+async def update_status(id_don_hang: int, status_data: UpdateStatusDonHangBan):
+    success = await operation_7.update_donhangban_status_async(
         id_don_hang_ban=id_don_hang,
         new_trang_thai_don_hang=status_data.trang_thai_don_hang,
         new_trang_thai_thanh_toan=status_data.trang_thai_thanh_toan,
@@ -115,4 +179,31 @@ def update_status(id_don_hang: int, status_data: UpdateStatusDonHangBan):
     if not success:
         raise HTTPException(status_code=400, detail="Không thể cập nhật trạng thái đơn hàng.")
         
-    return {"message": f"Đã cập nhật trạng thái đơn hàng {id_don_hang} thành công."}
\ No newline at end of file
+    return {"message": f"Đã cập nhật trạng thái đơn hàng {id_don_hang} thành công."}
+
+
+@router.post("/{id_don_hang}/payments", description="Ghi nhận một lần thanh toán (có thể từng phần) cho đơn hàng")
+async def add_payment(id_don_hang: int, payment_data: CreateThanhToan):
+    result = await operation_7.add_payment_to_donhangban_async(
+        id_don_hang_ban=id_don_hang,
+        so_tien=payment_data.so_tien,
+        phuong_thuc_thanh_toan=payment_data.phuong_thuc_thanh_toan,
+        id_nhan_vien=payment_data.id_nhan_vien,
+        ghi_chu=payment_data.ghi_chu
+    )
+
+    if result is None:
+        raise HTTPException(status_code=400,
+                            detail="Không thể ghi nhận thanh toán (đơn không tồn tại, đã hủy, đã thanh toán đủ hoặc số tiền vượt quá số còn nợ).")
+
+    return {"message": "Ghi nhận thanh toán thành công", "data": result}
+
+
+@router.get("/{id_don_hang}/payments", description="Số dư và lịch sử thanh toán của đơn hàng")
+async def get_payments(id_don_hang: int):
+    result = await operation_7.get_payments_of_donhangban_async(id_don_hang)
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="Không tìm thấy đơn hàng")
+
+    return result
@@ -46,6 +46,13 @@ class ExpenseOut(ExpenseBase):
         from_attributes = True
 
 
+class ExpensePage(BaseModel):
+    count: int
+    next_cursor: Optional[str] = None  # None nếu là trang cuối
+    total: Optional[int] = None  # Chỉ có khi include_total=true
+    data: List[ExpenseOut]
+
+
 # --- API Endpoints ---
 
 @router.post("/", response_model=ExpenseOut, status_code=status.HTTP_201_CREATED, summary="Tạo một khoản chi phí mới")
@@ -63,22 +70,30 @@ def create_expense(expense: ExpenseCreate):
     return created_expense
 
 
-@router.get("/", response_model=List[ExpenseOut], summary="Lấy danh sách chi phí")
+@router.get("/", response_model=ExpensePage, summary="Lấy danh sách chi phí (phân trang)")
 def get_expenses(
         type_filter: Optional[str] = Query(None, description="Tìm theo loại chi phí"),
         date_from: Optional[date] = Query(None, description="Lọc chi phí từ ngày (YYYY-MM-DD)"),
-        date_to: Optional[date] = Query(None, description="Lọc chi phí đến ngày (YYYY-MM-DD)")
+        date_to: Optional[date] = Query(None, description="Lọc chi phí đến ngày (YYYY-MM-DD)"),
+        limit: int = Query(50, ge=1, le=200, description="Số dòng mỗi trang"),
+        cursor: Optional[str] = Query(None, description="Giá trị next_cursor của trang trước"),
+        include_total: bool = Query(False, description="Trả thêm tổng số dòng (tốn thêm một truy vấn COUNT)")
 ):
     """
-    Lấy danh sách tất cả các khoản chi phí, có thể lọc theo loại và khoảng ngày.
+    Lấy danh sách chi phí theo trang (mới nhất trước), có thể lọc theo loại và khoảng ngày.
+    Gửi lại `next_cursor` để lấy trang tiếp theo.
     """
     date_from_str = date_from.isoformat() if date_from else None
     date_to_str = date_to.isoformat() if date_to else None
 
-    expenses = cp_ops.get_chiphi(loai_filter=type_filter, date_from_str=date_from_str, date_to_str=date_to_str)
-    if expenses is None:
+    try:
+        page = cp_ops.get_chiphi_page(loai_filter=type_filter, date_from_str=date_from_str, date_to_str=date_to_str,
+                                      limit=limit, cursor=cursor, include_total=include_total)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
         raise HTTPException(status_code=500, detail="Lỗi máy chủ nội bộ khi truy vấn chi phí.")
-    return expenses
+    return {"count": len(page["data"]), **page}
 
 
 @router.get("/{expense_id}", response_model=ExpenseOut, summary="Lấy thông tin một khoản chi phí")
@@ -0,0 +1,53 @@
+# be/scheduler.py
+
+import asyncio
+import sys
+from datetime import timedelta
+
+from be.db_connection import shop_now
+
+# --- Lịch chạy công việc định kỳ trong tiến trình backend ---
+# Các công việc phải chạy lại được nhiều lần (mỗi worker uvicorn đều chạy một lịch riêng).
+# Giờ chạy tính theo giờ cửa hàng (SHOP_TIMEZONE), không theo múi giờ của máy chủ.
+
+
+def _so_giay_den_lan_chay_tiep(gio, phut):
+    now = shop_now()
+    lan_chay = now.replace(hour=gio, minute=phut, second=0, microsecond=0)
+    if lan_chay <= now:
+        lan_chay += timedelta(days=1)
+    return lan_chay.timestamp() - now.timestamp()
+
+
+async def _chay_cong_viec(ten, job):
+    try:
+        # Công việc dùng kết nối đồng bộ (psycopg2) -> chạy trong thread, không chặn event loop
+        ket_qua = await asyncio.to_thread(job)
+        print(f"[Lịch] {ten}: {ket_qua}")
+    except Exception as e:
+        print(f"[Lịch] Lỗi khi chạy {ten}: {e}", file=sys.stderr)
+
+
+async def _chay_hang_ngay(ten, job, gio, phut, chay_ngay):
+    if chay_ngay:
+        # Bù lần chạy bị lỡ khi ứng dụng tắt qua nửa đêm
+        await _chay_cong_viec(ten, job)
+    while True:
+        await asyncio.sleep(_so_giay_den_lan_chay_tiep(gio, phut))
+        await _chay_cong_viec(ten, job)
+
+
+def start_daily_job(ten, job, gio=0, phut=0, chay_ngay=True):
+    """Chạy hàm đồng bộ `job` mỗi ngày lúc gio:phut (giờ máy chủ). Trả về task để hủy khi tắt ứng dụng."""
+    return asyncio.create_task(_chay_hang_ngay(ten, job, gio, phut, chay_ngay))
+
+
+async def stop_job(task):
+    """Hủy task định kỳ và chờ nó kết thúc."""
+    if task is None:
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
@@ -11,13 +11,13 @@ sys.path.append(os.path.join(current_dir, 'backend')) # Dự phòng
 
 try:
     # Import các hàm mới vừa viết
-    from be.db_connection import get_db_connection, execute_query, execute_non_query
+    from be.db_connection import get_db_connection, close_db_connection, execute_query, execute_non_query
     
     print("\n--- 1. TEST KẾT NỐI DATABASE ---")
     conn = get_db_connection()
     if conn:
         print("✅ KẾT NỐI THÀNH CÔNG!")
-        conn.close()
+        close_db_connection(conn)
     else:
         print("❌ KẾT NỐI THẤT BẠI. Dừng kiểm tra.")
         exit()
@@ -0,0 +1,113 @@
+# be/text_search.py
+
+import unicodedata
+
+# --- Tìm kiếm không dấu (tiếng Việt) ---
+# Cột tìm kiếm trong DB được sinh bởi f_chuan_hoa_tim_kiem() (database/000_create_extensions.sql):
+# bỏ dấu + chữ thường, có index trigram (GIN) để LIKE '%từ khóa%' không phải quét toàn bảng.
+# Từ khóa được chuẩn hóa ở Python theo cùng quy tắc rồi mới đưa vào câu truy vấn,
+# để mẫu LIKE là hằng số và PostgreSQL dùng được index.
+
+DEFAULT_SEARCH_LIMIT = 50
+MAX_SEARCH_LIMIT = 500
+
+# Hạng kết quả (nhỏ hơn = khớp tốt hơn)
+HANG_TRUNG_MA = 0           # Mã trùng khớp hoàn toàn
+HANG_DAU_MA = 1             # Mã bắt đầu bằng từ khóa
+HANG_DAU_TEN = 2            # Tên bắt đầu bằng từ khóa
+HANG_DAU_TU = 3             # Một từ trong tên bắt đầu bằng từ khóa
+HANG_CHUA_TRONG_TEN = 4     # Tên chứa từ khóa ở giữa từ
+
+
+def chuan_hoa(chuoi):
+    """Bỏ dấu tiếng Việt và chuyển về chữ thường ("Nguyễn Đức" -> "nguyen duc")."""
+    if not chuoi:
+        return ""
+    chuoi = chuoi.replace("đ", "d").replace("Đ", "D")
+    chuoi = unicodedata.normalize("NFD", chuoi)
+    return "".join(c for c in chuoi if not unicodedata.combining(c)).lower().strip()
+
+
+def chi_lay_so(chuoi):
+    """Chỉ giữ các chữ số (số điện thoại "0909 123-456" -> "0909123456")."""
+    return "".join(c for c in (chuoi or "") if "0" <= c <= "9")
+
+
+def escape_like(chuoi):
+    """Thoát các ký tự đặc biệt của LIKE (\\, %, _) để từ khóa được so khớp nguyên văn."""
+    return chuoi.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def clamp_search_limit(limit):
+    if not limit:
+        return DEFAULT_SEARCH_LIMIT
+    return max(1, min(int(limit), MAX_SEARCH_LIMIT))
+
+
+def build_contains_condition(cot_tim_kiem, tu_khoa, ham_chuan_hoa=chuan_hoa):
+    """
+    Điều kiện "cột đã chuẩn hóa chứa từ khóa" (dùng index trigram).
+    ham_chuan_hoa: cách chuẩn hóa từ khóa, phải khớp với cách cột được chuẩn hóa
+    (chuan_hoa cho tên / email, chi_lay_so cho số điện thoại).
+    Trả về (sql, params) hoặc (None, []) nếu từ khóa rỗng sau khi chuẩn hóa.
+    """
+    khoa = ham_chuan_hoa(tu_khoa)
+    if not khoa:
+        return None, []
+    return f"{cot_tim_kiem} LIKE %s", [f"%{escape_like(khoa)}%"]
+
+
+def build_suffix_condition(cot_so_dao_nguoc, tu_khoa):
+    """
+    Điều kiện "số điện thoại kết thúc bằng các chữ số đã nhập", viết thành
+    "chuỗi đảo ngược bắt đầu bằng ..." để dùng index B-tree (text_pattern_ops) trên reverse(cột).
+    Trả về (sql, params) hoặc (None, []) nếu không có chữ số nào.
+    """
+    so = chi_lay_so(tu_khoa)
+    if not so:
+        return None, []
+    return f"{cot_so_dao_nguoc} LIKE %s", [f"{so[::-1]}%"]
+
+
+def build_ranked_search(cot_ten, cot_ma, tu_khoa):
+    """
+    Tìm theo tên (chứa, không dấu) hoặc mã (bắt đầu bằng), có xếp hạng.
+    - cot_ten: cột tên đã chuẩn hóa (có index trigram)
+    - cot_ma: biểu thức mã dạng chữ thường (có index text_pattern_ops)
+    Trả về (điều kiện sql, params điều kiện, biểu thức hạng sql, params hạng),
+    hoặc None nếu từ khóa rỗng sau khi chuẩn hóa.
+    """
+    khoa = chuan_hoa(tu_khoa)
+    if not khoa:
+        return None
+    mau = escape_like(khoa)
+    dieu_kien = f"({cot_ten} LIKE %s OR {cot_ma} LIKE %s)"
+    dieu_kien_params = [f"%{mau}%", f"{mau}%"]
+    hang = f"""CASE
+            WHEN {cot_ma} = %s THEN {HANG_TRUNG_MA}
+            WHEN {cot_ma} LIKE %s THEN {HANG_DAU_MA}
+            WHEN {cot_ten} LIKE %s THEN {HANG_DAU_TEN}
+            WHEN {cot_ten} LIKE %s THEN {HANG_DAU_TU}
+            ELSE {HANG_CHUA_TRONG_TEN}
+        END"""
+    hang_params = [khoa, f"{mau}%", f"{mau}%", f"% {mau}%"]
+    return dieu_kien, dieu_kien_params, hang, hang_params
+
+
+def xep_hang(khoa, ma_chuan_hoa, ten_chuan_hoa):
+    """
+    Cùng quy tắc với build_ranked_search nhưng chạy trong bộ nhớ (bộ đệm danh mục POS).
+    `khoa` phải đã được chuẩn hóa. Trả về hạng, hoặc None nếu không khớp.
+    """
+    if ma_chuan_hoa == khoa:
+        return HANG_TRUNG_MA
+    if ma_chuan_hoa.startswith(khoa):
+        return HANG_DAU_MA
+    vi_tri = ten_chuan_hoa.find(khoa)
+    if vi_tri < 0:
+        return None
+    if vi_tri == 0:
+        return HANG_DAU_TEN
+    if f" {khoa}" in ten_chuan_hoa:
+        return HANG_DAU_TU
+    return HANG_CHUA_TRONG_TEN
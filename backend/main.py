@@ -1,16 +1,65 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware # <--- Thêm dòng này
 import uvicorn
+from contextlib import asynccontextmanager
+
+from be.db_connection import get_pool_stats
+from be.db_connection_async import open_async_pool, close_async_pool, get_async_pool_stats
+from be.catalog_cache import start_catalog_cache, stop_catalog_cache
+from be.report_cache import start_report_cache, stop_report_cache
+from be.report_engine import start_report_engine, stop_report_engine
+from be.scheduler import start_daily_job, stop_job
+from be.operation.operation_9_lichsugianiemyet import apply_due_prices
+from be.reports.operation_14_phankhucrfm import refresh_rfm_scores
+from be.reports.operation_17_xuatphantich import export_sales_history, CO_PYARROW
 
 # Import các router
 from be.routers import (
     routers_1_danhmuc, 
     routers_2_sanpham, 
+    routers_3_nhacungcap,
+    routers_4_khachhang,
+    routers_5_nhanvien,
+    routers_6_donhangnhap,
     routers_7_donhangban, 
-    routers_10_doanhthuloinhuan
+    routers_8_chiphi,
+    routers_10_doanhthuloinhuan,
+    routers_11_thongkebanhang,
+    routers_12_phantichkhachhang,
+    routers_13_congno,
+    routers_14_phankhucrfm,
+    routers_15_nhapdulieu,
+    routers_16_xuatdulieu,
+    routers_17_xuatphantich
 )
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Mở pool bất đồng bộ khi khởi động, đóng khi tắt ứng dụng
+    await open_async_pool()
+    # Bộ đệm danh mục POS: nạp toàn bộ + LISTEN thay đổi (chạy nền, không chặn khởi động)
+    await start_catalog_cache()
+    # Bộ đệm kết quả báo cáo: LISTEN thay đổi số liệu để bỏ kết quả cũ (đơn / chi phí ghi lùi ngày)
+    await start_report_cache()
+    # Bộ máy báo cáo trong bộ nhớ (numpy, bật bằng REPORT_ENGINE_ENABLED=1): dashboard không cần truy vấn DB
+    await start_report_engine()
+    # Áp dụng giá niêm yết đến hạn vào SanPham.gia_ban_hien_tai ngay sau nửa đêm (và một lần khi khởi động)
+    gia_den_han_task = start_daily_job("Áp dụng giá đến hạn", apply_due_prices, gio=0, phut=0)
+    # Tính lại toàn bộ điểm RFM / phân khúc khách hàng mỗi đêm (trong ngày có thể tính bổ sung qua API)
+    rfm_task = start_daily_job("Tính điểm RFM", refresh_rfm_scores, gio=1, phut=0, chay_ngay=False)
+    # Ghi bổ sung lịch sử bán hàng ra Parquet / Arrow cho phân tích ngoại tuyến (chỉ khi đã cài pyarrow)
+    xuat_task = (start_daily_job("Xuất lịch sử bán hàng", export_sales_history, gio=2, phut=0, chay_ngay=False)
+                 if CO_PYARROW else None)
+    yield
+    await stop_job(xuat_task)
+    await stop_job(rfm_task)
+    await stop_job(gia_den_han_task)
+    await stop_report_engine()
+    await stop_report_cache()
+    await stop_catalog_cache()
+    await close_async_pool()
+
+app = FastAPI(lifespan=lifespan)
 
 # --- CẤU HÌNH CORS (QUAN TRỌNG) ---
 origins = [
@@ -34,12 +83,32 @@ app.add_middleware(
 # Include Routers
 app.include_router(routers_1_danhmuc.router)
 app.include_router(routers_2_sanpham.router)
+app.include_router(routers_3_nhacungcap.router)
+app.include_router(routers_4_khachhang.router)
+app.include_router(routers_5_nhanvien.router)
+app.include_router(routers_6_donhangnhap.router)
 app.include_router(routers_7_donhangban.router)
+app.include_router(routers_8_chiphi.router)
 app.include_router(routers_10_doanhthuloinhuan.router)
+app.include_router(routers_11_thongkebanhang.router)
+app.include_router(routers_12_phantichkhachhang.router)
+app.include_router(routers_13_congno.router)
+app.include_router(routers_14_phankhucrfm.router)
+app.include_router(routers_15_nhapdulieu.router)
+app.include_router(routers_16_xuatdulieu.router)
+app.include_router(routers_17_xuatphantich.router)
 
 @app.get("/")
 def read_root():
     return {"Hello": "OmniPocket Backend is Running!"}
 
+@app.get("/db/pool-stats")
+def read_pool_stats():
+    # Thống kê pool kết nối (đang dùng, rảnh, thời gian chờ) để chọn DB_POOL_MAX phù hợp
+    return {
+        "sync_pool": get_pool_stats() or {},
+        "async_pool": get_async_pool_stats() or {}
+    }
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
\ No newline at end of file
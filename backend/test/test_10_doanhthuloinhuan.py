@@ -13,7 +13,7 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 # --- Imports từ ứng dụng của bạn (Sửa lỗi đường dẫn tại đây) ---
-from be.reports.operation_10_doanhthuloinhuan import get_financial_report
+from be.reports.operation_10_doanhthuloinhuan import get_financial_report, rebuild_sales_summary
 # Import các hàm phụ trợ để tạo dữ liệu test
 from be.operation.operation_1_danhmuc import add_danhmuc
 from be.operation.operation_2_sanpham import add_sanpham
@@ -99,11 +99,11 @@ class TestFinancialReport(unittest.TestCase):
         update_donhangban_status(dhb_id, 'Hoàn tất', 'Đã thanh toán', str(sale_date))
 
     # Sửa lỗi đường dẫn Mock tại đây để trỏ đến đúng file của bạn
-    @patch('be.reports.operation_10_doanhthuloinhuan.date')
-    def test_report_for_yesterday(self, mock_date):
+    @patch('be.reports.operation_10_doanhthuloinhuan.shop_today')
+    def test_report_for_yesterday(self, mock_today):
         """Kiểm tra báo cáo cho ngày hôm qua."""
         print("\n--- Test: Báo cáo ngày hôm qua ---")
-        mock_date.today.return_value = self.MOCKED_TODAY
+        mock_today.return_value = self.MOCKED_TODAY
 
         # Đổi tên kỳ báo cáo từ 'day' thành 'yesterday' cho khớp với hàm
         report = get_financial_report(period='yesterday')
@@ -120,11 +120,11 @@ class TestFinancialReport(unittest.TestCase):
         self.assertEqual(details[0]['loi_nhuan'], expected_profit)
 
     # Sửa lỗi đường dẫn Mock tại đây
-    @patch('be.reports.operation_10_doanhthuloinhuan.date')
-    def test_report_for_last_week(self, mock_date):
+    @patch('be.reports.operation_10_doanhthuloinhuan.shop_today')
+    def test_report_for_last_week(self, mock_today):
         """Kiểm tra báo cáo cho tuần trước."""
         print("\n--- Test: Báo cáo tuần trước ---")
-        mock_date.today.return_value = self.MOCKED_TODAY
+        mock_today.return_value = self.MOCKED_TODAY
 
         report = get_financial_report(period='last_week')
         self.assertIsNotNone(report)
@@ -141,11 +141,11 @@ class TestFinancialReport(unittest.TestCase):
         self.assertEqual(transaction_day['loi_nhuan'], expected_profit)
 
     # Sửa lỗi đường dẫn Mock tại đây
-    @patch('be.reports.operation_10_doanhthuloinhuan.date')
-    def test_report_for_last_month(self, mock_date):
+    @patch('be.reports.operation_10_doanhthuloinhuan.shop_today')
+    def test_report_for_last_month(self, mock_today):
         """Kiểm tra báo cáo cho tháng trước."""
         print("\n--- Test: Báo cáo tháng trước ---")
-        mock_date.today.return_value = self.MOCKED_TODAY
+        mock_today.return_value = self.MOCKED_TODAY
 
         report = get_financial_report(period='last_month')
         self.assertIsNotNone(report)
@@ -190,6 +190,38 @@ class TestFinancialReport(unittest.TestCase):
         self.assertEqual(len(report['details']), 31)
         self.assertTrue(all(d['tong_doanh_thu'] == 0 for d in report['details']))
 
+    def test_summary_table_follows_cancellation_and_rebuild(self):
+        """Bảng tổng hợp ngày: hủy đơn 'Hoàn tất' thì bị trừ ra; tính lại cho kết quả như cập nhật tăng dần."""
+        print("\n--- Test: Bảng tổng hợp bán hàng theo ngày ---")
+        ngay_ban = date(2025, 4, 20)
+        khoang = dict(period='custom', start_date_str="2025-04-01", end_date_str="2025-04-30")
+
+        dhb_id = create_donhangban(self.nhanvien_id, self.khachhang_id, "Địa chỉ Test", ngay_dat_hang_str=str(ngay_ban))
+        add_item_to_donhangban(dhb_id, self.sanpham_id, 4, self.gia_ban, 0)
+        update_donhangban_status(dhb_id, 'Hoàn tất', 'Đã thanh toán', str(ngay_ban))
+        self.assertEqual(get_financial_report(**khoang)['summary']['tong_doanh_thu'], self.gia_ban * 4)
+
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE DonHangBan SET trang_thai_don_hang = 'Đã hủy' WHERE id = %s;", (dhb_id,))
+                conn.commit()
+                self.assertEqual(get_financial_report(**khoang)['summary']['tong_doanh_thu'], 0)
+
+                # Toàn bộ dữ liệu test: tính lại từ đầu phải khớp với số liệu do trigger duy trì
+                cur.execute("SELECT ngay, id_san_pham, so_luong, doanh_thu, gia_von, so_don "
+                            "FROM TongHopBanHangNgay WHERE so_don <> 0 ORDER BY ngay, id_san_pham;")
+                truoc = cur.fetchall()
+                self.assertEqual(rebuild_sales_summary("2025-01-01", "2025-12-31"), len(truoc))
+                conn.commit()
+                cur.execute("SELECT ngay, id_san_pham, so_luong, doanh_thu, gia_von, so_don "
+                            "FROM TongHopBanHangNgay ORDER BY ngay, id_san_pham;")
+                self.assertEqual(cur.fetchall(), truoc)
+        finally:
+            close_db_connection(conn)
+
+        self.assertIsNone(rebuild_sales_summary("2025-02-01", "2025-01-01"))
+
 
 if __name__ == '__main__':
     unittest.main()
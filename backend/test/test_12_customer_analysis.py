@@ -151,6 +151,75 @@ class TestCustomerAnalysis(unittest.TestCase):
 
         print("=> PASS: Báo cáo top khách hàng chi tiêu chính xác.")
 
+    def test_3_first_and_last_purchase_dates_are_maintained(self):
+        """
+        KhachHang.ngay_mua_dau_tien / ngay_mua_gan_nhat do trigger duy trì:
+        đơn hoàn tất ghi lùi ngày làm lùi ngày mua đầu tiên; hủy đơn đó thì tính lại như cũ.
+        """
+        print("\n--- Test 3: Ngày mua đầu tiên / gần nhất của khách hàng ---")
+        sql = "SELECT ngay_mua_dau_tien, ngay_mua_gan_nhat FROM KhachHang WHERE id = %s;"
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, (self.kh_vip_id,))
+                self.assertEqual(cur.fetchone(), (date(2025, 5, 25), date(2025, 5, 28)))
+
+                # Đơn ghi lùi ngày: KH VIP thành khách "quay lại" của tháng 5
+                dhb_id = create_donhangban(self.nhanvien_id, self.kh_vip_id, "Địa chỉ Test", ngay_dat_hang_str="2025-01-05")
+                add_item_to_donhangban(dhb_id, self.sanpham_id, 1, Decimal('100'), 0)
+                update_donhangban_status(dhb_id, 'Hoàn tất', 'Đã thanh toán', "2025-01-05")
+                conn.commit()
+                cur.execute(sql, (self.kh_vip_id,))
+                self.assertEqual(cur.fetchone(), (date(2025, 1, 5), date(2025, 5, 28)))
+
+                report = get_customer_acquisition_report('custom', "2025-05-01", "2025-05-31")
+                self.assertEqual(report['summary']['so_khach_hang_moi'], 1)
+                self.assertEqual(report['summary']['so_khach_hang_quay_lai'], 2)
+
+                cur.execute("UPDATE DonHangBan SET trang_thai_don_hang = 'Đã hủy' WHERE id = %s;", (dhb_id,))
+                conn.commit()
+                cur.execute(sql, (self.kh_vip_id,))
+                self.assertEqual(cur.fetchone(), (date(2025, 5, 25), date(2025, 5, 28)))
+
+                # Khách hàng chưa có đơn hoàn tất nào
+                kh_id = add_khachhang("Khách Chưa Mua", "0977777777", "kh.chuamua@test.com")
+                cur.execute(sql, (kh_id,))
+                self.assertEqual(cur.fetchone(), (None, None))
+        finally:
+            close_db_connection(conn)
+
+    def test_4_get_customer_cohort_report(self):
+        """
+        Kiểm tra ma trận cohort theo tháng: cỡ cohort, số khách còn mua, tỉ lệ giữ chân và doanh thu.
+        """
+        print("\n--- Test 4: Báo cáo cohort khách hàng ---")
+        report = get_customer_cohort_report("2024-12", "2025-05")
+        self.assertIsNotNone(report)
+        self.assertEqual((report['tu_thang'], report['den_thang']), ("2024-12", "2025-05"))
+
+        cohorts = {c['thang_cohort']: c for c in report['cohorts']}
+        self.assertEqual(list(cohorts), ["2024-12", "2025-05"])
+
+        # Cohort 12/2024: KH Cũ, quay lại mua ở tháng thứ 5
+        thang_12 = cohorts["2024-12"]
+        self.assertEqual(thang_12['so_khach_hang'], 1)
+        self.assertEqual([(o['so_thang'], o['so_khach_hoat_dong'], o['ti_le_giu_chan'], o['doanh_thu'])
+                          for o in thang_12['theo_thang']],
+                         [(0, 1, 1.0, Decimal('100')), (5, 1, 1.0, Decimal('300'))])
+
+        # Cohort 5/2025: KH Mới và KH VIP
+        thang_5 = cohorts["2025-05"]
+        self.assertEqual(thang_5['so_khach_hang'], 2)
+        self.assertEqual(len(thang_5['theo_thang']), 1)
+        self.assertEqual(thang_5['theo_thang'][0]['doanh_thu'], Decimal('1580'))
+
+        # Cohort bắt đầu trước khoảng báo cáo không được tính
+        report = get_customer_cohort_report("2025-01", "2025-05")
+        self.assertEqual([c['thang_cohort'] for c in report['cohorts']], ["2025-05"])
+
+        self.assertIsNone(get_customer_cohort_report("2025-05", "2025-01"))
+        print("=> PASS: Báo cáo cohort khách hàng chính xác.")
+
 
 if __name__ == '__main__':
     unittest.main()
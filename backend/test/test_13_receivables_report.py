@@ -13,13 +13,16 @@ if project_root not in sys.path:
     sys.path.insert(0, project_root)
 
 # --- Imports từ ứng dụng của bạn ---
-from be.reports.operation_13_congno import get_receivables_report
+from be.reports.operation_13_congno import (get_receivables_report, get_receivables_aging_report,
+                                            get_customer_receivable_balance)
 # Import các hàm phụ trợ để tạo dữ liệu test
 from be.operation.operation_2_sanpham import add_sanpham
 from be.operation.operation_1_danhmuc import add_danhmuc
 from be.operation.operation_4_khachhang import add_khachhang
 from be.operation.operation_5_nhanvien import add_nhanvien
-from be.operation.operation_7_donhangban import create_donhangban, add_item_to_donhangban, update_donhangban_status
+from be.operation.operation_7_donhangban import (create_donhangban, add_item_to_donhangban, update_donhangban_status,
+                                                 add_payment_to_donhangban, get_payments_of_donhangban,
+                                                 get_all_donhangban, get_donhangban_page)
 from be.db_connection import get_db_connection, close_db_connection
 
 
@@ -52,6 +55,8 @@ class TestReceivablesReport(unittest.TestCase):
         cls.nhanvien_id = add_nhanvien("NV Cong No", "nv_congno", "pass", "nv.cn@test.com", "0988888888")
         cls.danhmuc_id = add_danhmuc("DM_CN", "Danh mục CN")
         cls.sanpham_id = add_sanpham("SP_CN", "SP Công Nợ", cls.danhmuc_id, 100, "Cái")
+        # Sản phẩm thứ hai để thêm dòng hàng vào đơn đã có sanpham_id (mỗi sản phẩm chỉ một dòng / đơn)
+        cls.sanpham_2_id = add_sanpham("SP_CN_2", "SP Công Nợ 2", cls.danhmuc_id, 100, "Cái")
 
         # --- Tạo kịch bản công nợ ---
         # KH 1: Có nợ, nhưng CHƯA quá hạn (giao hàng 20 ngày trước)
@@ -76,6 +81,24 @@ class TestReceivablesReport(unittest.TestCase):
         add_item_to_donhangban(dhb_id, cls.sanpham_id, 1, total_value, 0)
         # Cập nhật trạng thái là 'Đã giao' và có ngày giao hàng thực tế
         update_donhangban_status(dhb_id, 'Đã giao', ngay_giao_hang_thuc_te_str=str(delivery_date))
+        return dhb_id
+
+    def setUp(self):
+        # Khách hàng tạo riêng trong từng test, được dọn ở tearDown
+        self.khach_hang_tao_them = []
+
+    def tearDown(self):
+        """Xóa đơn và khách hàng tạo riêng trong test để công nợ còn lại không ảnh hưởng test sau."""
+        if not self.khach_hang_tao_them:
+            return
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM DonHangBan WHERE id_khach_hang = ANY(%s);", (self.khach_hang_tao_them,))
+                cur.execute("DELETE FROM KhachHang WHERE id = ANY(%s);", (self.khach_hang_tao_them,))
+                conn.commit()
+        finally:
+            close_db_connection(conn)
 
     @patch('be.reports.operation_13_receivables_report.date')
     def test_1_get_full_receivables_report(self, mock_date):
@@ -142,6 +165,121 @@ class TestReceivablesReport(unittest.TestCase):
 
         print("=> PASS: Lọc công nợ quá hạn chính xác.")
 
+    def test_3_aging_buckets(self):
+        """
+        Kiểm tra báo cáo tuổi nợ: mỗi khách hàng được chia theo nhóm tuổi nợ, mốc tùy chỉnh.
+        """
+        print("\n--- Test 3: Báo cáo tuổi nợ ---")
+        report = get_receivables_aging_report(as_of_str=str(self.MOCKED_TODAY))
+        self.assertIsNotNone(report)
+        self.assertEqual(report['nhom_tuoi_no'], ["0-30", "31-60", "61-90", "90+"])
+        self.assertEqual(report['summary']['theo_nhom'], [self.no_trong_han, self.no_qua_han, 0, 0])
+
+        chi_tiet = {d['id_khach_hang']: d['theo_nhom'] for d in report['details']}
+        self.assertEqual(chi_tiet, {self.kh_trong_han_id: [self.no_trong_han, 0, 0, 0],
+                                    self.kh_qua_han_id: [0, self.no_qua_han, 0, 0]})
+        # Khách nợ nhiều nhất trước
+        self.assertEqual(report['details'][0]['id_khach_hang'], self.kh_qua_han_id)
+
+        # Mốc tùy chỉnh: 0-15, 16-45, 45+
+        report = get_receivables_aging_report([15, 45], str(self.MOCKED_TODAY))
+        self.assertEqual(report['nhom_tuoi_no'], ["0-15", "16-45", "45+"])
+        self.assertEqual(report['summary']['theo_nhom'], [0, self.no_trong_han + self.no_qua_han, 0])
+
+        self.assertIsNone(get_receivables_aging_report([60, 30]))
+        print("=> PASS: Báo cáo tuổi nợ chính xác.")
+
+    def test_4_ledger_follows_items_and_payment(self):
+        """
+        Kiểm tra sổ công nợ do trigger duy trì: thêm dòng hàng, thanh toán, hủy đơn.
+        """
+        print("\n--- Test 4: Sổ công nợ theo dõi dòng hàng và thanh toán ---")
+        kh_id = add_khachhang("KH Sổ Nợ", "0988888884", "kh.sono@test.com")
+        self.khach_hang_tao_them.append(kh_id)
+        dhb_id = self._create_unpaid_sale(date(2025, 6, 1), kh_id, Decimal('300000'))
+
+        sql = "SELECT id_khach_hang, ngay_tinh_no, so_tien_con_no FROM CongNoPhaiThu WHERE id_don_hang_ban = %s;"
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, (dhb_id,))
+                self.assertEqual(cur.fetchone(), (kh_id, date(2025, 6, 1), Decimal('300000')))
+
+                # Thêm dòng hàng vào đơn đang nợ: số tiền còn nợ tăng theo
+                item_id = add_item_to_donhangban(dhb_id, self.sanpham_2_id, 2, Decimal('50000'), 0)
+                self.assertIsNotNone(item_id, "Không thêm được dòng hàng vào đơn đang nợ.")
+                cur.execute(sql, (dhb_id,))
+                self.assertEqual(cur.fetchone()[2], Decimal('400000'))
+
+                # Thanh toán: rời sổ công nợ
+                cur.execute("UPDATE DonHangBan SET trang_thai_thanh_toan = 'Đã thanh toán' WHERE id = %s;", (dhb_id,))
+                conn.commit()
+                cur.execute(sql, (dhb_id,))
+                self.assertIsNone(cur.fetchone())
+
+                # Chuyển lại chưa thanh toán rồi hủy đơn
+                cur.execute("UPDATE DonHangBan SET trang_thai_thanh_toan = 'Chưa thanh toán' WHERE id = %s;", (dhb_id,))
+                conn.commit()
+                cur.execute(sql, (dhb_id,))
+                self.assertIsNotNone(cur.fetchone())
+                cur.execute("UPDATE DonHangBan SET trang_thai_don_hang = 'Đã hủy' WHERE id = %s;", (dhb_id,))
+                conn.commit()
+                cur.execute(sql, (dhb_id,))
+                self.assertIsNone(cur.fetchone())
+        finally:
+            close_db_connection(conn)
+
+        # Các khách hàng trong setUpClass không bị ảnh hưởng
+        report = get_receivables_report()
+        self.assertEqual(report['summary']['tong_cong_no_phai_thu'], self.no_trong_han + self.no_qua_han)
+        print("=> PASS: Sổ công nợ được trigger cập nhật đúng.")
+
+    def test_5_partial_payments_update_balances(self):
+        """
+        Kiểm tra thanh toán từng phần: số dư của đơn và của khách hàng giảm ngay, trả đủ thì hết nợ,
+        không được trả quá số còn nợ.
+        """
+        print("\n--- Test 5: Thanh toán từng phần ---")
+        kh_id = add_khachhang("KH Trả Góp", "0988888885", "kh.tragop@test.com")
+        self.khach_hang_tao_them.append(kh_id)
+        dhb_id = self._create_unpaid_sale(date(2025, 6, 1), kh_id, Decimal('900000'))
+        self.assertEqual(get_customer_receivable_balance(kh_id)['tong_cong_no'], Decimal('900000'))
+
+        result = add_payment_to_donhangban(dhb_id, Decimal('400000'), 'Chuyển khoản', ghi_chu="Đợt 1")
+        self.assertEqual(result['so_tien_con_lai'], Decimal('500000'))
+        self.assertEqual(result['trang_thai_thanh_toan'], 'Chưa thanh toán')
+        self.assertEqual(get_customer_receivable_balance(kh_id), {
+            "id_khach_hang": kh_id, "tong_cong_no": Decimal('500000'), "so_don_no": 1})
+
+        # Danh sách đơn hiển thị số đã thu / còn lại (trạng thái vẫn 'Chưa thanh toán' khi trả một phần)
+        don = next(d for d in get_all_donhangban(customer_id=kh_id) if d['id'] == dhb_id)
+        self.assertEqual((don['so_tien_da_thanh_toan'], don['so_tien_con_lai']), (Decimal('400000'), Decimal('500000')))
+        trang = get_donhangban_page(customer_id=kh_id, fields="so_tien_da_thanh_toan,so_tien_con_lai")
+        self.assertEqual((trang['data'][0]['so_tien_da_thanh_toan'], trang['data'][0]['so_tien_con_lai']),
+                         (Decimal('400000'), Decimal('500000')))
+
+        # Vượt quá số còn nợ: bị từ chối, số dư giữ nguyên
+        self.assertIsNone(add_payment_to_donhangban(dhb_id, Decimal('600000')))
+        self.assertEqual(get_customer_receivable_balance(kh_id)['tong_cong_no'], Decimal('500000'))
+
+        report = get_receivables_report()
+        chi_tiet = next(d for d in report['details'] if d['id_khach_hang'] == kh_id)
+        self.assertEqual(chi_tiet['tong_cong_no'], Decimal('500000'))
+        self.assertEqual(report['summary']['tong_cong_no_phai_thu'],
+                         self.no_trong_han + self.no_qua_han + Decimal('500000'))
+
+        # Trả nốt: đơn tự chuyển 'Đã thanh toán', khách hết nợ
+        result = add_payment_to_donhangban(dhb_id, Decimal('500000'))
+        self.assertEqual(result['trang_thai_thanh_toan'], 'Đã thanh toán')
+        self.assertEqual(get_customer_receivable_balance(kh_id), {
+            "id_khach_hang": kh_id, "tong_cong_no": 0, "so_don_no": 0})
+        self.assertIsNone(add_payment_to_donhangban(dhb_id, Decimal('1')))
+
+        lich_su = get_payments_of_donhangban(dhb_id)
+        self.assertEqual([p['so_tien'] for p in lich_su['thanh_toan']], [Decimal('400000'), Decimal('500000')])
+        self.assertEqual(lich_su['thanh_toan'][1]['phuong_thuc_thanh_toan'], 'Tiền mặt')  # Phương thức của đơn
+        print("=> PASS: Thanh toán từng phần cập nhật số dư chính xác.")
+
 
 if __name__ == '__main__':
     unittest.main()
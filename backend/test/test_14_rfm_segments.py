@@ -0,0 +1,159 @@
+# test/test_14_rfm_segments.py
+
+import unittest
+import sys
+import os
+from decimal import Decimal
+from datetime import date
+
+# --- Thiết lập đường dẫn Project ---
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# --- Imports từ ứng dụng của bạn ---
+from be.reports.operation_14_phankhucrfm import refresh_rfm_scores, get_rfm_segment_summary, get_rfm_customers_page
+# Import các hàm phụ trợ để tạo dữ liệu test
+from be.operation.operation_2_sanpham import add_sanpham
+from be.operation.operation_1_danhmuc import add_danhmuc
+from be.operation.operation_4_khachhang import add_khachhang
+from be.operation.operation_5_nhanvien import add_nhanvien
+from be.operation.operation_7_donhangban import create_donhangban, add_item_to_donhangban, update_donhangban_status
+from be.db_connection import get_db_connection, close_db_connection
+
+
+class TestRFMSegments(unittest.TestCase):
+    """
+    Bộ kiểm thử cho điểm RFM và phân khúc khách hàng tính sẵn.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """
+        4 khách hàng đã mua hàng với độ gần đây / số lần / chi tiêu khác nhau, 1 khách chưa mua.
+        """
+        print("\n--- Thiết lập môi trường cho Test Phân khúc RFM ---")
+
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "TRUNCATE TABLE DanhMuc, SanPham, NhanVien, KhachHang, DonHangBan, ChiTietDonHangBan RESTART IDENTITY CASCADE;")
+                conn.commit()
+        finally:
+            close_db_connection(conn)
+
+        cls.nhanvien_id = add_nhanvien("NV RFM", "nv_rfm", "pass", "nv.rfm@test.com", "0933333334")
+        cls.danhmuc_id = add_danhmuc("DM_RFM", "Danh mục RFM")
+        cls.sanpham_id = add_sanpham("SP_RFM", "SP RFM", cls.danhmuc_id, 100, "Cái")
+
+        cls.kh_a = add_khachhang("Khách A", "0940000001", "kh.a@test.com")
+        cls.kh_b = add_khachhang("Khách B", "0940000002", "kh.b@test.com")
+        cls.kh_c = add_khachhang("Khách C", "0940000003", "kh.c@test.com")
+        cls.kh_d = add_khachhang("Khách D", "0940000004", "kh.d@test.com")
+        cls.kh_e = add_khachhang("Khách E", "0940000005", "kh.e@test.com")
+
+        # A: 3 đơn, gần đây nhất, chi tiêu 600
+        for ngay in [date(2025, 4, 1), date(2025, 5, 1), date(2025, 6, 5)]:
+            cls._create_completed_sale(ngay, cls.kh_a, 1, Decimal('200'))
+        # B: 1 đơn, chi tiêu 500
+        cls._create_completed_sale(date(2025, 6, 1), cls.kh_b, 1, Decimal('500'))
+        # C: 2 đơn từ tháng 3, chi tiêu 200
+        cls._create_completed_sale(date(2025, 2, 1), cls.kh_c, 1, Decimal('100'))
+        cls._create_completed_sale(date(2025, 3, 1), cls.kh_c, 1, Decimal('100'))
+        # D: 1 đơn từ lâu, chi tiêu 50
+        cls._create_completed_sale(date(2024, 12, 1), cls.kh_d, 1, Decimal('50'))
+
+    @classmethod
+    def _create_completed_sale(cls, sale_date, customer_id, quantity, price):
+        """Hàm helper để tạo một đơn hàng bán đã hoàn tất."""
+        dhb_id = create_donhangban(cls.nhanvien_id, customer_id, "Địa chỉ Test", ngay_dat_hang_str=str(sale_date))
+        add_item_to_donhangban(dhb_id, cls.sanpham_id, quantity, price, 0)
+        update_donhangban_status(dhb_id, 'Hoàn tất', 'Đã thanh toán', str(sale_date))
+        return dhb_id
+
+    def _diem(self):
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT id_khach_hang, so_lan_mua_hang, tong_chi_tieu, diem_r, diem_f, diem_m, phan_khuc
+                    FROM DiemRFMKhachHang;
+                """)
+                return {row[0]: row[1:] for row in cur.fetchall()}
+        finally:
+            close_db_connection(conn)
+
+    def test_1_full_refresh_scores_and_segments(self):
+        """Tính toàn bộ: điểm ngũ phân vị (giá trị bằng nhau cùng điểm) và phân khúc."""
+        print("\n--- Test 1: Tính toàn bộ điểm RFM ---")
+        result = refresh_rfm_scores(full=True)
+        self.assertIsNotNone(result)
+        self.assertEqual(result['so_dong_cap_nhat'], 4)
+
+        diem = self._diem()
+        self.assertNotIn(self.kh_e, diem)  # Chưa mua hàng
+        self.assertEqual(diem[self.kh_a], (3, Decimal('600'), 4, 4, 4, "Khách hàng VIP"))
+        self.assertEqual(diem[self.kh_b], (1, Decimal('500'), 3, 1, 3, "Tiềm năng"))
+        self.assertEqual(diem[self.kh_c], (2, Decimal('200'), 2, 3, 2, "Có nguy cơ rời bỏ"))
+        self.assertEqual(diem[self.kh_d], (1, Decimal('50'), 1, 1, 1, "Ngủ đông"))
+
+        # Chạy lại khi không có gì thay đổi: không ghi dòng nào
+        self.assertEqual(refresh_rfm_scores(full=True)['so_dong_cap_nhat'], 0)
+
+        summary = get_rfm_segment_summary()
+        self.assertEqual([s['phan_khuc'] for s in summary],
+                         ["Khách hàng VIP", "Tiềm năng", "Có nguy cơ rời bỏ", "Ngủ đông"])
+
+    def test_2_incremental_refresh_matches_full(self):
+        """Tính bổ sung chỉ đọc lại khách có đơn thay đổi, kết quả giống tính toàn bộ."""
+        print("\n--- Test 2: Tính bổ sung điểm RFM ---")
+        refresh_rfm_scores(full=True)
+        self._create_completed_sale(date(2025, 6, 8), self.kh_d, 1, Decimal('1000'))
+
+        result = refresh_rfm_scores(full=False)
+        self.assertEqual(result['so_khach_can_tinh'], 1)
+        diem = self._diem()
+        self.assertEqual(diem[self.kh_d], (2, Decimal('1050'), 4, 2, 4, "Khách hàng mới"))
+        self.assertEqual(diem[self.kh_a][2:], (3, 4, 3, "Trung thành"))
+        self.assertEqual(diem[self.kh_b][-1], "Ngủ đông")
+
+        # Hàng đợi đã trống; tính toàn bộ không còn gì để sửa
+        self.assertEqual(refresh_rfm_scores(full=False)['so_khach_can_tinh'], 0)
+        self.assertEqual(refresh_rfm_scores(full=True)['so_dong_cap_nhat'], 0)
+
+    def test_3_segment_pages(self):
+        """Duyệt một phân khúc theo trang, chi tiêu cao trước."""
+        print("\n--- Test 3: Danh sách khách hàng theo phân khúc ---")
+        refresh_rfm_scores(full=True)
+        ngu_dong = [kh for kh, d in self._diem().items() if d[-1] == "Ngủ đông"]
+
+        page = get_rfm_customers_page("Ngủ đông", limit=1)
+        ids = [row['id_khach_hang'] for row in page['data']]
+        while page['next_cursor']:
+            page = get_rfm_customers_page("Ngủ đông", limit=1, cursor=page['next_cursor'])
+            ids += [row['id_khach_hang'] for row in page['data']]
+        self.assertEqual(sorted(ids), sorted(ngu_dong))
+
+        with self.assertRaises(ValueError):
+            get_rfm_customers_page("Không tồn tại")
+
+    def test_4_returned_order_lowers_frequency(self):
+        """Đơn hoàn tất rồi bị trả hàng không còn được tính vào số lần mua."""
+        print("\n--- Test 4: Trả hàng làm giảm số lần mua ---")
+        refresh_rfm_scores(full=True)
+        so_lan_truoc = self._diem()[self.kh_c][0]
+
+        dhb_id = self._create_completed_sale(date(2025, 3, 15), self.kh_c, 1, Decimal('100'))
+        refresh_rfm_scores(full=False)
+        self.assertEqual(self._diem()[self.kh_c][0], so_lan_truoc + 1)
+
+        self.assertTrue(update_donhangban_status(dhb_id, 'Trả hàng'))
+        result = refresh_rfm_scores(full=False)
+        self.assertEqual(result['so_khach_can_tinh'], 1)
+        self.assertEqual(self._diem()[self.kh_c][0], so_lan_truoc)
+        self.assertEqual(refresh_rfm_scores(full=True)['so_dong_cap_nhat'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+# test/test_15_nhapdulieu.py
+
+import unittest
+import sys
+import os
+import tempfile
+
+# --- Thiết lập đường dẫn Project ---
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# --- Imports từ ứng dụng của bạn ---
+from be.operation import operation_15_nhapdulieu as import_ops
+from be.operation.operation_15_nhapdulieu import create_import_job, run_import_job, get_import_job
+# Import các hàm phụ trợ để tạo dữ liệu test
+from be.operation.operation_1_danhmuc import add_danhmuc
+from be.operation.operation_4_khachhang import add_khachhang
+from be.db_connection import get_db_connection, close_db_connection
+
+
+class TestNhapDuLieu(unittest.TestCase):
+    """
+    Bộ kiểm thử cho nhập dữ liệu hàng loạt từ tệp (COPY vào bảng tạm + INSERT ... ON CONFLICT).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        print("\n--- Thiết lập môi trường cho Test Nhập dữ liệu ---")
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("TRUNCATE TABLE DanhMuc, SanPham, KhachHang, LoNhapDuLieu RESTART IDENTITY CASCADE;")
+                conn.commit()
+        finally:
+            close_db_connection(conn)
+
+        cls.danhmuc_id = add_danhmuc("DM_IMP", "Danh mục Nhập tệp")
+        cls.kh_co_san = add_khachhang("Khách có sẵn", "0950000001", "co.san@test.com")
+
+    def _run(self, loai, noi_dung, ten_tep="du_lieu.csv"):
+        """Ghi nội dung ra tệp tạm, chạy lần nhập (đồng bộ) và trả về kết quả."""
+        job_id = create_import_job(loai, ten_tep)
+        self.assertIsNotNone(job_id)
+        with tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".csv", delete=False) as f:
+            f.write(noi_dung)
+        run_import_job(job_id, f.name)
+        self.assertFalse(os.path.exists(f.name), "Tệp tạm phải được xóa sau khi nhập.")
+        return get_import_job(job_id)
+
+    def _query(self, sql, params=None):
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                return cur.fetchall()
+        finally:
+            close_db_connection(conn)
+
+    def test_1_import_products_insert_update_and_row_errors(self):
+        """Thêm mới, cập nhật theo mã, bỏ qua dòng lỗi kèm lý do; tồn kho sản phẩm đã có không bị ghi đè."""
+        print("\n--- Test 1: Nhập sản phẩm ---")
+        job = self._run("san_pham",
+                        "ma_san_pham;ten_san_pham;ma_danh_muc;don_vi_tinh;so_luong_ton_kho\n"
+                        "SP_IMP_1;Bút bi;DM_IMP;Cái;10\n"
+                        "SP_IMP_2;Vở;DM_IMP;Quyển;\n"
+                        "\n"
+                        "SP_IMP_3;Thước;DM_KHONG;Cái;1\n"
+                        "SP_IMP_4;Gôm;DM_IMP;;-1\n"
+                        "SP_IMP_1;Bút bi xanh;DM_IMP;Cái;1\n")
+        self.assertEqual(job['trang_thai'], 'Hoàn tất')
+        self.assertEqual((job['so_dong_da_doc'], job['so_dong_them_moi'], job['so_dong_loi']), (5, 2, 3))
+        loi = {row['so_dong']: row['noi_dung_loi'] for row in job['loi']}
+        self.assertEqual(sorted(loi), [5, 6, 7])
+        self.assertIn("DM_KHONG", loi[5])
+        self.assertIn("thiếu don_vi_tinh", loi[6])
+        self.assertIn("so_luong_ton_kho", loi[6])
+        self.assertIn("trùng", loi[7])
+
+        # Lần 2: cập nhật tên / đơn vị, tồn kho chỉ là tồn đầu kỳ khi thêm mới
+        job = self._run("san_pham",
+                        "ma_san_pham,ten_san_pham,ma_danh_muc,don_vi_tinh,so_luong_ton_kho\n"
+                        "SP_IMP_1,Bút bi xanh,DM_IMP,Hộp,99\n"
+                        "SP_IMP_2,Vở,DM_IMP,Quyển,0\n"
+                        "SP_IMP_5,Bút bi,DM_IMP,Cái,0\n")
+        self.assertEqual((job['so_dong_them_moi'], job['so_dong_cap_nhat'], job['so_dong_khong_doi'],
+                          job['so_dong_loi']), (0, 1, 1, 1))
+        self.assertIn("ten_san_pham 'Bút bi' đã thuộc về một bản ghi khác", job['loi'][0]['noi_dung_loi'])
+        self.assertEqual(self._query("SELECT ten_san_pham, don_vi_tinh, so_luong_ton_kho FROM SanPham "
+                                     "WHERE ma_san_pham = 'SP_IMP_1'"), [("Bút bi xanh", "Hộp", 10)])
+
+    def test_2_import_customers_upsert_by_phone(self):
+        """Khách hàng khớp theo số điện thoại; email đã thuộc khách khác bị báo lỗi."""
+        print("\n--- Test 2: Nhập khách hàng ---")
+        job = self._run("khach_hang",
+                        "ten_khach_hang,so_dien_thoai,email,ngay_sinh,gioi_tinh\n"
+                        "Khách có sẵn (sửa),0950000001,co.san.moi@test.com,1990-01-02,Nữ\n"
+                        "Khách mới,0950000002,moi@test.com,,\n"
+                        "Khách trùng email,0950000003,co.san@test.com,,\n"
+                        "Khách sai,0950000004,khong-phai-email,02/01/1990,X\n")
+        self.assertEqual((job['so_dong_them_moi'], job['so_dong_cap_nhat'], job['so_dong_loi']), (1, 1, 2))
+        self.assertIn("email 'co.san@test.com' đã thuộc về một bản ghi khác", job['loi'][0]['noi_dung_loi'])
+        self.assertEqual(self._query("SELECT ten_khach_hang, email, ngay_sinh::text, gioi_tinh::text FROM KhachHang "
+                                     "WHERE id = %s", (self.kh_co_san,)),
+                         [("Khách có sẵn (sửa)", "co.san.moi@test.com", "1990-01-02", "Nữ")])
+        self.assertEqual(self._query("SELECT COUNT(*) FROM KhachHang")[0][0], 2)
+
+    def test_3_rejected_files(self):
+        """Định dạng không hỗ trợ bị từ chối ngay; thiếu cột bắt buộc làm lần nhập thất bại."""
+        print("\n--- Test 3: Tệp không hợp lệ ---")
+        with self.assertRaises(ValueError):
+            create_import_job("san_pham", "du_lieu.txt")
+        with self.assertRaises(ValueError):
+            create_import_job("don_hang", "du_lieu.csv")
+
+        job = self._run("nha_cung_cap", "ten_nha_cung_cap,email\nNCC A,a@test.com\n")
+        self.assertEqual(job['trang_thai'], 'Thất bại')
+        self.assertIn("dia_chi", job['thong_bao_loi'])
+        self.assertEqual(job['so_dong_da_doc'], 0)
+
+    @unittest.skipIf(import_ops.openpyxl is None, "Chưa cài openpyxl")
+    def test_4_import_suppliers_from_xlsx(self):
+        """Tệp .xlsx được đọc theo từng dòng, ô số / ngày được chuyển về chuỗi như CSV."""
+        print("\n--- Test 4: Nhập nhà cung cấp từ XLSX ---")
+        wb = import_ops.openpyxl.Workbook()
+        ws = wb.active
+        ws.append(["ten_nha_cung_cap", "email", "dia_chi", "ma_so_thue"])
+        ws.append(["NCC Excel", "excel@test.com", "1 Đường Excel", 3600000001])
+        with tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False) as f:
+            wb.save(f.name)
+
+        job_id = create_import_job("nha_cung_cap", "nha_cung_cap.xlsx")
+        self.assertEqual(run_import_job(job_id, f.name), 'Hoàn tất')
+        self.assertEqual(get_import_job(job_id)['so_dong_them_moi'], 1)
+        self.assertEqual(self._query("SELECT ma_so_thue FROM NhaCungCap WHERE ten_nha_cung_cap = 'NCC Excel'"),
+                         [("3600000001",)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# test/test_16_xuatdulieu.py
+
+import unittest
+import sys
+import os
+import asyncio
+import csv
+import io
+import json
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+# --- Thiết lập đường dẫn Project ---
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# --- Imports từ ứng dụng của bạn ---
+from be.operation import operation_16_xuatdulieu as export_ops
+# Import các hàm phụ trợ để tạo dữ liệu test
+from be.operation.operation_1_danhmuc import add_danhmuc
+from be.operation.operation_2_sanpham import add_sanpham
+from be.operation.operation_4_khachhang import add_khachhang
+from be.operation.operation_5_nhanvien import add_nhanvien
+from be.operation.operation_7_donhangban import create_donhangban_with_items
+from be.operation.operation_8_chiphi import add_chiphi
+from be.db_connection import get_db_connection, close_db_connection
+from be.db_connection_async import close_async_pool
+
+
+class TestXuatDuLieu(unittest.TestCase):
+    """
+    Bộ kiểm thử cho xuất dữ liệu dạng luồng (server-side cursor, CSV / NDJSON).
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        print("\n--- Thiết lập môi trường cho Test Xuất dữ liệu ---")
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("TRUNCATE TABLE DanhMuc, SanPham, NhanVien, KhachHang, DonHangBan, ChiTietDonHangBan, "
+                            "ChiPhi RESTART IDENTITY CASCADE;")
+                conn.commit()
+        finally:
+            close_db_connection(conn)
+
+        cls.nhanvien_id = add_nhanvien("NV Xuất", "nv_xuat", "pass", "nv.xuat@test.com", "0966666661")
+        cls.khachhang_id = add_khachhang("Khách Xuất", "0966666662", "kh.xuat@test.com")
+        danhmuc_id = add_danhmuc("DM_XUAT", "Danh mục Xuất")
+        cls.sp_1 = add_sanpham("SP_XUAT_1", "Sản phẩm Xuất 1", danhmuc_id, 100, "Cái")
+        cls.sp_2 = add_sanpham("SP_XUAT_2", "Sản phẩm Xuất 2", danhmuc_id, 100, "Cái")
+
+        # 3 đơn trong tháng 6 (mỗi đơn 2 dòng), 1 đơn tháng 7 nằm ngoài khoảng xuất
+        cls.don_thang_6 = []
+        for ngay in ["2025-06-01", "2025-06-15", "2025-06-30"]:
+            don = create_donhangban_with_items(cls.nhanvien_id, cls.khachhang_id, "Địa chỉ", [
+                {"id_san_pham": cls.sp_1, "so_luong": 1, "gia_ban_niem_yet_don_vi": Decimal('1000'), "giam_gia": 0},
+                {"id_san_pham": cls.sp_2, "so_luong": 2, "gia_ban_niem_yet_don_vi": Decimal('1500'), "giam_gia": 0},
+            ], ngay_dat_hang_str=ngay)
+            cls.don_thang_6.append(don['id'])
+        create_donhangban_with_items(cls.nhanvien_id, cls.khachhang_id, "Địa chỉ", [
+            {"id_san_pham": cls.sp_1, "so_luong": 1, "gia_ban_niem_yet_don_vi": Decimal('1000'), "giam_gia": 0},
+        ], ngay_dat_hang_str="2025-07-01")
+
+        add_chiphi("Điện", 500000, "2025-06-10")
+        add_chiphi("Nước", 100000, "2025-07-10")
+
+    def _export(self, loai, dinh_dang, tu_ngay=date(2025, 6, 1), den_ngay=date(2025, 6, 30)):
+        """Chạy generator xuất, trả về danh sách các đoạn văn bản."""
+        async def kich_ban():
+            try:
+                return [doan async for doan in export_ops.stream_export(loai, dinh_dang, tu_ngay, den_ngay)]
+            finally:
+                await close_async_pool()
+
+        return asyncio.run(kich_ban())
+
+    def test_1_csv_orders_in_range(self):
+        """CSV: BOM + dòng tiêu đề, chỉ các đơn trong khoảng ngày (theo giờ cửa hàng), theo thứ tự ngày."""
+        print("\n--- Test 1: Xuất đơn hàng bán ra CSV ---")
+        noi_dung = "".join(self._export("don_hang_ban", "csv"))
+        self.assertTrue(noi_dung.startswith("\ufeff"))
+        cac_dong = list(csv.DictReader(io.StringIO(noi_dung[1:])))
+        self.assertEqual([int(d['id']) for d in cac_dong], self.don_thang_6)
+        self.assertEqual(cac_dong[0]['ten_khach_hang'], "Khách Xuất")
+        self.assertEqual(Decimal(cac_dong[0]['tam_tinh_tien_hang']), Decimal('4000'))
+
+    def test_2_ndjson_order_lines_in_batches(self):
+        """NDJSON: mỗi dòng chi tiết một object; dữ liệu được gửi theo từng lô KICH_THUOC_LO dòng."""
+        print("\n--- Test 2: Xuất chi tiết đơn hàng ra NDJSON theo lô ---")
+        with mock.patch.object(export_ops, "KICH_THUOC_LO", 4):
+            cac_doan = self._export("chi_tiet_don_hang_ban", "ndjson")
+        self.assertEqual([doan.count("\n") for doan in cac_doan], [4, 2])
+
+        cac_dong = [json.loads(dong) for doan in cac_doan for dong in doan.splitlines()]
+        self.assertEqual(len(cac_dong), 6)
+        self.assertEqual({d['id_don_hang_ban'] for d in cac_dong}, set(self.don_thang_6))
+        self.assertEqual(cac_dong[1]['ma_san_pham'], "SP_XUAT_2")
+        self.assertEqual(cac_dong[1]['tong_gia_ban'], 3000)
+
+    def test_3_expenses_and_range_validation(self):
+        """Chi phí lọc theo ngày; khoảng ngày ngược bị từ chối, mặc định là từ đầu tháng đến hôm nay."""
+        print("\n--- Test 3: Xuất chi phí, kiểm tra khoảng ngày ---")
+        cac_dong = list(csv.reader(io.StringIO("".join(self._export("chi_phi", "csv"))[1:])))
+        self.assertEqual(len(cac_dong), 2)
+        self.assertEqual(cac_dong[1][2], "Điện")
+
+        self.assertEqual("".join(self._export("tai_chinh_theo_ngay", "ndjson")).count("\n"), 30)
+
+        with self.assertRaises(ValueError):
+            export_ops.get_export_range(date(2025, 7, 1), date(2025, 6, 1))
+        tu_ngay, den_ngay = export_ops.get_export_range()
+        self.assertEqual((tu_ngay, den_ngay), (date.today().replace(day=1), date.today()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+# test/test_17_xuatphantich.py
+
+import unittest
+import sys
+import os
+import json
+import shutil
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+# --- Thiết lập đường dẫn Project ---
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# --- Imports từ ứng dụng của bạn ---
+from be.reports import operation_17_xuatphantich as analytics_ops
+from be.reports.operation_17_xuatphantich import export_sales_history, get_sales_history_export_status
+# Import các hàm phụ trợ để tạo dữ liệu test
+from be.operation.operation_1_danhmuc import add_danhmuc
+from be.operation.operation_2_sanpham import add_sanpham
+from be.operation.operation_4_khachhang import add_khachhang
+from be.operation.operation_5_nhanvien import add_nhanvien
+from be.operation.operation_7_donhangban import create_donhangban_with_items, update_donhangban_status
+from be.db_connection import get_db_connection, close_db_connection
+
+
+@unittest.skipIf(analytics_ops.pa is None, "Chưa cài pyarrow")
+class TestXuatPhanTich(unittest.TestCase):
+    """
+    Bộ kiểm thử cho xuất lịch sử bán hàng dạng cột (Parquet / Arrow), ghi bổ sung theo ngày.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        print("\n--- Thiết lập môi trường cho Test Xuất phân tích ---")
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("TRUNCATE TABLE DanhMuc, SanPham, NhanVien, KhachHang, DonHangBan, ChiTietDonHangBan "
+                            "RESTART IDENTITY CASCADE;")
+                conn.commit()
+        finally:
+            close_db_connection(conn)
+
+        cls.nhanvien_id = add_nhanvien("NV Phân tích", "nv_phantich", "pass", "nv.pt@test.com", "0977777771")
+        cls.khachhang_id = add_khachhang("Khách Phân tích", "0977777772", "kh.pt@test.com")
+        danhmuc_id = add_danhmuc("DM_PT", "Danh mục Phân tích")
+        cls.sp_1 = add_sanpham("SP_PT_1", "Sản phẩm Phân tích 1", danhmuc_id, 100, "Cái")
+        cls.sp_2 = add_sanpham("SP_PT_2", "Sản phẩm Phân tích 2", danhmuc_id, 100, "Cái")
+
+        # Hai ngày đã kết thúc có đơn hoàn tất (2 dòng và 1 dòng), một đơn chưa hoàn tất, một đơn hôm nay
+        cls.ngay_1 = date.today() - timedelta(days=3)
+        cls.ngay_2 = date.today() - timedelta(days=2)
+        cls._tao_don(cls.ngay_1, [cls.sp_1, cls.sp_2])
+        cls._tao_don(cls.ngay_2, [cls.sp_1])
+        cls._tao_don(cls.ngay_2, [cls.sp_2], hoan_tat=False)
+        cls._tao_don(date.today(), [cls.sp_1])
+
+        cls.thu_muc = tempfile.mkdtemp()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.thu_muc, ignore_errors=True)
+
+    @classmethod
+    def _tao_don(cls, ngay, cac_san_pham, hoan_tat=True):
+        don = create_donhangban_with_items(cls.nhanvien_id, cls.khachhang_id, "Địa chỉ", [
+            {"id_san_pham": sp, "so_luong": 2, "gia_ban_niem_yet_don_vi": Decimal('1000'), "giam_gia": 0}
+            for sp in cac_san_pham
+        ], ngay_dat_hang_str=str(ngay))
+        if hoan_tat:
+            update_donhangban_status(don['id'], 'Hoàn tất', 'Đã thanh toán', str(ngay))
+        return don['id']
+
+    def _doc_ngay(self, ngay):
+        return analytics_ops.pq.read_table(
+            os.path.join(self.thu_muc, f"ngay={ngay}", "ban_hang.parquet")).to_pydict()
+
+    def test_1_export_closed_days_then_incremental(self):
+        """Lần đầu ghi mọi ngày đã kết thúc; chạy lại không ghi gì; đơn ghi lùi ngày chỉ làm ghi lại ngày đó."""
+        print("\n--- Test 1: Xuất Parquet theo ngày, ghi bổ sung ---")
+        result = export_sales_history(self.thu_muc, "parquet")
+        self.assertEqual((result['so_ngay_ghi'], result['so_dong_ghi']), (2, 3))
+        self.assertEqual(sorted(os.listdir(self.thu_muc)),
+                         ["_manifest.json", f"ngay={self.ngay_1}", f"ngay={self.ngay_2}"])
+        bang = self._doc_ngay(self.ngay_1)
+        self.assertEqual(bang['id_san_pham'], [self.sp_1, self.sp_2])
+        self.assertEqual(bang['tong_gia_ban'], [Decimal('2000'), Decimal('2000')])
+
+        self.assertEqual(export_sales_history(self.thu_muc, "parquet")['so_ngay_ghi'], 0)
+
+        self._tao_don(self.ngay_1, [self.sp_2])
+        result = export_sales_history(self.thu_muc, "parquet")
+        self.assertEqual((result['so_ngay_ghi'], result['so_dong_ghi']), (1, 3))
+        self.assertEqual(len(self._doc_ngay(self.ngay_1)['id_chi_tiet_don_hang_ban']), 3)
+
+        status = get_sales_history_export_status(self.thu_muc, "parquet")
+        self.assertEqual((status['so_ngay'], status['ngay_dau'], status['ngay_cuoi']),
+                         (2, str(self.ngay_1), str(self.ngay_2)))
+
+    def test_2_full_rewrite_and_arrow_format(self):
+        """full=True ghi lại mọi ngày; định dạng Arrow dùng manifest riêng; định dạng lạ bị từ chối."""
+        print("\n--- Test 2: Ghi lại toàn bộ, định dạng Arrow ---")
+        self.assertEqual(export_sales_history(self.thu_muc, "parquet", full=True)['so_ngay_ghi'], 2)
+
+        thu_muc_arrow = tempfile.mkdtemp()
+        try:
+            result = export_sales_history(thu_muc_arrow, "arrow")
+            self.assertEqual(result['so_ngay_ghi'], 2)
+            with analytics_ops.pa.memory_map(os.path.join(thu_muc_arrow, f"ngay={self.ngay_2}", "ban_hang.arrow")) as f:
+                bang = analytics_ops.pa.ipc.open_file(f).read_all()
+            self.assertEqual(bang.num_rows, 1)
+            with open(os.path.join(thu_muc_arrow, "_manifest.json"), encoding="utf-8") as f:
+                self.assertEqual(json.load(f)['dinh_dang'], "arrow")
+        finally:
+            shutil.rmtree(thu_muc_arrow, ignore_errors=True)
+
+        with self.assertRaises(ValueError):
+            export_sales_history(self.thu_muc, "csv")
+
+
+if __name__ == '__main__':
+    unittest.main()
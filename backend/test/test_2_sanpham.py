@@ -1,8 +1,10 @@
 # test/test_2_sanpham.py
 
 import unittest
+import asyncio
 import sys
 import os
+from datetime import date
 
 # Thêm thư mục gốc của dự án vào Python Path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -10,6 +12,9 @@ sys.path.insert(0, project_root)
 
 from be.operation.operation_2_sanpham import *
 from be.operation.operation_1_danhmuc import add_danhmuc
+from be.operation.operation_9_lichsugianiemyet import add_lichsugianiemyet
+from be import catalog_cache
+from be.db_connection_async import close_async_pool
 from be.db_connection import get_db_connection, close_db_connection
 
 
@@ -120,6 +125,72 @@ class TestSanPhamOperation(unittest.TestCase):
         self.assertEqual(updated_sp['mo_ta_chi_tiet'], "Mô tả mới nhất")
         self.assertEqual(updated_sp['trang_thai'], "Ngừng kinh doanh")
 
+    def test_4_catalog_cache_follows_notify(self):
+        """Bộ đệm danh mục POS phải tự cập nhật theo NOTIFY khi thêm sản phẩm, đổi giá, ngừng kinh doanh."""
+        print("\n--- Chạy test: Bộ đệm danh mục POS (LISTEN/NOTIFY) ---")
+
+        async def cho_den_khi(dieu_kien, gioi_han=5.0):
+            # Thông báo đến bất đồng bộ sau COMMIT -> chờ có giới hạn
+            thoi_gian = 0.0
+            while not dieu_kien() and thoi_gian < gioi_han:
+                await asyncio.sleep(0.05)
+                thoi_gian += 0.05
+            return dieu_kien()
+
+        async def kich_ban():
+            try:
+                await catalog_cache.start_catalog_cache()
+                self.assertTrue(await cho_den_khi(catalog_cache.is_ready), "Bộ đệm không nạp được danh mục.")
+
+                sp_id = add_sanpham("SP_CACHE", "Bánh Quy Bơ", self.danhmuc_id, 3, "Hộp")
+                self.assertIsNotNone(sp_id)
+                self.assertTrue(await cho_den_khi(lambda: len(catalog_cache.search_catalog("bánh quy")) == 1))
+                item = catalog_cache.search_catalog("sp_cache")[0]
+                self.assertEqual(item['id'], sp_id)
+                self.assertTrue(item['canh_bao'], "Tồn kho 3 phải được gắn cờ sắp hết hàng.")
+
+                self.assertIsNotNone(add_lichsugianiemyet(sp_id, 25000, date.today().isoformat()))
+                self.assertTrue(await cho_den_khi(
+                    lambda: catalog_cache.search_catalog("SP_CACHE")[0]['gia_ban_hien_tai'] == 25000.0))
+
+                # Kết quả từ bộ đệm phải khớp với truy vấn trực tiếp DB
+                self.assertEqual(catalog_cache.search_catalog("quy"), await catalog_cache.query_catalog_from_db("quy"))
+
+                self.assertTrue(update_sanpham(sp_id, trang_thai="Ngừng kinh doanh"))
+                self.assertTrue(await cho_den_khi(lambda: catalog_cache.search_catalog("SP_CACHE") == []))
+            finally:
+                await catalog_cache.stop_catalog_cache()
+                await close_async_pool()
+
+        asyncio.run(kich_ban())
+
+    def test_5_accent_insensitive_ranked_search(self):
+        """Tìm không dấu, theo đầu mã, có xếp hạng: bộ đệm và truy vấn DB phải cho cùng kết quả."""
+        print("\n--- Chạy test: Tìm kiếm sản phẩm không dấu, xếp hạng ---")
+        add_sanpham("SUA01", "Sữa tươi Vinamilk", self.danhmuc_id, 20, "Hộp")
+        add_sanpham("BANH02", "Bánh sữa Ba Vì", self.danhmuc_id, 20, "Gói")
+        add_sanpham("KEO03", "Kẹo dừa Bến Tre", self.danhmuc_id, 20, "Gói")
+        add_sanpham("TRA04", "Trà sữa đóng chai", self.danhmuc_id, 20, "Chai")
+
+        # Lọc theo tên ở danh sách quản lý: "sua" khớp "sữa"
+        self.assertEqual(len(get_sanpham(ten_san_pham_filter="SUA")), 3)
+
+        async def kich_ban():
+            try:
+                tu_db = await catalog_cache.query_catalog_from_db("sua")
+                await catalog_cache.reload_all()
+                tu_bo_dem = catalog_cache.search_catalog("sua")
+                theo_ma = await catalog_cache.query_catalog_from_db("ban", limit=1)
+                return tu_db, tu_bo_dem, theo_ma
+            finally:
+                await close_async_pool()
+
+        tu_db, tu_bo_dem, theo_ma = asyncio.run(kich_ban())
+        # Đầu mã (SUA01) > đầu tên > đầu một từ (tên ngắn trước)
+        self.assertEqual([p['ma_san_pham'] for p in tu_db], ["SUA01", "BANH02", "TRA04"])
+        self.assertEqual(tu_db, tu_bo_dem)
+        self.assertEqual([p['ma_san_pham'] for p in theo_ma], ["BANH02"])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -9,8 +9,11 @@ from datetime import date
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.insert(0, project_root)
 
-from be.operation.operation_4_khachhang import add_khachhang, get_all_khachhang, update_khachhang
+from be.operation.operation_4_khachhang import add_khachhang, get_khachhang, update_khachhang, get_khachhang_page, \
+    search_khachhang
 from be.db_connection import get_db_connection, close_db_connection
+from fastapi.testclient import TestClient
+from main import app
 
 
 class TestKhachHangOperation(unittest.TestCase):
@@ -45,7 +48,7 @@ class TestKhachHangOperation(unittest.TestCase):
         )
         self.assertIsNotNone(kh2_id)
 
-        all_kh = get_all_khachhang()
+        all_kh = get_khachhang()
         self.assertEqual(len(all_kh), 2)
         # so_lan_mua_hang mặc định là 0 khi thêm mới
         self.assertEqual(all_kh[0]['so_lan_mua_hang'], 0)
@@ -71,7 +74,7 @@ class TestKhachHangOperation(unittest.TestCase):
         )
         self.assertTrue(update_success)
 
-        all_kh = get_all_khachhang()
+        all_kh = get_khachhang()
         updated_kh = all_kh[0]
         self.assertEqual(updated_kh['ten_khach_hang'], "Tên Mới")
         self.assertEqual(updated_kh['dia_chi'], "Địa chỉ mới")
@@ -92,9 +95,86 @@ class TestKhachHangOperation(unittest.TestCase):
         self.assertIsNone(duplicate_email_id)
 
         # Đảm bảo chỉ có 1 khách hàng trong DB
-        all_kh = get_all_khachhang()
+        all_kh = get_khachhang()
         self.assertEqual(len(all_kh), 1)
 
+    def test_4_get_khachhang_page(self):
+        """Phân trang theo cursor: đi hết các trang không bỏ sót / lặp khách hàng nào."""
+        print("\n--- Chạy test: Phân trang danh sách khách hàng ---")
+
+        # Hai khách trùng tên để kiểm tra khóa phụ id giữ thứ tự ổn định
+        for i, ten in enumerate(["Trần B", "Lê C", "Trần B", "An D", "Phạm E"]):
+            self.assertIsNotNone(add_khachhang(ten, f"09000000{i:02d}", f"kh{i}@email.com"))
+
+        ids, cursor, so_trang = [], None, 0
+        while True:
+            page = get_khachhang_page(limit=2, cursor=cursor, include_total=(cursor is None))
+            self.assertIsNotNone(page)
+            if cursor is None:
+                self.assertEqual(page['total'], 5)
+            self.assertLessEqual(len(page['data']), 2)
+            ids.extend(kh['id'] for kh in page['data'])
+            so_trang += 1
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+
+        self.assertEqual(so_trang, 3)
+        self.assertEqual(len(ids), 5)
+        self.assertEqual(len(set(ids)), 5, "Không được lặp khách hàng giữa các trang.")
+        self.assertEqual(ids, [kh['id'] for kh in sorted(get_khachhang(), key=lambda k: (k['ten_khach_hang'], k['id']))])
+
+        with self.assertRaises(ValueError):
+            get_khachhang_page(cursor="cursor-hong")
+
+    def test_5_accent_insensitive_and_phone_suffix_search(self):
+        """Tìm tên không dấu, tìm theo vài số cuối điện thoại (bỏ qua khoảng trắng), lọc email."""
+        print("\n--- Chạy test: Tìm khách hàng không dấu / theo số cuối điện thoại ---")
+        id_a = add_khachhang("Nguyễn Văn An", "0909 123 456", "an.nguyen@email.com")
+        id_b = add_khachhang("Trần Thị Ngụy", "0912000456", "ngu@email.com")
+        id_c = add_khachhang("Lê Đức Anh", "0988777666", "duc.anh@email.com")
+        self.assertTrue(all([id_a, id_b, id_c]))
+
+        # Lọc danh sách: "nguyen" khớp "Nguyễn", "duc" khớp "Đức", số điện thoại bỏ khoảng trắng
+        self.assertEqual([kh['id'] for kh in get_khachhang(name_filter="NGUYEN")], [id_a])
+        self.assertEqual([kh['id'] for kh in get_khachhang(name_filter="duc")], [id_c])
+        self.assertEqual([kh['id'] for kh in get_khachhang(phone_filter="123456")], [id_a])
+        self.assertEqual([kh['id'] for kh in get_khachhang(email_filter="Duc.Anh")], [id_c])
+
+        # Thu ngân: số cuối điện thoại
+        self.assertEqual(sorted(kh['id'] for kh in search_khachhang("456")), sorted([id_a, id_b]))
+        self.assertEqual([kh['id'] for kh in search_khachhang("0909 123456")], [id_a])
+        self.assertEqual(search_khachhang("1234"), [])
+
+        # Thu ngân: tên / email -- email bắt đầu bằng từ khóa (id_b) xếp trước tên bắt đầu bằng từ khóa (id_a)
+        self.assertEqual([kh['id'] for kh in search_khachhang("ngu")], [id_b, id_a])
+        self.assertEqual(search_khachhang("   "), [])
+
+    def test_6_search_route(self):
+        """Gọi qua ứng dụng (main.app): /customers/search đã được gắn và không bị /{customer_id} nuốt mất."""
+        print("\n--- Chạy test: API tra cứu khách hàng ---")
+        id_a = add_khachhang("Nguyễn Văn An", "0909123456", "an.nguyen@email.com")
+        id_b = add_khachhang("Lê Đức Anh", "0988777666", "duc.anh@email.com")
+        self.assertTrue(all([id_a, id_b]))
+
+        client = TestClient(app)
+        res = client.get("/customers/search", params={"q": "nguyen"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([kh['id'] for kh in res.json()], [id_a])
+
+        res = client.get("/customers/search", params={"q": "7666", "limit": 5})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([kh['id'] for kh in res.json()], [id_b])
+
+        # Thiếu từ khóa -> lỗi kiểm tra tham số
+        self.assertEqual(client.get("/customers/search").status_code, 422)
+
+        # Danh sách phân trang cũng đi qua router đã gắn
+        res = client.get("/customers/", params={"limit": 1})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['count'], 1)
+        self.assertIsNotNone(res.json()['next_cursor'])
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
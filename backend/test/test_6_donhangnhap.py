@@ -18,6 +18,8 @@ from be.operation.operation_2_sanpham import add_sanpham
 from be.operation.operation_3_nhacungcap import add_nhacungcap
 from be.operation.operation_5_nhanvien import add_nhanvien
 from be.db_connection import get_db_connection, close_db_connection
+from fastapi.testclient import TestClient
+from main import app
 
 
 class TestDonHangNhapOperation(unittest.TestCase):
@@ -192,6 +194,101 @@ class TestDonHangNhapOperation(unittest.TestCase):
 
         print("=> PASS: Các hàm xử lý đúng với ID không tồn tại.")
 
+    def test_5_receive_date_is_copied_to_lots(self):
+        """
+        Kiểm tra trigger đồng bộ ngay_nhap_kho: lô chỉ có ngày nhập kho khi đơn 'Hoàn tất'
+        (đây là điều kiện để lô nằm trong index lô mở của FIFO).
+        """
+        print("\n--- Test 5: Đồng bộ ngày nhập kho cho lô ---")
+        dhn_id = create_donhangnhap(self.nhacungcap_id, self.nhanvien_id)
+        item_id = add_item_to_donhangnhap(dhn_id, self.sanpham_id_1, 10, Decimal('10000'))
+
+        def ngay_nhap_kho():
+            conn = get_db_connection()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT ngay_nhap_kho FROM ChiTietDonHangNhap WHERE id = %s", (item_id,))
+                    return cur.fetchone()[0]
+            finally:
+                close_db_connection(conn)
+
+        self.assertIsNone(ngay_nhap_kho(), "Lô của đơn chưa hoàn tất không được có ngày nhập kho.")
+
+        update_donhangnhap_status(dhn_id, 'Hoàn tất', '2025-06-10')
+        self.assertEqual(str(ngay_nhap_kho()), '2025-06-10')
+
+        update_donhangnhap_status(dhn_id, 'Đã hủy')
+        self.assertIsNone(ngay_nhap_kho(), "Lô của đơn đã hủy phải rời khỏi danh sách lô mở.")
+        print("=> PASS: Ngày nhập kho của lô được đồng bộ theo trạng thái đơn nhập.")
+
+    def test_6_create_with_items_is_atomic(self):
+        """
+        Kiểm tra tạo đơn kèm sản phẩm trong một giao dịch: thành công thì trả về đơn đầy đủ,
+        một dòng lỗi (sản phẩm trùng / không tồn tại) thì không để lại đầu đơn nào.
+        """
+        print("\n--- Test 6: Tạo đơn nhập kèm sản phẩm (một giao dịch) ---")
+        items = [
+            {'id_san_pham': self.sanpham_id_1, 'so_luong': 50, 'gia_nhap_don_vi': Decimal('100000')},
+            {'id_san_pham': self.sanpham_id_2, 'so_luong': 25, 'gia_nhap_don_vi': Decimal('250000'), 'ghi_chu': 'Hộp lớn'},
+        ]
+        order = create_donhangnhap_with_items(self.nhacungcap_id, self.nhanvien_id, items,
+                                              ngay_dat_hang_str='2025-06-01', ghi_chu='Nhập lô đầu')
+        self.assertIsNotNone(order, "Tạo đơn kèm sản phẩm thất bại.")
+        self.assertEqual(str(order['ngay_dat_hang']), '2025-06-01')
+        self.assertEqual(order['ten_nha_cung_cap'], "NCC Test Corp")
+        self.assertEqual(len(order['chi_tiet_san_pham']), 2)
+        self.assertEqual(sum(item['tong_gia_nhap'] for item in order['chi_tiet_san_pham']),
+                         50 * Decimal('100000') + 25 * Decimal('250000'))
+        self.assertEqual(order, get_chitietdonhangnhap(order['id']), "Đơn trả về phải giống khi đọc lại.")
+
+        # Đơn không có sản phẩm vẫn hợp lệ
+        order_rong = create_donhangnhap_with_items(self.nhacungcap_id, self.nhanvien_id, [])
+        self.assertEqual(order_rong['chi_tiet_san_pham'], [])
+
+        # Dòng trùng sản phẩm / sản phẩm không tồn tại -> không tạo gì cả
+        for items_loi in (items + [items[0]], items + [{'id_san_pham': 999999, 'so_luong': 1,
+                                                        'gia_nhap_don_vi': Decimal('1000')}]):
+            self.assertIsNone(create_donhangnhap_with_items(self.nhacungcap_id, self.nhanvien_id, items_loi))
+        self.assertIsNone(create_donhangnhap_with_items(self.nhacungcap_id, self.nhanvien_id, items,
+                                                        ngay_dat_hang_str='01/06/2025'))
+
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*) FROM DonHangNhap")
+                self.assertEqual(cur.fetchone()[0], 2, "Đơn lỗi không được để lại đầu đơn.")
+        finally:
+            close_db_connection(conn)
+        print("=> PASS: Tạo đơn kèm sản phẩm là nguyên tử.")
+
+    def test_7_create_with_items_route(self):
+        """Gọi POST /purchase-orders/ qua ứng dụng (main.app): đơn và sản phẩm được tạo trong một lần gọi."""
+        print("\n--- Test 7: API tạo đơn nhập kèm sản phẩm ---")
+        client = TestClient(app)
+        body = {
+            'id_nha_cung_cap': self.nhacungcap_id,
+            'id_nhan_vien': self.nhanvien_id,
+            'ngay_dat_hang': '2025-06-02',
+            'chi_tiet_san_pham': [
+                {'id_san_pham': self.sanpham_id_1, 'so_luong': 5, 'gia_nhap_don_vi': '100000'},
+                {'id_san_pham': self.sanpham_id_2, 'so_luong': 2, 'gia_nhap_don_vi': '250000'},
+            ],
+        }
+        res = client.post("/purchase-orders/", json=body)
+        self.assertEqual(res.status_code, 201, res.text)
+        order = res.json()
+        self.assertEqual(order['ngay_dat_hang'], '2025-06-02')
+        self.assertEqual(sorted(item['id_san_pham'] for item in order['chi_tiet_san_pham']),
+                         sorted([self.sanpham_id_1, self.sanpham_id_2]))
+
+        # Trùng sản phẩm -> 400, không để lại đầu đơn
+        body['chi_tiet_san_pham'].append(body['chi_tiet_san_pham'][0])
+        self.assertEqual(client.post("/purchase-orders/", json=body).status_code, 400)
+        res = client.get("/purchase-orders/", params={'include_total': True})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['total'], 1)
+        print("=> PASS: API tạo đơn nhập kèm sản phẩm.")
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -3,6 +3,7 @@
 import unittest
 import sys
 import os
+import asyncio
 from decimal import Decimal
 
 # --- Thiết lập đường dẫn Project ---
@@ -14,9 +15,12 @@ if project_root not in sys.path:
 from be.operation.operation_7_donhangban import *
 from be.operation.operation_1_danhmuc import add_danhmuc
 from be.operation.operation_2_sanpham import add_sanpham
+from be.operation.operation_3_nhacungcap import add_nhacungcap
 from be.operation.operation_4_khachhang import add_khachhang
 from be.operation.operation_5_nhanvien import add_nhanvien
+from be.operation.operation_6_donhangnhap import create_donhangnhap, add_item_to_donhangnhap, update_donhangnhap_status
 from be.db_connection import get_db_connection, close_db_connection
+from be.db_connection_async import close_async_pool
 
 
 class TestDonHangBanOperation(unittest.TestCase):
@@ -38,7 +42,7 @@ class TestDonHangBanOperation(unittest.TestCase):
         try:
             with conn.cursor() as cur:
                 cur.execute(
-                    "TRUNCATE TABLE DanhMuc, SanPham, NhanVien, KhachHang, DonHangBan, ChiTietDonHangBan RESTART IDENTITY CASCADE;"
+                    "TRUNCATE TABLE DanhMuc, SanPham, NhanVien, KhachHang, NhaCungCap, DonHangNhap, ChiTietDonHangNhap, DonHangBan, ChiTietDonHangBan RESTART IDENTITY CASCADE;"
                 )
                 conn.commit()
         finally:
@@ -48,6 +52,7 @@ class TestDonHangBanOperation(unittest.TestCase):
         cls.danhmuc_id = add_danhmuc("DM_T_BAN", "Danh mục Test Bán Hàng")
         cls.khachhang_id = add_khachhang("KH Test Bán", "0900000001", "kh.test.ban@example.com")
         cls.nhanvien_id = add_nhanvien("NV Test Bán", "nv_test_ban", "pass123", "nv.test.ban@example.com", "0900000002")
+        cls.nhacungcap_id = add_nhacungcap("NCC Test Bán", "ncc.test.ban@example.com", "1 Đường NCC")
 
         cls.stock_sp1 = 100
         cls.stock_sp2 = 20
@@ -67,7 +72,7 @@ class TestDonHangBanOperation(unittest.TestCase):
         try:
             with conn.cursor() as cur:
                 # Xóa tất cả các đơn hàng cũ
-                cur.execute("TRUNCATE TABLE DonHangBan, ChiTietDonHangBan RESTART IDENTITY CASCADE;")
+                cur.execute("TRUNCATE TABLE DonHangBan, ChiTietDonHangBan, DonHangNhap, ChiTietDonHangNhap RESTART IDENTITY CASCADE;")
                 # Reset số lượng tồn kho
                 cur.execute("UPDATE SanPham SET so_luong_ton_kho = %s WHERE id = %s",
                             (self.stock_sp1, self.sanpham_id_1))
@@ -173,6 +178,168 @@ class TestDonHangBanOperation(unittest.TestCase):
         self.assertEqual(so_lan_mua_moi, so_lan_mua_cu + 1, "Trigger cập nhật số lần mua hàng không chính xác.")
         print(f"=> PASS: Tồn kho ({ton_kho_moi}) và số lần mua hàng ({so_lan_mua_moi}) đã được cập nhật đúng.")
 
+    def test_4_async_variants_match_sync_behaviour(self):
+        """
+        Kiểm tra các hàm async (dùng cho router) cho kết quả giống các hàm đồng bộ.
+        """
+        print("\n--- Test 4: Các hàm async tạo đơn, thêm sản phẩm, lấy chi tiết ---")
+
+        async def kich_ban():
+            try:
+                dhb_id = await create_donhangban_async(self.nhanvien_id, self.khachhang_id, "12 Đường Async")
+                item_id = await add_item_to_donhangban_async(dhb_id, self.sanpham_id_1, 2, Decimal('100000'), 0)
+                item_fail = await add_item_to_donhangban_async(dhb_id, self.sanpham_id_2, 21, Decimal('100000'), 0)
+                details = await get_chitietdonhangban_async(dhb_id)
+                orders = await get_all_donhangban_async(customer_id=self.khachhang_id)
+                return dhb_id, item_id, item_fail, details, orders
+            finally:
+                await close_async_pool()
+
+        dhb_id, item_id, item_fail, details, orders = asyncio.run(kich_ban())
+
+        self.assertIsNotNone(dhb_id, "Tạo đơn hàng async thất bại.")
+        self.assertIsNotNone(item_id, "Thêm sản phẩm async thất bại.")
+        self.assertIsNone(item_fail, "Hàm async đã cho phép bán quá tồn kho.")
+        self.assertEqual(len(details['chi_tiet_san_pham']), 1)
+        self.assertEqual(details['financial_calc']['tong_tien_hang'], 200000.0)
+        self.assertEqual([o['id'] for o in orders], [dhb_id])
+        print("=> PASS: Các hàm async hoạt động giống phiên bản đồng bộ.")
+
+    def test_5_create_order_with_items_in_one_transaction(self):
+        """
+        Kiểm tra tạo đơn kèm nhiều sản phẩm trong một giao dịch:
+        thành công trả về hóa đơn, thiếu tồn kho thì không tạo gì cả.
+        """
+        print("\n--- Test 5: Tạo đơn kèm sản phẩm trong một giao dịch ---")
+        items = [
+            {'id_san_pham': self.sanpham_id_2, 'so_luong': 3, 'gia_ban_niem_yet_don_vi': Decimal('200000'), 'giam_gia': 0},
+            {'id_san_pham': self.sanpham_id_1, 'so_luong': 5, 'gia_ban_niem_yet_don_vi': Decimal('100000'), 'giam_gia': Decimal('0.1')},
+        ]
+        invoice = create_donhangban_with_items(self.nhanvien_id, self.khachhang_id, "1 Đường Giỏ Hàng", items)
+        self.assertIsNotNone(invoice, "Tạo đơn kèm sản phẩm thất bại.")
+        self.assertEqual(len(invoice['chi_tiet_san_pham']), 2)
+        self.assertEqual(invoice['financial_calc']['tong_tien_hang'], 1050000.0)
+
+        # Một dòng vượt tồn kho -> toàn bộ đơn bị hủy
+        items_fail = [
+            {'id_san_pham': self.sanpham_id_1, 'so_luong': 1, 'gia_ban_niem_yet_don_vi': Decimal('100000'), 'giam_gia': 0},
+            {'id_san_pham': self.sanpham_id_2, 'so_luong': 21, 'gia_ban_niem_yet_don_vi': Decimal('200000'), 'giam_gia': 0},
+        ]
+        self.assertIsNone(create_donhangban_with_items(self.nhanvien_id, self.khachhang_id, "2 Đường Lỗi", items_fail))
+        # Sản phẩm trùng trong giỏ -> từ chối
+        self.assertIsNone(create_donhangban_with_items(self.nhanvien_id, self.khachhang_id, "3 Đường Trùng", items + items[:1]))
+
+        async def kich_ban():
+            try:
+                return await create_donhangban_with_items_async(self.nhanvien_id, self.khachhang_id, "4 Đường Async", items)
+            finally:
+                await close_async_pool()
+        invoice_async = asyncio.run(kich_ban())
+        self.assertEqual(invoice_async['financial_calc'], invoice['financial_calc'])
+
+        orders = get_all_donhangban(customer_id=self.khachhang_id)
+        self.assertEqual(len(orders), 2, "Đơn lỗi không được để lại dữ liệu.")
+        print("=> PASS: Đơn kèm sản phẩm được tạo trong một giao dịch.")
+
+    def test_6_fifo_allocation_and_reversal(self):
+        """
+        Kiểm tra trigger FIFO theo tập hợp: xuất qua nhiều lô, ghi PhanBoLoNhap,
+        và trả lại lô khi hủy đơn.
+        """
+        print("\n--- Test 6: Phân bổ lô nhập FIFO và hoàn trả khi hủy đơn ---")
+        # 3 lô: 5 @ 10.000 (cũ nhất), 5 @ 12.000, 10 @ 15.000
+        lo_ids = []
+        for ngay, so_luong, gia in [('2025-01-01', 5, 10000), ('2025-02-01', 5, 12000), ('2025-03-01', 10, 15000)]:
+            dhn_id = create_donhangnhap(self.nhacungcap_id, self.nhanvien_id)
+            lo_ids.append(add_item_to_donhangnhap(dhn_id, self.sanpham_id_1, so_luong, Decimal(gia)))
+            update_donhangnhap_status(dhn_id, 'Hoàn tất', ngay)
+
+        dhb_id = create_donhangban(self.nhanvien_id, self.khachhang_id, "5 Đường FIFO")
+        add_item_to_donhangban(dhb_id, self.sanpham_id_1, 12, Decimal('20000'), 0)
+
+        # 5*10.000 + 5*12.000 + 2*15.000
+        item = get_chitietdonhangban(dhb_id)['chi_tiet_san_pham'][0]
+        self.assertEqual(item['tong_gia_von'], Decimal('140000'), "Giá vốn FIFO tính sai.")
+
+        phan_bo = get_phanbolonhap(dhb_id)
+        self.assertEqual([(p['id_chi_tiet_don_hang_nhap'], p['so_luong']) for p in phan_bo],
+                         [(lo_ids[0], 5), (lo_ids[1], 5), (lo_ids[2], 2)])
+
+        def so_luong_con_lai():
+            conn = get_db_connection()
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT so_luong_con_lai FROM ChiTietDonHangNhap WHERE id = ANY(%s) ORDER BY id", (lo_ids,))
+                    return [r[0] for r in cur.fetchall()]
+            finally:
+                close_db_connection(conn)
+
+        self.assertEqual(so_luong_con_lai(), [0, 0, 8])
+
+        # Hủy đơn -> số lượng trở về các lô, phân bổ được đánh dấu đã hoàn trả
+        self.assertTrue(update_donhangban_status(dhb_id, 'Đã hủy'))
+        self.assertEqual(so_luong_con_lai(), [5, 5, 10])
+        self.assertTrue(all(p['da_hoan_tra'] for p in get_phanbolonhap(dhb_id)))
+        print("=> PASS: Phân bổ FIFO và hoàn trả lô chính xác.")
+
+    def test_7_stored_order_totals_follow_line_changes(self):
+        """
+        Kiểm tra tổng tiền lưu sẵn trên DonHangBan được trigger cập nhật khi thêm/sửa/xóa dòng.
+        """
+        print("\n--- Test 7: Tổng tiền lưu sẵn trên đơn hàng ---")
+        dhb_id = create_donhangban(self.nhanvien_id, self.khachhang_id, "7 Đường Tổng Tiền")
+        add_item_to_donhangban(dhb_id, self.sanpham_id_1, 2, Decimal('100000'), 0)
+        item_2 = add_item_to_donhangban(dhb_id, self.sanpham_id_2, 1, Decimal('50000'), 0)
+
+        def tong_tien_don():
+            order = get_all_donhangban(customer_id=self.khachhang_id)[0]
+            return order['tam_tinh_tien_hang'], order['so_dong_hang']
+
+        self.assertEqual(tong_tien_don(), (Decimal('250000'), 2))
+        self.assertEqual(get_all_donhangban(customer_id=self.khachhang_id)[0]['tong_thanh_toan_du_kien'],
+                         Decimal('250000') * Decimal('1.115'))
+
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("UPDATE ChiTietDonHangBan SET so_luong = 3 WHERE id = %s", (item_2,))
+                conn.commit()
+            self.assertEqual(tong_tien_don(), (Decimal('350000'), 2))
+
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM ChiTietDonHangBan WHERE id = %s", (item_2,))
+                conn.commit()
+            self.assertEqual(tong_tien_don(), (Decimal('200000'), 1))
+        finally:
+            close_db_connection(conn)
+        print("=> PASS: Tổng tiền đơn hàng được cập nhật theo từng dòng.")
+
+    def test_8_order_list_keyset_pagination(self):
+        """
+        Kiểm tra phân trang theo cursor: duyệt hết các trang không trùng/thiếu đơn, chọn trường, lọc ngày.
+        """
+        print("\n--- Test 8: Phân trang danh sách đơn hàng theo cursor ---")
+        ids = [create_donhangban(self.nhanvien_id, self.khachhang_id, f"Địa chỉ {i}", f"2025-06-0{i}")
+               for i in range(1, 6)]
+
+        da_xem = []
+        cursor = None
+        while True:
+            page = get_donhangban_page(limit=2, cursor=cursor, fields="tam_tinh_tien_hang")
+            da_xem.extend(row['id'] for row in page['data'])
+            self.assertEqual(set(page['data'][0].keys()), {'ngay_dat_hang', 'id', 'tam_tinh_tien_hang'})
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(da_xem, list(reversed(ids)), "Các trang phải liên tiếp, mới nhất trước.")
+
+        page = get_donhangban_page(date_from_str="2025-06-02", date_to_str="2025-06-03")
+        self.assertEqual([row['id'] for row in page['data']], [ids[2], ids[1]])
+
+        with self.assertRaises(ValueError):
+            get_donhangban_page(fields="mat_khau")
+        print("=> PASS: Phân trang theo cursor hoạt động đúng.")
+
 
 if __name__ == '__main__':
     unittest.main()
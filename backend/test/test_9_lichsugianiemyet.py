@@ -4,7 +4,7 @@ import unittest
 import sys
 import os
 from decimal import Decimal
-from datetime import date
+from datetime import date, timedelta
 
 # --- Thiết lập đường dẫn Project ---
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -14,7 +14,7 @@ if project_root not in sys.path:
 # --- Imports từ ứng dụng của bạn ---
 from be.operation.operation_9_lichsugianiemyet import *
 from be.operation.operation_1_danhmuc import add_danhmuc
-from be.operation.operation_2_sanpham import add_sanpham
+from be.operation.operation_2_sanpham import add_sanpham, get_sanpham_by_id
 from be.db_connection import get_db_connection, close_db_connection
 
 
@@ -125,6 +125,33 @@ class TestLichSuGiaOperation(unittest.TestCase):
 
         print("=> PASS: Hệ thống đã xử lý các trường hợp nhập liệu không hợp lệ.")
 
+    def test_3_current_price_is_materialized(self):
+        """
+        SanPham.gia_ban_hien_tai phải theo giá đang có hiệu lực: đổi ngay khi thêm/sửa giá hôm nay,
+        giữ nguyên với giá tương lai cho tới khi func_ap_dung_gia_den_han chạy vào ngày đó.
+        """
+        print("\n--- Test 3: Giá bán hiện tại lưu sẵn trên SanPham ---")
+        hom_nay = date.today()
+
+        gia_id = add_lichsugianiemyet(self.sanpham_id, 120000, (hom_nay - timedelta(days=10)).isoformat())
+        self.assertEqual(get_sanpham_by_id(self.sanpham_id)['gia_ban_hien_tai'], Decimal('120000'))
+
+        # Sửa giá đang hiệu lực -> cập nhật ngay
+        self.assertTrue(update_lichsugianiemyet(gia_id, gia_niem_yet=125000))
+        self.assertEqual(get_sanpham_by_id(self.sanpham_id)['gia_ban_hien_tai'], Decimal('125000'))
+
+        # Giá tương lai chưa được áp dụng
+        ngay_tuong_lai = hom_nay + timedelta(days=3)
+        self.assertIsNotNone(add_lichsugianiemyet(self.sanpham_id, 150000, ngay_tuong_lai.isoformat()))
+        self.assertEqual(get_sanpham_by_id(self.sanpham_id)['gia_ban_hien_tai'], Decimal('125000'))
+
+        # Lịch chạy hằng ngày: hôm nay không có gì đến hạn, tới ngày áp dụng thì đổi giá đúng một lần
+        self.assertEqual(apply_due_prices(), 0)
+        self.assertEqual(apply_due_prices(ngay_tuong_lai.isoformat()), 1)
+        self.assertEqual(get_sanpham_by_id(self.sanpham_id)['gia_ban_hien_tai'], Decimal('150000'))
+        self.assertEqual(apply_due_prices(ngay_tuong_lai.isoformat()), 0, "Chạy lại không được đổi giá lần nữa.")
+        self.assertIsNone(apply_due_prices("khong-phai-ngay"))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,117 @@
+# test/test_db_connection.py
+
+import unittest
+import sys
+import os
+import time
+import psycopg2.pool
+
+# Thêm thư mục gốc của dự án vào Python Path để có thể import các module từ 'be'
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from be.db_connection import (
+    ConnectionPool, get_db_connection, close_db_connection, execute_query, get_pool_stats,
+    DB_HOST, DB_NAME, DB_USER, DB_PASS
+)
+
+
+class TestConnectionPool(unittest.TestCase):
+    """
+    Bộ kiểm thử cho pool kết nối dùng chung.
+    """
+
+    def _new_pool(self, **kwargs):
+        options = dict(minconn=0, maxconn=2, max_lifetime=1800, timeout=1, check_idle=30)
+        options.update(kwargs)
+        return ConnectionPool(host=DB_HOST, database=DB_NAME, user=DB_USER, password=DB_PASS, **options)
+
+    def test_1_connection_is_reused(self):
+        """Kết nối trả về pool phải được tái sử dụng, không mở kết nối mới."""
+        print("\n--- Chạy test: Tái sử dụng kết nối ---")
+        pool = self._new_pool()
+        try:
+            conn1 = pool.getconn()
+            pool.putconn(conn1)
+            conn2 = pool.getconn()
+            self.assertIs(conn1, conn2, "Pool không tái sử dụng kết nối đã trả về.")
+            pool.putconn(conn2)
+
+            stats = pool.stats()
+            self.assertEqual(stats['connections_created'], 1)
+            self.assertEqual(stats['total_checkouts'], 2)
+            self.assertEqual(stats['in_use'], 0)
+            self.assertEqual(stats['idle'], 1)
+        finally:
+            pool.closeall()
+
+    def test_2_pool_exhausted_times_out(self):
+        """Khi pool đã dùng hết, lần lấy tiếp theo phải báo lỗi sau khi hết thời gian chờ."""
+        print("\n--- Chạy test: Hết kết nối trong pool ---")
+        pool = self._new_pool(maxconn=1, timeout=0.2)
+        try:
+            conn = pool.getconn()
+            with self.assertRaises(psycopg2.pool.PoolError):
+                pool.getconn()
+            self.assertEqual(pool.stats()['timeouts'], 1)
+            pool.putconn(conn)
+        finally:
+            pool.closeall()
+
+    def test_3_broken_and_expired_connections_are_replaced(self):
+        """Kết nối đã đóng hoặc quá tuổi không được giao lại cho người dùng."""
+        print("\n--- Chạy test: Thay thế kết nối hỏng ---")
+        pool = self._new_pool(max_lifetime=0.01)
+        try:
+            conn1 = pool.getconn()
+            conn1.close()
+            pool.putconn(conn1)
+
+            conn2 = pool.getconn()
+            self.assertFalse(conn2.closed)
+            self.assertIsNot(conn1, conn2)
+            time.sleep(0.05)
+            pool.putconn(conn2)
+            self.assertEqual(pool.stats()['connections_closed'], 2, "Kết nối quá tuổi phải bị đóng khi trả về.")
+        finally:
+            pool.closeall()
+
+    def test_4_module_helpers_use_shared_pool(self):
+        """get_db_connection/execute_query dùng chung pool của tiến trình."""
+        print("\n--- Chạy test: Hàm tiện ích dùng pool chung ---")
+        conn = get_db_connection()
+        self.assertIsNotNone(conn)
+        close_db_connection(conn)
+
+        result = execute_query("SELECT 1 AS mot;")
+        self.assertEqual(result[0]['mot'], 1)
+
+        stats = get_pool_stats()
+        self.assertIsNotNone(stats)
+        self.assertEqual(stats['in_use'], 0, "Kết nối không được trả lại pool sau khi dùng.")
+
+    def test_5_putconn_rejects_unknown_connection(self):
+        """Trả kết nối lạ hoặc trả hai lần phải báo lỗi, không làm lệch số kết nối đang dùng."""
+        print("\n--- Chạy test: Trả kết nối không thuộc pool ---")
+        pool = self._new_pool()
+        khac = self._new_pool()
+        try:
+            conn = pool.getconn()
+            conn_khac = khac.getconn()
+            with self.assertRaises(psycopg2.pool.PoolError):
+                pool.putconn(conn_khac)
+            self.assertEqual(pool.stats()['in_use'], 1)
+
+            pool.putconn(conn)
+            with self.assertRaises(psycopg2.pool.PoolError):
+                pool.putconn(conn)
+            self.assertEqual(pool.stats()['in_use'], 0)
+            self.assertEqual(pool.stats()['idle'], 1)
+            khac.putconn(conn_khac)
+        finally:
+            pool.closeall()
+            khac.closeall()
+
+
+if __name__ == '__main__':
+    unittest.main()
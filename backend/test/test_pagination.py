@@ -0,0 +1,86 @@
+# test/test_pagination.py
+
+import unittest
+import sys
+import os
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+# Thêm thư mục gốc của dự án vào Python Path để có thể import các module từ 'be'
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from be import pagination
+
+
+class TestPagination(unittest.TestCase):
+    """
+    Bộ kiểm thử cho các hàm phân trang dùng chung (không cần CSDL).
+    """
+
+    def test_1_cursor_round_trip(self):
+        """Cursor phải giải mã lại đúng các giá trị (datetime có múi giờ, date, Decimal, int, str)."""
+        print("\n--- Chạy test: Mã hóa / giải mã cursor ---")
+        values = [datetime(2025, 6, 10, 8, 30, tzinfo=timezone.utc), date(2025, 6, 1), Decimal('12.50'), 42, "Bánh mì"]
+        cursor = pagination.encode_cursor(values)
+        self.assertEqual(pagination.decode_cursor(cursor, len(values)), values)
+
+    def test_2_invalid_cursor_raises(self):
+        """Cursor hỏng hoặc sai số phần tử phải ném ValueError."""
+        print("\n--- Chạy test: Cursor không hợp lệ ---")
+        with self.assertRaises(ValueError):
+            pagination.decode_cursor("khong-phai-base64!!", 2)
+        with self.assertRaises(ValueError):
+            pagination.decode_cursor(pagination.encode_cursor([1]), 2)
+
+    def test_3_keyset_condition_and_page(self):
+        """Điều kiện keyset và việc cắt trang / sinh next_cursor."""
+        print("\n--- Chạy test: Điều kiện keyset và cắt trang ---")
+        sql, params = pagination.build_keyset_condition(["dhb.ngay_dat_hang", "dhb.id"], [date(2025, 1, 1), 7])
+        self.assertEqual(sql, "(dhb.ngay_dat_hang, dhb.id) < (%s, %s)")
+        self.assertEqual(params, [date(2025, 1, 1), 7])
+
+        rows = [{"id": i, "ngay": date(2025, 1, 10 - i)} for i in range(1, 4)]
+        page, next_cursor = pagination.build_page(rows, 2, ("ngay", "id"))
+        self.assertEqual([r["id"] for r in page], [1, 2])
+        self.assertEqual(pagination.decode_cursor(next_cursor, 2), [date(2025, 1, 8), 2])
+
+        page, next_cursor = pagination.build_page(rows, 3, ("ngay", "id"))
+        self.assertEqual(len(page), 3)
+        self.assertIsNone(next_cursor, "Trang cuối không được có next_cursor.")
+
+    def test_4_field_projection(self):
+        """Chọn trường: luôn kèm khóa cursor, từ chối trường lạ, limit bị giới hạn."""
+        print("\n--- Chạy test: Chọn trường trả về ---")
+        allowed = {"id": "t.id", "ngay": "t.ngay", "ten": "t.ten"}
+        self.assertEqual(pagination.parse_fields("ten", allowed, ("ngay", "id")),
+                         ["t.ngay AS ngay", "t.id AS id", "t.ten AS ten"])
+        self.assertEqual(len(pagination.parse_fields(None, allowed, ("id",))), 3)
+        with self.assertRaises(ValueError):
+            pagination.parse_fields("ten,mat_khau", allowed, ("id",))
+
+        self.assertEqual(pagination.clamp_limit(None), pagination.DEFAULT_LIMIT)
+        self.assertEqual(pagination.clamp_limit(10_000), pagination.MAX_LIMIT)
+
+    def test_5_build_page_sql(self):
+        """Ghép câu truy vấn trang: lọc, keyset theo hướng sắp xếp, LIMIT dư 1 dòng và câu đếm tổng."""
+        print("\n--- Chạy test: Ghép câu truy vấn trang ---")
+        select_sql = "SELECT id, ten FROM KhachHang"
+        sort_columns = [("ten", "ten"), ("id", "id")]
+
+        sql, params, count_sql, count_params, limit = pagination.build_page_sql(
+            select_sql, ["ten ILIKE %s"], ["%a%"], sort_columns, limit=10)
+        self.assertEqual(sql, "SELECT id, ten FROM KhachHang WHERE ten ILIKE %s ORDER BY ten ASC, id ASC LIMIT %s;")
+        self.assertEqual(params, ("%a%", 11))
+        self.assertEqual(count_sql, "SELECT COUNT(*) AS total FROM (SELECT id, ten FROM KhachHang WHERE ten ILIKE %s) AS t;")
+        self.assertEqual(count_params, ("%a%",))
+        self.assertEqual(limit, 10)
+
+        cursor = pagination.encode_cursor(["Bình", 4])
+        sql, params, _, _, _ = pagination.build_page_sql(select_sql, [], [], sort_columns, cursor=cursor, descending=True)
+        self.assertEqual(sql, "SELECT id, ten FROM KhachHang WHERE (ten, id) < (%s, %s) ORDER BY ten DESC, id DESC LIMIT %s;")
+        self.assertEqual(params, ("Bình", 4, pagination.DEFAULT_LIMIT + 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+# test/test_report_cache.py
+
+import unittest
+import sys
+import os
+import asyncio
+from datetime import date
+from unittest.mock import patch
+
+# Thêm thư mục gốc của dự án vào Python Path để có thể import các module từ 'be'
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from be import report_cache
+
+
+class TestReportCache(unittest.TestCase):
+    """
+    Bộ kiểm thử cho bộ đệm kết quả báo cáo (không cần CSDL: báo cáo được thay bằng hàm đếm số lần gọi).
+    """
+    MOCKED_TODAY = date(2025, 6, 10)
+
+    def setUp(self):
+        # Giả lập kết nối LISTEN đã sẵn sàng, bộ đệm rỗng
+        asyncio.run(report_cache._dong_bo.on_connect())
+        for ten in report_cache._stats:
+            report_cache._stats[ten] = 0
+        self.so_lan_tinh = 0
+
+    def tearDown(self):
+        report_cache._dong_bo.on_disconnect()
+
+    def _bao_cao(self, tu_ngay=None, den_ngay=None):
+        self.so_lan_tinh += 1
+        return {"tu": tu_ngay, "den": den_ngay, "lan": self.so_lan_tinh}
+
+    @patch('be.report_cache.shop_today')
+    def test_1_resolve_period(self, mock_today):
+        """Quy đổi kỳ báo cáo giống _get_date_range của các module báo cáo."""
+        print("\n--- Chạy test: Quy đổi kỳ báo cáo ---")
+        mock_today.return_value = self.MOCKED_TODAY
+        self.assertEqual(report_cache.resolve_period('yesterday'), (date(2025, 6, 9), date(2025, 6, 9)))
+        self.assertEqual(report_cache.resolve_period('last_week'), (date(2025, 6, 2), date(2025, 6, 8)))
+        self.assertEqual(report_cache.resolve_period('last_month'), (date(2025, 5, 1), date(2025, 5, 31)))
+        self.assertEqual(report_cache.resolve_period('custom', '2025-01-01', '2025-01-31'),
+                         (date(2025, 1, 1), date(2025, 1, 31)))
+        for args in [('week',), ('custom',), ('custom', '2025-02-01', '2025-01-01')]:
+            with self.assertRaises(ValueError):
+                report_cache.resolve_period(*args)
+
+    def test_2_closed_period_hit_and_invalidation(self):
+        """Kỳ đã đóng: lần hai trúng bộ đệm; thông báo một ngày trong kỳ làm tính lại, ngày ngoài kỳ thì không."""
+        print("\n--- Chạy test: Trúng bộ đệm và vô hiệu hóa theo ngày ---")
+        goi = lambda: report_cache.cached_report("test", 'custom', '2024-01-01', '2024-01-31', (3,), self._bao_cao)
+
+        self.assertEqual(goi()["lan"], 1)
+        self.assertEqual(goi()["lan"], 1)
+        self.assertEqual(goi()["tu"], "2024-01-01")
+
+        asyncio.run(report_cache._dong_bo.on_notify(report_cache.KENH_THONG_BAO, '{"bang": "chiphi", "ngay": "2024-02-05"}'))
+        self.assertEqual(goi()["lan"], 1)
+
+        asyncio.run(report_cache._dong_bo.on_notify(report_cache.KENH_THONG_BAO, '{"bang": "chiphi", "ngay": "2024-01-15"}'))
+        self.assertEqual(goi()["lan"], 2)
+
+        # Tham số khác -> khóa khác; TRUNCATE (ngay = null) xóa tất cả
+        report_cache.cached_report("test", 'custom', '2024-01-01', '2024-01-31', (5,), self._bao_cao)
+        self.assertEqual(self.so_lan_tinh, 3)
+        asyncio.run(report_cache._dong_bo.on_notify(report_cache.KENH_THONG_BAO, '{"bang": "chiphi", "ngay": null}'))
+        self.assertEqual(report_cache.get_report_cache_stats()["so_ket_qua"], 0)
+
+        stats = report_cache.get_report_cache_stats()
+        self.assertEqual(stats["so_lan_trung"], 3)
+        self.assertEqual(stats["so_lan_truot"], 3)
+
+    def test_3_dependency_and_open_period(self):
+        """phu_thuoc_tu mở rộng vùng vô hiệu hóa; kỳ chạm hôm nay chỉ giữ trong TTL; báo cáo lỗi không được lưu."""
+        print("\n--- Chạy test: Phụ thuộc lịch sử, TTL và lỗi ---")
+        goi = lambda: report_cache.cached_report("kh", 'custom', '2024-01-01', '2024-01-31', (), self._bao_cao,
+                                                 phu_thuoc_tu=date.min)
+        goi()
+        asyncio.run(report_cache._dong_bo.on_notify(report_cache.KENH_THONG_BAO, '{"bang": "x", "ngay": "2023-12-31"}'))
+        goi()
+        self.assertEqual(self.so_lan_tinh, 2)
+
+        hom_nay = report_cache.shop_today().isoformat()
+        with patch.object(report_cache, 'REPORT_CACHE_TTL_SECONDS', 0):
+            report_cache.cached_report("mo", 'custom', hom_nay, hom_nay, (), self._bao_cao)
+            report_cache.cached_report("mo", 'custom', hom_nay, hom_nay, (), self._bao_cao)
+        self.assertEqual(self.so_lan_tinh, 4)
+
+        self.assertIsNone(report_cache.cached_report("loi", 'custom', '2024-01-01', '2024-01-31', (), lambda t, d: None))
+        self.assertIsNone(report_cache.cached_report("loi", 'week', None, None, (), self._bao_cao))
+        # Chỉ còn "kh" và "mo" (đã hết hạn, bị thay ở lần ghi sau); báo cáo lỗi không nằm trong bộ đệm
+        self.assertEqual(report_cache.get_report_cache_stats()["so_ket_qua"], 2)
+
+        # Mất kết nối LISTEN: không dùng bộ đệm
+        report_cache._dong_bo.on_disconnect()
+        goi()
+        goi()
+        self.assertEqual(self.so_lan_tinh, 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+# test/test_report_engine.py
+
+import unittest
+import sys
+import os
+import asyncio
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+# --- Thiết lập đường dẫn Project ---
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# --- Imports từ ứng dụng của bạn ---
+from be import report_engine
+from be.reports import operation_10_doanhthuloinhuan as finance_ops
+from be.reports import operation_11_thongkebanhang as stats_ops
+from be.reports import operation_12_phantichkhachhang as customer_ops
+# Import các hàm phụ trợ để tạo dữ liệu test
+from be.operation.operation_1_danhmuc import add_danhmuc
+from be.operation.operation_2_sanpham import add_sanpham
+from be.operation.operation_4_khachhang import add_khachhang
+from be.operation.operation_5_nhanvien import add_nhanvien
+from be.operation.operation_7_donhangban import create_donhangban_with_items, update_donhangban_status
+from be.operation.operation_8_chiphi import add_chiphi
+from be.db_connection import get_db_connection, close_db_connection
+from be.db_connection_async import close_async_pool
+
+np = report_engine.np
+
+
+@unittest.skipIf(np is None, "Chưa cài numpy")
+class TestReportEngine(unittest.TestCase):
+    """
+    Bộ kiểm thử cho bộ máy báo cáo trong bộ nhớ: kết quả phải giống hệt các báo cáo SQL.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        print("\n--- Thiết lập môi trường cho Test Bộ máy báo cáo ---")
+        conn = get_db_connection()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("TRUNCATE TABLE DanhMuc, SanPham, NhanVien, KhachHang, DonHangBan, ChiTietDonHangBan, "
+                            "ChiPhi RESTART IDENTITY CASCADE;")
+                conn.commit()
+        finally:
+            close_db_connection(conn)
+
+        cls.nhanvien_id = add_nhanvien("NV Engine", "nv_engine", "pass", "nv.engine@test.com", "0988888881")
+        cls.kh_1 = add_khachhang("Khách Engine 1", "0988888882", "kh1.engine@test.com")
+        cls.kh_2 = add_khachhang("Khách Engine 2", "0988888883", "kh2.engine@test.com")
+        danhmuc_id = add_danhmuc("DM_ENG", "Danh mục Engine")
+        cls.sp_1 = add_sanpham("SP_ENG_1", "Sản phẩm Engine 1", danhmuc_id, 100, "Cái")
+        cls.sp_2 = add_sanpham("SP_ENG_2", "Sản phẩm Engine 2", danhmuc_id, 100, "Cái")
+
+        cls.tu_ngay = date.today() - timedelta(days=6)
+        cls.den_ngay = date.today()
+        cls._tao_don(cls.kh_1, cls.tu_ngay, [(cls.sp_1, 3), (cls.sp_2, 1)])
+        cls._tao_don(cls.kh_2, cls.tu_ngay + timedelta(days=2), [(cls.sp_2, 1)])
+        cls._tao_don(cls.kh_2, cls.tu_ngay + timedelta(days=2), [(cls.sp_1, 1)], hoan_tat=False)
+        add_chiphi("Điện", 500000, (cls.tu_ngay + timedelta(days=1)).isoformat())
+
+    @classmethod
+    def _tao_don(cls, id_khach_hang, ngay, items, hoan_tat=True):
+        don = create_donhangban_with_items(cls.nhanvien_id, id_khach_hang, "Địa chỉ", [
+            {"id_san_pham": sp, "so_luong": so_luong, "gia_ban_niem_yet_don_vi": Decimal('1000'), "giam_gia": 0}
+            for sp, so_luong in items
+        ], ngay_dat_hang_str=str(ngay))
+        if hoan_tat:
+            update_donhangban_status(don['id'], 'Hoàn tất', 'Đã thanh toán', str(ngay))
+        return don['id']
+
+    def _giong_sql(self):
+        """Các báo cáo của bộ máy trùng với báo cáo SQL trên cùng khoảng ngày."""
+        tu, den = self.tu_ngay.isoformat(), self.den_ngay.isoformat()
+        nhan = finance_ops.get_period_label('custom', self.tu_ngay, self.den_ngay)
+        return all([
+            report_engine.get_order_count_report(self.tu_ngay, self.den_ngay)
+            == stats_ops.get_order_count_report('custom', tu, den),
+            report_engine.get_best_selling_products_report(self.tu_ngay, self.den_ngay, 'quantity', 3)
+            == stats_ops.get_best_selling_products_report('custom', 'quantity', 3, tu, den),
+            report_engine.get_top_spending_customers_report(self.tu_ngay, self.den_ngay, 5)
+            == customer_ops.get_top_spending_customers_report('custom', 5, tu, den),
+            report_engine.get_financial_report(self.tu_ngay, self.den_ngay, nhan)
+            == finance_ops.get_financial_report('custom', tu, den),
+        ])
+
+    def test_1_matches_sql_and_follows_notify(self):
+        """Nạp toàn bộ khi kết nối; đơn hoàn tất ghi lùi ngày / chi phí mới chỉ làm nạp lại đúng ngày đó."""
+        print("\n--- Chạy test: Bộ máy báo cáo trong bộ nhớ (LISTEN/NOTIFY) ---")
+
+        async def cho_den_khi(dieu_kien, gioi_han=5.0):
+            # Thông báo đến bất đồng bộ sau COMMIT -> chờ có giới hạn
+            thoi_gian = 0.0
+            while not dieu_kien() and thoi_gian < gioi_han:
+                await asyncio.sleep(0.05)
+                thoi_gian += 0.05
+            return dieu_kien()
+
+        async def kich_ban():
+            try:
+                with patch.object(report_engine, "REPORT_ENGINE_ENABLED", True):
+                    await report_engine.start_report_engine()
+                self.assertTrue(await cho_den_khi(report_engine.is_ready), "Bộ máy không nạp được dữ liệu.")
+                self.assertTrue(self._giong_sql())
+
+                top = report_engine.get_best_selling_products_report(self.tu_ngay, self.den_ngay, 'revenue', 3)
+                self.assertEqual([sp['id_san_pham'] for sp in top], [self.sp_1, self.sp_2])
+                self.assertEqual(top[0]['tong_doanh_thu'], Decimal('3000'))
+
+                # Đơn của kh_2 ghi lùi về ngày đầu kỳ làm kh_2 vượt kh_1
+                self._tao_don(self.kh_2, self.tu_ngay, [(self.sp_2, 5)])
+                add_chiphi("Nước", 100000, self.tu_ngay.isoformat())
+                self.assertTrue(await cho_den_khi(
+                    lambda: report_engine.get_report_engine_stats()["so_lan_nap_theo_ngay"] > 0 and self._giong_sql()))
+                top = report_engine.get_top_spending_customers_report(self.tu_ngay, self.den_ngay, 3)
+                self.assertEqual([kh['id_khach_hang'] for kh in top], [self.kh_2, self.kh_1])
+                self.assertEqual(report_engine.get_report_engine_stats()["so_lan_nap_toan_bo"], 1)
+            finally:
+                await report_engine.stop_report_engine()
+                await close_async_pool()
+
+        asyncio.run(kich_ban())
+        self.assertIsNone(report_engine.get_order_count_report(self.tu_ngay, self.den_ngay))
+
+    def test_2_column_helpers(self):
+        """Gộp nhóm, cắt khoảng ngày và thay dữ liệu một ngày trên mảng (không cần CSDL)."""
+        print("\n--- Chạy test: Thao tác bảng cột ---")
+        khoa, (tong,), (lon_nhat,) = report_engine._gop_nhom(
+            np.array([3, 1, 3, 2]), [np.array([10, 20, 30, 40])], [np.array([5, 6, 7, 1])])
+        self.assertEqual((khoa.tolist(), tong.tolist(), lon_nhat.tolist()), ([1, 2, 3], [20, 40, 40], [6, 1, 7]))
+
+        d1, d2, d3 = (date(2025, 6, n).toordinal() for n in (1, 2, 3))
+        bang = report_engine._thanh_bang(np.array([[d2, 7], [d1, 5], [d3, 9]]), ("ngay", "gia_tri"))
+        self.assertEqual(bang["ngay"].tolist(), [d1, d2, d3])
+
+        # Ghi lùi ngày: ngày 2 bị thay, vẫn sắp theo ngày
+        moi = {"ngay": np.array([d2, d2]), "gia_tri": np.array([1, 2])}
+        bang = report_engine._thay_ngay(bang, np.array([d2]), moi)
+        self.assertEqual(bang["ngay"].tolist(), [d1, d2, d2, d3])
+        self.assertEqual(report_engine._trong_khoang(bang, date(2025, 6, 2), date(2025, 6, 3))["gia_tri"].tolist(),
+                         [1, 2, 9])
+        self.assertEqual(report_engine._theo_ngay(bang, "gia_tri", date(2025, 5, 31), date(2025, 6, 2)).tolist(),
+                         [0, 5, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+# test/test_report_query_plans.py
+
+import unittest
+import sys
+import os
+import json
+from datetime import date
+
+# --- Thiết lập đường dẫn Project ---
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+from be.reports import operation_10_doanhthuloinhuan as op_10
+from be.reports import operation_11_thongkebanhang as op_11
+from be.reports import operation_12_phantichkhachhang as op_12
+from be.operation.operation_7_donhangban import _build_page_sql
+from be.db_connection import get_db_connection, close_db_connection, shop_day_range
+
+# Các bảng lớn mà câu truy vấn báo cáo không được quét toàn bộ
+BANG_LON = {"donhangban", "chitietdonhangban", "tonghopbanhangngay", "tonghopdonhangngay", "chiphi", "khachhang"}
+
+
+class TestReportQueryPlans(unittest.TestCase):
+    """
+    Kiểm tra hồi quy kế hoạch truy vấn (EXPLAIN) của các câu SQL báo cáo:
+    điều kiện ngày phải dùng được index (không ép kiểu cột).
+    Dữ liệu test nhỏ nên tắt enable_seqscan: khi đó planner chỉ chọn Seq Scan nếu KHÔNG có index dùng được.
+    """
+    TU_NGAY = date(2025, 5, 1)
+    DEN_NGAY = date(2025, 5, 31)
+
+    def _explain(self, sql, params):
+        conn = get_db_connection()
+        self.assertIsNotNone(conn)
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL enable_seqscan = off;")
+                cur.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+                plan = cur.fetchone()[0]
+                return json.loads(plan) if isinstance(plan, str) else plan
+        finally:
+            conn.rollback()
+            close_db_connection(conn)
+
+    def _cac_node(self, node):
+        yield node
+        for con in node.get("Plans", []):
+            yield from self._cac_node(con)
+
+    def _assert_dung_index(self, ten, sql, params, index_bat_buoc=None):
+        nodes = list(self._cac_node(self._explain(sql, params)[0]["Plan"]))
+        for node in nodes:
+            bang = (node.get("Relation Name") or "").lower()
+            if bang in BANG_LON:
+                self.assertNotEqual(node["Node Type"], "Seq Scan", f"{ten}: quét toàn bảng {bang}")
+        if index_bat_buoc:
+            self.assertIn(index_bat_buoc, {n.get("Index Name") for n in nodes}, f"{ten}: không dùng {index_bat_buoc}")
+
+    def test_1_financial_report_queries(self):
+        """Báo cáo tài chính: bảng tổng hợp đơn hàng và ChiPhi đều lọc theo index ngày."""
+        print("\n--- Chạy test: EXPLAIN báo cáo tài chính ---")
+        khoang = (self.TU_NGAY, self.DEN_NGAY)
+        self._assert_dung_index("tài chính - tổng hợp", op_10.SQL_FINANCIAL_SUMMARY, khoang * 2)
+        self._assert_dung_index("tài chính - theo ngày", op_10.SQL_FINANCIAL_DETAILS, khoang * 3)
+
+    def test_2_sales_statistics_queries(self):
+        """Thống kê bán hàng: số đơn theo ngày và sản phẩm bán chạy."""
+        print("\n--- Chạy test: EXPLAIN thống kê bán hàng ---")
+        khoang = (self.TU_NGAY, self.DEN_NGAY)
+        self._assert_dung_index("số đơn", op_11.SQL_ORDER_COUNT, khoang * 2, "pk_tong_hop_don_hang_ngay")
+        for order_clause in ["tong_so_luong_ban DESC", "tong_doanh_thu DESC"]:
+            self._assert_dung_index("bán chạy", op_11.SQL_BEST_SELLING.format(order_clause=order_clause),
+                                    khoang + (10,), "pk_tong_hop_ban_hang_ngay")
+
+    def test_3_customer_analysis_queries(self):
+        """Phân tích khách hàng: khách mới / quay lại và top chi tiêu."""
+        print("\n--- Chạy test: EXPLAIN phân tích khách hàng ---")
+        khoang = (self.TU_NGAY, self.DEN_NGAY)
+        self._assert_dung_index("khách mới - tổng hợp", op_12.SQL_ACQUISITION_SUMMARY, khoang * 2 + (self.TU_NGAY,))
+        self._assert_dung_index("khách mới - theo ngày", op_12.SQL_ACQUISITION_DETAILS, khoang * 2)
+        self._assert_dung_index("top chi tiêu", op_12.SQL_TOP_SPENDERS, khoang + (10,))
+        self._assert_dung_index("cohort", op_12.SQL_CUSTOMER_COHORTS, khoang + (self.TU_NGAY,))
+
+    def test_4_donhangban_half_open_range(self):
+        """Lọc DonHangBan theo trạng thái + khoảng nửa mở (giờ cửa hàng) dùng index (trang_thai, ngay_dat_hang)."""
+        print("\n--- Chạy test: EXPLAIN lọc DonHangBan theo ngày ---")
+        tu_luc, den_truoc = shop_day_range(self.TU_NGAY, self.DEN_NGAY)
+        self.assertEqual(tu_luc.date(), self.TU_NGAY)
+        self.assertEqual(den_truoc.date(), date(2025, 6, 1))
+
+        # Cùng điều kiện với func_tinh_lai_tong_hop_ban_hang (012_create_triggers.sql, section 6.5)
+        sql = """
+            SELECT dhb.id, dhb.tam_tinh_tien_hang
+            FROM DonHangBan dhb
+            WHERE dhb.trang_thai_don_hang = 'Hoàn tất'
+              AND dhb.ngay_dat_hang >= %s AND dhb.ngay_dat_hang < %s
+        """
+        self._assert_dung_index("tính lại tổng hợp", sql, (tu_luc, den_truoc), "idx_donhangban_trangthai_ngaydathang")
+
+        sql, params, _ = _build_page_sql(limit=20, status='Hoàn tất', date_from_str=str(self.TU_NGAY),
+                                         date_to_str=str(self.DEN_NGAY))
+        self._assert_dung_index("danh sách đơn", sql, params)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+# test/test_text_search.py
+
+import unittest
+import sys
+import os
+
+# Thêm thư mục gốc của dự án vào Python Path để có thể import các module từ 'be'
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from be import text_search
+
+
+class TestTextSearch(unittest.TestCase):
+    """
+    Bộ kiểm thử cho các hàm tìm kiếm không dấu dùng chung (không cần CSDL).
+    """
+
+    def test_1_chuan_hoa(self):
+        """Bỏ dấu tiếng Việt (kể cả đ/Đ), chữ thường, bỏ khoảng trắng thừa hai đầu."""
+        print("\n--- Chạy test: Chuẩn hóa chuỗi tìm kiếm ---")
+        self.assertEqual(text_search.chuan_hoa("  Nguyễn Đức Thắng "), "nguyen duc thang")
+        self.assertEqual(text_search.chuan_hoa("Sữa tươi Ông Thọ"), "sua tuoi ong tho")
+        self.assertEqual(text_search.chuan_hoa(None), "")
+
+    def test_2_like_pattern_is_escaped(self):
+        """Ký tự đặc biệt của LIKE trong từ khóa phải được so khớp nguyên văn."""
+        print("\n--- Chạy test: Thoát ký tự LIKE ---")
+        sql, params = text_search.build_contains_condition("t.ten_tim_kiem", "50%_Giảm")
+        self.assertEqual(sql, "t.ten_tim_kiem LIKE %s")
+        self.assertEqual(params, ["%50\\%\\_giam%"])
+        self.assertEqual(text_search.build_contains_condition("t.ten_tim_kiem", "   "), (None, []))
+
+        # Số điện thoại: chỉ giữ chữ số; "kết thúc bằng" = chuỗi đảo ngược "bắt đầu bằng"
+        self.assertEqual(text_search.build_contains_condition("t.sdt", "09 12-34", text_search.chi_lay_so),
+                         ("t.sdt LIKE %s", ["%091234%"]))
+        self.assertEqual(text_search.build_suffix_condition("reverse(t.sdt)", "5 678"),
+                         ("reverse(t.sdt) LIKE %s", ["8765%"]))
+        self.assertEqual(text_search.build_suffix_condition("reverse(t.sdt)", "abc"), (None, []))
+
+    def test_3_xep_hang(self):
+        """Thứ tự hạng: trùng mã > đầu mã > đầu tên > đầu một từ > giữa từ."""
+        print("\n--- Chạy test: Xếp hạng kết quả ---")
+        self.assertEqual(text_search.xep_hang("sp01", "sp01", "banh mi"), text_search.HANG_TRUNG_MA)
+        self.assertEqual(text_search.xep_hang("sp0", "sp01", "banh mi"), text_search.HANG_DAU_MA)
+        self.assertEqual(text_search.xep_hang("sua", "sp02", "sua tuoi"), text_search.HANG_DAU_TEN)
+        self.assertEqual(text_search.xep_hang("sua", "sp03", "hop sua chua"), text_search.HANG_DAU_TU)
+        self.assertEqual(text_search.xep_hang("ua", "sp04", "hop sua chua"), text_search.HANG_CHUA_TRONG_TEN)
+        self.assertIsNone(text_search.xep_hang("tra", "sp05", "hop sua chua"))
+
+        dieu_kien, dieu_kien_params, hang, hang_params = text_search.build_ranked_search("t.ten", "lower(t.ma)", "Sữa")
+        self.assertEqual(dieu_kien, "(t.ten LIKE %s OR lower(t.ma) LIKE %s)")
+        self.assertEqual(dieu_kien_params, ["%sua%", "sua%"])
+        self.assertEqual(hang.count("%s"), len(hang_params))
+        self.assertIsNone(text_search.build_ranked_search("t.ten", "lower(t.ma)", ""))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,15 @@
+-- Chạy trước tất cả các file tạo bảng: các cột / index tìm kiếm ở 002, 003, 004 dùng các đối tượng dưới đây.
+
+-- unaccent: bỏ dấu tiếng Việt ("Nguyễn Đức" -> "Nguyen Duc")
+-- pg_trgm: index trigram (GIN) cho tìm kiếm LIKE '%...%'
+CREATE EXTENSION IF NOT EXISTS unaccent;
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Chuẩn hóa chuỗi để tìm kiếm: bỏ dấu + chữ thường.
+-- unaccent() chỉ là STABLE (phụ thuộc search_path) nên không dùng được trong cột sinh tự động / index;
+-- hàm bọc này chỉ định rõ từ điển nên được khai báo IMMUTABLE.
+-- Phía Python chuẩn hóa từ khóa theo cùng quy tắc (be/text_search.py: chuan_hoa).
+CREATE OR REPLACE FUNCTION f_chuan_hoa_tim_kiem(p_chuoi TEXT)
+RETURNS TEXT AS $$
+    SELECT lower(public.unaccent('public.unaccent'::regdictionary, p_chuoi));
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT;
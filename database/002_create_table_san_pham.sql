@@ -7,6 +7,8 @@ CREATE TABLE SanPham (
     don_vi_tinh VARCHAR(50) NOT NULL,
     mo_ta_chi_tiet TEXT NULL,
     duong_dan_hinh_anh_chinh VARCHAR(255) NULL,
+    gia_ban_hien_tai NUMERIC(12, 0) NOT NULL DEFAULT 0, -- Giá niêm yết đang có hiệu lực (trigger 4.2 + hàm 4.3 ở 012 duy trì)
+    ten_tim_kiem TEXT GENERATED ALWAYS AS (f_chuan_hoa_tim_kiem(ten_san_pham)) STORED, -- Tên bỏ dấu, chữ thường (000_create_extensions.sql)
     trang_thai VARCHAR(50) NOT NULL DEFAULT 'Đang kinh doanh - Còn hàng' CHECK (trang_thai IN ('Đang kinh doanh - Còn hàng', 'Đang kinh doanh - Hết hàng', 'Ngừng kinh doanh')),
     ngay_tao_ban_ghi TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT fk_danh_muc
@@ -14,4 +16,13 @@ CREATE TABLE SanPham (
         REFERENCES DanhMuc(id)
         ON DELETE RESTRICT
         ON UPDATE CASCADE
-);
\ No newline at end of file
+);
+
+-- Tìm kiếm sản phẩm ở POS (be/text_search.py):
+-- tên chứa từ khóa, không dấu (LIKE '%...%' qua index trigram)
+CREATE INDEX idx_sanpham_ten_tim_kiem_trgm ON SanPham USING GIN (ten_tim_kiem gin_trgm_ops);
+-- mã sản phẩm bắt đầu bằng từ khóa (LIKE '...%')
+CREATE INDEX idx_sanpham_ma_prefix ON SanPham (lower(ma_san_pham) text_pattern_ops);
+
+-- Danh sách sản phẩm theo trang (keyset: ten_san_pham, id), không phải sắp xếp cả bảng
+CREATE INDEX idx_sanpham_ten_id ON SanPham (ten_san_pham, id);
@@ -6,5 +6,16 @@ CREATE TABLE NhaCungCap (
     email VARCHAR(255) NOT NULL UNIQUE CHECK (email ~* '^[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}$'),
     dia_chi TEXT NOT NULL,
     nguoi_lien_he_chinh VARCHAR(100) NULL,
+    -- Cột tìm kiếm sinh tự động (f_chuan_hoa_tim_kiem ở 000_create_extensions.sql)
+    ten_tim_kiem TEXT GENERATED ALWAYS AS (f_chuan_hoa_tim_kiem(ten_nha_cung_cap)) STORED, -- Tên bỏ dấu, chữ thường
+    so_dien_thoai_so TEXT GENERATED ALWAYS AS (regexp_replace(so_dien_thoai, '[^0-9]', '', 'g')) STORED, -- Chỉ giữ chữ số
     ngay_tao_ban_ghi TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+
+-- Tìm kiếm nhà cung cấp theo tên không dấu / email / số điện thoại (LIKE '%...%' qua index trigram)
+CREATE INDEX idx_nhacungcap_ten_tim_kiem_trgm ON NhaCungCap USING GIN (ten_tim_kiem gin_trgm_ops);
+CREATE INDEX idx_nhacungcap_email_trgm ON NhaCungCap USING GIN (lower(email) gin_trgm_ops);
+CREATE INDEX idx_nhacungcap_sdt_trgm ON NhaCungCap USING GIN (so_dien_thoai_so gin_trgm_ops);
+
+-- Danh sách nhà cung cấp theo trang (keyset: ten_nha_cung_cap, id)
+CREATE INDEX idx_nhacungcap_ten_id ON NhaCungCap (ten_nha_cung_cap, id);
@@ -9,5 +9,24 @@ CREATE TABLE KhachHang (
     ngay_sinh DATE NULL,
     gioi_tinh enum_gioi_tinh NULL,
     so_lan_mua_hang INTEGER NOT NULL DEFAULT 0 CHECK (so_lan_mua_hang >= 0),
+    -- Ngày (đặt hàng) của đơn 'Hoàn tất' đầu tiên / gần nhất, do trigger duy trì (012_create_triggers.sql, 3.2 và 6.2)
+    ngay_mua_dau_tien DATE NULL,
+    ngay_mua_gan_nhat DATE NULL,
+    -- Cột tìm kiếm sinh tự động (f_chuan_hoa_tim_kiem ở 000_create_extensions.sql)
+    ten_tim_kiem TEXT GENERATED ALWAYS AS (f_chuan_hoa_tim_kiem(ten_khach_hang)) STORED, -- Tên bỏ dấu, chữ thường
+    so_dien_thoai_so TEXT GENERATED ALWAYS AS (regexp_replace(so_dien_thoai, '[^0-9]', '', 'g')) STORED, -- Chỉ giữ chữ số
     ngay_tao_ban_ghi TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+
+-- Tìm kiếm khách hàng (be/text_search.py, operation_4_khachhang):
+-- tên không dấu / email / số điện thoại chứa chuỗi nhập (LIKE '%...%' qua index trigram)
+CREATE INDEX idx_khachhang_ten_tim_kiem_trgm ON KhachHang USING GIN (ten_tim_kiem gin_trgm_ops);
+CREATE INDEX idx_khachhang_email_trgm ON KhachHang USING GIN (lower(email) gin_trgm_ops);
+CREATE INDEX idx_khachhang_sdt_trgm ON KhachHang USING GIN (so_dien_thoai_so gin_trgm_ops);
+-- Thu ngân tra khách theo vài số cuối điện thoại: "kết thúc bằng" = "chuỗi đảo ngược bắt đầu bằng" (index B-tree)
+CREATE INDEX idx_khachhang_sdt_hau_to ON KhachHang (reverse(so_dien_thoai_so) text_pattern_ops);
+-- Báo cáo khách hàng mới (lần mua đầu tiên rơi vào một khoảng ngày)
+CREATE INDEX idx_khachhang_ngay_mua_dau_tien ON KhachHang (ngay_mua_dau_tien);
+
+-- Danh sách khách hàng theo trang (keyset: ten_khach_hang, id)
+CREATE INDEX idx_khachhang_ten_id ON KhachHang (ten_khach_hang, id);
@@ -12,4 +12,7 @@ CREATE TABLE NhanVien (
     vai_tro enum_vai_tro_nhan_vien NOT NULL DEFAULT 'Nhân viên',
     trang_thai enum_trang_thai_nhan_vien NOT NULL DEFAULT 'Đang làm việc',
     ngay_tao_ban_ghi TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP
-);
\ No newline at end of file
+);
+
+-- Danh sách nhân viên theo trang (keyset: ten_nhan_vien, id)
+CREATE INDEX idx_nhanvien_ten_id ON NhanVien (ten_nhan_vien, id);
@@ -19,4 +19,7 @@ CREATE TABLE DonHangNhap (
         REFERENCES NhanVien(id)
         ON DELETE RESTRICT -- Hoặc SET NULL nếu bạn muốn giữ đơn hàng khi nhân viên nghỉ việc và bị xóa (nhưng chúng ta đã thống nhất là chỉ đổi trạng thái nhân viên)
         ON UPDATE CASCADE
-);
\ No newline at end of file
+);
+
+-- Danh sách đơn hàng nhập theo trang (keyset: ngay_dat_hang, id)
+CREATE INDEX idx_donhangnhap_ngaydathang_id ON DonHangNhap (ngay_dat_hang DESC, id DESC);
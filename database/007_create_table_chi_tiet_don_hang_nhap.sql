@@ -6,6 +6,7 @@ CREATE TABLE ChiTietDonHangNhap (
     so_luong_con_lai INTEGER NOT NULL CHECK (so_luong_con_lai >= 0),
     gia_nhap_don_vi NUMERIC(12, 0) NOT NULL CHECK (gia_nhap_don_vi >= 0),
     tong_gia_nhap NUMERIC(15, 0) NOT NULL CHECK (tong_gia_nhap >= 0),
+    ngay_nhap_kho DATE NULL, -- Ngày lô vào kho (sao chép từ đơn nhập khi 'Hoàn tất', NULL nếu chưa nhập), dùng cho FIFO
     ngay_tao_ban_ghi TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
     ghi_chu TEXT NULL,
     CONSTRAINT fk_don_hang_nhap
@@ -19,4 +20,9 @@ CREATE TABLE ChiTietDonHangNhap (
         ON DELETE RESTRICT
         ON UPDATE CASCADE,
     CONSTRAINT unique_sanpham_trong_don_nhap UNIQUE (id_don_hang_nhap, id_san_pham)
-);
\ No newline at end of file
+);
+
+-- Index cho tra cứu lô còn hàng theo FIFO (chỉ chứa các lô đã nhập kho và còn số lượng)
+CREATE INDEX idx_chitietnhap_lo_mo_fifo ON ChiTietDonHangNhap (id_san_pham, ngay_nhap_kho, id)
+    INCLUDE (so_luong_con_lai, gia_nhap_don_vi)
+    WHERE so_luong_con_lai > 0 AND ngay_nhap_kho IS NOT NULL;
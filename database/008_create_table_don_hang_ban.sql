@@ -32,6 +32,16 @@ CREATE TABLE DonHangBan (
     trang_thai_don_hang enum_trang_thai_don_hang_ban NOT NULL DEFAULT 'Chờ xác nhận',
     trang_thai_thanh_toan enum_trang_thai_thanh_toan NOT NULL DEFAULT 'Chưa thanh toán',
     ghi_chu_don_hang TEXT NULL,
+    -- Tổng tiền của đơn, do trigger trên ChiTietDonHangBan cập nhật (không tự ghi từ ứng dụng)
+    tam_tinh_tien_hang NUMERIC(15, 0) NOT NULL DEFAULT 0,  -- Tổng tong_gia_ban của các dòng
+    so_dong_hang INTEGER NOT NULL DEFAULT 0,               -- Số dòng sản phẩm
+    tong_gia_von NUMERIC(15, 0) NOT NULL DEFAULT 0,        -- Tổng giá vốn FIFO của các dòng
+    -- Tổng các lần thanh toán (ThanhToanDonHangBan), do trigger cập nhật (017_create_table_thanh_toan_don_hang_ban.sql).
+    -- Là nguồn chính cho số đã thu: trả một phần vẫn để trang_thai_thanh_toan = 'Chưa thanh toán'
+    so_tien_da_thanh_toan NUMERIC(15, 0) NOT NULL DEFAULT 0 CHECK (so_tien_da_thanh_toan >= 0),
+    thue_vat NUMERIC(17, 3) GENERATED ALWAYS AS (tam_tinh_tien_hang * 0.10) STORED,   -- VAT 10%
+    thue_hkd NUMERIC(17, 3) GENERATED ALWAYS AS (tam_tinh_tien_hang * 0.015) STORED,  -- Thuế HKD 1.5%
+    tong_thanh_toan_du_kien NUMERIC(17, 3) GENERATED ALWAYS AS (tam_tinh_tien_hang * 1.115) STORED,
     ngay_tao_ban_ghi TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
     ngay_cap_nhat_ban_ghi TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP, -- Sẽ cần trigger để tự động cập nhật
     CONSTRAINT fk_khach_hang_donban
@@ -44,4 +54,12 @@ CREATE TABLE DonHangBan (
         REFERENCES NhanVien(id)
         ON DELETE RESTRICT
         ON UPDATE CASCADE
-);
\ No newline at end of file
+);
+
+-- Index cho danh sách đơn hàng phân trang theo cursor (ORDER BY ngay_dat_hang DESC, id DESC)
+CREATE INDEX idx_donhangban_ngaydathang_id ON DonHangBan (ngay_dat_hang DESC, id DESC);
+-- Lịch sử đơn của một khách hàng (lọc id_khach_hang + cùng thứ tự phân trang)
+CREATE INDEX idx_donhangban_khachhang_ngaydathang ON DonHangBan (id_khach_hang, ngay_dat_hang DESC, id DESC);
+-- Lọc theo trạng thái + khoảng thời gian nửa mở (trang_thai_don_hang = 'Hoàn tất' AND ngay_dat_hang >= .. AND < ..):
+-- tính lại bảng tổng hợp bán hàng, lọc danh sách đơn theo trạng thái và ngày
+CREATE INDEX idx_donhangban_trangthai_ngaydathang ON DonHangBan (trang_thai_don_hang, ngay_dat_hang);
@@ -21,4 +21,7 @@ CREATE TABLE ChiTietDonHangBan (
         ON DELETE RESTRICT
         ON UPDATE CASCADE,
     CONSTRAINT unique_sanpham_trong_don_ban UNIQUE (id_don_hang_ban, id_san_pham)
-);
\ No newline at end of file
+);
+
+-- Ràng buộc unique_sanpham_trong_don_ban (id_don_hang_ban, id_san_pham) đã tạo index bắt đầu bằng
+-- id_don_hang_ban -> JOIN / lọc dòng theo đơn hàng dùng index này, không cần index riêng.
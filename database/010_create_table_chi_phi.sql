@@ -11,4 +11,8 @@ CREATE TABLE ChiPhi (
         REFERENCES NhanVien(id)
         ON DELETE SET NULL
         ON UPDATE CASCADE
-);
\ No newline at end of file
+);
+
+-- Báo cáo tài chính lọc chi phí theo khoảng ngày; thêm id để danh sách phân trang
+-- (keyset: ngay_chi_phi, id) dùng luôn chỉ mục này
+CREATE INDEX idx_chiphi_ngay_chi_phi ON ChiPhi (ngay_chi_phi, id);
@@ -21,4 +21,5 @@ CREATE TABLE LichSuGiaNiemYet (
 );
 
 -- Tạo index để tăng tốc độ truy vấn lịch sử giá theo sản phẩm và ngày áp dụng
---CREATE INDEX idx_lichsugia_sanpham_ngayapdung ON LichSuGiaNiemYet (id_san_pham, ngay_ap_dung DESC);
\ No newline at end of file
+-- (dùng khi tính lại SanPham.gia_ban_hien_tai cho từng sản phẩm)
+CREATE INDEX idx_lichsugia_sanpham_ngayapdung ON LichSuGiaNiemYet (id_san_pham, ngay_ap_dung DESC);
\ No newline at end of file
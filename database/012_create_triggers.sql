@@ -93,6 +93,10 @@ BEGIN
     NEW.so_luong_con_lai = NEW.so_luong;
     -- Tự động tính tong_gia_nhap
     NEW.tong_gia_nhap = NEW.gia_nhap_don_vi * NEW.so_luong;
+    -- Thêm vào đơn đã 'Hoàn tất' thì lô được tính là đã nhập kho ngay
+    SELECT COALESCE(dhn.ngay_nhan_hang_thuc_te, CURRENT_DATE) INTO NEW.ngay_nhap_kho
+    FROM DonHangNhap dhn
+    WHERE dhn.id = NEW.id_don_hang_nhap AND dhn.trang_thai = 'Hoàn tất';
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
@@ -104,6 +108,29 @@ FOR EACH ROW
 EXECUTE FUNCTION func_khoi_tao_chitiet_nhap();
 
 
+-- 2.3. Hàm đồng bộ ngày nhập kho của các lô (ChiTietDonHangNhap.ngay_nhap_kho)
+-- Mục đích: Lô chỉ có ngay_nhap_kho khi đơn nhập 'Hoàn tất', để trigger FIFO chỉ cần đọc
+-- một bảng qua index idx_chitietnhap_lo_mo_fifo thay vì JOIN DonHangNhap và sắp xếp toàn bộ lịch sử.
+CREATE OR REPLACE FUNCTION func_dong_bo_ngay_nhap_kho()
+RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE ChiTietDonHangNhap
+    SET ngay_nhap_kho = CASE WHEN NEW.trang_thai = 'Hoàn tất'
+                             THEN COALESCE(NEW.ngay_nhan_hang_thuc_te, CURRENT_DATE) END
+    WHERE id_don_hang_nhap = NEW.id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger áp dụng cho bảng DonHangNhap (đổi trạng thái hoặc sửa ngày nhận hàng)
+CREATE TRIGGER trg_after_update_donhangnhap_ngay_nhap_kho
+AFTER UPDATE ON DonHangNhap
+FOR EACH ROW
+WHEN (OLD.trang_thai IS DISTINCT FROM NEW.trang_thai
+      OR OLD.ngay_nhan_hang_thuc_te IS DISTINCT FROM NEW.ngay_nhan_hang_thuc_te)
+EXECUTE FUNCTION func_dong_bo_ngay_nhap_kho();
+
+
 -- =====================================================================
 -- SECTION 3: TRIGGER CHO NGHIỆP VỤ BÁN HÀNG (DonHangBan)
 -- =====================================================================
@@ -134,13 +161,16 @@ EXECUTE FUNCTION func_cap_nhat_ton_kho_khi_ban_hang();
 
 
 -- 3.2. Hàm cập nhật số lần mua hàng của Khách hàng
--- Mục đích: Tăng số lần mua hàng của khách hàng lên 1 khi họ có một đơn hàng hoàn tất.
+-- Mục đích: Tăng số lần mua hàng của khách hàng lên 1 khi họ có một đơn hàng hoàn tất,
+-- đồng thời cập nhật ngày mua đầu tiên / gần nhất (đơn hoàn tất có thể mang ngày đặt hàng cũ).
 CREATE OR REPLACE FUNCTION func_cap_nhat_so_lan_mua_hang()
 RETURNS TRIGGER AS $$
 BEGIN
     IF NEW.trang_thai_don_hang = 'Hoàn tất' AND OLD.trang_thai_don_hang IS DISTINCT FROM NEW.trang_thai_don_hang THEN
         UPDATE KhachHang
-        SET so_lan_mua_hang = so_lan_mua_hang + 1
+        SET so_lan_mua_hang = so_lan_mua_hang + 1,
+            ngay_mua_dau_tien = LEAST(ngay_mua_dau_tien, NEW.ngay_dat_hang::date),
+            ngay_mua_gan_nhat = GREATEST(ngay_mua_gan_nhat, NEW.ngay_dat_hang::date)
         WHERE id = NEW.id_khach_hang;
         
         RAISE NOTICE 'Đã cập nhật số lần mua hàng cho khách hàng ID %.', NEW.id_khach_hang;
@@ -179,47 +209,48 @@ EXECUTE FUNCTION func_tinh_toan_chitiet_ban();
 
 -- 3.4. Hàm tính giá vốn hàng bán (FIFO)
 -- Mục đích: Tính giá vốn cho mỗi sản phẩm được bán ra dựa trên các lô hàng nhập trước.
+-- Cách làm (theo tập hợp, không lặp từng lô):
+--   - Tổng lũy kế (window SUM) số lượng còn lại của các lô theo thứ tự FIFO.
+--   - Lô được dùng khi lũy kế TRƯỚC nó còn nhỏ hơn số lượng cần xuất; lô cuối chỉ lấy phần thiếu.
+--   - Một câu UPDATE trừ tất cả lô, một câu INSERT ghi phân bổ vào PhanBoLoNhap
+--     (bảng tạo ở 013_create_table_phan_bo_lo_nhap.sql) để kiểm tra và hoàn trả giá vốn.
 CREATE OR REPLACE FUNCTION func_tinh_tong_gia_von_ban_fifo()
 RETURNS TRIGGER AS $$
 DECLARE
-    v_so_luong_can_xuat NUMERIC;
     v_tong_gia_von NUMERIC := 0;
-    v_gia_nhap NUMERIC;
-    v_sl_con_lai_trong_lo NUMERIC;
-    v_sl_xuat_tu_lo_nay NUMERIC;
-    rec RECORD;
 BEGIN
-    v_so_luong_can_xuat := NEW.so_luong;
-
-    FOR rec IN (
-        SELECT ctdhn.id, ctdhn.gia_nhap_don_vi, ctdhn.so_luong_con_lai
+    -- Khóa sản phẩm để các lần xuất kho cùng sản phẩm chạy tuần tự (lũy kế luôn đọc số liệu mới nhất)
+    PERFORM 1 FROM SanPham WHERE id = NEW.id_san_pham FOR UPDATE;
+
+    WITH lo_kha_dung AS (
+        -- Index range scan trên idx_chitietnhap_lo_mo_fifo: chỉ duyệt các lô còn hàng của sản phẩm
+        SELECT ctdhn.id, ctdhn.gia_nhap_don_vi, ctdhn.so_luong_con_lai,
+               SUM(ctdhn.so_luong_con_lai) OVER (
+                   ORDER BY ctdhn.ngay_nhap_kho ASC, ctdhn.id ASC
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW
+               ) AS luy_ke
         FROM ChiTietDonHangNhap ctdhn
-        JOIN DonHangNhap dhn ON ctdhn.id_don_hang_nhap = dhn.id
         WHERE ctdhn.id_san_pham = NEW.id_san_pham
           AND ctdhn.so_luong_con_lai > 0
-          AND dhn.trang_thai = 'Hoàn tất'
-        ORDER BY dhn.ngay_nhan_hang_thuc_te ASC, ctdhn.id ASC
+          AND ctdhn.ngay_nhap_kho IS NOT NULL
+    ),
+    phan_bo AS (
+        SELECT id, gia_nhap_don_vi,
+               LEAST(so_luong_con_lai, NEW.so_luong - (luy_ke - so_luong_con_lai)) AS so_luong_xuat
+        FROM lo_kha_dung
+        WHERE luy_ke - so_luong_con_lai < NEW.so_luong
+    ),
+    tru_lo AS (
+        UPDATE ChiTietDonHangNhap ctdhn
+        SET so_luong_con_lai = ctdhn.so_luong_con_lai - pb.so_luong_xuat
+        FROM phan_bo pb
+        WHERE ctdhn.id = pb.id
+    ),
+    ghi_phan_bo AS (
+        INSERT INTO PhanBoLoNhap (id_chi_tiet_don_hang_ban, id_chi_tiet_don_hang_nhap, so_luong, gia_nhap_don_vi)
+        SELECT NEW.id, id, so_luong_xuat, gia_nhap_don_vi FROM phan_bo
     )
-    LOOP
-        IF v_so_luong_can_xuat <= 0 THEN
-            EXIT;
-        END IF;
-
-        v_gia_nhap := rec.gia_nhap_don_vi;
-        v_sl_con_lai_trong_lo := rec.so_luong_con_lai;
-
-        IF v_so_luong_can_xuat <= v_sl_con_lai_trong_lo THEN
-            v_sl_xuat_tu_lo_nay := v_so_luong_can_xuat;
-            v_tong_gia_von := v_tong_gia_von + (v_sl_xuat_tu_lo_nay * v_gia_nhap);
-            UPDATE ChiTietDonHangNhap SET so_luong_con_lai = so_luong_con_lai - v_sl_xuat_tu_lo_nay WHERE id = rec.id;
-            v_so_luong_can_xuat := 0;
-        ELSE
-            v_sl_xuat_tu_lo_nay := v_sl_con_lai_trong_lo;
-            v_tong_gia_von := v_tong_gia_von + (v_sl_xuat_tu_lo_nay * v_gia_nhap);
-            UPDATE ChiTietDonHangNhap SET so_luong_con_lai = 0 WHERE id = rec.id;
-            v_so_luong_can_xuat := v_so_luong_can_xuat - v_sl_xuat_tu_lo_nay;
-        END IF;
-    END LOOP;
+    SELECT COALESCE(SUM(so_luong_xuat * gia_nhap_don_vi), 0) INTO v_tong_gia_von FROM phan_bo;
 
     NEW.tong_gia_von := v_tong_gia_von;
     RETURN NEW;
@@ -233,6 +264,122 @@ FOR EACH ROW
 EXECUTE FUNCTION func_tinh_tong_gia_von_ban_fifo();
 
 
+-- 3.4b. Hàm cập nhật tổng tiền lưu sẵn trên DonHangBan
+-- Mục đích: Cộng/trừ phần chênh lệch của dòng vừa thêm/sửa/xóa vào tam_tinh_tien_hang, so_dong_hang,
+-- tong_gia_von của đơn, để danh sách đơn và báo cáo công nợ không phải SUM lại ChiTietDonHangBan.
+CREATE OR REPLACE FUNCTION func_cap_nhat_tong_tien_don_ban()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.id_don_hang_ban = NEW.id_don_hang_ban THEN
+        UPDATE DonHangBan
+        SET tam_tinh_tien_hang = tam_tinh_tien_hang - OLD.tong_gia_ban + NEW.tong_gia_ban,
+            tong_gia_von = tong_gia_von - OLD.tong_gia_von + NEW.tong_gia_von
+        WHERE id = NEW.id_don_hang_ban;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE DonHangBan
+        SET tam_tinh_tien_hang = tam_tinh_tien_hang - OLD.tong_gia_ban,
+            so_dong_hang = so_dong_hang - 1,
+            tong_gia_von = tong_gia_von - OLD.tong_gia_von
+        WHERE id = OLD.id_don_hang_ban;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE DonHangBan
+        SET tam_tinh_tien_hang = tam_tinh_tien_hang + NEW.tong_gia_ban,
+            so_dong_hang = so_dong_hang + 1,
+            tong_gia_von = tong_gia_von + NEW.tong_gia_von
+        WHERE id = NEW.id_don_hang_ban;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger áp dụng cho bảng ChiTietDonHangBan
+CREATE TRIGGER trg_after_change_chitietban_tong_tien
+AFTER INSERT OR UPDATE OR DELETE ON ChiTietDonHangBan
+FOR EACH ROW
+EXECUTE FUNCTION func_cap_nhat_tong_tien_don_ban();
+
+-- Khởi tạo tổng tiền cho các đơn đã có (một lần; từ đây trigger ở trên cộng / trừ chênh lệch)
+UPDATE DonHangBan dhb
+SET tam_tinh_tien_hang = ct.tam_tinh_tien_hang,
+    so_dong_hang = ct.so_dong_hang,
+    tong_gia_von = ct.tong_gia_von
+FROM (
+    SELECT id_don_hang_ban,
+           SUM(tong_gia_ban) AS tam_tinh_tien_hang,
+           COUNT(*) AS so_dong_hang,
+           SUM(tong_gia_von) AS tong_gia_von
+    FROM ChiTietDonHangBan
+    GROUP BY id_don_hang_ban
+) ct
+WHERE dhb.id = ct.id_don_hang_ban;
+
+
+-- 3.5. Hàm hoàn trả số lượng về các lô nhập đã xuất (theo PhanBoLoNhap)
+-- Mục đích: Dùng chung cho việc xóa dòng bán và hủy đơn / trả hàng. Mỗi phân bổ chỉ được hoàn trả một lần.
+CREATE OR REPLACE FUNCTION func_hoan_tra_lo_nhap(p_id_chi_tiet_ban_list INTEGER[])
+RETURNS VOID AS $$
+BEGIN
+    WITH hoan_tra AS (
+        UPDATE PhanBoLoNhap
+        SET da_hoan_tra = TRUE, ngay_hoan_tra = CURRENT_TIMESTAMP
+        WHERE id_chi_tiet_don_hang_ban = ANY(p_id_chi_tiet_ban_list) AND NOT da_hoan_tra
+        RETURNING id_chi_tiet_don_hang_nhap, so_luong
+    )
+    UPDATE ChiTietDonHangNhap ctdhn
+    SET so_luong_con_lai = ctdhn.so_luong_con_lai + ht.so_luong
+    FROM (
+        SELECT id_chi_tiet_don_hang_nhap, SUM(so_luong) AS so_luong
+        FROM hoan_tra GROUP BY id_chi_tiet_don_hang_nhap
+    ) ht
+    WHERE ctdhn.id = ht.id_chi_tiet_don_hang_nhap;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 3.5a. Xóa một dòng bán: trả lại lô trước khi dòng (và phân bổ của nó) bị xóa
+CREATE OR REPLACE FUNCTION func_hoan_tra_lo_khi_xoa_chitiet_ban()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM func_hoan_tra_lo_nhap(ARRAY[OLD.id]);
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_before_delete_chitietban_hoan_tra_lo
+BEFORE DELETE ON ChiTietDonHangBan
+FOR EACH ROW
+EXECUTE FUNCTION func_hoan_tra_lo_khi_xoa_chitiet_ban();
+
+-- 3.5b. Hủy đơn / trả hàng: trả lại lô cho toàn bộ dòng của đơn.
+-- Nếu đơn đã 'Hoàn tất' (tồn kho đã bị trừ ở 3.1) thì cộng lại tồn kho sản phẩm.
+CREATE OR REPLACE FUNCTION func_hoan_tra_lo_khi_huy_don_ban()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM func_hoan_tra_lo_nhap(ARRAY(SELECT id FROM ChiTietDonHangBan WHERE id_don_hang_ban = NEW.id));
+
+    IF OLD.trang_thai_don_hang = 'Hoàn tất' THEN
+        UPDATE SanPham sp
+        SET so_luong_ton_kho = sp.so_luong_ton_kho + ctdhb.so_luong
+        FROM ChiTietDonHangBan ctdhb
+        WHERE ctdhb.id_don_hang_ban = NEW.id AND sp.id = ctdhb.id_san_pham;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_after_update_donhangban_hoan_tra_lo
+AFTER UPDATE ON DonHangBan
+FOR EACH ROW
+WHEN (OLD.trang_thai_don_hang IS DISTINCT FROM NEW.trang_thai_don_hang
+      AND NEW.trang_thai_don_hang IN ('Đã hủy', 'Trả hàng')
+      AND OLD.trang_thai_don_hang NOT IN ('Đã hủy', 'Trả hàng'))
+EXECUTE FUNCTION func_hoan_tra_lo_khi_huy_don_ban();
+
+
 -- =====================================================================
 -- SECTION 4: TRIGGER CHO QUẢN LÝ GIÁ (LichSuGiaNiemYet)
 -- =====================================================================
@@ -255,4 +402,410 @@ $$ LANGUAGE plpgsql;
 CREATE TRIGGER trg_cap_nhat_ngay_ket_thuc_gia
 BEFORE INSERT ON LichSuGiaNiemYet
 FOR EACH ROW
-EXECUTE FUNCTION func_cap_nhat_ngay_ket_thuc_gia();
\ No newline at end of file
+EXECUTE FUNCTION func_cap_nhat_ngay_ket_thuc_gia();
+
+-- 4.2. Hàm đồng bộ giá bán hiện tại (SanPham.gia_ban_hien_tai) khi lịch sử giá thay đổi
+-- Mục đích: Danh sách POS, tạo đơn và báo cáo đọc giá hiện tại trực tiếp từ SanPham,
+-- không phải tìm giá mới nhất trong LichSuGiaNiemYet cho từng sản phẩm ở mỗi truy vấn.
+CREATE OR REPLACE FUNCTION func_tinh_lai_gia_ban_hien_tai(p_id_san_pham_list INTEGER[], p_ngay DATE DEFAULT CURRENT_DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    v_so_san_pham INTEGER;
+BEGIN
+    UPDATE SanPham sp
+    SET gia_ban_hien_tai = gia.gia_moi
+    FROM (
+        SELECT sp2.id,
+               COALESCE((SELECT ls.gia_niem_yet
+                         FROM LichSuGiaNiemYet ls
+                         WHERE ls.id_san_pham = sp2.id
+                           AND ls.ngay_ap_dung <= p_ngay
+                         ORDER BY ls.ngay_ap_dung DESC
+                         LIMIT 1), 0) AS gia_moi
+        FROM SanPham sp2
+        WHERE p_id_san_pham_list IS NULL OR sp2.id = ANY(p_id_san_pham_list)
+    ) AS gia
+    WHERE sp.id = gia.id
+      AND sp.gia_ban_hien_tai IS DISTINCT FROM gia.gia_moi; -- Không ghi (và không NOTIFY) nếu giá không đổi
+
+    GET DIAGNOSTICS v_so_san_pham = ROW_COUNT;
+    RETURN v_so_san_pham;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION func_dong_bo_gia_ban_hien_tai()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        UPDATE SanPham SET gia_ban_hien_tai = 0 WHERE gia_ban_hien_tai <> 0;
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM func_tinh_lai_gia_ban_hien_tai(ARRAY[OLD.id_san_pham]);
+    ELSIF TG_OP = 'UPDATE' AND OLD.id_san_pham <> NEW.id_san_pham THEN
+        PERFORM func_tinh_lai_gia_ban_hien_tai(ARRAY[OLD.id_san_pham, NEW.id_san_pham]);
+    ELSE
+        PERFORM func_tinh_lai_gia_ban_hien_tai(ARRAY[NEW.id_san_pham]);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger áp dụng cho bảng LichSuGiaNiemYet
+-- (giá có ngày áp dụng trong tương lai không đổi giá hiện tại; hàm 4.3 áp dụng khi tới ngày)
+CREATE TRIGGER trg_after_change_lichsugia_gia_hien_tai
+AFTER INSERT OR UPDATE OF id_san_pham, gia_niem_yet, ngay_ap_dung OR DELETE ON LichSuGiaNiemYet
+FOR EACH ROW
+EXECUTE FUNCTION func_dong_bo_gia_ban_hien_tai();
+
+CREATE TRIGGER trg_after_truncate_lichsugia_gia_hien_tai
+AFTER TRUNCATE ON LichSuGiaNiemYet
+FOR EACH STATEMENT
+EXECUTE FUNCTION func_dong_bo_gia_ban_hien_tai();
+
+-- 4.3. Hàm áp dụng các giá đến hạn (chạy hằng ngày, ngay sau nửa đêm)
+-- Mục đích: Giá nhập trước với ngày áp dụng trong tương lai chỉ có hiệu lực khi tới ngày đó;
+-- không có dòng nào thay đổi lúc nửa đêm nên trigger 4.2 không tự chạy. Backend gọi hàm này
+-- theo lịch (be/scheduler.py), có thể gọi lại nhiều lần trong ngày mà không sai.
+-- Chỉ tính lại các sản phẩm có giá bắt đầu trong khoảng [p_ngay - p_so_ngay_bu + 1, p_ngay]
+-- (p_so_ngay_bu > 1 để bù các ngày lịch chạy bị lỡ). Trả về số sản phẩm đã đổi giá.
+CREATE OR REPLACE FUNCTION func_ap_dung_gia_den_han(p_ngay DATE DEFAULT CURRENT_DATE, p_so_ngay_bu INTEGER DEFAULT 7)
+RETURNS INTEGER AS $$
+BEGIN
+    RETURN func_tinh_lai_gia_ban_hien_tai(
+        ARRAY(SELECT DISTINCT id_san_pham
+              FROM LichSuGiaNiemYet
+              WHERE ngay_ap_dung > p_ngay - p_so_ngay_bu
+                AND ngay_ap_dung <= p_ngay),
+        p_ngay);
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- =====================================================================
+-- SECTION 5: THÔNG BÁO THAY ĐỔI DANH MỤC BÁN HÀNG (LISTEN/NOTIFY)
+-- =====================================================================
+
+-- 5.1. Hàm gửi thông báo khi sản phẩm hoặc giá niêm yết thay đổi
+-- Mục đích: Bộ nhớ đệm danh mục POS ở backend (be/catalog_cache.py) LISTEN kênh 'catalog_changed'
+-- và chỉ nạp lại đúng sản phẩm bị đổi. Payload: {"bang": ..., "id_san_pham": ...};
+-- id_san_pham = null (TRUNCATE) nghĩa là phải nạp lại toàn bộ.
+-- NOTIFY chỉ được gửi khi giao dịch COMMIT, các thông báo trùng nhau trong cùng giao dịch được gộp lại.
+CREATE OR REPLACE FUNCTION func_thong_bao_thay_doi_danh_muc_pos()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_id_san_pham INTEGER;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        v_id_san_pham := NULL;
+    ELSIF TG_TABLE_NAME = 'sanpham' THEN
+        v_id_san_pham := CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END;
+    ELSE
+        v_id_san_pham := CASE WHEN TG_OP = 'DELETE' THEN OLD.id_san_pham ELSE NEW.id_san_pham END;
+    END IF;
+
+    PERFORM pg_notify('catalog_changed',
+                      json_build_object('bang', TG_TABLE_NAME, 'id_san_pham', v_id_san_pham)::TEXT);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger áp dụng cho bảng SanPham (thêm/sửa/xóa, kể cả tồn kho thay đổi khi bán/nhập hàng)
+CREATE TRIGGER trg_after_change_sanpham_thong_bao
+AFTER INSERT OR UPDATE OR DELETE ON SanPham
+FOR EACH ROW
+EXECUTE FUNCTION func_thong_bao_thay_doi_danh_muc_pos();
+
+CREATE TRIGGER trg_after_truncate_sanpham_thong_bao
+AFTER TRUNCATE ON SanPham
+FOR EACH STATEMENT
+EXECUTE FUNCTION func_thong_bao_thay_doi_danh_muc_pos();
+
+-- Trigger áp dụng cho bảng LichSuGiaNiemYet (giá mới làm đổi giá bán hiện tại của sản phẩm)
+CREATE TRIGGER trg_after_change_lichsugia_thong_bao
+AFTER INSERT OR UPDATE OR DELETE ON LichSuGiaNiemYet
+FOR EACH ROW
+EXECUTE FUNCTION func_thong_bao_thay_doi_danh_muc_pos();
+
+CREATE TRIGGER trg_after_truncate_lichsugia_thong_bao
+AFTER TRUNCATE ON LichSuGiaNiemYet
+FOR EACH STATEMENT
+EXECUTE FUNCTION func_thong_bao_thay_doi_danh_muc_pos();
+
+
+-- =====================================================================
+-- SECTION 6: BẢNG TỔNG HỢP BÁN HÀNG THEO NGÀY (TongHopBanHangNgay, TongHopDonHangNgay)
+-- =====================================================================
+-- Bảng tạo ở 014_create_table_tong_hop_ban_hang.sql. Chỉ các đơn 'Hoàn tất' được tính.
+-- Mọi thay đổi được ghi dưới dạng cộng/trừ phần chênh lệch (không quét lại lịch sử).
+
+-- 6.1. Cộng (p_dau = 1) hoặc trừ (p_dau = -1) toàn bộ một đơn vào bảng tổng hợp
+CREATE OR REPLACE FUNCTION func_tong_hop_theo_don(p_id_don INTEGER, p_ngay DATE,
+                                                  p_id_khach_hang INTEGER, p_id_nhan_vien INTEGER, p_dau INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO TongHopBanHangNgay AS th (ngay, id_san_pham, id_khach_hang, id_nhan_vien, so_luong, doanh_thu, gia_von, so_don)
+    SELECT p_ngay, ct.id_san_pham, p_id_khach_hang, p_id_nhan_vien,
+           p_dau * SUM(ct.so_luong), p_dau * SUM(ct.tong_gia_ban), p_dau * SUM(COALESCE(ct.tong_gia_von, 0)), p_dau
+    FROM ChiTietDonHangBan ct
+    WHERE ct.id_don_hang_ban = p_id_don
+    GROUP BY ct.id_san_pham
+    ON CONFLICT (ngay, id_san_pham, id_khach_hang, id_nhan_vien) DO UPDATE
+    SET so_luong = th.so_luong + EXCLUDED.so_luong,
+        doanh_thu = th.doanh_thu + EXCLUDED.doanh_thu,
+        gia_von = th.gia_von + EXCLUDED.gia_von,
+        so_don = th.so_don + EXCLUDED.so_don;
+
+    INSERT INTO TongHopDonHangNgay AS th (ngay, id_khach_hang, id_nhan_vien, so_don, doanh_thu, gia_von)
+    SELECT p_ngay, p_id_khach_hang, p_id_nhan_vien,
+           p_dau, p_dau * COALESCE(SUM(ct.tong_gia_ban), 0), p_dau * COALESCE(SUM(ct.tong_gia_von), 0)
+    FROM ChiTietDonHangBan ct
+    WHERE ct.id_don_hang_ban = p_id_don
+    ON CONFLICT (ngay, id_khach_hang, id_nhan_vien) DO UPDATE
+    SET so_don = th.so_don + EXCLUDED.so_don,
+        doanh_thu = th.doanh_thu + EXCLUDED.doanh_thu,
+        gia_von = th.gia_von + EXCLUDED.gia_von;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 6.2. Đơn chuyển sang / rời khỏi 'Hoàn tất' (hủy, trả hàng), đổi ngày / khách / nhân viên, hoặc bị xóa
+-- Ngày mua đầu tiên / gần nhất của khách hàng: khi một đơn hoàn tất bị bỏ ra thì tính lại từ bảng
+-- tổng hợp (chỉ các dòng của khách đó, index idx_tong_hop_don_hang_khach_hang); khi thêm vào thì
+-- LEAST/GREATEST. Trường hợp đơn chuyển sang 'Hoàn tất' do trigger 3.2 xử lý.
+CREATE OR REPLACE FUNCTION func_tinh_lai_ngay_mua_khach_hang(p_id_khach_hang INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    UPDATE KhachHang kh
+    SET ngay_mua_dau_tien = th.dau_tien,
+        ngay_mua_gan_nhat = th.gan_nhat
+    FROM (SELECT MIN(ngay) AS dau_tien, MAX(ngay) AS gan_nhat
+          FROM TongHopDonHangNgay
+          WHERE id_khach_hang = p_id_khach_hang AND so_don > 0) th
+    WHERE kh.id = p_id_khach_hang;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION func_tong_hop_khi_doi_don_ban()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_cu_hoan_tat BOOLEAN := FALSE;
+    v_moi_hoan_tat BOOLEAN := FALSE;
+    v_doi_khoa BOOLEAN := FALSE;
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        v_cu_hoan_tat := OLD.trang_thai_don_hang = 'Hoàn tất';
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        v_moi_hoan_tat := NEW.trang_thai_don_hang = 'Hoàn tất';
+    END IF;
+    IF TG_OP = 'UPDATE' THEN
+        v_doi_khoa := (OLD.ngay_dat_hang::date, OLD.id_khach_hang, OLD.id_nhan_vien)
+            IS DISTINCT FROM (NEW.ngay_dat_hang::date, NEW.id_khach_hang, NEW.id_nhan_vien);
+    END IF;
+
+    IF v_cu_hoan_tat AND (NOT v_moi_hoan_tat OR v_doi_khoa) THEN
+        PERFORM func_tong_hop_theo_don(OLD.id, OLD.ngay_dat_hang::date, OLD.id_khach_hang, OLD.id_nhan_vien, -1);
+        PERFORM func_tinh_lai_ngay_mua_khach_hang(OLD.id_khach_hang);
+    END IF;
+    IF v_moi_hoan_tat AND (NOT v_cu_hoan_tat OR v_doi_khoa) THEN
+        PERFORM func_tong_hop_theo_don(NEW.id, NEW.ngay_dat_hang::date, NEW.id_khach_hang, NEW.id_nhan_vien, 1);
+        IF TG_OP = 'INSERT' OR v_doi_khoa THEN
+            UPDATE KhachHang
+            SET ngay_mua_dau_tien = LEAST(ngay_mua_dau_tien, NEW.ngay_dat_hang::date),
+                ngay_mua_gan_nhat = GREATEST(ngay_mua_gan_nhat, NEW.ngay_dat_hang::date)
+            WHERE id = NEW.id_khach_hang;
+        END IF;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        RETURN OLD;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_after_change_donhangban_tong_hop
+AFTER INSERT OR UPDATE OF trang_thai_don_hang, ngay_dat_hang, id_khach_hang, id_nhan_vien ON DonHangBan
+FOR EACH ROW
+EXECUTE FUNCTION func_tong_hop_khi_doi_don_ban();
+
+-- Xóa đơn: trừ khi các dòng còn tồn tại (BEFORE), vì khóa ngoại CASCADE sẽ xóa dòng trước các trigger AFTER
+CREATE TRIGGER trg_before_delete_donhangban_tong_hop
+BEFORE DELETE ON DonHangBan
+FOR EACH ROW
+WHEN (OLD.trang_thai_don_hang = 'Hoàn tất')
+EXECUTE FUNCTION func_tong_hop_khi_doi_don_ban();
+
+-- 6.3. Thêm / sửa / xóa dòng của một đơn ĐÃ 'Hoàn tất': ghi phần chênh lệch của dòng
+-- Cộng (p_dau = 1) hoặc trừ (p_dau = -1) một dòng. so_don mức sản phẩm chỉ đổi khi đó là
+-- dòng duy nhất của sản phẩm trong đơn.
+CREATE OR REPLACE FUNCTION func_tong_hop_theo_dong(p_id_don INTEGER, p_id_dong INTEGER, p_id_san_pham INTEGER,
+                                                   p_so_luong NUMERIC, p_tong_gia_ban NUMERIC,
+                                                   p_tong_gia_von NUMERIC, p_dau INTEGER)
+RETURNS VOID AS $$
+DECLARE
+    v_don RECORD;
+BEGIN
+    SELECT ngay_dat_hang::date AS ngay, id_khach_hang, id_nhan_vien INTO v_don
+    FROM DonHangBan
+    WHERE id = p_id_don AND trang_thai_don_hang = 'Hoàn tất';
+    IF NOT FOUND THEN
+        RETURN; -- Đơn chưa hoàn tất, hoặc đang bị xóa (đã trừ ở 6.2)
+    END IF;
+
+    INSERT INTO TongHopBanHangNgay AS th (ngay, id_san_pham, id_khach_hang, id_nhan_vien, so_luong, doanh_thu, gia_von, so_don)
+    VALUES (v_don.ngay, p_id_san_pham, v_don.id_khach_hang, v_don.id_nhan_vien,
+            p_dau * p_so_luong, p_dau * p_tong_gia_ban, p_dau * COALESCE(p_tong_gia_von, 0),
+            CASE WHEN EXISTS (SELECT 1 FROM ChiTietDonHangBan ct
+                              WHERE ct.id_don_hang_ban = p_id_don
+                                AND ct.id_san_pham = p_id_san_pham
+                                AND ct.id <> p_id_dong)
+                 THEN 0 ELSE p_dau END)
+    ON CONFLICT (ngay, id_san_pham, id_khach_hang, id_nhan_vien) DO UPDATE
+    SET so_luong = th.so_luong + EXCLUDED.so_luong,
+        doanh_thu = th.doanh_thu + EXCLUDED.doanh_thu,
+        gia_von = th.gia_von + EXCLUDED.gia_von,
+        so_don = th.so_don + EXCLUDED.so_don;
+
+    UPDATE TongHopDonHangNgay
+    SET doanh_thu = doanh_thu + p_dau * p_tong_gia_ban,
+        gia_von = gia_von + p_dau * COALESCE(p_tong_gia_von, 0)
+    WHERE ngay = v_don.ngay AND id_khach_hang = v_don.id_khach_hang AND id_nhan_vien = v_don.id_nhan_vien;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION func_tong_hop_khi_doi_chitiet_ban()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM func_tong_hop_theo_dong(OLD.id_don_hang_ban, OLD.id, OLD.id_san_pham,
+                                        OLD.so_luong, OLD.tong_gia_ban, OLD.tong_gia_von, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM func_tong_hop_theo_dong(NEW.id_don_hang_ban, NEW.id, NEW.id_san_pham,
+                                        NEW.so_luong, NEW.tong_gia_ban, NEW.tong_gia_von, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_after_change_chitietban_tong_hop
+AFTER INSERT OR UPDATE OR DELETE ON ChiTietDonHangBan
+FOR EACH ROW
+EXECUTE FUNCTION func_tong_hop_khi_doi_chitiet_ban();
+
+-- 6.4. TRUNCATE DonHangBan thì dọn luôn bảng tổng hợp
+-- Dùng DELETE, không TRUNCATE: khi lệnh TRUNCATE ... CASCADE có cả SanPham / KhachHang / NhanVien thì khóa
+-- ngoại CASCADE (014_create_table_tong_hop_ban_hang.sql) đã đưa hai bảng tổng hợp vào chính lệnh đó, TRUNCATE
+-- lồng sẽ lỗi ObjectInUse; lúc này hai bảng đã rỗng nên DELETE không làm gì.
+CREATE OR REPLACE FUNCTION func_tong_hop_khi_truncate_don_ban()
+RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM TongHopBanHangNgay;
+    DELETE FROM TongHopDonHangNgay;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_after_truncate_donhangban_tong_hop
+AFTER TRUNCATE ON DonHangBan
+FOR EACH STATEMENT
+EXECUTE FUNCTION func_tong_hop_khi_truncate_don_ban();
+
+-- 6.5. Tính lại bảng tổng hợp cho một khoảng ngày từ dữ liệu gốc
+-- Dùng khi khởi tạo trên dữ liệu có sẵn hoặc để đối soát. Trả về số dòng mức sản phẩm đã ghi.
+-- Lọc khoảng nửa mở [p_tu_ngay, p_den_ngay + 1) trên ngay_dat_hang (DATE được đổi sang timestamptz theo
+-- TimeZone của phiên = giờ cửa hàng) để dùng index idx_donhangban_trangthai_ngaydathang.
+CREATE OR REPLACE FUNCTION func_tinh_lai_tong_hop_ban_hang(p_tu_ngay DATE, p_den_ngay DATE)
+RETURNS INTEGER AS $$
+DECLARE
+    v_so_dong INTEGER;
+BEGIN
+    DELETE FROM TongHopBanHangNgay WHERE ngay BETWEEN p_tu_ngay AND p_den_ngay;
+    DELETE FROM TongHopDonHangNgay WHERE ngay BETWEEN p_tu_ngay AND p_den_ngay;
+
+    INSERT INTO TongHopBanHangNgay (ngay, id_san_pham, id_khach_hang, id_nhan_vien, so_luong, doanh_thu, gia_von, so_don)
+    SELECT dhb.ngay_dat_hang::date, ct.id_san_pham, dhb.id_khach_hang, dhb.id_nhan_vien,
+           SUM(ct.so_luong), SUM(ct.tong_gia_ban), SUM(COALESCE(ct.tong_gia_von, 0)), COUNT(DISTINCT dhb.id)
+    FROM DonHangBan dhb
+    JOIN ChiTietDonHangBan ct ON ct.id_don_hang_ban = dhb.id
+    WHERE dhb.trang_thai_don_hang = 'Hoàn tất'
+      AND dhb.ngay_dat_hang >= p_tu_ngay AND dhb.ngay_dat_hang < p_den_ngay + 1
+    GROUP BY 1, 2, 3, 4;
+    GET DIAGNOSTICS v_so_dong = ROW_COUNT;
+
+    INSERT INTO TongHopDonHangNgay (ngay, id_khach_hang, id_nhan_vien, so_don, doanh_thu, gia_von)
+    SELECT dhb.ngay_dat_hang::date, dhb.id_khach_hang, dhb.id_nhan_vien,
+           COUNT(*), SUM(dhb.tam_tinh_tien_hang), SUM(dhb.tong_gia_von)
+    FROM DonHangBan dhb
+    WHERE dhb.trang_thai_don_hang = 'Hoàn tất'
+      AND dhb.ngay_dat_hang >= p_tu_ngay AND dhb.ngay_dat_hang < p_den_ngay + 1
+    GROUP BY 1, 2, 3;
+
+    -- Ngày mua đầu tiên / gần nhất có thể nằm ngoài khoảng -> tính lại cho mọi khách có đơn trong khoảng
+    UPDATE KhachHang kh
+    SET ngay_mua_dau_tien = th.dau_tien,
+        ngay_mua_gan_nhat = th.gan_nhat
+    FROM (SELECT k.id,
+                 (SELECT MIN(ngay) FROM TongHopDonHangNgay t WHERE t.id_khach_hang = k.id AND t.so_don > 0) AS dau_tien,
+                 (SELECT MAX(ngay) FROM TongHopDonHangNgay t WHERE t.id_khach_hang = k.id AND t.so_don > 0) AS gan_nhat
+          FROM KhachHang k
+          WHERE k.id IN (SELECT id_khach_hang FROM TongHopDonHangNgay WHERE ngay BETWEEN p_tu_ngay AND p_den_ngay)
+             OR k.ngay_mua_dau_tien BETWEEN p_tu_ngay AND p_den_ngay
+             OR k.ngay_mua_gan_nhat BETWEEN p_tu_ngay AND p_den_ngay) th
+    WHERE kh.id = th.id;
+
+    RETURN v_so_dong;
+END;
+$$ LANGUAGE plpgsql;
+
+
+-- =====================================================================
+-- SECTION 7: THÔNG BÁO THAY ĐỔI SỐ LIỆU BÁO CÁO (LISTEN/NOTIFY)
+-- =====================================================================
+
+-- 7.1. Hàm gửi thông báo khi số liệu của một ngày thay đổi
+-- Mục đích: Bộ đệm kết quả báo cáo ở backend (be/report_cache.py) LISTEN kênh 'report_data_changed'
+-- và bỏ các kết quả có khoảng ngày chứa ngày bị đổi (VD: đơn / chi phí ghi lùi ngày vào kỳ đã đóng).
+-- Payload: {"bang": ..., "ngay": "YYYY-MM-DD"}; ngay = null (TRUNCATE) nghĩa là bỏ toàn bộ.
+-- Báo cáo bán hàng đọc từ bảng tổng hợp (section 6) nên chỉ cần theo dõi bảng tổng hợp và ChiPhi.
+-- Các thông báo trùng nhau trong cùng giao dịch (nhiều dòng của một đơn) được gộp lại khi COMMIT.
+CREATE OR REPLACE FUNCTION func_thong_bao_thay_doi_bao_cao()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_ngay_cu DATE;
+    v_ngay_moi DATE;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('report_data_changed', json_build_object('bang', TG_TABLE_NAME, 'ngay', NULL)::TEXT);
+        RETURN NULL;
+    END IF;
+
+    IF TG_TABLE_NAME = 'chiphi' THEN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN v_ngay_cu := OLD.ngay_chi_phi; END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN v_ngay_moi := NEW.ngay_chi_phi; END IF;
+    ELSE
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN v_ngay_cu := OLD.ngay; END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN v_ngay_moi := NEW.ngay; END IF;
+    END IF;
+
+    IF v_ngay_cu IS NOT NULL AND v_ngay_cu IS DISTINCT FROM v_ngay_moi THEN
+        PERFORM pg_notify('report_data_changed', json_build_object('bang', TG_TABLE_NAME, 'ngay', v_ngay_cu)::TEXT);
+    END IF;
+    IF v_ngay_moi IS NOT NULL THEN
+        PERFORM pg_notify('report_data_changed', json_build_object('bang', TG_TABLE_NAME, 'ngay', v_ngay_moi)::TEXT);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger trên TongHopBanHangNgay / TongHopDonHangNgay được tạo ở 014_create_table_tong_hop_ban_hang.sql
+-- (bảng được tạo sau file này).
+
+CREATE TRIGGER trg_after_change_chiphi_thong_bao
+AFTER INSERT OR UPDATE OF ngay_chi_phi, so_tien OR DELETE ON ChiPhi
+FOR EACH ROW
+EXECUTE FUNCTION func_thong_bao_thay_doi_bao_cao();
+
+CREATE TRIGGER trg_after_truncate_chiphi_thong_bao
+AFTER TRUNCATE ON ChiPhi
+FOR EACH STATEMENT
+EXECUTE FUNCTION func_thong_bao_thay_doi_bao_cao();
@@ -0,0 +1,28 @@
+CREATE TABLE PhanBoLoNhap (
+    id SERIAL PRIMARY KEY,                          -- ID tự tăng, khóa chính của bảng
+    id_chi_tiet_don_hang_ban INTEGER NOT NULL,      -- Dòng bán hàng đã lấy hàng từ lô
+    id_chi_tiet_don_hang_nhap INTEGER NOT NULL,     -- Lô nhập (dòng chi tiết đơn nhập) bị xuất
+    so_luong INTEGER NOT NULL CHECK (so_luong > 0), -- Số lượng xuất từ lô này
+    gia_nhap_don_vi NUMERIC(12, 0) NOT NULL CHECK (gia_nhap_don_vi >= 0), -- Giá vốn đơn vị của lô tại thời điểm xuất
+    da_hoan_tra BOOLEAN NOT NULL DEFAULT FALSE,     -- TRUE khi số lượng đã được trả lại lô (hủy đơn / trả hàng)
+    ngay_hoan_tra TIMESTAMP WITH TIME ZONE NULL,    -- Thời điểm trả lại lô
+    ngay_tao_ban_ghi TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+
+    -- Trigger FIFO ghi phân bổ trong BEFORE INSERT của ChiTietDonHangBan (dòng bán chưa tồn tại),
+    -- nên việc kiểm tra khóa ngoại được hoãn đến cuối giao dịch.
+    CONSTRAINT fk_phan_bo_chi_tiet_ban
+        FOREIGN KEY (id_chi_tiet_don_hang_ban)
+        REFERENCES ChiTietDonHangBan(id)
+        ON DELETE CASCADE
+        ON UPDATE CASCADE
+        DEFERRABLE INITIALLY DEFERRED,
+    CONSTRAINT fk_phan_bo_chi_tiet_nhap
+        FOREIGN KEY (id_chi_tiet_don_hang_nhap)
+        REFERENCES ChiTietDonHangNhap(id)
+        ON DELETE RESTRICT
+        ON UPDATE CASCADE
+);
+
+-- Tra cứu phân bổ theo dòng bán (hoàn trả, kiểm toán giá vốn) và theo lô nhập
+CREATE INDEX idx_phanbolonhap_chitietban ON PhanBoLoNhap (id_chi_tiet_don_hang_ban);
+CREATE INDEX idx_phanbolonhap_chitietnhap ON PhanBoLoNhap (id_chi_tiet_don_hang_nhap);
@@ -0,0 +1,66 @@
+-- Bảng tổng hợp bán hàng theo ngày, phục vụ các báo cáo ở backend/be/reports.
+-- Chỉ tính các đơn 'Hoàn tất'; được cập nhật tăng dần bởi trigger (012_create_triggers.sql, section 6)
+-- và có thể tính lại cho một khoảng ngày bằng func_tinh_lai_tong_hop_ban_hang(tu_ngay, den_ngay).
+-- "ngay" là ngày đặt hàng (ngay_dat_hang::date).
+
+-- Mức dòng hàng: ngày x sản phẩm x khách hàng x nhân viên
+CREATE TABLE TongHopBanHangNgay (
+    ngay DATE NOT NULL,                             -- Ngày đặt hàng
+    id_san_pham INTEGER NOT NULL,
+    id_khach_hang INTEGER NOT NULL,
+    id_nhan_vien INTEGER NOT NULL,
+    so_luong NUMERIC(14, 3) NOT NULL DEFAULT 0,     -- Tổng số lượng bán
+    doanh_thu NUMERIC(17, 3) NOT NULL DEFAULT 0,    -- Tổng tong_gia_ban của các dòng
+    gia_von NUMERIC(17, 3) NOT NULL DEFAULT 0,      -- Tổng tong_gia_von (FIFO) của các dòng
+    so_don INTEGER NOT NULL DEFAULT 0,              -- Số đơn có bán sản phẩm này
+
+    CONSTRAINT pk_tong_hop_ban_hang_ngay PRIMARY KEY (ngay, id_san_pham, id_khach_hang, id_nhan_vien),
+    -- Khóa ngoại CASCADE để TRUNCATE ... CASCADE các bảng danh mục cũng dọn bảng tổng hợp
+    CONSTRAINT fk_tong_hop_ban_hang_san_pham
+        FOREIGN KEY (id_san_pham) REFERENCES SanPham(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    CONSTRAINT fk_tong_hop_ban_hang_khach_hang
+        FOREIGN KEY (id_khach_hang) REFERENCES KhachHang(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    CONSTRAINT fk_tong_hop_ban_hang_nhan_vien
+        FOREIGN KEY (id_nhan_vien) REFERENCES NhanVien(id) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- Mức đơn hàng: ngày x khách hàng x nhân viên (đếm đơn không bị nhân lên theo số dòng)
+CREATE TABLE TongHopDonHangNgay (
+    ngay DATE NOT NULL,                             -- Ngày đặt hàng
+    id_khach_hang INTEGER NOT NULL,
+    id_nhan_vien INTEGER NOT NULL,
+    so_don INTEGER NOT NULL DEFAULT 0,              -- Số đơn 'Hoàn tất'
+    doanh_thu NUMERIC(17, 3) NOT NULL DEFAULT 0,    -- Tổng tong_gia_ban của các đơn
+    gia_von NUMERIC(17, 3) NOT NULL DEFAULT 0,      -- Tổng giá vốn của các đơn
+
+    CONSTRAINT pk_tong_hop_don_hang_ngay PRIMARY KEY (ngay, id_khach_hang, id_nhan_vien),
+    CONSTRAINT fk_tong_hop_don_hang_khach_hang
+        FOREIGN KEY (id_khach_hang) REFERENCES KhachHang(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    CONSTRAINT fk_tong_hop_don_hang_nhan_vien
+        FOREIGN KEY (id_nhan_vien) REFERENCES NhanVien(id) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- Báo cáo theo sản phẩm trong một khoảng ngày (bán chạy) dùng khóa chính (ngay, ...);
+-- báo cáo theo khách hàng (lần mua đầu, chi tiêu) cần truy cập theo khách hàng trước
+CREATE INDEX idx_tong_hop_don_hang_khach_hang ON TongHopDonHangNgay (id_khach_hang, ngay);
+
+-- Thông báo thay đổi số liệu báo cáo (hàm ở 012_create_triggers.sql, section 7)
+CREATE TRIGGER trg_after_change_tonghopbanhang_thong_bao
+AFTER INSERT OR UPDATE OR DELETE ON TongHopBanHangNgay
+FOR EACH ROW
+EXECUTE FUNCTION func_thong_bao_thay_doi_bao_cao();
+
+CREATE TRIGGER trg_after_truncate_tonghopbanhang_thong_bao
+AFTER TRUNCATE ON TongHopBanHangNgay
+FOR EACH STATEMENT
+EXECUTE FUNCTION func_thong_bao_thay_doi_bao_cao();
+
+CREATE TRIGGER trg_after_change_tonghopdonhang_thong_bao
+AFTER INSERT OR UPDATE OR DELETE ON TongHopDonHangNgay
+FOR EACH ROW
+EXECUTE FUNCTION func_thong_bao_thay_doi_bao_cao();
+
+CREATE TRIGGER trg_after_truncate_tonghopdonhang_thong_bao
+AFTER TRUNCATE ON TongHopDonHangNgay
+FOR EACH STATEMENT
+EXECUTE FUNCTION func_thong_bao_thay_doi_bao_cao();
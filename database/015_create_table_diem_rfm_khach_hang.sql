@@ -0,0 +1,51 @@
+-- Điểm RFM (Recency / Frequency / Monetary) và phân khúc của từng khách hàng, tính sẵn bởi
+-- backend/be/reports/operation_14_phankhucrfm.py (chạy lại toàn bộ hằng đêm, tính bổ sung theo yêu cầu).
+-- Chỉ gồm khách hàng đã có ít nhất một đơn 'Hoàn tất'. Điểm 1..5 là nhóm ngũ phân vị (5 = tốt nhất):
+--   - diem_r: theo ngay_mua_gan_nhat (mua càng gần đây điểm càng cao)
+--   - diem_f: theo so_lan_mua_hang (số đơn hoàn tất, SUM(so_don) từ TongHopDonHangNgay)
+--   - diem_m: theo tong_chi_tieu (tổng doanh thu đơn hoàn tất, từ TongHopDonHangNgay)
+CREATE TABLE DiemRFMKhachHang (
+    id_khach_hang INTEGER PRIMARY KEY,
+    ngay_mua_gan_nhat DATE NOT NULL,
+    so_lan_mua_hang INTEGER NOT NULL,
+    tong_chi_tieu NUMERIC(17, 3) NOT NULL,
+    diem_r SMALLINT NOT NULL CHECK (diem_r BETWEEN 1 AND 5),
+    diem_f SMALLINT NOT NULL CHECK (diem_f BETWEEN 1 AND 5),
+    diem_m SMALLINT NOT NULL CHECK (diem_m BETWEEN 1 AND 5),
+    phan_khuc VARCHAR(50) NOT NULL,
+    ngay_cap_nhat TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP, -- Lần cuối điểm / chỉ số thay đổi
+
+    CONSTRAINT fk_diem_rfm_khach_hang
+        FOREIGN KEY (id_khach_hang) REFERENCES KhachHang(id) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- Duyệt một phân khúc theo trang, chi tiêu cao trước (keyset: tong_chi_tieu, id_khach_hang)
+CREATE INDEX idx_diem_rfm_phan_khuc ON DiemRFMKhachHang (phan_khuc, tong_chi_tieu, id_khach_hang);
+
+-- Hàng đợi khách hàng có số liệu mua hàng thay đổi kể từ lần tính điểm trước (tính bổ sung)
+CREATE TABLE KhachHangCanTinhRFM (
+    id_khach_hang INTEGER PRIMARY KEY,
+
+    CONSTRAINT fk_can_tinh_rfm_khach_hang
+        FOREIGN KEY (id_khach_hang) REFERENCES KhachHang(id) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- Mọi thay đổi đơn hoàn tất (hoàn tất, hủy, sửa dòng, ghi lùi ngày) đều đi qua TongHopDonHangNgay
+-- (012_create_triggers.sql, section 6) -> đánh dấu khách hàng liên quan cần tính lại.
+CREATE OR REPLACE FUNCTION func_danh_dau_tinh_lai_rfm()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO KhachHangCanTinhRFM (id_khach_hang) VALUES (OLD.id_khach_hang) ON CONFLICT DO NOTHING;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO KhachHangCanTinhRFM (id_khach_hang) VALUES (NEW.id_khach_hang) ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_after_change_tonghopdonhang_rfm
+AFTER INSERT OR UPDATE OR DELETE ON TongHopDonHangNgay
+FOR EACH ROW
+EXECUTE FUNCTION func_danh_dau_tinh_lai_rfm();
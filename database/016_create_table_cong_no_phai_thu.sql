@@ -0,0 +1,118 @@
+-- Sổ công nợ phải thu: MỖI ĐƠN đang nợ có một dòng với số tiền còn nợ, do trigger trên DonHangBan duy trì.
+-- Một đơn là công nợ khi: trang_thai_don_hang 'Đã giao' / 'Hoàn tất', trang_thai_thanh_toan 'Chưa thanh toán',
+-- đơn có ít nhất một dòng hàng và còn tiền chưa trả (tam_tinh_tien_hang - so_tien_da_thanh_toan > 0).
+-- Dòng hàng thêm / sửa / xóa cập nhật DonHangBan.tam_tinh_tien_hang (012_create_triggers.sql, 3.4b),
+-- thanh toán cập nhật DonHangBan.so_tien_da_thanh_toan (017_create_table_thanh_toan_don_hang_ban.sql)
+-- nên chỉ cần bắt thay đổi trên DonHangBan.
+-- Báo cáo công nợ và tuổi nợ (backend/be/reports/operation_13_congno.py) chỉ đọc bảng này.
+CREATE TABLE CongNoPhaiThu (
+    id_don_hang_ban INTEGER PRIMARY KEY,
+    id_khach_hang INTEGER NOT NULL,
+    ngay_tinh_no DATE NULL,                         -- Ngày giao hàng thực tế (mốc tính tuổi nợ)
+    so_tien_con_no NUMERIC(15, 0) NOT NULL,         -- Số tiền còn phải thu của đơn
+
+    CONSTRAINT fk_cong_no_don_hang_ban
+        FOREIGN KEY (id_don_hang_ban) REFERENCES DonHangBan(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    CONSTRAINT fk_cong_no_khach_hang
+        FOREIGN KEY (id_khach_hang) REFERENCES KhachHang(id) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- Công nợ theo khách hàng (gom nhóm báo cáo, tra cứu nợ của một khách)
+CREATE INDEX idx_cong_no_khach_hang ON CongNoPhaiThu (id_khach_hang, ngay_tinh_no);
+-- Nợ quá hạn: ngay_tinh_no < CURRENT_DATE - 30
+CREATE INDEX idx_cong_no_ngay_tinh_no ON CongNoPhaiThu (ngay_tinh_no);
+
+-- Tổng công nợ của từng khách hàng đang nợ (không có dòng = không nợ), do trigger trên CongNoPhaiThu duy trì:
+-- báo cáo công nợ chỉ đọc số khách đang nợ, không gom nhóm lại các đơn
+CREATE TABLE CongNoKhachHang (
+    id_khach_hang INTEGER PRIMARY KEY,
+    tong_cong_no NUMERIC(17, 0) NOT NULL DEFAULT 0,  -- Tổng số tiền còn nợ của các đơn
+    so_don_no INTEGER NOT NULL DEFAULT 0,            -- Số đơn đang nợ
+
+    CONSTRAINT fk_cong_no_kh_khach_hang
+        FOREIGN KEY (id_khach_hang) REFERENCES KhachHang(id) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- Đồng bộ dòng công nợ của một đơn với trạng thái hiện tại của đơn
+CREATE OR REPLACE FUNCTION func_dong_bo_cong_no_phai_thu()
+RETURNS TRIGGER AS $$
+DECLARE
+    v_moi_la_no BOOLEAN;
+    v_cu_la_no BOOLEAN := FALSE;
+BEGIN
+    v_moi_la_no := NEW.trang_thai_don_hang IN ('Đã giao', 'Hoàn tất')
+                   AND NEW.trang_thai_thanh_toan = 'Chưa thanh toán'
+                   AND NEW.so_dong_hang > 0
+                   AND NEW.tam_tinh_tien_hang > NEW.so_tien_da_thanh_toan;
+    IF TG_OP = 'UPDATE' THEN
+        v_cu_la_no := OLD.trang_thai_don_hang IN ('Đã giao', 'Hoàn tất')
+                      AND OLD.trang_thai_thanh_toan = 'Chưa thanh toán'
+                      AND OLD.so_dong_hang > 0
+                      AND OLD.tam_tinh_tien_hang > OLD.so_tien_da_thanh_toan;
+    END IF;
+
+    IF v_moi_la_no THEN
+        INSERT INTO CongNoPhaiThu (id_don_hang_ban, id_khach_hang, ngay_tinh_no, so_tien_con_no)
+        VALUES (NEW.id, NEW.id_khach_hang, NEW.ngay_giao_hang_thuc_te,
+                NEW.tam_tinh_tien_hang - NEW.so_tien_da_thanh_toan)
+        ON CONFLICT (id_don_hang_ban) DO UPDATE SET
+            id_khach_hang = EXCLUDED.id_khach_hang,
+            ngay_tinh_no = EXCLUDED.ngay_tinh_no,
+            so_tien_con_no = EXCLUDED.so_tien_con_no;
+    ELSIF v_cu_la_no THEN
+        -- Đã thanh toán (đủ), bị hủy / trả hàng, hoặc hết dòng hàng
+        DELETE FROM CongNoPhaiThu WHERE id_don_hang_ban = NEW.id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_after_change_donhangban_cong_no
+AFTER INSERT OR UPDATE OF trang_thai_don_hang, trang_thai_thanh_toan, tam_tinh_tien_hang, so_dong_hang,
+                          so_tien_da_thanh_toan, ngay_giao_hang_thuc_te, id_khach_hang ON DonHangBan
+FOR EACH ROW
+EXECUTE FUNCTION func_dong_bo_cong_no_phai_thu();
+
+-- Cộng / trừ công nợ của một khách hàng; khách hết đơn nợ thì xóa dòng
+CREATE OR REPLACE FUNCTION func_cong_no_khach_hang_theo(p_id_khach_hang INTEGER, p_so_tien NUMERIC, p_so_don INTEGER)
+RETURNS VOID AS $$
+BEGIN
+    INSERT INTO CongNoKhachHang (id_khach_hang, tong_cong_no, so_don_no)
+    VALUES (p_id_khach_hang, p_so_tien, p_so_don)
+    ON CONFLICT (id_khach_hang) DO UPDATE SET
+        tong_cong_no = CongNoKhachHang.tong_cong_no + EXCLUDED.tong_cong_no,
+        so_don_no = CongNoKhachHang.so_don_no + EXCLUDED.so_don_no;
+
+    DELETE FROM CongNoKhachHang WHERE id_khach_hang = p_id_khach_hang AND so_don_no = 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION func_cap_nhat_cong_no_khach_hang()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        PERFORM func_cong_no_khach_hang_theo(OLD.id_khach_hang, -OLD.so_tien_con_no, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM func_cong_no_khach_hang_theo(NEW.id_khach_hang, NEW.so_tien_con_no, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_after_change_congnophaithu_khach_hang
+AFTER INSERT OR UPDATE OR DELETE ON CongNoPhaiThu
+FOR EACH ROW
+EXECUTE FUNCTION func_cap_nhat_cong_no_khach_hang();
+
+-- Không có trigger TRUNCATE: khóa ngoại CASCADE tới KhachHang đã đưa CongNoKhachHang vào mọi lệnh
+-- TRUNCATE ... CASCADE làm rỗng CongNoPhaiThu (TRUNCATE lồng trong trigger sẽ lỗi ObjectInUse).
+
+-- Khởi tạo sổ công nợ cho dữ liệu đã có (trigger ở trên điền CongNoKhachHang)
+INSERT INTO CongNoPhaiThu (id_don_hang_ban, id_khach_hang, ngay_tinh_no, so_tien_con_no)
+SELECT id, id_khach_hang, ngay_giao_hang_thuc_te, tam_tinh_tien_hang - so_tien_da_thanh_toan
+FROM DonHangBan
+WHERE trang_thai_don_hang IN ('Đã giao', 'Hoàn tất')
+  AND trang_thai_thanh_toan = 'Chưa thanh toán'
+  AND so_dong_hang > 0
+  AND tam_tinh_tien_hang > so_tien_da_thanh_toan;
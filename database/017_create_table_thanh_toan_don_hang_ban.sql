@@ -0,0 +1,74 @@
+-- Các lần thanh toán (có thể từng phần) của đơn hàng bán.
+-- Trigger cộng / trừ DonHangBan.so_tien_da_thanh_toan trong cùng giao dịch ghi thanh toán; đơn trả đủ tự chuyển
+-- 'Đã thanh toán'. Sổ công nợ (016_create_table_cong_no_phai_thu.sql) theo dõi cột này nên số còn nợ của đơn
+-- và của khách hàng được cập nhật ngay.
+-- Số đã thu / còn lại của một đơn đọc từ so_tien_da_thanh_toan (nguồn dữ liệu chính), không từ trang_thai_thanh_toan:
+-- enum trạng thái không có giá trị "trả một phần" -- đơn trả dở vẫn là 'Chưa thanh toán' với so_tien_da_thanh_toan > 0,
+-- và chỉ chuyển 'Đã thanh toán' khi đã thu đủ tam_tinh_tien_hang.
+CREATE TABLE ThanhToanDonHangBan (
+    id SERIAL PRIMARY KEY,
+    id_don_hang_ban INTEGER NOT NULL,
+    id_nhan_vien INTEGER NULL,                      -- Nhân viên thu tiền
+    so_tien NUMERIC(15, 0) NOT NULL CHECK (so_tien > 0),
+    phuong_thuc_thanh_toan enum_phuong_thuc_thanh_toan NOT NULL,
+    ngay_thanh_toan TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ghi_chu TEXT NULL,
+
+    CONSTRAINT fk_thanh_toan_don_hang_ban
+        FOREIGN KEY (id_don_hang_ban) REFERENCES DonHangBan(id) ON DELETE CASCADE ON UPDATE CASCADE,
+    CONSTRAINT fk_thanh_toan_nhan_vien
+        FOREIGN KEY (id_nhan_vien) REFERENCES NhanVien(id) ON DELETE SET NULL ON UPDATE CASCADE
+);
+
+-- Lịch sử thanh toán của một đơn
+CREATE INDEX idx_thanh_toan_don_hang_ban ON ThanhToanDonHangBan (id_don_hang_ban, ngay_thanh_toan);
+
+-- Ghi nhận / hủy một lần thanh toán vào đơn.
+-- Thêm: đơn phải chưa bị hủy / trả hàng, chưa 'Đã thanh toán' và số tiền không vượt quá số còn lại;
+-- UPDATE có điều kiện khóa dòng đơn nên hai lần thu tiền đồng thời không thể cùng vượt quá.
+CREATE OR REPLACE FUNCTION func_ghi_nhan_thanh_toan_don_ban()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE DonHangBan
+        SET so_tien_da_thanh_toan = so_tien_da_thanh_toan + NEW.so_tien,
+            trang_thai_thanh_toan = CASE
+                WHEN so_tien_da_thanh_toan + NEW.so_tien >= tam_tinh_tien_hang THEN 'Đã thanh toán'
+                ELSE trang_thai_thanh_toan
+            END
+        WHERE id = NEW.id_don_hang_ban
+          AND trang_thai_don_hang NOT IN ('Đã hủy', 'Trả hàng')
+          AND trang_thai_thanh_toan = 'Chưa thanh toán'
+          AND so_tien_da_thanh_toan + NEW.so_tien <= tam_tinh_tien_hang;
+
+        IF NOT FOUND THEN
+            RAISE EXCEPTION 'Không thể ghi nhận thanh toán % cho đơn hàng %: đơn không tồn tại, đã hủy, đã thanh toán hoặc số tiền vượt quá số còn nợ.',
+                NEW.so_tien, NEW.id_don_hang_ban
+                USING ERRCODE = 'check_violation';
+        END IF;
+        RETURN NULL;
+    END IF;
+
+    -- Xóa (điều chỉnh) một lần thanh toán: trả lại số tiền cho đơn
+    UPDATE DonHangBan
+    SET so_tien_da_thanh_toan = so_tien_da_thanh_toan - OLD.so_tien,
+        trang_thai_thanh_toan = CASE
+            WHEN so_tien_da_thanh_toan - OLD.so_tien < tam_tinh_tien_hang THEN 'Chưa thanh toán'
+            ELSE trang_thai_thanh_toan
+        END
+    WHERE id = OLD.id_don_hang_ban;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_after_change_thanhtoan_don_ban
+AFTER INSERT OR DELETE ON ThanhToanDonHangBan
+FOR EACH ROW
+EXECUTE FUNCTION func_ghi_nhan_thanh_toan_don_ban();
+
+-- Đơn cũ đã đánh dấu 'Đã thanh toán' trước khi có bảng này: coi như đã thu đủ, để so_tien_da_thanh_toan
+-- khớp với trạng thái (một lần; từ đây trigger ở trên cộng / trừ theo từng lần thanh toán)
+UPDATE DonHangBan
+SET so_tien_da_thanh_toan = tam_tinh_tien_hang
+WHERE trang_thai_thanh_toan = 'Đã thanh toán'
+  AND so_tien_da_thanh_toan = 0;
@@ -0,0 +1,27 @@
+-- Các lần nhập dữ liệu hàng loạt từ tệp CSV / XLSX (sản phẩm, khách hàng, nhà cung cấp).
+-- Tệp được xử lý nền theo từng khối dòng bởi backend/be/operation/operation_15_nhapdulieu.py:
+-- mỗi khối COMMIT riêng nên số dòng đã xử lý (tiến độ) được cập nhật dần trong lúc chạy.
+CREATE TABLE LoNhapDuLieu (
+    id SERIAL PRIMARY KEY,
+    loai_du_lieu VARCHAR(20) NOT NULL CHECK (loai_du_lieu IN ('san_pham', 'khach_hang', 'nha_cung_cap')),
+    ten_tep VARCHAR(255) NOT NULL,
+    trang_thai VARCHAR(20) NOT NULL DEFAULT 'Đang chờ' CHECK (trang_thai IN ('Đang chờ', 'Đang xử lý', 'Hoàn tất', 'Thất bại')),
+    so_dong_da_doc INTEGER NOT NULL DEFAULT 0,      -- Số dòng dữ liệu đã đọc (không tính dòng tiêu đề, dòng trống)
+    so_dong_them_moi INTEGER NOT NULL DEFAULT 0,
+    so_dong_cap_nhat INTEGER NOT NULL DEFAULT 0,
+    so_dong_loi INTEGER NOT NULL DEFAULT 0,
+    thong_bao_loi TEXT NULL,                        -- Lỗi làm dừng cả lần nhập (tệp hỏng, thiếu cột bắt buộc...)
+    ngay_tao_ban_ghi TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    ngay_hoan_tat TIMESTAMP WITH TIME ZONE NULL
+);
+
+-- Lỗi của từng dòng bị bỏ qua trong một lần nhập
+CREATE TABLE LoiNhapDuLieu (
+    id_lo_nhap INTEGER NOT NULL,
+    so_dong INTEGER NOT NULL,                       -- Số thứ tự dòng trong tệp (dòng tiêu đề là dòng 1)
+    noi_dung_loi TEXT NOT NULL,
+
+    CONSTRAINT pk_loi_nhap_du_lieu PRIMARY KEY (id_lo_nhap, so_dong),
+    CONSTRAINT fk_loi_nhap_lo_nhap
+        FOREIGN KEY (id_lo_nhap) REFERENCES LoNhapDuLieu(id) ON DELETE CASCADE ON UPDATE CASCADE
+);
@@ -23,6 +23,9 @@ export const apiService = {
   
   // Bước B: Thêm sản phẩm (Tại đây Trigger DB sẽ tự động thực hiện trừ kho thật)
   addItemToOrder: (itemData) => api.post('/donhangban/add-item', itemData),
+
+  // Tạo đơn + toàn bộ sản phẩm trong 1 request / 1 giao dịch, trả về hóa đơn
+  createOrderWithItems: (orderData) => api.post('/donhangban/create-with-items', orderData),
   
   // Lấy chi tiết hóa đơn (bao gồm tính toán Thuế 11.5% từ Backend)
   getOrderDetail: (id) => api.get(`/donhangban/chitiet/${id}`),
@@ -99,25 +99,19 @@ const CreateOrder = () => {
     if (cart.length === 0) return;
     setIsSubmitting(true);
     try {
-      const orderRes = await apiService.createOrder({
+      await apiService.createOrderWithItems({
         id_nhan_vien: 1,
         id_khach_hang: 1,
         dia_chi_giao_hang: "Tại quầy",
         trang_thai_don_hang: 'Hoàn tất',
-        trang_thai_thanh_toan: 'Đã thanh toán'
-      });
-      
-      const orderId = orderRes.data.id_don_hang;
-      
-      const detailPromises = cart.map(item => apiService.addItemToOrder({
-          id_don_hang_ban: orderId,
+        trang_thai_thanh_toan: 'Đã thanh toán',
+        items: cart.map(item => ({
           id_san_pham: item.id,
           so_luong: item.quantity,
           gia_ban_niem_yet_don_vi: item.gia_ban_hien_tai,
           giam_gia: 0
-      }));
-      
-      await Promise.all(detailPromises);
+        }))
+      });
 
       alert("Thanh toán thành công!");
       navigate('/');